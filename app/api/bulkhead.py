@@ -0,0 +1,206 @@
+"""
+app/api/bulkhead.py
+-------------------
+Bulkhead isolation for route handlers.
+
+Without isolation, a pile-up of 60-second provider calls starves cheap
+endpoints like /auth/me. Each bulkhead owns a concurrency limit, a bounded
+executor, and a bounded wait queue; once both are full, new requests are
+rejected immediately with 503 instead of queueing.
+
+- async handlers: admitted through the bulkhead's limit; their blocking
+  calls made via app.utils.blocking.run_blocking go to its executor
+- sync handlers: run entirely in the bulkhead's executor
+
+- "llm":     routes that call a provider (profiling, completions, key validation)
+- "control": session checks, key listing, prompt lookup, routing, usage
+- "auth":    login and register, which wait on bcrypt (password_hasher);
+             a login storm fills this one and leaves /auth/me alone
+- "import":  NDJSON prompt uploads, which hold their slot while the whole
+             body streams in; kept small so bulk loads cannot starve "control"
+
+Usage:
+    @router.get("/things")
+    @bulkhead("control")
+    def list_things(...): ...
+"""
+
+from __future__ import annotations
+
+import asyncio
+import functools
+import inspect
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable
+
+from fastapi import HTTPException
+
+from app.utils.blocking import use_executor
+
+# name -> (default workers, default queue); override via BULKHEAD_<NAME>_WORKERS / _QUEUE
+_DEFAULTS = {
+    "llm": (32, 64),
+    "control": (16, 128),
+    "import": (2, 4),
+    "auth": (8, 32),  # stays below the bcrypt pool's own bound (2 + 64)
+}
+
+
+class BulkheadFull(RuntimeError):
+    """Both the executor and the wait queue of a bulkhead are full."""
+
+
+class Bulkhead:
+    def __init__(self, name: str, max_concurrent: int, max_queue: int):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrent, thread_name_prefix=f"bulkhead-{name}")
+        self._lock = threading.Lock()
+        self._admitted = 0  # running + waiting
+        self._running = 0
+        self._rejected = 0
+        self._completed = 0
+        self._wait_total_s = 0.0
+        self._wait_max_s = 0.0
+        # asyncio primitives bind to one loop; rebuilt if the loop changes (tests)
+        self._semaphore: asyncio.Semaphore | None = None
+        self._semaphore_loop: asyncio.AbstractEventLoop | None = None
+
+    @asynccontextmanager
+    async def admit(self) -> AsyncIterator[None]:
+        """Hold one of this bulkhead's slots for the duration of an async handler."""
+        self._reserve()
+        enqueued_at = time.monotonic()
+        try:
+            async with self._loop_semaphore():
+                self._on_start(time.monotonic() - enqueued_at)
+                try:
+                    with use_executor(self._executor):
+                        yield
+                finally:
+                    self._on_finish()
+        finally:
+            self._on_release()
+
+    async def run(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """Run a blocking callable in this bulkhead's executor."""
+        self._reserve()
+        enqueued_at = time.monotonic()
+
+        def call():
+            self._on_start(time.monotonic() - enqueued_at)
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self._on_finish()
+
+        future = self._executor.submit(call)
+        # Fires on completion *or* cancellation, so a disconnected client's
+        # slot is only freed once its thread has actually finished.
+        future.add_done_callback(lambda _: self._on_release())
+        return await asyncio.wrap_future(future)
+
+    def stats(self) -> dict:
+        with self._lock:
+            started = self._completed + self._running
+            return {
+                "max_concurrent": self.max_concurrent,
+                "max_queue": self.max_queue,
+                "running": self._running,
+                "queued": self._admitted - self._running,
+                "saturation": round(self._admitted / (self.max_concurrent + self.max_queue), 3),
+                "rejected": self._rejected,
+                "completed": self._completed,
+                "wait_avg_ms": round(self._wait_total_s / started * 1000, 2) if started else 0.0,
+                "wait_max_ms": round(self._wait_max_s * 1000, 2),
+            }
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=True)
+
+    def _reserve(self) -> None:
+        with self._lock:
+            if self._admitted >= self.max_concurrent + self.max_queue:
+                self._rejected += 1
+                raise BulkheadFull(f"Service busy ({self.name} capacity exhausted), retry shortly")
+            self._admitted += 1
+
+    def _loop_semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        if self._semaphore_loop is not loop:
+            self._semaphore = asyncio.Semaphore(self.max_concurrent)
+            self._semaphore_loop = loop
+        return self._semaphore
+
+    def _on_start(self, wait_s: float) -> None:
+        with self._lock:
+            self._running += 1
+            self._wait_total_s += wait_s
+            self._wait_max_s = max(self._wait_max_s, wait_s)
+
+    def _on_finish(self) -> None:
+        with self._lock:
+            self._running -= 1
+            self._completed += 1
+
+    def _on_release(self) -> None:
+        with self._lock:
+            self._admitted -= 1
+
+
+_bulkheads: dict[str, Bulkhead] = {}
+_registry_lock = threading.Lock()
+
+
+def get_bulkhead(name: str) -> Bulkhead:
+    """
+    Lazily build a named bulkhead. Sizes come from env, e.g.
+    BULKHEAD_LLM_WORKERS=32, BULKHEAD_LLM_QUEUE=64.
+    """
+    with _registry_lock:
+        if name not in _bulkheads:
+            workers, queue = _DEFAULTS.get(name, (8, 32))
+            prefix = f"BULKHEAD_{name.upper()}"
+            _bulkheads[name] = Bulkhead(
+                name,
+                max_concurrent=int(os.getenv(f"{prefix}_WORKERS", workers)),
+                max_queue=int(os.getenv(f"{prefix}_QUEUE", queue)),
+            )
+        return _bulkheads[name]
+
+
+def all_bulkhead_stats() -> dict[str, dict]:
+    with _registry_lock:
+        bulkheads = list(_bulkheads.values())
+    return {b.name: b.stats() for b in bulkheads}
+
+
+def bulkhead(name: str):
+    """Run a route handler inside the named bulkhead (503 when full)."""
+    def decorator(fn: Callable[..., Any]):
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def wrapper(*args: Any, **kwargs: Any) -> Any:
+                try:
+                    async with get_bulkhead(name).admit():
+                        return await fn(*args, **kwargs)
+                except BulkheadFull as e:
+                    raise _busy(e)
+        else:
+            @functools.wraps(fn)
+            async def wrapper(*args: Any, **kwargs: Any) -> Any:
+                try:
+                    return await get_bulkhead(name).run(fn, *args, **kwargs)
+                except BulkheadFull as e:
+                    raise _busy(e)
+        return wrapper
+    return decorator
+
+
+def _busy(e: BulkheadFull) -> HTTPException:
+    return HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
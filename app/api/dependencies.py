@@ -5,39 +5,52 @@ Milestone 4: FastAPI auth dependencies.
 
 get_current_user: required auth (raises 401)
 get_optional_user: optional auth (returns None if no header)
+require_admin: required auth + username listed in ADMIN_USERNAMES (raises 403)
+
+Both resolve through the session store + token cache, not the users table.
 """
 
+import os
+
 from fastapi import Depends, Header, HTTPException
-from sqlalchemy.orm import Session
 
-from app.db.models import User
-from app.db.session import get_db
 from app.services.auth_service import get_user_from_token
+from app.services.session_store import UserSnapshot
 
 
-def get_current_user(
+async def get_current_user(
     authorization: str = Header(..., alias="Authorization"),
-    db: Session = Depends(get_db),
-) -> User:
-    """Extract Bearer token from Authorization header, resolve to User."""
+) -> UserSnapshot:
+    """Extract Bearer token from Authorization header, resolve to a user snapshot."""
     if not authorization.startswith("Bearer "):
         raise HTTPException(status_code=401, detail="Missing Bearer token")
     token = authorization[7:]
     try:
-        return get_user_from_token(token, db)
+        return await get_user_from_token(token)
     except LookupError as e:
         raise HTTPException(status_code=401, detail=str(e))
 
 
-def get_optional_user(
+async def get_optional_user(
     authorization: str | None = Header(default=None, alias="Authorization"),
-    db: Session = Depends(get_db),
-) -> User | None:
+) -> UserSnapshot | None:
     """Same as get_current_user but returns None if no auth header present."""
     if not authorization or not authorization.startswith("Bearer "):
         return None
     token = authorization[7:]
     try:
-        return get_user_from_token(token, db)
+        return await get_user_from_token(token)
     except LookupError:
-        return None
\ No newline at end of file
+        return None
+
+
+def admin_usernames() -> set[str]:
+    """Comma-separated ADMIN_USERNAMES, read per call so tests/ops can change it."""
+    return {u.strip() for u in os.getenv("ADMIN_USERNAMES", "").split(",") if u.strip()}
+
+
+async def require_admin(user: UserSnapshot = Depends(get_current_user)) -> UserSnapshot:
+    """get_current_user, restricted to operators named in ADMIN_USERNAMES."""
+    if user.username not in admin_usernames():
+        raise HTTPException(status_code=403, detail="Admin access required")
+    return user
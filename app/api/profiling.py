@@ -0,0 +1,92 @@
+"""
+app/api/profiling.py
+--------------------
+ASGI middleware: profile one request on demand, without a redeploy.
+
+    curl -H "Authorization: Bearer $ADMIN_TOKEN" -H "X-BYOK-Profile: 1" \\
+         -X POST .../v1/completions -d '{"prompt_id": 42}'
+
+When the X-BYOK-Profile header is present and the bearer token belongs to
+a user in ADMIN_USERNAMES, the request runs under a RequestProfile
+(app/utils/profiling.py). The response then carries `X-Profile-Id`, and
+PROFILE_DIR (default ./profiles) gets:
+
+    <id>.cpu.folded     sampled stacks, for speedscope / flamegraph.pl
+    <id>.mem.txt        top allocation sites + peak traced memory
+    <id>.tracemalloc    raw snapshot (tracemalloc.Snapshot.load)
+
+The id is the caller's X-Request-ID when it is safe to use as a file name,
+otherwise a random one. Without the header, or for anyone else, the
+request passes through untouched. If another profile is already running
+in this worker, the response says `X-Profile-Id: busy` and nothing is
+captured.
+
+Files are written after the response has been sent, on a worker thread.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import re
+import uuid
+
+from app.api.dependencies import admin_usernames
+from app.services.auth_service import get_user_from_token
+from app.utils.profiling import RequestProfile
+
+PROFILE_HEADER = b"x-byok-profile"
+_SAFE_ID = re.compile(r"[A-Za-z0-9_-]{1,64}")
+
+
+def _header(scope, name: bytes) -> str | None:
+    for key, value in scope.get("headers", []):
+        if key == name:
+            return value.decode("latin-1")
+    return None
+
+
+async def _is_admin(scope) -> bool:
+    authorization = _header(scope, b"authorization") or ""
+    if not authorization.startswith("Bearer "):
+        return False
+    try:
+        user = await get_user_from_token(authorization[7:])
+    except LookupError:
+        return False
+    return user.username in admin_usernames()
+
+
+def _request_id(scope) -> str:
+    given = _header(scope, b"x-request-id")
+    if given and _SAFE_ID.fullmatch(given):
+        return given
+    return uuid.uuid4().hex[:16]
+
+
+class ProfilingMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or _header(scope, PROFILE_HEADER) is None or not await _is_admin(scope):
+            await self.app(scope, receive, send)
+            return
+
+        profile = RequestProfile.begin(_request_id(scope))
+        profile_id = profile.request_id if profile is not None else "busy"
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((b"x-profile-id", profile_id.encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        if profile is None:
+            await self.app(scope, receive, send_with_id)
+            return
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            profile.finish()
+            await asyncio.to_thread(profile.write)
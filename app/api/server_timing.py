@@ -0,0 +1,53 @@
+"""
+app/api/server_timing.py
+------------------------
+ASGI middleware: per-request stage timings (app/utils/timing.py) out as a
+`Server-Timing` response header, plus the request-level histogram.
+
+    Server-Timing: keys;dur=1.8, catalog;dur=2.3, select;dur=0.2,
+                   attempt;dur=812.4;desc="openai/gpt-4o-mini error",
+                   attempt-2;dur=655.0;desc="gemini/models/gemini-2.5-flash", total;dur=1475.9
+
+The header goes out with the response start, so for streaming responses
+(export) it covers the work done before the first byte.
+
+Pure ASGI rather than BaseHTTPMiddleware: no extra task per request and
+streaming bodies pass straight through.
+"""
+
+from __future__ import annotations
+
+import time
+
+from app.utils.timing import REQUEST_SECONDS, begin_request, end_request
+
+
+class ServerTimingMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings, token = begin_request()
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", timings.header().encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            end_request(token)
+            route = scope.get("route")
+            # Route template keeps label cardinality bounded (/v1/prompts/{prompt_id})
+            path = getattr(route, "path", None) or "unmatched"
+            REQUEST_SECONDS.observe(time.perf_counter() - timings.started, (scope["method"], path, str(status)))
@@ -10,10 +10,11 @@ GET  /auth/me       — get current user info
 """
 
 from fastapi import APIRouter, Depends, Header, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.api.bulkhead import bulkhead
 from app.db.session import get_db
-from app.db.models import User
+from app.services.session_store import UserSnapshot
 from app.api.dependencies import get_current_user
 from app.schemas.auth import (
     RegisterRequest,
@@ -21,26 +22,33 @@ from app.schemas.auth import (
     AuthResponse,
     UserResponse,
 )
-from app.services.auth_service import register_user, login_user, logout
+from app.services.auth_service import register_user, login_user, logout, create_session
+from app.services.password_hasher import HasherBusy
 
 router = APIRouter()
 
 
 @router.post("/auth/register", response_model=AuthResponse, status_code=201)
-def register(req: RegisterRequest, db: Session = Depends(get_db)) -> AuthResponse:
+@bulkhead("auth")
+async def register(req: RegisterRequest, db: AsyncSession = Depends(get_db)) -> AuthResponse:
     try:
-        user = register_user(req.username, req.password, db)
+        user = await register_user(req.username, req.password, db)
+    except HasherBusy as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except ValueError as e:
         raise HTTPException(status_code=409, detail=str(e))
-    # Auto-login after registration
-    _, token = login_user(req.username, req.password, db)
+    # Auto-login after registration (password was just hashed — no need to verify it again)
+    token = await create_session(user)
     return AuthResponse(user_id=user.id, username=user.username, session_token=token)
 
 
 @router.post("/auth/login", response_model=AuthResponse)
-def login(req: LoginRequest, db: Session = Depends(get_db)) -> AuthResponse:
+@bulkhead("auth")
+async def login(req: LoginRequest, db: AsyncSession = Depends(get_db)) -> AuthResponse:
     try:
-        user, token = login_user(req.username, req.password, db)
+        user, token = await login_user(req.username, req.password, db)
+    except HasherBusy as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except LookupError as e:
         raise HTTPException(status_code=404, detail=str(e))
     except ValueError as e:
@@ -49,15 +57,17 @@ def login(req: LoginRequest, db: Session = Depends(get_db)) -> AuthResponse:
 
 
 @router.post("/auth/logout")
-def logout_endpoint(
-    _user: User = Depends(get_current_user),
+@bulkhead("control")
+async def logout_endpoint(
+    _user: UserSnapshot = Depends(get_current_user),
     authorization: str = Header(..., alias="Authorization"),
 ):
     token = authorization[7:]  # strip "Bearer "
-    logout(token)
+    await logout(token)
     return {"status": "logged out"}
 
 
 @router.get("/auth/me", response_model=UserResponse)
-def me(user: User = Depends(get_current_user)) -> UserResponse:
+@bulkhead("control")
+async def me(user: UserSnapshot = Depends(get_current_user)) -> UserResponse:
     return UserResponse(user_id=user.id, username=user.username)
\ No newline at end of file
@@ -3,35 +3,70 @@ API route for LLM completion (Milestone 3B + Milestone 4 per-user keys).
 
 Accepts a prompt_id (already profiled), routes to the best model,
 executes the LLM call with fallback, and returns the response.
+
+GET /completions/attempts/summary (admin only) breaks the recorded
+attempts down by model and fallback position, with latency percentiles.
 """
 
+from datetime import datetime
+
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.api.bulkhead import bulkhead
 from app.db.session import get_db
-from app.db.models import User
-from app.api.dependencies import get_optional_user
-from app.schemas.completion import CompletionRequest, CompletionResponse
+from app.services.session_store import UserSnapshot
+from app.api.dependencies import get_optional_user, require_admin
+from app.schemas.completion import AttemptSummaryResponse, CompletionRequest, CompletionResponse
+from app.services.attempt_analytics import AttemptFilters, attempt_summary
+from app.services.budget_ledger import BudgetExceeded
 from app.services.completion_service import execute_completion
 from app.services.key_service import build_user_keys
 from app.services.LLM_completion import LLMCompletionClient
+from app.services.scheduler import SchedulerBusy, get_scheduler
 
 router = APIRouter()
 
 
 @router.post("/completions", response_model=CompletionResponse)
-def create_completion(
+@bulkhead("llm")
+async def create_completion(
     req: CompletionRequest,
-    db: Session = Depends(get_db),
-    user: User | None = Depends(get_optional_user),
+    db: AsyncSession = Depends(get_db),
+    user: UserSnapshot | None = Depends(get_optional_user),
 ) -> CompletionResponse:
-    user_keys = build_user_keys(user.id, db) if user else None
-    client = LLMCompletionClient(keys=user_keys)
+    user_keys = await build_user_keys(user.id, db) if user else None
+    client = LLMCompletionClient(
+        keys=user_keys,
+        scheduler=get_scheduler(),
+        user_id=user.id if user else None,
+    )
     try:
-        return execute_completion(req.prompt_id, db, client)
+        return await execute_completion(req.prompt_id, db, client)
+    except BudgetExceeded as e:
+        raise HTTPException(status_code=402, detail=str(e))
     except LookupError as e:
         raise HTTPException(status_code=404, detail=str(e))
     except ValueError as e:
         raise HTTPException(status_code=422, detail=str(e))
+    except SchedulerBusy as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
     except RuntimeError as e:
-        raise HTTPException(status_code=502, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=502, detail=str(e))
+
+
+@router.get("/completions/attempts/summary", response_model=AttemptSummaryResponse)
+@bulkhead("control")
+async def completion_attempt_summary(
+    start: datetime | None = None,
+    end: datetime | None = None,
+    provider: str | None = None,
+    task_type: str | None = None,
+    db: AsyncSession = Depends(get_db),
+    _admin: UserSnapshot = Depends(require_admin),
+) -> AttemptSummaryResponse:
+    """Default window: the 7 days before `end` (default now)."""
+    if start and end and start >= end:
+        raise HTTPException(status_code=422, detail="start must be before end")
+    filters = AttemptFilters(start=start, end=end, provider=provider, task_type=task_type)
+    return AttemptSummaryResponse(**await attempt_summary(db, filters))
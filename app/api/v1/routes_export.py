@@ -0,0 +1,61 @@
+"""
+app/api/v1/routes_export.py
+---------------------------
+Bulk export for offline analysis (admin only — see ADMIN_USERNAMES).
+
+GET /export/prompts
+GET /export/request_logs
+
+Streams NDJSON in (created_at, id) order straight from a server-side
+cursor, so memory stays flat whatever the table size.
+
+Query params:
+- after_id: resume after the last id received (default 0 = from the start;
+            404 if that row no longer exists, e.g. archived)
+- user_id:  only rows for this user
+- gzip:     true -> application/gzip body (<table>.ndjson.gz)
+- batch:    rows fetched per cursor round trip
+"""
+
+from typing import Literal
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+
+from app.api.bulkhead import bulkhead
+from app.api.dependencies import require_admin
+from app.db.session import AsyncSessionLocal
+from app.services.exporter import DEFAULT_BATCH, EXPORTABLE, export_ndjson, gzip_stream, resume_point
+from app.services.session_store import UserSnapshot
+
+router = APIRouter()
+
+
+@router.get("/export/{table}")
+@bulkhead("control")
+async def export_table(
+    table: Literal["prompts", "request_logs"],
+    after_id: int = Query(default=0, ge=0),
+    user_id: int | None = None,
+    gzip: bool = False,
+    batch: int = Query(default=DEFAULT_BATCH, ge=1, le=50_000),
+    _admin: UserSnapshot = Depends(require_admin),
+) -> StreamingResponse:
+    # Checked up front: once streaming starts, errors can no longer change the status
+    async with AsyncSessionLocal() as db:
+        try:
+            await resume_point(db, EXPORTABLE[table], after_id)
+        except LookupError as e:
+            raise HTTPException(status_code=404, detail=str(e))
+    body = export_ndjson(AsyncSessionLocal, EXPORTABLE[table], after_id=after_id, user_id=user_id, batch=batch)
+    filename = f"{table}.ndjson"
+    media_type = "application/x-ndjson"
+    if gzip:
+        body = gzip_stream(body)
+        filename += ".gz"
+        media_type = "application/gzip"
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
@@ -0,0 +1,48 @@
+"""
+app/api/v1/routes_ops.py
+------------------------
+Operational introspection endpoints.
+
+GET /ops/scheduler — provider scheduler limits, queue depth and wait times
+                     (admins only: it lists API key fingerprints)
+GET /ops/bulkheads — per-bulkhead running/queued/rejected counts and saturation
+GET /ops/write-queue — write-behind queue depth and flush counters
+GET /metrics — Prometheus histograms of request and stage latency (mounted
+               at the root, where scrapers expect it; see app/utils/timing.py)
+
+These endpoints are deliberately NOT behind a bulkhead: they must answer
+even when every pool is saturated.
+"""
+
+from fastapi import APIRouter, Depends
+from fastapi.responses import PlainTextResponse
+
+from app.api.bulkhead import all_bulkhead_stats
+from app.api.dependencies import require_admin
+from app.services.scheduler import get_scheduler
+from app.services.session_store import UserSnapshot
+from app.services.write_behind import get_write_queue
+from app.utils.timing import render_prometheus
+
+router = APIRouter()
+metrics_router = APIRouter()
+
+
+@router.get("/ops/scheduler")
+async def scheduler_stats(_admin: UserSnapshot = Depends(require_admin)) -> dict:
+    return get_scheduler().stats()
+
+
+@router.get("/ops/bulkheads")
+async def bulkhead_stats() -> dict:
+    return all_bulkhead_stats()
+
+
+@router.get("/ops/write-queue")
+async def write_queue_stats() -> dict:
+    return get_write_queue().stats()
+
+
+@metrics_router.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def metrics() -> PlainTextResponse:
+    return PlainTextResponse(render_prometheus(), media_type="text/plain; version=0.0.4")
@@ -3,24 +3,47 @@ API routes for Prompt intake (Milestone 1 + Milestone 2).
 
 Responsibilities:
 - Receive user prompt
-- Store it in database
+- Store it in database (through the write-behind queue; the id is assigned up front)
 - Run ONE LLM call to classify the prompt into a JSON profile (Milestone 2)
 - Store prompt_profile_json in DB
 - Allow retrieval by ID (including stored profile)
+- List prompts (keyset-paginated, filterable) and count them per profile field
+- Bulk-import prompts from NDJSON; profiling runs in a background worker pool
 """
 
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from datetime import datetime
 
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.api.bulkhead import bulkhead
 from app.db.session import get_db
+from app.db.models import ImportJob
 from app.db.prompt_models import Prompt
-from app.db.models import User
-from app.api.dependencies import get_optional_user
+from app.services.prompt_queries import (
+    AnalyticsGroupBy,
+    InvalidCursor,
+    PromptFilters,
+    list_prompts as query_prompts,
+    prompt_analytics,
+)
+from app.services.prompt_bodies import attach_body, prompt_text, prompt_texts
+from app.services.prompt_import import ImportTooLarge, import_prompts, job_progress
+from app.services.session_store import UserSnapshot
+from app.services.write_behind import WriteQueueFull, get_row, get_write_queue
+from app.utils.blocking import run_blocking
+from app.utils.timing import stage
+from app.api.dependencies import get_current_user, get_optional_user
 
 # Pydantic schemas (request + response)
 from app.schemas.prompts import (
+    ImportJobProgress,
     PromptCreateRequest,
+    PromptAnalyticsResponse,
     PromptCreateWithProfileResponse,
+    PromptImportResponse,
+    PromptListItem,
+    PromptListResponse,
     PromptReadWithProfileResponse,
     PromptProfile,
 )
@@ -45,10 +68,10 @@ def _get_profiler() -> GeminiPromptProfiler:
 
 
 @router.post("/prompts", response_model=PromptCreateWithProfileResponse)
-def create_prompt(
+@bulkhead("llm")
+async def create_prompt(
     req: PromptCreateRequest,
-    db: Session = Depends(get_db),
-    user: User | None = Depends(get_optional_user),
+    user: UserSnapshot | None = Depends(get_optional_user),
 ) -> PromptCreateWithProfileResponse:
     """
     Milestone 2 behavior:
@@ -75,7 +98,9 @@ def create_prompt(
     # ----------------------------
     # This returns a PromptProfile Pydantic object (already validated)
     try:
-        profile: PromptProfile = _get_profiler().profile(raw_prompt)
+        with stage("profile") as timer:
+            profile: PromptProfile = await run_blocking(_get_profiler().profile, raw_prompt)
+            timer.set(task_type=profile.task_type)
     except Exception as e:
         # If Gemini fails or returns invalid JSON, return 502 (bad gateway)
         # because we depend on an external provider.
@@ -87,16 +112,22 @@ def create_prompt(
 
     # Create ORM object
     row = Prompt(
+        # Set here rather than by the column default: the row is readable before its INSERT
+        created_at=datetime.utcnow(),
         username=user.username if user else req.username,
         user_id=user.id if user else None,
-        raw_prompt=raw_prompt,
-        prompt_profile_json=profile.model_dump(),
     )
+    # Body is stored as deduplicated, compressed chunks (see prompt_bodies)
+    attach_body(row, raw_prompt)
+    # Also fills task_type / needs_web / output_format / urgency for filtering
+    row.set_profile(profile.model_dump())
 
-    # Persist to database
-    db.add(row)
-    db.commit()
-    db.refresh(row)  # Load generated ID and stored fields
+    # Queue for the batched writer — the id is assigned now, the INSERT lands within milliseconds
+    try:
+        with stage("enqueue", task_type=profile.task_type):
+            await get_write_queue().asubmit(row)
+    except WriteQueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
 
     # ----------------------------
     # 4) Return response
@@ -105,36 +136,153 @@ def create_prompt(
     return PromptCreateWithProfileResponse(
         prompt_id=row.id,
         username=row.username,
-        raw_prompt=row.raw_prompt,
+        raw_prompt=raw_prompt,
         prompt_profile_json=profile,
     )
 
 
-@router.get("/prompts")
-def list_prompts(db: Session = Depends(get_db)):
+def _filters(
+    user: UserSnapshot | None = Depends(get_optional_user),
+    user_id: int | None = None,
+    username: str | None = None,
+    start: datetime | None = None,
+    end: datetime | None = None,
+    task_type: str | None = None,
+    needs_web: bool | None = None,
+    output_format: str | None = None,
+    urgency: str | None = None,
+) -> PromptFilters:
+    """
+    Shared query params for listing + analytics.
+
+    With a Bearer token the results are always scoped to the caller;
+    user_id / username only apply to unauthenticated (legacy) calls.
+    """
+    if start and end and start >= end:
+        raise HTTPException(status_code=422, detail="start must be before end")
+    if user is not None:
+        user_id, username = user.id, None
+    return PromptFilters(
+        user_id=user_id,
+        username=username,
+        start=start,
+        end=end,
+        task_type=task_type,
+        needs_web=needs_web,
+        output_format=output_format,
+        urgency=urgency,
+    )
+
+
+@router.get("/prompts", response_model=PromptListResponse)
+@bulkhead("control")
+async def list_prompts(
+    limit: int = Query(default=20, ge=1, le=200),
+    cursor: str | None = None,
+    filters: PromptFilters = Depends(_filters),
+    db: AsyncSession = Depends(get_db),
+) -> PromptListResponse:
     """
-    Return a list of stored prompts (latest 20).
-    Helpful for quick browsing.
+    Return stored prompts, newest first, one page at a time.
+
+    Filters: user_id/username, start/end (created_at, end exclusive),
+    task_type, needs_web, output_format, urgency.
     """
-    rows = db.query(Prompt).order_by(Prompt.id.desc()).limit(20).all()
+    try:
+        rows, next_cursor = await query_prompts(db, filters, limit=limit, cursor=cursor)
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    texts = await prompt_texts(db, rows)
+
+    return PromptListResponse(
+        items=[
+            PromptListItem(
+                id=r.id,
+                username=r.username,
+                user_id=r.user_id,
+                created_at=r.created_at,
+                prompt=text,
+                # Show whether the profile exists (useful while debugging migrations)
+                has_profile=bool(r.prompt_profile_json),
+                task_type=r.task_type,
+                needs_web=r.needs_web,
+                output_format=r.output_format,
+                urgency=r.urgency,
+            )
+            for r, text in zip(rows, texts)
+        ],
+        next_cursor=next_cursor,
+    )
+
+
+# Declared before /prompts/{prompt_id} so "analytics" isn't parsed as an id
+@router.get("/prompts/analytics", response_model=PromptAnalyticsResponse)
+@bulkhead("control")
+async def prompts_analytics(
+    group_by: AnalyticsGroupBy = "task_type",
+    filters: PromptFilters = Depends(_filters),
+    db: AsyncSession = Depends(get_db),
+) -> PromptAnalyticsResponse:
+    """
+    Count prompts per task_type / needs_web / output_format / urgency / day,
+    with the same filters as the listing.
+    """
+    groups = await prompt_analytics(db, filters, group_by)
+    return PromptAnalyticsResponse(
+        group_by=group_by,
+        total=sum(g["prompts"] for g in groups),
+        groups=groups,
+    )
+
+
+@router.post("/prompts/import", response_model=PromptImportResponse, status_code=202)
+@bulkhead("import")
+async def import_prompts_ndjson(
+    request: Request,
+    user: UserSnapshot = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+) -> PromptImportResponse:
+    """
+    Bulk-load prompts from an NDJSON body, one {"prompt": ..., "created_at": ...} per line.
+
+    The body is streamed into the prompts table as it arrives; rows start
+    without a profile and are profiled in the background. Poll
+    GET /v1/prompts/imports/{job_id} for progress.
+    """
+    try:
+        result = await import_prompts(db, user, request.stream())
+    except ImportTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+
+    job = result.job
+    return PromptImportResponse(
+        job_id=job.id,
+        status=job.status,
+        imported=job.imported,
+        rejected=job.rejected,
+        errors=result.errors,
+    )
+
 
-    return [
-        {
-            "id": r.id,
-            "username": r.username,
-            "created_at": r.created_at.isoformat(),
-            "prompt": r.raw_prompt,
-            # Show whether the profile exists (useful while debugging migrations)
-            "has_profile": bool(r.prompt_profile_json),
-        }
-        for r in rows
-    ]
+@router.get("/prompts/imports/{job_id}", response_model=ImportJobProgress)
+@bulkhead("control")
+async def import_progress(
+    job_id: int,
+    user: UserSnapshot = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+) -> ImportJobProgress:
+    """Counts and ETA for a bulk import's background profiling."""
+    job = await db.get(ImportJob, job_id)
+    if job is None or job.user_id != user.id:
+        raise HTTPException(status_code=404, detail="Import job not found")
+    return ImportJobProgress(**job_progress(job))
 
 
 @router.get("/prompts/{prompt_id}", response_model=PromptReadWithProfileResponse)
-def get_prompt(
+@bulkhead("control")
+async def get_prompt(
     prompt_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ) -> PromptReadWithProfileResponse:
     """
     Retrieve a stored prompt by its ID (Milestone 2).
@@ -145,8 +293,8 @@ def get_prompt(
     - stored prompt_profile_json (if exists)
     """
 
-    # Query by primary key
-    row = db.query(Prompt).filter(Prompt.id == prompt_id).first()
+    # Query by primary key (a just-created row may still be in a write queue)
+    row = await get_row(db, Prompt, prompt_id)
 
     # If row doesn't exist, return 404
     if not row:
@@ -160,7 +308,7 @@ def get_prompt(
     return PromptReadWithProfileResponse(
         prompt_id=row.id,
         username=row.username,
-        raw_prompt=row.raw_prompt,
+        raw_prompt=await prompt_text(db, row),
         created_at=row.created_at,
         prompt_profile_json=profile_obj,
     )
\ No newline at end of file
@@ -1,6 +1,7 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.api.bulkhead import bulkhead
 from app.db.session import get_db
 from app.schemas.routing import RouteRequest, RouteResponse
 from app.services.model_catalog_repo import load_catalog
@@ -11,9 +12,10 @@ router = APIRouter()
 
 
 @router.post("/route", response_model=RouteResponse)
-def route_prompt(req: RouteRequest, db: Session = Depends(get_db)) -> RouteResponse:
+@bulkhead("control")
+async def route_prompt(req: RouteRequest, db: AsyncSession = Depends(get_db)) -> RouteResponse:
     # 1) Load models from DB
-    catalog = load_catalog(db)
+    catalog = await load_catalog(db)
 
     if not catalog:
         raise HTTPException(status_code=500, detail="Model catalog is empty. Seed models_catalog table.")
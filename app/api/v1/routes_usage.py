@@ -1,50 +1,83 @@
-from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
-from sqlalchemy import func
+"""
+app/api/v1/routes_usage.py
+--------------------------
+GET /usage — spend and token totals for a user.
 
+Totals come from usage_rollups (per user / day / model), so the cost of a
+call depends on the date range, not on how many request_logs the user has.
+
+Query params:
+- start, end: inclusive UTC dates (YYYY-MM-DD); default = all time
+- group_by:   day | model | provider — adds a per-group breakdown
+- username:   legacy lookup when no Bearer token is sent (default "demo")
+"""
+
+from datetime import date
+
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.api.bulkhead import bulkhead
+from app.api.dependencies import get_optional_user
 from app.db.session import get_db
 from app.db.models import RequestLog, User, Budget
+from app.services.session_store import UserSnapshot
+from app.services.usage_rollups import GroupBy, query_usage
 
 router = APIRouter()
 
 @router.get("/usage")
-def usage(username: str = "demo", db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.username == username).first()
-    if not user:
-        return {"error": "user not found"}
-
-    total_cost = (
-        db.query(func.sum(RequestLog.estimated_cost_usd))
-        .filter(RequestLog.user_id == user.id)
-        .scalar()
-        or 0.0
-    )
-
-    total_requests = (
-        db.query(func.count(RequestLog.id))
-        .filter(RequestLog.user_id == user.id)
-        .scalar()
-        or 0
-    )
-
-    budget = db.query(Budget).filter(Budget.user_id == user.id).first()
+@bulkhead("control")
+async def usage(
+    username: str = "demo",
+    start: date | None = None,
+    end: date | None = None,
+    group_by: GroupBy | None = None,
+    db: AsyncSession = Depends(get_db),
+    current: UserSnapshot | None = Depends(get_optional_user),
+):
+    if start and end and start > end:
+        raise HTTPException(status_code=422, detail="start must be on or before end")
+
+    if current is not None:
+        user_id, username = current.id, current.username
+    else:
+        user = (await db.execute(select(User).where(User.username == username))).scalars().first()
+        if not user:
+            return {"error": "user not found"}
+        user_id = user.id
+
+    summary = await query_usage(db, user_id, start=start, end=end, group_by=group_by)
+    totals = summary["totals"]
+
+    budget = (await db.execute(select(Budget).where(Budget.user_id == user_id))).scalars().first()
     remaining = None
     if budget:
         remaining = round(budget.monthly_budget_usd - budget.spent_usd, 6)
 
+    # Indexed on (user_id, created_at, id) + LIMIT: stays cheap regardless of history size.
+    # Not by id alone: ids are not in insert order across workers.
     last_requests = (
-        db.query(RequestLog)
-        .filter(RequestLog.user_id == user.id)
-        .order_by(RequestLog.id.desc())
-        .limit(10)
-        .all()
-    )
+        await db.execute(
+            select(RequestLog)
+            .where(RequestLog.user_id == user_id)
+            .order_by(RequestLog.created_at.desc(), RequestLog.id.desc())
+            .limit(10)
+        )
+    ).scalars().all()
 
     return {
         "username": username,
-        "total_requests": int(total_requests),
-        "total_estimated_cost_usd": round(float(total_cost), 8),
+        "range": {"start": start, "end": end},
+        "total_requests": int(totals["requests"]),
+        "failed_requests": int(totals["failed"]),
+        "total_input_tokens": int(totals["input_tokens"]),
+        "total_output_tokens": int(totals["output_tokens"]),
+        "total_estimated_cost_usd": round(float(totals["cost_usd"]), 8),
+        "wasted_cost_usd": round(float(totals["wasted_cost_usd"]), 8),
         "budget_remaining_usd": remaining,
+        "groups": summary["groups"],
         "last_10": [
             {
                 "id": r.id,
@@ -0,0 +1,311 @@
+"""
+app/db/migrations.py
+--------------------
+Versioned schema migrations.
+
+The database records the version it has been migrated to in a one-row
+`schema_version` table. Worker startup (ensure_schema) reads that one
+integer and returns when it matches HEAD — no table/column introspection,
+no DDL. Migrating is an explicit step, run once per deploy:
+
+    python -m scripts.migrate            # upgrade to HEAD
+    python -m scripts.migrate --status
+
+A brand-new (empty) database is created from the models and stamped HEAD
+directly. DB_AUTO_MIGRATE=1 lets startup run pending migrations itself
+(handy for local development; avoid it with several workers).
+
+Adding a migration: append Migration(version=N + 1, ...) to MIGRATIONS.
+- `upgrade(conn)` holds the DDL and runs in one transaction; keep it
+  idempotent (the add_column helper checks first) so a rerun after a
+  failed backfill is harmless.
+- `backfill(bind)` is for data changes on existing rows. It runs after
+  the DDL commits, in small batches with their own transactions (see
+  run_batched), so writers are never locked out for long; it must be
+  resumable (select only rows still needing the change).
+The version is recorded only after both have finished.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, Sequence
+
+from sqlalchemy import Boolean, Column, DateTime, Float, ForeignKey, Integer, JSON, Text, bindparam, inspect, select, text, update
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import OperationalError, ProgrammingError
+
+from app.db.base import Base
+
+logger = logging.getLogger(__name__)
+
+
+class SchemaOutOfDate(RuntimeError):
+    """The database is behind the code; run the migrate CLI."""
+
+
+@dataclass(frozen=True)
+class Migration:
+    version: int
+    description: str
+    upgrade: Callable[[Connection], None]
+    backfill: Callable[[Engine], None] | None = None
+
+
+# ---------- helpers for migrations ----------
+
+def add_column(conn: Connection, table: str, column: Column) -> bool:
+    """ALTER TABLE ... ADD COLUMN unless the table is missing or already has it."""
+    inspector = inspect(conn)
+    if not inspector.has_table(table):
+        return False
+    if column.name in {c["name"] for c in inspector.get_columns(table)}:
+        return False
+    ddl = f"ALTER TABLE {table} ADD COLUMN {column.name} {column.type.compile(dialect=conn.dialect)}"
+    for fk in column.foreign_keys:
+        ref_table, ref_column = fk.target_fullname.split(".")
+        ddl += f" REFERENCES {ref_table}({ref_column})"
+    if column.server_default is not None:
+        ddl += f" DEFAULT '{column.server_default.arg}'"
+    conn.execute(text(ddl))
+    return True
+
+
+def create_missing_indexes(conn: Connection) -> None:
+    """Create model-declared indexes an older database lacks (skipping ones on absent columns)."""
+    inspector = inspect(conn)
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        present = {c["name"] for c in inspector.get_columns(table.name)}
+        for index in table.indexes:
+            if {c.name for c in index.columns} <= present:
+                index.create(conn, checkfirst=True)
+
+
+def run_batched(
+    bind: Engine,
+    fetch: Callable[[Connection, int], Sequence],
+    apply: Callable[[Connection, Sequence], None],
+    pause_s: float = 0.0,
+) -> int:
+    """
+    Keyset-batched data change: fetch(conn, after_id) returns the next batch
+    (rows with an `id`, in id order), apply(conn, rows) changes them. Each
+    batch commits on its own, so the write lock is only ever held briefly.
+    """
+    after_id = 0
+    total = 0
+    while True:
+        with bind.begin() as conn:
+            rows = fetch(conn, after_id)
+            if not rows:
+                return total
+            apply(conn, rows)
+        after_id = rows[-1].id
+        total += len(rows)
+        if pause_s:
+            time.sleep(pause_s)
+
+
+# ---------- migrations ----------
+
+# (table, column) pairs added after the table first shipped, before versioning.
+# Types are SQLAlchemy types so the DDL compiles for SQLite and Postgres alike.
+_BASELINE_COLUMNS = [
+    ("users", Column("password_hash", Text)),
+    ("users", Column("created_at", DateTime)),
+    ("provider_keys", Column("api_key_encrypted", Text)),
+    ("provider_keys", Column("created_at", DateTime)),
+    ("prompts", Column("user_id", Integer, ForeignKey("users.id"))),
+    ("provider_keys", Column("status", Text, server_default="pending")),
+    ("provider_keys", Column("validated_at", DateTime)),
+    ("provider_keys", Column("discovered_models", JSON)),
+    ("models_catalog", Column("in_per_1m", Float)),
+    ("models_catalog", Column("out_per_1m", Float)),
+    ("request_logs", Column("prompt_id", Integer, ForeignKey("prompts.id"))),
+    ("request_logs", Column("input_tokens", Integer)),
+    ("request_logs", Column("output_tokens", Integer)),
+    ("request_logs", Column("cost_usd", Float)),
+    ("request_logs", Column("wasted_cost_usd", Float)),
+    ("request_logs", Column("status", Text)),
+    ("prompts", Column("task_type", Text)),
+    ("prompts", Column("needs_web", Boolean)),
+    ("prompts", Column("output_format", Text)),
+    ("prompts", Column("urgency", Text)),
+    ("prompts", Column("import_job_id", Integer, ForeignKey("import_jobs.id"))),
+    ("prompts", Column("body_hash", Text)),
+    ("prompts", Column("body_chunks", JSON)),
+]
+
+
+def _baseline_upgrade(conn: Connection) -> None:
+    for table, column in _BASELINE_COLUMNS:
+        add_column(conn, table, column)
+    create_missing_indexes(conn)
+
+
+def _baseline_backfill(bind: Engine, batch: int = 1000) -> None:
+    """Copy profile fields out of prompt_profile_json for rows stored before the columns existed."""
+    from app.db.prompt_models import PROFILE_COLUMNS, Prompt, profile_columns
+
+    table = Prompt.__table__
+    stmt = (
+        update(table)
+        .where(table.c.id == bindparam("row_id"))
+        .values({name: bindparam(name) for name in PROFILE_COLUMNS})
+    )
+
+    def fetch(conn: Connection, after_id: int):
+        return conn.execute(
+            select(table.c.id, table.c.prompt_profile_json)
+            .where(table.c.id > after_id, table.c.task_type.is_(None), table.c.prompt_profile_json.is_not(None))
+            .order_by(table.c.id)
+            .limit(batch)
+        ).all()
+
+    def apply(conn: Connection, rows) -> None:
+        conn.execute(stmt, [{"row_id": r.id, **profile_columns(r.prompt_profile_json)} for r in rows])
+
+    run_batched(bind, fetch, apply)
+
+
+def _completion_attempts(conn: Connection) -> None:
+    from app.db.models import CompletionAttempt
+
+    CompletionAttempt.__table__.create(conn, checkfirst=True)
+
+
+def _attempt_completion_id(conn: Connection) -> None:
+    add_column(conn, "completion_attempts", Column("completion_id", Text))
+    create_missing_indexes(conn)
+
+
+def _attempt_completion_id_backfill(bind: Engine, batch: int = 1000) -> None:
+    """Older attempts of signed-in users: their request_log_id already identifies the chain."""
+    from app.db.models import CompletionAttempt
+
+    table = CompletionAttempt.__table__
+
+    def fetch(conn: Connection, after_id: int):
+        return conn.execute(
+            select(table.c.id, table.c.request_log_id)
+            .where(table.c.id > after_id, table.c.completion_id.is_(None), table.c.request_log_id.is_not(None))
+            .order_by(table.c.id)
+            .limit(batch)
+        ).all()
+
+    def apply(conn: Connection, rows) -> None:
+        conn.execute(
+            update(table).where(table.c.id == bindparam("row_id")).values(completion_id=bindparam("chain")),
+            [{"row_id": r.id, "chain": f"log-{r.request_log_id}"} for r in rows],
+        )
+
+    run_batched(bind, fetch, apply)
+
+
+MIGRATIONS: list[Migration] = [
+    Migration(
+        1,
+        "baseline: columns and indexes added before versioned migrations; profile column backfill",
+        _baseline_upgrade,
+        _baseline_backfill,
+    ),
+    Migration(2, "completion_attempts: one row per provider call", _completion_attempts),
+    Migration(3, "(created_at, id) indexes on prompts and request_logs for export and recent history", create_missing_indexes),
+    Migration(4, "prompts: needs_web / output_format / urgency indexes for filters and analytics", create_missing_indexes),
+    Migration(
+        5,
+        "completion_attempts.completion_id: explicit fallback chain id",
+        _attempt_completion_id,
+        _attempt_completion_id_backfill,
+    ),
+    Migration(6, "completion_attempts.prompt_id index for retention's reference check", create_missing_indexes),
+]
+
+HEAD = MIGRATIONS[-1].version
+
+
+# ---------- version bookkeeping ----------
+
+def current_version(bind: Engine) -> int | None:
+    """The recorded schema version; None when the database predates versioning (or is empty)."""
+    from app.db.models import SchemaVersion
+
+    try:
+        with bind.connect() as conn:
+            version = conn.execute(select(SchemaVersion.version).where(SchemaVersion.id == 1)).scalar()
+    except (OperationalError, ProgrammingError):
+        return None  # no schema_version table
+    return version if version is not None else 0
+
+
+def _stamp(conn: Connection, version: int) -> None:
+    from app.db.models import SchemaVersion
+
+    values = {"version": version, "updated_at": datetime.utcnow()}
+    if conn.execute(update(SchemaVersion).where(SchemaVersion.id == 1).values(values)).rowcount == 0:
+        conn.execute(SchemaVersion.__table__.insert().values(id=1, **values))
+
+
+def _is_empty(bind: Engine) -> bool:
+    return not inspect(bind).get_table_names()
+
+
+def upgrade(bind: Engine, target: int | None = None) -> list[int]:
+    """Migrate to `target` (default HEAD). Returns the versions applied."""
+    from app.db import model_catalog_models, models, prompt_models  # noqa: F401  register every table
+
+    target = HEAD if target is None else target
+    version = current_version(bind)
+
+    if version is None and _is_empty(bind):
+        # New database: the models already describe HEAD
+        Base.metadata.create_all(bind=bind)
+        with bind.begin() as conn:
+            _stamp(conn, HEAD)
+        logger.info("Created schema at version %d", HEAD)
+        return []
+
+    # Tables introduced since the last run (create_all only adds what is missing)
+    Base.metadata.create_all(bind=bind)
+    version = version or 0
+    applied = []
+    for migration in MIGRATIONS:
+        if not version < migration.version <= target:
+            continue
+        logger.info("Migrating to %d: %s", migration.version, migration.description)
+        with bind.begin() as conn:
+            migration.upgrade(conn)
+        if migration.backfill is not None:
+            migration.backfill(bind)
+        with bind.begin() as conn:
+            _stamp(conn, migration.version)
+        applied.append(migration.version)
+    return applied
+
+
+def ensure_schema(bind: Engine) -> int:
+    """
+    Startup check: one SELECT when the schema is current.
+
+    Initialises an empty database; otherwise refuses to start on an
+    out-of-date schema unless DB_AUTO_MIGRATE=1.
+    """
+    version = current_version(bind)
+    if version == HEAD:
+        return version
+    if version is not None and version > HEAD:
+        logger.warning("Database schema version %d is newer than this code (%d)", version, HEAD)
+        return version
+    if (version is None and _is_empty(bind)) or os.getenv("DB_AUTO_MIGRATE", "0") == "1":
+        upgrade(bind)
+        return HEAD
+    raise SchemaOutOfDate(
+        f"Database schema is at version {version or 0}, code expects {HEAD}: "
+        "run `python -m scripts.migrate` (or set DB_AUTO_MIGRATE=1)"
+    )
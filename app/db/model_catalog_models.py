@@ -9,7 +9,7 @@ This table is the single source of truth for:
 - cost/latency tiers
 """
 
-from sqlalchemy import Integer, String, Boolean
+from sqlalchemy import Integer, String, Boolean, Float
 from sqlalchemy.orm import Mapped, mapped_column
 
 from app.db.base import Base
@@ -40,4 +40,8 @@ class ModelCatalog(Base):
     # Capabilities
     supports_web: Mapped[bool] = mapped_column(Boolean, default=False)
     supports_json: Mapped[bool] = mapped_column(Boolean, default=True)
-    good_for_code: Mapped[bool] = mapped_column(Boolean, default=True)
\ No newline at end of file
+    good_for_code: Mapped[bool] = mapped_column(Boolean, default=True)
+
+    # USD per 1M tokens; NULL = unpriced (usage is still logged, cost counts as 0)
+    in_per_1m: Mapped[float | None] = mapped_column(Float, nullable=True)
+    out_per_1m: Mapped[float | None] = mapped_column(Float, nullable=True)
\ No newline at end of file
@@ -1,6 +1,6 @@
-from sqlalchemy import String, Integer, Float, Boolean, DateTime, ForeignKey, Text, JSON
+from sqlalchemy import String, Integer, Float, Boolean, Date, DateTime, ForeignKey, Index, Text, JSON
 from sqlalchemy.orm import Mapped, mapped_column, relationship
-from datetime import datetime
+from datetime import date, datetime
 from app.db.base import Base
 
 class User(Base):
@@ -23,12 +23,26 @@ class Budget(Base):
 
     user = relationship("User", back_populates="budgets")
 
+class BudgetFlush(Base):
+    __tablename__ = "budget_flushes"
+    # One row per (ledger flush, user): re-applying the same flush id is a no-op
+    flush_id: Mapped[str] = mapped_column(String, primary_key=True)
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), primary_key=True)
+    delta_usd: Mapped[float] = mapped_column(Float)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, index=True)
+
 class RequestLog(Base):
     __tablename__ = "request_logs"
+    # Recent history per user, and export order: ids do not follow insert order across workers
+    __table_args__ = (
+        Index("ix_request_logs_user_created", "user_id", "created_at", "id"),
+        Index("ix_request_logs_created", "created_at", "id"),
+    )
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), index=True)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
 
+    # Legacy; written empty. The text is the prompt's body: prompt_bodies.prompt_text via prompt_id
     prompt: Mapped[str] = mapped_column(Text)
     require_json: Mapped[bool] = mapped_column(Boolean, default=False)
 
@@ -41,8 +55,62 @@ class RequestLog(Base):
     estimated_cost_usd: Mapped[float] = mapped_column(Float)
     attempts: Mapped[int] = mapped_column(Integer)
 
+    # Actual usage reported by the provider SDKs, summed over every attempt
+    prompt_id: Mapped[int | None] = mapped_column(ForeignKey("prompts.id"), nullable=True, index=True)
+    input_tokens: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    output_tokens: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    cost_usd: Mapped[float | None] = mapped_column(Float, nullable=True)
+    # Part of cost_usd spent on attempts whose output was thrown away (fallbacks)
+    wasted_cost_usd: Mapped[float | None] = mapped_column(Float, nullable=True)
+    status: Mapped[str | None] = mapped_column(String, nullable=True)  # ok | failed
+
     user = relationship("User", back_populates="requests")
 
+class UsageRollup(Base):
+    __tablename__ = "usage_rollups"
+    # One row per user / UTC day / model, maintained alongside request_logs inserts
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), primary_key=True)
+    day: Mapped[date] = mapped_column(Date, primary_key=True)
+    provider: Mapped[str] = mapped_column(String, primary_key=True)
+    model: Mapped[str] = mapped_column(String, primary_key=True)
+
+    requests: Mapped[int] = mapped_column(Integer, default=0)
+    failed: Mapped[int] = mapped_column(Integer, default=0)
+    attempts: Mapped[int] = mapped_column(Integer, default=0)
+    input_tokens: Mapped[int] = mapped_column(Integer, default=0)
+    output_tokens: Mapped[int] = mapped_column(Integer, default=0)
+    cost_usd: Mapped[float] = mapped_column(Float, default=0.0)
+    wasted_cost_usd: Mapped[float] = mapped_column(Float, default=0.0)
+
+class CompletionAttempt(Base):
+    __tablename__ = "completion_attempts"
+    # One row per provider call made by /v1/completions, failed fallbacks included
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    request_log_id: Mapped[int | None] = mapped_column(ForeignKey("request_logs.id"), nullable=True, index=True)
+    # Shared by the attempts of one completion (anonymous ones included); groups fallback chains
+    completion_id: Mapped[str | None] = mapped_column(String(32), nullable=True, index=True)
+    # Indexed for retention's "is this prompt still referenced" probe
+    prompt_id: Mapped[int | None] = mapped_column(ForeignKey("prompts.id"), nullable=True, index=True)
+    user_id: Mapped[int | None] = mapped_column(Integer, nullable=True)  # None for anonymous calls
+    attempt_no: Mapped[int] = mapped_column(Integer)  # 1 = first choice, 2+ = fallbacks
+
+    candidate_key: Mapped[str | None] = mapped_column(String, nullable=True)
+    provider: Mapped[str] = mapped_column(String)
+    model: Mapped[str] = mapped_column(String)
+    task_type: Mapped[str | None] = mapped_column(String, nullable=True)
+
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, index=True)  # call started
+    ended_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+    latency_ms: Mapped[float | None] = mapped_column(Float, nullable=True)
+
+    outcome: Mapped[str] = mapped_column(String)  # ok | error | unusable
+    error_class: Mapped[str | None] = mapped_column(String, nullable=True)
+    retryable: Mapped[bool | None] = mapped_column(Boolean, nullable=True)
+
+    input_tokens: Mapped[int] = mapped_column(Integer, default=0)
+    output_tokens: Mapped[int] = mapped_column(Integer, default=0)
+    cost_usd: Mapped[float] = mapped_column(Float, default=0.0)
+
 class ProviderKey(Base):
     __tablename__ = "provider_keys"
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
@@ -57,6 +125,51 @@ class ProviderKey(Base):
 
     user = relationship("User", back_populates="provider_keys")
 
+class AuthSession(Base):
+    __tablename__ = "sessions"
+    # sha256 of the bearer token — the raw token is never stored
+    token_hash: Mapped[str] = mapped_column(String, primary_key=True)
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), index=True)
+    username: Mapped[str] = mapped_column(String)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    expires_at: Mapped[datetime] = mapped_column(DateTime, index=True)
+
+class RevokedToken(Base):
+    __tablename__ = "revoked_tokens"
+    # Logged-out signed tokens; rows are dropped once the token would have expired anyway
+    jti: Mapped[str] = mapped_column(String, primary_key=True)
+    expires_at: Mapped[datetime] = mapped_column(DateTime, index=True)
+
+class IdSequence(Base):
+    __tablename__ = "id_sequences"
+    # Next unreserved id per table; the write-behind queue reserves ids in blocks
+    name: Mapped[str] = mapped_column(String, primary_key=True)
+    next_id: Mapped[int] = mapped_column(Integer)
+
+class SchemaVersion(Base):
+    __tablename__ = "schema_version"
+    # Single row (id=1): the last migration applied (see app/db/migrations.py)
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    version: Mapped[int] = mapped_column(Integer)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+class ImportJob(Base):
+    __tablename__ = "import_jobs"
+    # One bulk NDJSON upload; its prompts are profiled in the background
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), index=True)
+    status: Mapped[str] = mapped_column(String, default="importing")  # importing | profiling | done | failed
+    imported: Mapped[int] = mapped_column(Integer, default=0)
+    rejected: Mapped[int] = mapped_column(Integer, default=0)
+    profiled: Mapped[int] = mapped_column(Integer, default=0)
+    failed: Mapped[int] = mapped_column(Integer, default=0)
+    # Highest prompt id fully handled; profiling resumes after it
+    checkpoint_id: Mapped[int] = mapped_column(Integer, default=0)
+    last_error: Mapped[str | None] = mapped_column(Text, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    profiling_started_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+    updated_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+
 class ModelCatalog(Base):
     __tablename__ = "model_catalog"
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
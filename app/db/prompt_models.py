@@ -6,7 +6,7 @@ We keep it separate from older models to allow incremental development.
 """
 
 from datetime import datetime
-from sqlalchemy import Integer, String, DateTime, Text, JSON, ForeignKey
+from sqlalchemy import Boolean, Index, Integer, LargeBinary, String, DateTime, Text, JSON, ForeignKey
 from sqlalchemy.orm import Mapped, mapped_column
 
 from app.db.base import Base
@@ -24,6 +24,18 @@ class Prompt(Base):
     # Name of the table in SQLite
     __tablename__ = "prompts"
 
+    # Listing/analytics access paths: per-user history, and per profile field across
+    # users (filters, and index-only GROUP BY counts over a created_at range)
+    __table_args__ = (
+        Index("ix_prompts_user_created", "user_id", "created_at"),
+        Index("ix_prompts_task_created", "task_type", "created_at"),
+        Index("ix_prompts_web_created", "needs_web", "created_at"),
+        Index("ix_prompts_format_created", "output_format", "created_at"),
+        Index("ix_prompts_urgency_created", "urgency", "created_at"),
+        Index("ix_prompts_import_job", "import_job_id", "id"),
+        Index("ix_prompts_created", "created_at", "id"),  # export order
+    )
+
     # Primary key (auto-increment integer)
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
 
@@ -34,9 +46,15 @@ class Prompt(Base):
     username: Mapped[str] = mapped_column(String, index=True)
     user_id: Mapped[int | None] = mapped_column(ForeignKey("users.id"), nullable=True, index=True)
 
-    # The raw text of the prompt as sent by the user
+    # The raw text of the prompt as sent by the user.
+    # Empty for rows stored as chunks (body_chunks); read text through
+    # app.services.prompt_bodies, which handles both forms.
     raw_prompt: Mapped[str] = mapped_column(Text)
 
+    # sha256 of the full text, and the ordered prompt_blobs hashes it is made of
+    body_hash: Mapped[str | None] = mapped_column(String(64), nullable=True, index=True)
+    body_chunks: Mapped[list | None] = mapped_column(JSON, nullable=True)
+
     # ✅ Milestone 2:
     # The extracted JSON profile for this prompt.
     #
@@ -51,4 +69,50 @@ class Prompt(Base):
     # }
     #
     # nullable=True because older rows (created before milestone 2) won’t have this yet.
-    prompt_profile_json: Mapped[dict | None] = mapped_column(JSON, nullable=True)
\ No newline at end of file
+    prompt_profile_json: Mapped[dict | None] = mapped_column(JSON, nullable=True)
+
+    # Denormalized copies of profile fields, so filters and GROUP BYs hit
+    # indexed columns instead of parsing JSON row by row. Set via set_profile().
+    task_type: Mapped[str | None] = mapped_column(String, nullable=True)
+    needs_web: Mapped[bool | None] = mapped_column(Boolean, nullable=True)
+    output_format: Mapped[str | None] = mapped_column(String, nullable=True)
+    urgency: Mapped[str | None] = mapped_column(String, nullable=True)
+
+    # Set for rows loaded by POST /v1/prompts/import (profiled later, in the background)
+    import_job_id: Mapped[int | None] = mapped_column(ForeignKey("import_jobs.id"), nullable=True)
+
+    def set_profile(self, profile: dict | None) -> None:
+        """Store the profile JSON and keep the denormalized columns in sync."""
+        self.prompt_profile_json = profile
+        for name, value in profile_columns(profile).items():
+            setattr(self, name, value)
+
+
+# Profile fields mirrored into their own columns
+PROFILE_COLUMNS = ("task_type", "needs_web", "output_format", "urgency")
+
+
+def profile_columns(profile: dict | None) -> dict:
+    profile = profile or {}
+    return {name: profile.get(name) for name in PROFILE_COLUMNS}
+
+
+
+class PromptBlob(Base):
+    """
+    One compressed chunk of prompt text, keyed by the sha256 of its contents.
+
+    Chat transcripts re-send the whole conversation every turn; splitting
+    bodies into content-addressed chunks stores each shared prefix once.
+    Contents are immutable; only touched_at changes.
+    """
+
+    __tablename__ = "prompt_blobs"
+
+    hash: Mapped[str] = mapped_column(String(64), primary_key=True)
+    codec: Mapped[str] = mapped_column(String)  # "zlib" | "raw"
+    size: Mapped[int] = mapped_column(Integer)  # uncompressed bytes
+    data: Mapped[bytes] = mapped_column(LargeBinary)
+    # Refreshed whenever a new prompt re-uses the chunk; retention only
+    # garbage-collects unreferenced blobs that have not been touched recently
+    touched_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
@@ -2,6 +2,8 @@ from pathlib import Path
 from dotenv import load_dotenv
 load_dotenv(Path(__file__).resolve().parent.parent / ".env")
 
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
@@ -12,16 +14,40 @@ from app.api.v1.routes_route_to_model import router as routing_router
 from app.api.v1.routes_completion import router as completion_router
 from app.api.v1.routes_auth import router as auth_router
 from app.api.v1.routes_keys import router as keys_router
+from app.api.v1.routes_ops import metrics_router, router as ops_router
+from app.api.server_timing import ServerTimingMiddleware
+from app.api.profiling import ProfilingMiddleware
+from app.api.v1.routes_export import router as export_router
 
-from app.db.session import engine, run_migrations
-from app.db.base import Base
+from app.db.session import SessionLocal, engine
+from app.db.migrations import ensure_schema
 from app.db import models, prompt_models, model_catalog_models  # noqa: F401
+from app.services.budget_ledger import shutdown_budget_ledger
+from app.services.prompt_import import resume_import_jobs, shutdown_import_pool
+from app.services.write_behind import shutdown_write_queue
+from app.utils.leader import acquire_leadership, release_leadership
+
 
+@asynccontextmanager
+async def lifespan(_app: FastAPI):
+    # Nothing touches the database at import time. One SELECT when the schema
+    # is current; migrations themselves run via scripts/migrate.py
+    ensure_schema(engine)
+    # Pick up bulk imports a previous process left half-profiled; with several
+    # workers only one of them may do this (see docs/DEPLOYMENT.md)
+    if acquire_leadership():
+        resume_import_jobs(SessionLocal)
+    yield
+    # In-flight requests have drained by now (uvicorn waits before lifespan shutdown)
+    shutdown_import_pool()
+    # Write out anything still queued before the process exits
+    shutdown_write_queue()
+    shutdown_budget_ledger()
+    release_leadership()
 
-Base.metadata.create_all(bind=engine)
-run_migrations()
 
 app = FastAPI(
+    lifespan=lifespan,
     title="BYOK LLM Router",
     version="0.1.0",
     description="BYOK (Bring Your Own Key) routing, cost control, policies, and fallback for LLM providers.",
@@ -33,7 +59,12 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Lets browser devtools show the per-stage breakdown for cross-origin calls
+    expose_headers=["Server-Timing", "X-Profile-Id"],
 )
+# Innermost, so a profile covers the app and not the other middleware
+app.add_middleware(ProfilingMiddleware)
+app.add_middleware(ServerTimingMiddleware)
 
 
 ##@app.get("/health")
@@ -46,4 +77,7 @@ app.include_router(prompts_router, prefix="/v1", tags=["prompts"])
 app.include_router(routing_router, prefix="/v1", tags=["model_routing"])
 app.include_router(completion_router, prefix="/v1", tags=["completions"])
 app.include_router(auth_router, prefix="/v1", tags=["auth"])
-app.include_router(keys_router, prefix="/v1", tags=["keys"])
\ No newline at end of file
+app.include_router(keys_router, prefix="/v1", tags=["keys"])
+app.include_router(ops_router, prefix="/v1", tags=["ops"])
+app.include_router(export_router, prefix="/v1", tags=["export"])
+app.include_router(metrics_router, tags=["ops"])
\ No newline at end of file
@@ -0,0 +1,73 @@
+"""
+app/providers/sdk_clients.py
+----------------------------
+Registry of provider SDK client factories.
+
+The google-genai, openai and anthropic SDKs together take seconds to
+import, and most processes (tests, CLI scripts, a worker that only serves
+/v1/usage) never talk to all three. Each factory imports its SDK inside
+the function, so the cost is paid by the first call for that provider and
+`import app.main` stays cheap.
+
+    client = make_client("openai", api_key)
+
+Adding a provider: decorate a factory with @register_sdk("name"); import
+the SDK inside it, never at module level.
+
+Base URLs: OPENAI_BASE_URL, ANTHROPIC_BASE_URL and GEMINI_BASE_URL point a
+provider at another endpoint (a proxy, or the stand-in servers of
+scripts/fake_providers.py used by scripts/load_test.py). Unset means the
+SDK default.
+"""
+
+from __future__ import annotations
+
+import os
+from typing import Any, Callable
+
+SDK_FACTORIES: dict[str, Callable[[str], Any]] = {}
+
+
+def register_sdk(provider: str) -> Callable[[Callable[[str], Any]], Callable[[str], Any]]:
+    def decorator(factory: Callable[[str], Any]) -> Callable[[str], Any]:
+        SDK_FACTORIES[provider] = factory
+        return factory
+    return decorator
+
+
+def make_client(provider: str, api_key: str) -> Any:
+    """A new SDK client for `provider`; the SDK is imported on first use."""
+    factory = SDK_FACTORIES.get(provider)
+    if factory is None:
+        raise ValueError(f"Unsupported provider: {provider}")
+    return factory(api_key)
+
+
+def gemini_types():
+    """google.genai.types (request config objects), imported on first use."""
+    from google.genai import types
+
+    return types
+
+
+@register_sdk("gemini")
+def _gemini(api_key: str):
+    from google import genai
+
+    base_url = os.getenv("GEMINI_BASE_URL")
+    http_options = gemini_types().HttpOptions(base_url=base_url) if base_url else None
+    return genai.Client(api_key=api_key, http_options=http_options)
+
+
+@register_sdk("openai")
+def _openai(api_key: str):
+    from openai import OpenAI
+
+    return OpenAI(api_key=api_key, base_url=os.getenv("OPENAI_BASE_URL") or None)
+
+
+@register_sdk("anthropic")
+def _anthropic(api_key: str):
+    from anthropic import Anthropic
+
+    return Anthropic(api_key=api_key, base_url=os.getenv("ANTHROPIC_BASE_URL") or None)
@@ -7,6 +7,7 @@ Request: prompt_id (references an already-profiled prompt)
 Response: LLM output + routing metadata
 """
 
+from datetime import datetime
 from typing import Optional
 
 from pydantic import BaseModel, Field
@@ -30,4 +31,32 @@ class CompletionResponse(BaseModel):
     model: str
     attempts: int = Field(ge=1)
     route_decision: RouteDecision
-    sources: Optional[list[WebSource]] = None
\ No newline at end of file
+    sources: Optional[list[WebSource]] = None
+
+    # Billed usage summed over all attempts (fallbacks included)
+    input_tokens: int = 0
+    output_tokens: int = 0
+    cost_usd: float = 0.0
+
+
+class AttemptSummaryResponse(BaseModel):
+    """
+    Fallback analysis over completion_attempts for [start, end).
+
+    by_model / by_attempt_no entries: attempts, ok, error, unusable,
+    success_rate, retryable_share, latency_ms {p50, p90, p99}, tokens,
+    cost_usd, top_errors {error class: count}. The chain totals
+    (completions .. resolved_at_attempt) count whole completions that had
+    at least one attempt matching the provider/task_type filter.
+    """
+
+    start: datetime
+    end: datetime
+    completions: int
+    succeeded: int
+    failed: int
+    needed_fallback: int
+    resolved_at_attempt: dict[str, int]
+    failed_attempt_latency_ms: dict[str, Optional[float]]
+    by_model: list[dict]
+    by_attempt_no: list[dict]
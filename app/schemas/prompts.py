@@ -148,4 +148,93 @@ class PromptReadWithProfileResponse(BaseModel):
     created_at: datetime
 
     # Optional in case older rows exist without a profile
-    prompt_profile_json: Optional[PromptProfile] = None
\ No newline at end of file
+    prompt_profile_json: Optional[PromptProfile] = None
+
+# ----------------------------
+# Listing + analytics
+# ----------------------------
+
+class PromptListItem(BaseModel):
+    """
+    One row of GET /v1/prompts (profile fields come from the denormalized columns).
+    """
+
+    id: int
+    username: str
+    user_id: Optional[int] = None
+    created_at: datetime
+    prompt: str
+    has_profile: bool
+    task_type: Optional[str] = None
+    needs_web: Optional[bool] = None
+    output_format: Optional[str] = None
+    urgency: Optional[str] = None
+
+
+class PromptListResponse(BaseModel):
+    """
+    A page of prompts, newest first.
+
+    Pass next_cursor back as ?cursor= to get the next page; null on the last page.
+    """
+
+    items: list[PromptListItem]
+    next_cursor: Optional[str] = None
+
+
+class PromptAnalyticsResponse(BaseModel):
+    """
+    Prompt counts grouped by one profile field (or by day).
+    """
+
+    group_by: str
+    total: int
+    groups: list[dict]
+
+
+# ----------------------------
+# Bulk import
+# ----------------------------
+
+class PromptImportLine(BaseModel):
+    """
+    One line of the NDJSON body for POST /v1/prompts/import.
+    """
+
+    prompt: str = Field(min_length=1)
+
+    # Keep the original timestamp when backfilling history
+    created_at: Optional[datetime] = None
+
+
+class PromptImportResponse(BaseModel):
+    """
+    Returned once the upload is stored; profiling continues in the background.
+    """
+
+    job_id: int
+    status: str
+    imported: int
+    rejected: int
+
+    # First few rejected lines: {"line": <1-based line number>, "error": "..."}
+    errors: list[dict] = []
+
+
+class ImportJobProgress(BaseModel):
+    """
+    Progress of a bulk import's background profiling.
+    """
+
+    job_id: int
+    status: str
+    imported: int
+    rejected: int
+    profiled: int
+    failed: int
+    remaining: int
+    rows_per_s: Optional[float] = None
+    eta_s: Optional[float] = None
+    last_error: Optional[str] = None
+    created_at: datetime
+    updated_at: Optional[datetime] = None
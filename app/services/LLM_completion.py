@@ -7,25 +7,55 @@ Supports 3 providers (MVP):
 - gemini  (google-genai SDK)
 - openai  (openai SDK)
 - anthropic (anthropic SDK)
+
+SDKs are loaded on first use through app/providers/sdk_clients.py, so
+importing this module does not import any of them.
+
+Optionally gated by a ProviderScheduler (per-provider / per-key concurrency,
+priority by urgency, per-user fairness).
+
+Every call reports the input/output token usage returned by the SDK. A
+response that came back but is unusable (empty text, e.g. a safety block)
+raises ProviderResponseError carrying that usage, since the tokens were
+billed even though the caller will fall back.
 """
 
 import os
 from dataclasses import dataclass, field
 from typing import Literal
 
-from google import genai
-from google.genai import types as genai_types
-from openai import OpenAI
-from anthropic import Anthropic
+from app.providers.sdk_clients import gemini_types, make_client
+from app.services.scheduler import ProviderScheduler, key_fingerprint
 
 ProviderName = Literal["gemini", "openai", "anthropic"]
 
 
 @dataclass
 class LLMResult:
-    """Result from an LLM call, including optional web sources."""
+    """Result from an LLM call, including optional web sources and billed token usage."""
     text: str
     sources: list[dict] = field(default_factory=list)
+    input_tokens: int = 0
+    output_tokens: int = 0
+
+
+class ProviderResponseError(RuntimeError):
+    """The provider answered (and billed) but the response cannot be used."""
+
+    def __init__(self, message: str, input_tokens: int = 0, output_tokens: int = 0):
+        super().__init__(message)
+        self.input_tokens = input_tokens
+        self.output_tokens = output_tokens
+
+
+def _checked(result: LLMResult, provider: str) -> LLMResult:
+    if not result.text.strip():
+        raise ProviderResponseError(
+            f"{provider} returned an empty response",
+            input_tokens=result.input_tokens,
+            output_tokens=result.output_tokens,
+        )
+    return result
 
 
 class LLMCompletionClient:
@@ -34,13 +64,22 @@ class LLMCompletionClient:
     Dispatches to the correct provider SDK based on provider name.
     """
 
-    def __init__(self, keys: dict[str, str] | None = None):
+    def __init__(
+        self,
+        keys: dict[str, str] | None = None,
+        scheduler: ProviderScheduler | None = None,
+        user_id: int | None = None,
+    ):
         """
         keys: optional dict like {"gemini": "AIza...", "openai": "sk-..."}.
         User keys take priority; falls back to env vars.
+        scheduler: optional admission control; every provider call waits for a slot.
+        user_id: tenant identity used for fair queuing inside the scheduler.
         """
         self._keys = keys or {}
         self._clients: dict = {}
+        self._scheduler = scheduler
+        self._user_id = user_id
 
     def _get_api_key(self, provider: str) -> str:
         env_var_map = {"gemini": "GEMINI_API_KEY", "openai": "OPENAI_API_KEY", "anthropic": "ANTHROPIC_API_KEY"}
@@ -49,22 +88,26 @@ class LLMCompletionClient:
             raise RuntimeError(f"No API key available for {provider}")
         return key
 
-    def _get_gemini_client(self) -> genai.Client:
-        if "gemini" not in self._clients:
-            self._clients["gemini"] = genai.Client(api_key=self._get_api_key("gemini"))
-        return self._clients["gemini"]
-
-    def _get_openai_client(self) -> OpenAI:
-        if "openai" not in self._clients:
-            self._clients["openai"] = OpenAI(api_key=self._get_api_key("openai"))
-        return self._clients["openai"]
-
-    def _get_anthropic_client(self) -> Anthropic:
-        if "anthropic" not in self._clients:
-            self._clients["anthropic"] = Anthropic(api_key=self._get_api_key("anthropic"))
-        return self._clients["anthropic"]
-
-    def generate(self, prompt: str, provider: ProviderName, model: str, needs_web: bool = False) -> LLMResult:
+    def _get_client(self, provider: str):
+        if provider not in self._clients:
+            self._clients[provider] = make_client(provider, self._get_api_key(provider))
+        return self._clients[provider]
+
+    def generate(
+        self,
+        prompt: str,
+        provider: ProviderName,
+        model: str,
+        needs_web: bool = False,
+        urgency: str = "normal",
+    ) -> LLMResult:
+        if self._scheduler is None:
+            return self._dispatch(prompt, provider, model, needs_web)
+        key_id = key_fingerprint(self._get_api_key(provider))
+        with self._scheduler.slot(provider, key_id, user_id=self._user_id, urgency=urgency):
+            return self._dispatch(prompt, provider, model, needs_web)
+
+    def _dispatch(self, prompt: str, provider: ProviderName, model: str, needs_web: bool) -> LLMResult:
         if provider == "gemini":
             return self._generate_gemini(prompt, model, needs_web=needs_web)
         elif provider == "openai":
@@ -74,10 +117,11 @@ class LLMCompletionClient:
         raise ValueError(f"Unsupported provider: {provider}")
 
     def _generate_gemini(self, prompt: str, model: str, needs_web: bool = False) -> LLMResult:
-        client = self._get_gemini_client()
+        client = self._get_client("gemini")
 
         config = None
         if needs_web:
+            genai_types = gemini_types()
             config = genai_types.GenerateContentConfig(
                 tools=[genai_types.Tool(google_search=genai_types.GoogleSearch())],
             )
@@ -99,21 +143,39 @@ class LLMCompletionClient:
                             "url": chunk.web.uri or "",
                         })
 
-        return LLMResult(text=response.text or "", sources=sources)
+        usage = response.usage_metadata
+        return _checked(LLMResult(
+            text=response.text or "",
+            sources=sources,
+            input_tokens=(usage and usage.prompt_token_count) or 0,
+            # Thinking tokens are billed at the output rate
+            output_tokens=((usage and usage.candidates_token_count) or 0) + ((usage and usage.thoughts_token_count) or 0),
+        ), "gemini")
 
     def _generate_openai(self, prompt: str, model: str) -> LLMResult:
-        client = self._get_openai_client()
+        client = self._get_client("openai")
         response = client.chat.completions.create(
             model=model,
             messages=[{"role": "user", "content": prompt}],
         )
-        return LLMResult(text=response.choices[0].message.content or "")
+        usage = response.usage
+        return _checked(LLMResult(
+            text=response.choices[0].message.content or "",
+            input_tokens=(usage and usage.prompt_tokens) or 0,
+            output_tokens=(usage and usage.completion_tokens) or 0,
+        ), "openai")
 
     def _generate_anthropic(self, prompt: str, model: str) -> LLMResult:
-        client = self._get_anthropic_client()
+        client = self._get_client("anthropic")
         response = client.messages.create(
             model=model,
             max_tokens=1024,
             messages=[{"role": "user", "content": prompt}],
         )
-        return LLMResult(text=response.content[0].text or "")
\ No newline at end of file
+        usage = response.usage
+        text = response.content[0].text if response.content else ""
+        return _checked(LLMResult(
+            text=text or "",
+            input_tokens=(usage and usage.input_tokens) or 0,
+            output_tokens=(usage and usage.output_tokens) or 0,
+        ), "anthropic")
\ No newline at end of file
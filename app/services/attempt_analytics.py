@@ -0,0 +1,192 @@
+"""
+app/services/attempt_analytics.py
+---------------------------------
+Fallback analysis over completion_attempts (one row per provider call).
+
+attempt_summary() answers the questions behind MAX_FALLBACK_ATTEMPTS and
+candidate ordering:
+- per provider/model: attempts, outcome counts, retryable share, latency
+  percentiles, tokens and cost, and which error classes dominate
+- per position in the fallback chain (attempt_no): how often the call at
+  that position succeeds, and what it costs in latency
+- overall: how many completions needed a fallback, and how many failed
+  after every candidate
+
+The overall numbers are per completion chain: the attempts sharing one
+completion_id. A chain belongs to the window its first attempt started in,
+and is judged on all of its attempts even if later ones fall outside. With
+a provider or task_type filter, by_model and by_attempt_no only count
+matching attempts, while the chain totals cover every chain with at least
+one matching attempt; a gemini filter then reports the completions gemini
+took part in. Chain totals are one GROUP BY in the database. Attempts
+recorded before completion_id existed count only when they had a
+request_log (migration 5 backfills those).
+
+Percentiles are exact (nearest rank) over the window, computed in Python so
+SQLite and Postgres give the same answer. Rows are streamed; memory is one
+float per attempt in the window.
+"""
+
+from __future__ import annotations
+
+import math
+from collections import Counter, defaultdict
+from dataclasses import dataclass, replace
+from datetime import datetime, timedelta
+
+from sqlalchemy import case, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.models import CompletionAttempt
+
+DEFAULT_WINDOW = timedelta(days=7)
+PERCENTILES = (50, 90, 99)
+
+
+@dataclass
+class AttemptFilters:
+    start: datetime | None = None
+    end: datetime | None = None
+    provider: str | None = None
+    task_type: str | None = None
+
+    def window(self) -> tuple[datetime, datetime]:
+        """[start, end), defaulting to the last DEFAULT_WINDOW."""
+        end = self.end or datetime.utcnow()
+        return self.start or end - DEFAULT_WINDOW, end
+
+    def clauses(self) -> list:
+        start, end = self.window()
+        clauses = [CompletionAttempt.created_at >= start, CompletionAttempt.created_at < end]
+        if self.provider is not None:
+            clauses.append(CompletionAttempt.provider == self.provider)
+        if self.task_type is not None:
+            clauses.append(CompletionAttempt.task_type == self.task_type)
+        return clauses
+
+
+def percentiles(values: list[float], points=PERCENTILES) -> dict[str, float | None]:
+    """Nearest-rank percentiles, e.g. {"p50": ..., "p90": ..., "p99": ...}."""
+    if not values:
+        return {f"p{p}": None for p in points}
+    ordered = sorted(values)
+    return {f"p{p}": round(ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)], 1) for p in points}
+
+
+class _Group:
+    __slots__ = ("attempts", "outcomes", "retryable", "latencies", "input_tokens", "output_tokens", "cost", "errors")
+
+    def __init__(self):
+        self.attempts = 0
+        self.outcomes: Counter[str] = Counter()
+        self.retryable = 0
+        self.latencies: list[float] = []
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.cost = 0.0
+        self.errors: Counter[str] = Counter()
+
+    def add(self, row) -> None:
+        self.attempts += 1
+        self.outcomes[row.outcome] += 1
+        if row.retryable:
+            self.retryable += 1
+        if row.latency_ms is not None:
+            self.latencies.append(row.latency_ms)
+        self.input_tokens += row.input_tokens or 0
+        self.output_tokens += row.output_tokens or 0
+        self.cost += row.cost_usd or 0.0
+        if row.error_class:
+            self.errors[row.error_class] += 1
+
+    def summary(self) -> dict:
+        failed = self.attempts - self.outcomes["ok"]
+        return {
+            "attempts": self.attempts,
+            "ok": self.outcomes["ok"],
+            "error": self.outcomes["error"],
+            "unusable": self.outcomes["unusable"],
+            "success_rate": round(self.outcomes["ok"] / self.attempts, 4) if self.attempts else None,
+            "retryable_share": round(self.retryable / failed, 4) if failed else None,
+            "latency_ms": percentiles(self.latencies),
+            "input_tokens": self.input_tokens,
+            "output_tokens": self.output_tokens,
+            "cost_usd": round(self.cost, 6),
+            "top_errors": dict(self.errors.most_common(5)),
+        }
+
+
+async def chain_outcomes(db: AsyncSession, filters: AttemptFilters) -> Counter[int | None]:
+    """
+    Completions started in the window, by the attempt_no that succeeded
+    (None = every attempt failed).
+    """
+    start, end = filters.window()
+    ca = CompletionAttempt
+    first = select(ca.completion_id).where(
+        ca.attempt_no == 1, ca.created_at >= start, ca.created_at < end, ca.completion_id.is_not(None),
+    )
+    if filters.task_type is not None:
+        first = first.where(ca.task_type == filters.task_type)  # same for every attempt of a chain
+    chains = (
+        select(func.min(case((ca.outcome == "ok", ca.attempt_no))).label("resolved_at"))
+        .where(ca.completion_id.in_(first))
+        .group_by(ca.completion_id)
+    )
+    if filters.provider is not None:
+        chains = chains.having(func.max(case((ca.provider == filters.provider, 1), else_=0)) == 1)
+    chains = chains.subquery()
+    rows = await db.execute(select(chains.c.resolved_at, func.count()).group_by(chains.c.resolved_at))
+    return Counter({resolved_at: count for resolved_at, count in rows})
+
+
+async def attempt_summary(db: AsyncSession, filters: AttemptFilters, batch: int = 5000) -> dict:
+    columns = (
+        CompletionAttempt.provider,
+        CompletionAttempt.model,
+        CompletionAttempt.attempt_no,
+        CompletionAttempt.outcome,
+        CompletionAttempt.error_class,
+        CompletionAttempt.retryable,
+        CompletionAttempt.latency_ms,
+        CompletionAttempt.input_tokens,
+        CompletionAttempt.output_tokens,
+        CompletionAttempt.cost_usd,
+    )
+    start, end = filters.window()
+    filters = replace(filters, start=start, end=end)  # one "now" for the query and the response
+    stmt = select(*columns).where(*filters.clauses())
+
+    by_model: dict[tuple[str, str], _Group] = defaultdict(_Group)
+    by_position: dict[int, _Group] = defaultdict(_Group)
+    failed_latency: list[float] = []  # time lost on attempts that a fallback had to follow
+
+    result = await db.stream(stmt.execution_options(yield_per=batch))
+    async for row in result:
+        by_model[(row.provider, row.model)].add(row)
+        by_position[row.attempt_no].add(row)
+        if row.outcome != "ok" and row.latency_ms is not None:
+            failed_latency.append(row.latency_ms)
+
+    resolved_at = await chain_outcomes(db, filters)
+    failed = resolved_at.pop(None, 0)
+    succeeded = sum(resolved_at.values())
+    completions = succeeded + failed
+    return {
+        "start": start,
+        "end": end,
+        "completions": completions,
+        "succeeded": succeeded,
+        "failed": failed,
+        "needed_fallback": completions - resolved_at[1],
+        "resolved_at_attempt": {str(k): v for k, v in sorted(resolved_at.items())},
+        "failed_attempt_latency_ms": percentiles(failed_latency),
+        "by_model": [
+            {"provider": provider, "model": model, **group.summary()}
+            for (provider, model), group in sorted(by_model.items())
+        ],
+        "by_attempt_no": [
+            {"attempt_no": position, **group.summary()}
+            for position, group in sorted(by_position.items())
+        ],
+    }
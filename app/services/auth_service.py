@@ -3,59 +3,162 @@ app/services/auth_service.py
 -----------------------------
 Milestone 4: Authentication business logic.
 
-In-memory session store for MVP. Replace with DB-backed sessions or JWT later.
+Two auth modes (AUTH_MODE env var):
+- session (default): opaque tokens in a pluggable SessionStore (memory or DB,
+  see session_store.py) with expiry and sliding renewal. A per-process
+  TokenCache keeps resolved user snapshots so authenticated requests
+  normally skip both the store and the users table.
+- signed: HMAC-signed expiring tokens (see token_signer.py) carrying
+  user_id + username, verified with CPU only. Logout goes to a RevocationList.
+
+Signed tokens are recognised by their prefix in either mode, so switching
+modes does not strand tokens that are still valid.
+
+bcrypt runs in a bounded pool (password_hasher.py); hashes with an outdated
+work factor are transparently upgraded on the next successful login.
+
+All entry points are async: DB access goes through AsyncSession and bcrypt
+is awaited, so no call here blocks the event loop.
 """
 
+import os
 import secrets
 
-import bcrypt
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.db.models import User
+from app.services.password_hasher import get_password_hasher
+from app.services.session_store import (
+    DEFAULT_TTL_S,
+    SessionStore,
+    TokenCache,
+    UserSnapshot,
+    store_from_env,
+)
+from app.services.token_signer import RevocationList, TokenSigner, is_signed_token
+
+_store: SessionStore | None = None
+_token_cache = TokenCache()
+_signer: TokenSigner | None = None
+_revocations: RevocationList | None = None
+
+
+def get_session_store() -> SessionStore:
+    global _store
+    if _store is None:
+        _store = store_from_env()
+    return _store
+
+
+def set_session_store(store: SessionStore) -> None:
+    """Swap the backend (tests, or explicit wiring at startup)."""
+    global _store
+    _store = store
+    _token_cache.clear()
+
+
+def get_token_signer() -> TokenSigner:
+    global _signer
+    if _signer is None:
+        _signer = TokenSigner.from_env(ttl_s=float(os.getenv("SESSION_TTL_S", DEFAULT_TTL_S)))
+    return _signer
+
 
-# In-memory session store: token -> user_id
-# Swap for Redis or DB table for production.
-_sessions: dict[str, int] = {}
+def get_revocation_list() -> RevocationList:
+    global _revocations
+    if _revocations is None:
+        if os.getenv("SESSION_BACKEND", "memory").lower() == "db":
+            from app.db.session import AsyncSessionLocal
+            _revocations = RevocationList(AsyncSessionLocal)
+        else:
+            _revocations = RevocationList()
+    return _revocations
 
 
-def register_user(username: str, password: str, db: Session) -> User:
+def configure_signed_tokens(signer: TokenSigner | None, revocations: RevocationList | None = None) -> None:
+    """Swap the signer / revocation list (tests, or explicit wiring at startup)."""
+    global _signer, _revocations
+    _signer = signer
+    _revocations = revocations
+
+
+def _auth_mode() -> str:
+    return os.getenv("AUTH_MODE", "session").lower()
+
+
+async def _find_user(username: str, db: AsyncSession) -> User | None:
+    result = await db.execute(select(User).where(User.username == username))
+    return result.scalars().first()
+
+
+async def register_user(username: str, password: str, db: AsyncSession) -> User:
     """Create a new user with bcrypt-hashed password."""
-    existing = db.query(User).filter(User.username == username).first()
+    existing = await _find_user(username, db)
     if existing:
         raise ValueError(f"Username '{username}' already exists")
-    hashed = bcrypt.hashpw(password.encode(), bcrypt.gensalt()).decode()
+    hashed = await get_password_hasher().hash(password)
     user = User(username=username, password_hash=hashed)
     db.add(user)
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    await db.refresh(user)
     return user
 
 
-def login_user(username: str, password: str, db: Session) -> tuple[User, str]:
+async def login_user(username: str, password: str, db: AsyncSession) -> tuple[User, str]:
     """Verify credentials and create a session token."""
-    user = db.query(User).filter(User.username == username).first()
+    user = await _find_user(username, db)
     if not user:
         raise LookupError("User not found")
     if not user.password_hash:
         raise ValueError("Account has no password set")
-    if not bcrypt.checkpw(password.encode(), user.password_hash.encode()):
+    hasher = get_password_hasher()
+    if not await hasher.verify(password, user.password_hash):
         raise ValueError("Invalid password")
+    if hasher.needs_rehash(user.password_hash):
+        user.password_hash = await hasher.hash(password)
+        await db.commit()
+    return user, await create_session(user)
+
+
+async def create_session(user: User) -> str:
+    """Issue a token for an already-authenticated user (login, or right after register)."""
+    if _auth_mode() == "signed":
+        return get_token_signer().sign(user.id, user.username)
     token = secrets.token_urlsafe(32)
-    _sessions[token] = user.id
-    return user, token
+    await get_session_store().create(token, user.id, user.username)
+    return token
+
 
+async def get_user_from_token(token: str) -> UserSnapshot:
+    """Resolve a session token to a UserSnapshot."""
+    if is_signed_token(token):
+        claims = get_token_signer().verify(token)
+        revocations = get_revocation_list()
+        await revocations.sync_if_stale()
+        if revocations.is_revoked(claims.jti):
+            raise LookupError("Invalid or expired session")
+        return UserSnapshot(id=claims.user_id, username=claims.username)
 
-def get_user_from_token(token: str, db: Session) -> User:
-    """Resolve a session token to a User."""
-    user_id = _sessions.get(token)
-    if user_id is None:
+    snapshot = _token_cache.get(token)
+    if snapshot is not None:
+        return snapshot
+    record = await get_session_store().get(token)
+    if record is None:
         raise LookupError("Invalid or expired session")
-    user = db.query(User).filter(User.id == user_id).first()
-    if not user:
-        raise LookupError("User not found for session")
-    return user
+    snapshot = UserSnapshot(id=record.user_id, username=record.username)
+    _token_cache.put(token, snapshot, record.expires_at)
+    return snapshot
 
 
-def logout(token: str) -> None:
+async def logout(token: str) -> None:
     """Invalidate a session token."""
-    _sessions.pop(token, None)
\ No newline at end of file
+    if is_signed_token(token):
+        try:
+            claims = get_token_signer().verify(token)
+        except LookupError:
+            return  # already invalid — nothing to revoke
+        await get_revocation_list().revoke(claims.jti, claims.expires_at)
+        return
+    _token_cache.evict(token)
+    await get_session_store().delete(token)
@@ -0,0 +1,355 @@
+"""
+app/services/budget_ledger.py
+-----------------------------
+Per-user spend enforcement without a DB read-modify-write per request.
+
+Each process keeps an in-memory account per user, loaded once from
+`budgets`:
+
+    remaining = monthly_budget_usd - spent_usd(db) - unflushed - in_flight - reserved
+
+A completion reserves its estimated cost before each provider call and
+settles to the actual cost afterwards. A background thread flushes settled
+deltas every `flush_interval_s` as one batched transaction:
+
+    INSERT INTO budget_flushes (flush_id, user_id, delta)   -- PK guards replays
+    UPDATE budgets SET spent_usd = spent_usd + delta
+
+A flush whose outcome is unknown (error after commit) is retried under the
+same flush_id; if its budget_flushes rows already exist it was applied, so
+it is not applied twice. After each flush spent_usd is re-read, which picks
+up spend recorded by other workers. budget_flushes rows are only needed for
+that retry, so the flusher deletes those older than `flush_retention_s`
+(at most once per `prune_interval_s`).
+
+Only accounts used since the last refresh are re-read, so the per-second
+query follows active users, not every user the process has seen. Accounts
+idle for `idle_evict_s` with nothing unflushed are dropped and loaded again
+on the user's next request.
+
+Users without a `budgets` row are not limited. The refresh re-checks them
+too (when active), so a budget created later applies within one flush
+interval.
+
+Env:
+- BUDGET_FLUSH_INTERVAL_S  (default 1.0)
+- BUDGET_EST_OUTPUT_TOKENS (default 1024) — output size assumed when reserving
+- BUDGET_FLUSH_RETENTION_S (default 86400) — age at which budget_flushes rows are pruned
+- BUDGET_IDLE_EVICT_S      (default 300) — idle time after which an account is dropped from memory
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Callable
+
+from sqlalchemy import delete, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.db.model_catalog_models import ModelCatalog
+from app.db.models import Budget, BudgetFlush
+from app.schemas.routing import CostTier
+from app.services.usage_accounting import price_tokens
+from app.utils.timing import stage
+
+logger = logging.getLogger(__name__)
+
+# Remaining/limit ratio below which routing is capped to a cheaper tier
+_TIER_CAPS: list[tuple[float, CostTier]] = [(0.10, "low"), (0.25, "medium")]
+
+_REFRESH_CHUNK = 500  # user ids per IN (...) when re-reading budgets
+
+
+class BudgetExceeded(RuntimeError):
+    """No candidate model fits in the user's remaining budget."""
+
+
+@dataclass
+class Reservation:
+    user_id: int
+    amount: float
+
+
+@dataclass
+class _Account:
+    limit: float
+    spent: float  # as last read from the DB
+    unflushed: float = 0.0
+    in_flight: float = 0.0  # part of a flush not yet confirmed
+    reserved: float = 0.0
+
+    @property
+    def remaining(self) -> float:
+        return self.limit - self.spent - self.unflushed - self.in_flight - self.reserved
+
+
+def _settled(account: _Account | None) -> bool:
+    return account is None or not (account.unflushed or account.in_flight or account.reserved)
+
+
+def estimate_cost(entry: ModelCatalog | None, prompt: str, output_tokens: int | None = None) -> float:
+    """Upper-bound-ish cost of one call: ~4 chars per input token plus a full-size answer."""
+    if output_tokens is None:
+        output_tokens = int(os.getenv("BUDGET_EST_OUTPUT_TOKENS", 1024))
+    return price_tokens(entry, len(prompt) // 4 + 1, output_tokens)
+
+
+def cost_tier_cap(remaining: float, limit: float) -> CostTier:
+    """Cheapest acceptable ceiling for the router as the budget runs down."""
+    if limit <= 0:
+        return "low"
+    ratio = remaining / limit
+    for threshold, tier in _TIER_CAPS:
+        if ratio < threshold:
+            return tier
+    return "high"
+
+
+class BudgetLedger:
+    def __init__(
+        self,
+        session_factory: Callable[[], Session],
+        flush_interval_s: float = 1.0,
+        flush_retention_s: float = 86_400.0,
+        prune_interval_s: float = 600.0,
+        idle_evict_s: float = 300.0,
+    ):
+        self._session_factory = session_factory
+        self.flush_interval_s = flush_interval_s
+        self.flush_retention_s = flush_retention_s
+        self.prune_interval_s = prune_interval_s
+        self.idle_evict_s = idle_evict_s
+        self._last_prune = 0.0
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._accounts: dict[int, _Account | None] = {}  # None = no budget row
+        self._last_used: dict[int, float] = {}  # monotonic time of the last request
+        self._touched: set[int] = set()  # used since the last refresh
+        self._pending_flush: tuple[str, dict[int, float]] | None = None
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    # -- accounts --------------------------------------------------------
+
+    def load(self, user_id: int) -> None:
+        """Read the user's budget row once (blocking; call via run_blocking from async code)."""
+        with self._lock:
+            if user_id in self._accounts:
+                return
+        with self._session_factory() as db:
+            budget = db.scalars(select(Budget).where(Budget.user_id == user_id)).first()
+            account = _Account(limit=budget.monthly_budget_usd, spent=budget.spent_usd or 0.0) if budget else None
+        with self._lock:
+            self._accounts.setdefault(user_id, account)
+            self._touch(user_id)
+        self._ensure_thread()
+
+    def is_loaded(self, user_id: int) -> bool:
+        with self._lock:
+            return user_id in self._accounts
+
+    def limit(self, user_id: int) -> float | None:
+        with self._lock:
+            account = self._accounts.get(user_id)
+            return account.limit if account else None
+
+    def remaining(self, user_id: int) -> float | None:
+        """USD left for the user, or None when the user has no budget."""
+        with self._lock:
+            self._touch(user_id)
+            account = self._accounts.get(user_id)
+            return account.remaining if account else None
+
+    # -- reserve / settle ------------------------------------------------
+
+    def reserve(self, user_id: int, amount: float) -> Reservation:
+        with self._lock:
+            self._touch(user_id)
+            account = self._accounts.get(user_id)
+            if account is not None:
+                if amount > account.remaining:
+                    raise BudgetExceeded(
+                        f"Budget exhausted: ${account.remaining:.4f} left, call needs ~${amount:.4f}"
+                    )
+                account.reserved += amount
+        return Reservation(user_id=user_id, amount=amount)
+
+    def settle(self, reservation: Reservation, actual: float) -> None:
+        """Replace the reservation with the actual cost (0 if the call was not billed)."""
+        with self._lock:
+            self._touch(reservation.user_id)
+            account = self._accounts.get(reservation.user_id)
+            if account is None:
+                return
+            account.reserved = max(0.0, account.reserved - reservation.amount)
+            account.unflushed += actual
+
+    def _touch(self, user_id: int) -> None:
+        # Lock held by the caller
+        self._last_used[user_id] = time.monotonic()
+        self._touched.add(user_id)
+
+    def _evict_idle(self) -> int:
+        """Drop accounts nobody used for idle_evict_s and with no spend still to write."""
+        cutoff = time.monotonic() - self.idle_evict_s
+        with self._lock:
+            idle = [
+                uid for uid, used in self._last_used.items()
+                if used < cutoff and uid not in self._touched and _settled(self._accounts.get(uid))
+            ]
+            for uid in idle:
+                del self._last_used[uid]
+                self._accounts.pop(uid, None)
+        return len(idle)
+
+    # -- persistence -----------------------------------------------------
+
+    def flush(self) -> int:
+        """Write settled deltas to `budgets`. Returns the number of users updated."""
+        with self._flush_lock:
+            if self._pending_flush is None:
+                with self._lock:
+                    deltas = {uid: a.unflushed for uid, a in self._accounts.items() if a and a.unflushed}
+                    for uid in deltas:
+                        account = self._accounts[uid]
+                        account.in_flight += account.unflushed
+                        account.unflushed = 0.0
+                if not deltas:
+                    self._refresh()
+                    self._maybe_prune()
+                    self._evict_idle()
+                    return 0
+                self._pending_flush = (uuid.uuid4().hex, deltas)
+
+            flush_id, deltas = self._pending_flush
+            self._apply(flush_id, deltas)  # raises -> retried with the same id next time
+            self._pending_flush = None
+            with self._lock:
+                for uid, delta in deltas.items():
+                    account = self._accounts[uid]
+                    account.in_flight -= delta
+                    account.spent += delta
+            self._refresh()
+            self._maybe_prune()
+            self._evict_idle()
+            return len(deltas)
+
+    def _apply(self, flush_id: str, deltas: dict[int, float]) -> None:
+        with stage("budget_commit"), self._session_factory() as db:
+            try:
+                db.add_all([BudgetFlush(flush_id=flush_id, user_id=uid, delta_usd=d) for uid, d in deltas.items()])
+                db.flush()
+            except IntegrityError:
+                db.rollback()
+                logger.info("Budget flush %s was already applied", flush_id)
+                return
+            for uid, delta in deltas.items():
+                db.execute(
+                    update(Budget).where(Budget.user_id == uid).values(spent_usd=Budget.spent_usd + delta)
+                )
+            db.commit()
+
+    def _refresh(self) -> None:
+        """
+        Re-read spent_usd of the accounts used since the last refresh, so
+        other workers' spend counts here too. Users cached without a budget
+        are looked up again, so a new row applies.
+        """
+        with self._lock:
+            user_ids = [uid for uid in self._touched if uid in self._accounts]
+            self._touched.clear()
+        if not user_ids:
+            return
+        rows = []
+        with self._session_factory() as db:
+            for i in range(0, len(user_ids), _REFRESH_CHUNK):
+                rows += db.execute(
+                    select(Budget.user_id, Budget.monthly_budget_usd, Budget.spent_usd)
+                    .where(Budget.user_id.in_(user_ids[i:i + _REFRESH_CHUNK]))
+                ).all()
+        with self._lock:
+            for uid, limit, spent in rows:
+                if uid not in self._accounts:
+                    continue  # evicted meanwhile
+                account = self._accounts[uid]
+                if account is None:
+                    self._accounts[uid] = _Account(limit=limit, spent=spent or 0.0)
+                else:
+                    account.limit = limit
+                    account.spent = spent or 0.0
+
+    def _maybe_prune(self) -> None:
+        now = time.monotonic()
+        if now - self._last_prune < self.prune_interval_s:
+            return
+        self._last_prune = now
+        self.prune_flushes()
+
+    def prune_flushes(self) -> int:
+        """Delete budget_flushes rows older than flush_retention_s; they can no longer be replayed."""
+        cutoff = datetime.utcnow() - timedelta(seconds=self.flush_retention_s)
+        with self._session_factory() as db:
+            deleted = db.execute(delete(BudgetFlush).where(BudgetFlush.created_at < cutoff)).rowcount
+            db.commit()
+        return deleted
+
+    def _ensure_thread(self) -> None:
+        if self._thread is None and self.flush_interval_s > 0:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="budget-flush", daemon=True)
+                    self._thread.start()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.flush_interval_s):
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Budget flush failed; will retry")
+
+    def close(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        try:
+            self.flush()
+        except Exception:
+            logger.exception("Final budget flush failed; unflushed spend is lost")
+
+
+_ledger: BudgetLedger | None = None
+_ledger_lock = threading.Lock()
+
+
+def get_budget_ledger() -> BudgetLedger:
+    global _ledger
+    with _ledger_lock:
+        if _ledger is None:
+            from app.db.session import SessionLocal
+            _ledger = BudgetLedger(
+                SessionLocal,
+                flush_interval_s=float(os.getenv("BUDGET_FLUSH_INTERVAL_S", 1.0)),
+                flush_retention_s=float(os.getenv("BUDGET_FLUSH_RETENTION_S", 86_400)),
+                idle_evict_s=float(os.getenv("BUDGET_IDLE_EVICT_S", 300)),
+            )
+        return _ledger
+
+
+def set_budget_ledger(ledger: BudgetLedger | None) -> None:
+    """Swap the ledger (tests). Flushes and closes the previous one."""
+    global _ledger
+    with _ledger_lock:
+        previous, _ledger = _ledger, ledger
+    if previous is not None and previous is not ledger:
+        previous.close()
+
+
+def shutdown_budget_ledger() -> None:
+    set_budget_ledger(None)
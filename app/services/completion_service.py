@@ -4,22 +4,53 @@ app/services/completion_service.py
 Milestone 3B: Completion orchestrator.
 
 Pipeline: load prompt -> route -> execute LLM (with fallback) -> return response.
+
+Prompt text is resolved through prompt_bodies (chunked storage + LRU).
+
+DB access is async; the provider SDK call is blocking and goes through
+run_blocking (the caller's bulkhead executor when there is one).
+
+Token usage of every attempt, failed ones included, is priced from the
+catalog and queued as a RequestLog row plus one CompletionAttempt row per
+attempt (usage_accounting.py).
+
+For users with a budget, each attempt reserves its estimated cost in the
+in-memory BudgetLedger first and settles to the actual cost afterwards. As
+the budget runs low, routing is capped to cheaper cost tiers. Candidates
+that cannot fit are skipped, and BudgetExceeded is raised only when none fit.
+
+SchedulerBusy (our own provider queue is full or timed out) is re-raised
+instead of falling back: the provider was never called, and the route
+answers 503 with Retry-After.
+
+Each stage (prompt load, catalog, budget, routing, every provider attempt)
+is timed through app/utils/timing.py: Server-Timing header + /metrics.
 """
 
-from sqlalchemy.orm import Session
+import time
+from datetime import datetime
+
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.db.prompt_models import Prompt
 from app.schemas.prompts import PromptProfile
 from app.schemas.completion import CompletionResponse, WebSource
+from app.services.budget_ledger import BudgetExceeded, cost_tier_cap, estimate_cost, get_budget_ledger
 from app.services.model_catalog_repo import load_catalog
 from app.services.model_selector import ModelSelector
+from app.services.prompt_bodies import prompt_text
+from app.services.scheduler import SchedulerBusy
+from app.services.write_behind import get_row
 from app.services.deterministic_router import DeterministicRouter
-from app.services.LLM_completion import LLMCompletionClient
+from app.services.LLM_completion import LLMCompletionClient, ProviderResponseError
+from app.services.usage_accounting import AttemptUsage, price_tokens, record_completion
+from app.utils.blocking import run_blocking
+from app.utils.timing import stage
 
 MAX_FALLBACK_ATTEMPTS = 3
 
 
-def execute_completion(prompt_id: int, db: Session, client: LLMCompletionClient) -> CompletionResponse:
+async def execute_completion(prompt_id: int, db: AsyncSession, client: LLMCompletionClient) -> CompletionResponse:
     """
     Full completion pipeline:
     1. Load prompt from DB
@@ -27,55 +58,143 @@ def execute_completion(prompt_id: int, db: Session, client: LLMCompletionClient)
     3. Execute LLM call with fallback
     """
 
-    # 1) Load prompt
-    row = db.query(Prompt).filter(Prompt.id == prompt_id).first()
-    if not row:
-        raise LookupError(f"Prompt {prompt_id} not found")
+    # 1) Load prompt (it may still be waiting in a write-behind queue)
+    with stage("load_prompt"):
+        row = await get_row(db, Prompt, prompt_id)
+        if not row:
+            raise LookupError(f"Prompt {prompt_id} not found")
 
-    if not row.prompt_profile_json:
-        raise ValueError(f"Prompt {prompt_id} has no profile — run profiling first")
+        if not row.prompt_profile_json:
+            raise ValueError(f"Prompt {prompt_id} has no profile — run profiling first")
 
-    profile = PromptProfile(**row.prompt_profile_json)
+        profile = PromptProfile(**row.prompt_profile_json)
+        raw_prompt = await prompt_text(db, row)
 
     # 2) Route
-    catalog = load_catalog(db)
+    catalog = await load_catalog(db)
     if not catalog:
         raise RuntimeError("Model catalog is empty. Seed models_catalog table.")
 
+    user_id = row.user_id
+    ledger = get_budget_ledger() if user_id is not None else None
+    remaining = None
+    if ledger is not None:
+        if not ledger.is_loaded(user_id):
+            with stage("budget_load"):
+                await run_blocking(ledger.load, user_id)
+        remaining = ledger.remaining(user_id)
+
     selector = ModelSelector(catalog=catalog)
     router = DeterministicRouter(selector=selector)
     decision = router.route(profile)
+    if remaining is not None:
+        cap = cost_tier_cap(remaining, ledger.limit(user_id))
+        capped = router.route(profile, max_cost_tier=cap) if cap != "high" else decision
+        if capped.candidates:
+            if capped is not decision:
+                capped.reason += f" (budget low: capped at cost_tier={cap})"
+            decision = capped
 
     if not decision.candidates:
         raise ValueError(f"No models match constraints for prompt {prompt_id}: {decision.reason}")
 
     # 3) Execute with fallback — selected first, then remaining candidates
-    selected = decision.selected
-    fallbacks = [c for c in decision.candidates if c.key != selected.key]
-    chain = [selected] + fallbacks[:MAX_FALLBACK_ATTEMPTS - 1]
+    entries = {m.key: m for m in catalog}
+    estimates = {c.key: estimate_cost(entries.get(c.key), raw_prompt) for c in decision.candidates}
+    ordered = decision.candidates
+    if remaining is not None:
+        ordered = [c for c in ordered if estimates[c.key] <= remaining]
+        if not ordered:
+            raise BudgetExceeded(
+                f"Budget exhausted: ${remaining:.4f} left, cheapest matching model needs "
+                f"~${min(estimates.values()):.4f}"
+            )
+    chain = ordered[:MAX_FALLBACK_ATTEMPTS]
     attempts = 0
+    usage: list[AttemptUsage] = []
     last_error: Exception | None = None
 
     for candidate in chain:
+        reservation = None
+        if ledger is not None:
+            try:
+                reservation = ledger.reserve(user_id, estimates[candidate.key])
+            except BudgetExceeded as e:
+                # Concurrent requests used up the room since routing — try a cheaper one
+                last_error = e
+                continue
         attempts += 1
+        attempt = AttemptUsage(
+            provider=candidate.provider, model=candidate.model,
+            candidate_key=candidate.key, started_at=datetime.utcnow(),
+        )
+        usage.append(attempt)
+        entry = entries.get(candidate.key)
+        started = time.perf_counter()
+        cost: float | None = None  # None until priced: settle at the estimate
         try:
-            result = client.generate(
-                prompt=row.raw_prompt,
-                provider=candidate.provider,
-                model=candidate.model,
-                needs_web=profile.needs_web,
-            )
-            sources = [WebSource(**s) for s in result.sources] if result.sources else None
-            return CompletionResponse(
-                prompt_id=prompt_id,
-                text=result.text,
-                provider=candidate.provider,
-                model=candidate.model,
-                attempts=attempts,
-                route_decision=decision,
-                sources=sources,
-            )
-        except Exception as e:
-            last_error = e
+            with stage(
+                "attempt", provider=candidate.provider, model=candidate.model, task_type=profile.task_type,
+            ) as timer:
+                try:
+                    result = await run_blocking(
+                        client.generate,
+                        prompt=raw_prompt,
+                        provider=candidate.provider,
+                        model=candidate.model,
+                        needs_web=profile.needs_web,
+                        urgency=profile.urgency,
+                    )
+                except SchedulerBusy:
+                    # Our own queue is saturated, not the provider: falling back would
+                    # only pile onto the next queue. Nothing was sent, so nothing is owed.
+                    usage.pop()
+                    cost = 0.0
+                    if usage:
+                        await record_completion(row.user_id, prompt_id, usage, task_type=profile.task_type)
+                    raise
+                except Exception as e:
+                    last_error = e
+                    attempt.failed(e, "unusable" if isinstance(e, ProviderResponseError) else "error")
+                    timer.set(outcome=attempt.outcome)
+                    if isinstance(e, ProviderResponseError):
+                        # Billed but unusable — counts as wasted spend
+                        attempt.input_tokens = e.input_tokens
+                        attempt.output_tokens = e.output_tokens
+                        attempt.cost_usd = price_tokens(entry, e.input_tokens, e.output_tokens)
+                    cost = attempt.cost_usd
+                    continue
+                finally:
+                    attempt.ended_at = datetime.utcnow()
+                    attempt.latency_ms = (time.perf_counter() - started) * 1000
+
+            attempt.ok = True
+            attempt.input_tokens = result.input_tokens
+            attempt.output_tokens = result.output_tokens
+            attempt.cost_usd = cost = price_tokens(entry, result.input_tokens, result.output_tokens)
+        finally:
+            # Every exit settles, cancellation included: an open reservation would
+            # shrink the user's budget in this worker until restart. A call that
+            # was cut short may still be billed, so it is charged the estimate.
+            if reservation is not None:
+                ledger.settle(reservation, reservation.amount if cost is None else cost)
+        await record_completion(row.user_id, prompt_id, usage, task_type=profile.task_type)
+
+        sources = [WebSource(**s) for s in result.sources] if result.sources else None
+        return CompletionResponse(
+            prompt_id=prompt_id,
+            text=result.text,
+            provider=candidate.provider,
+            model=candidate.model,
+            attempts=attempts,
+            route_decision=decision,
+            sources=sources,
+            input_tokens=sum(a.input_tokens for a in usage),
+            output_tokens=sum(a.output_tokens for a in usage),
+            cost_usd=sum(a.cost_usd for a in usage),
+        )
 
+    if not usage and isinstance(last_error, BudgetExceeded):
+        raise last_error
+    await record_completion(row.user_id, prompt_id, usage, task_type=profile.task_type)
     raise RuntimeError(f"All {attempts} attempts failed. Last error: {last_error}")
\ No newline at end of file
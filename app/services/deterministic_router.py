@@ -1,7 +1,7 @@
 # app/services/deterministic_router.py
 
 from app.schemas.prompts import PromptProfile
-from app.schemas.routing import RouteConstraints, RouteDecision, TaskType
+from app.schemas.routing import CostTier, RouteConstraints, RouteDecision, TaskType
 from app.services.model_selector import ModelSelector
 
 # MVP: task_type -> preferred provider
@@ -25,13 +25,15 @@ class DeterministicRouter:
     def __init__(self, selector: ModelSelector):
         self.selector = selector
 
-    def route(self, profile: PromptProfile) -> RouteDecision:
+    def route(self, profile: PromptProfile, max_cost_tier: CostTier = "high") -> RouteDecision:
+        """max_cost_tier: budget-driven cap (see budget_ledger.cost_tier_cap)."""
         constraints = RouteConstraints(
             task_type=profile.task_type,
             needs_web=profile.needs_web,
             needs_code=profile.needs_code,
             output_format=profile.output_format,
             latency_tier="fast" if profile.urgency == "fast" else "normal",
+            max_cost_tier=max_cost_tier,
         )
 
         candidates = self.selector.select(constraints)
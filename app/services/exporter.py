@@ -0,0 +1,97 @@
+"""
+app/services/exporter.py
+------------------------
+Stream whole tables out as NDJSON (one JSON object per line), optionally gzip.
+
+Rows are read in (created_at, id) order from a server-side cursor
+(`stream()` with `yield_per`), so the process holds one batch at a time
+whatever the table size. Ids alone are not in insert order (each worker
+draws them from its own block, see write_behind), so the order and the
+resume point use created_at first. Every line carries its `id`; an
+interrupted export resumes with `after_id=<last id received>`, which is
+looked up to get its created_at.
+
+Prompt rows are exported with their full text in raw_prompt (chunked
+bodies are reassembled), so the output does not depend on prompt_blobs.
+"""
+
+from __future__ import annotations
+
+import json
+import zlib
+from datetime import date, datetime
+from typing import AsyncIterator, Callable
+
+from sqlalchemy import Table, and_, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.models import RequestLog
+from app.db.prompt_models import Prompt
+from app.services.prompt_bodies import prompt_texts
+
+# Export name -> table. Core rows, not ORM objects: no identity map to grow.
+EXPORTABLE: dict[str, Table] = {
+    "prompts": Prompt.__table__,
+    "request_logs": RequestLog.__table__,
+}
+
+DEFAULT_BATCH = 1000
+
+
+def json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"not JSON serializable: {type(value).__name__}")
+
+
+async def resume_point(db: AsyncSession, table: Table, after_id: int) -> tuple[datetime, int] | None:
+    """(created_at, id) of the row to resume after; None for a fresh export. LookupError if it is gone."""
+    if not after_id:
+        return None
+    created_at = await db.scalar(select(table.c.created_at).where(table.c.id == after_id))
+    if created_at is None:
+        raise LookupError(f"Row {after_id} not found in {table.name}; cannot resume after it")
+    return created_at, after_id
+
+
+async def export_ndjson(
+    session_factory: Callable[[], AsyncSession],
+    table: Table,
+    after_id: int = 0,
+    user_id: int | None = None,
+    batch: int = DEFAULT_BATCH,
+) -> AsyncIterator[bytes]:
+    """Yield NDJSON chunks (one per batch) for rows after row `after_id` in (created_at, id) order."""
+    stmt = select(table).order_by(table.c.created_at, table.c.id)
+    if user_id is not None:
+        stmt = stmt.where(table.c.user_id == user_id)
+
+    # Own session: the generator outlives the request handler that created it
+    async with session_factory() as db:
+        after = await resume_point(db, table, after_id)
+        if after is not None:
+            created_at, row_id = after
+            stmt = stmt.where(or_(
+                table.c.created_at > created_at,
+                and_(table.c.created_at == created_at, table.c.id > row_id),
+            ))
+        result = await db.stream(stmt.execution_options(yield_per=batch))
+        async for rows in result.partitions():
+            records = [dict(row._mapping) for row in rows]
+            if table is Prompt.__table__:
+                for record, text in zip(records, await prompt_texts(db, rows)):
+                    record["raw_prompt"] = text
+            yield "".join(
+                json.dumps(record, default=json_default, separators=(",", ":")) + "\n"
+                for record in records
+            ).encode()
+
+
+async def gzip_stream(chunks: AsyncIterator[bytes], level: int = 6) -> AsyncIterator[bytes]:
+    """Gzip an async byte stream incrementally (a valid .gz once the stream ends)."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)  # wbits=31 -> gzip container
+    async for chunk in chunks:
+        out = compressor.compress(chunk)
+        if out:
+            yield out
+    yield compressor.flush()
@@ -9,12 +9,39 @@ Uses the new official google-genai SDK (not the deprecated google.generativeai).
 import os
 import json
 
-from google import genai
 from pydantic import ValidationError
 
+from app.providers.sdk_clients import make_client
 from app.schemas.prompts import PromptProfile
 
 
+def parse_profile(text: str) -> PromptProfile:
+    """
+    Clean up Gemini's answer and validate it into a PromptProfile.
+    Pure function: no network, so it can be tested and benchmarked on its own.
+    """
+    text = text.strip()
+    # Strip markdown code fences if Gemini wraps the JSON
+    if text.startswith("```"):
+        text = text.split("\n", 1)[1]  # remove first line (```json)
+        text = text.rsplit("```", 1)[0]  # remove closing ```
+        text = text.strip()
+    # Convert Python booleans to JSON booleans if Gemini slips
+    text = (text.replace("True", "true").replace("False", "false")
+            .replace("None", "null"))
+    try:
+        data = json.loads(text)
+    except json.JSONDecodeError:
+        raise RuntimeError(f"Gemini did not return valid JSON:\n{text}")
+
+    try:
+        profile = PromptProfile(**data)
+    except ValidationError as e:
+        raise RuntimeError(f"Gemini JSON does not match schema:\n{data}") from e
+
+    return profile
+
+
 class GeminiPromptProfiler:
     """
     Prompt profiler that uses Gemini to classify prompts into a JSON profile.
@@ -26,7 +53,7 @@ class GeminiPromptProfiler:
             raise RuntimeError("Missing GEMINI_API_KEY environment variable")
 
         # Initialize Gemini client
-        self.client = genai.Client(api_key=api_key)
+        self.client = make_client("gemini", api_key)
         self.model_name = model_name
 
     def profile(self, raw_prompt: str) -> PromptProfile:
@@ -93,23 +120,4 @@ Classify this prompt:
             contents=[system_instruction, user_prompt],
         )
 
-        text = (response.text or "").strip()
-        # Strip markdown code fences if Gemini wraps the JSON
-        if text.startswith("```"):
-            text = text.split("\n", 1)[1]  # remove first line (```json)
-            text = text.rsplit("```", 1)[0]  # remove closing ```
-            text = text.strip()
-        # Convert Python booleans to JSON booleans if Gemini slips
-        text = (text.replace("True", "true").replace("False", "false")
-                .replace("None", "null"))
-        try:
-            data = json.loads(text)
-        except json.JSONDecodeError:
-            raise RuntimeError(f"Gemini did not return valid JSON:\n{text}")
-
-        try:
-            profile = PromptProfile(**data)
-        except ValidationError as e:
-            raise RuntimeError(f"Gemini JSON does not match schema:\n{data}") from e
-
-        return profile
\ No newline at end of file
+        return parse_profile(response.text or "")
@@ -4,29 +4,39 @@ app/services/key_service.py
 Milestone 4: Per-user API key management.
 
 Handles storing, retrieving, and deleting encrypted provider API keys.
-Validates keys on save via real provider API calls.
+Validates keys on save via real provider API calls (run off the event loop).
 """
 
 from datetime import datetime
 
-from sqlalchemy.orm import Session
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.db.models import ProviderKey
+from app.utils.blocking import run_blocking
 from app.utils.encryption import encrypt_key, decrypt_key, mask_key
+from app.utils.timing import timed
 from app.services.key_validator import validate_key
 
 
-def store_key(user_id: int, provider: str, api_key: str, db: Session) -> ProviderKey:
+async def _find_key(user_id: int, provider: str, db: AsyncSession) -> ProviderKey | None:
+    result = await db.execute(
+        select(ProviderKey).where(
+            ProviderKey.user_id == user_id,
+            ProviderKey.provider == provider,
+        )
+    )
+    return result.scalars().first()
+
+
+async def store_key(user_id: int, provider: str, api_key: str, db: AsyncSession) -> ProviderKey:
     """Encrypt, validate, and store (or update) a provider key for a user."""
-    existing = db.query(ProviderKey).filter(
-        ProviderKey.user_id == user_id,
-        ProviderKey.provider == provider,
-    ).first()
+    existing = await _find_key(user_id, provider, db)
     encrypted = encrypt_key(api_key)
     masked = mask_key(api_key)
 
-    # Validate the key against the provider API
-    result = validate_key(provider, api_key)
+    # Validate the key against the provider API (blocking SDK call)
+    result = await run_blocking(validate_key, provider, api_key)
     status = "active" if result["valid"] else "invalid"
     now = datetime.utcnow()
 
@@ -49,60 +59,58 @@ def store_key(user_id: int, provider: str, api_key: str, db: Session) -> Provide
             discovered_models=models,
         )
         db.add(existing)
-    db.commit()
-    db.refresh(existing)
+    await db.commit()
+    await db.refresh(existing)
     return existing
 
 
-def revalidate_key(user_id: int, provider: str, db: Session) -> ProviderKey | None:
+async def revalidate_key(user_id: int, provider: str, db: AsyncSession) -> ProviderKey | None:
     """Re-validate an existing stored key and update its status."""
-    row = db.query(ProviderKey).filter(
-        ProviderKey.user_id == user_id,
-        ProviderKey.provider == provider,
-    ).first()
+    row = await _find_key(user_id, provider, db)
     if not row or not row.api_key_encrypted:
         return None
 
     api_key = decrypt_key(row.api_key_encrypted)
-    result = validate_key(provider, api_key)
+    result = await run_blocking(validate_key, provider, api_key)
     row.status = "active" if result["valid"] else "invalid"
     row.validated_at = datetime.utcnow()
     row.discovered_models = result.get("models", [])
-    db.commit()
-    db.refresh(row)
+    await db.commit()
+    await db.refresh(row)
     return row
 
 
-def get_user_keys(user_id: int, db: Session) -> list[ProviderKey]:
+async def get_user_keys(user_id: int, db: AsyncSession) -> list[ProviderKey]:
     """List all provider keys for a user (masked, not decrypted)."""
-    return db.query(ProviderKey).filter(ProviderKey.user_id == user_id).all()
+    result = await db.execute(select(ProviderKey).where(ProviderKey.user_id == user_id))
+    return list(result.scalars().all())
 
 
-def get_decrypted_key(user_id: int, provider: str, db: Session) -> str | None:
+async def get_decrypted_key(user_id: int, provider: str, db: AsyncSession) -> str | None:
     """Return decrypted API key for a specific provider, or None if not set."""
-    row = db.query(ProviderKey).filter(
-        ProviderKey.user_id == user_id,
-        ProviderKey.provider == provider,
-    ).first()
+    row = await _find_key(user_id, provider, db)
     if not row or not row.api_key_encrypted:
         return None
     return decrypt_key(row.api_key_encrypted)
 
 
-def delete_key(user_id: int, provider: str, db: Session) -> None:
+async def delete_key(user_id: int, provider: str, db: AsyncSession) -> None:
     """Remove a stored key."""
-    db.query(ProviderKey).filter(
-        ProviderKey.user_id == user_id,
-        ProviderKey.provider == provider,
-    ).delete()
-    db.commit()
+    await db.execute(
+        delete(ProviderKey).where(
+            ProviderKey.user_id == user_id,
+            ProviderKey.provider == provider,
+        )
+    )
+    await db.commit()
 
 
-def build_user_keys(user_id: int, db: Session) -> dict[str, str]:
+@timed("keys")
+async def build_user_keys(user_id: int, db: AsyncSession) -> dict[str, str]:
     """Load all decrypted keys for a user as a dict (provider -> key)."""
-    rows = db.query(ProviderKey).filter(ProviderKey.user_id == user_id).all()
+    rows = await get_user_keys(user_id, db)
     result = {}
     for row in rows:
         if row.api_key_encrypted:
             result[row.provider] = decrypt_key(row.api_key_encrypted)
-    return result
\ No newline at end of file
+    return result
@@ -7,9 +7,7 @@ Returns validation result with discovered models.
 
 from typing import Any
 
-from google import genai
-from openai import OpenAI
-from anthropic import Anthropic
+from app.providers.sdk_clients import make_client
 
 
 def validate_key(provider: str, api_key: str) -> dict[str, Any]:
@@ -30,7 +28,7 @@ def validate_key(provider: str, api_key: str) -> dict[str, Any]:
 
 def _validate_gemini(api_key: str) -> dict[str, Any]:
     try:
-        client = genai.Client(api_key=api_key)
+        client = make_client("gemini", api_key)
         models = []
         for model in client.models.list():
             models.append(model.name)
@@ -41,7 +39,7 @@ def _validate_gemini(api_key: str) -> dict[str, Any]:
 
 def _validate_openai(api_key: str) -> dict[str, Any]:
     try:
-        client = OpenAI(api_key=api_key)
+        client = make_client("openai", api_key)
         response = client.models.list()
         models = [m.id for m in response.data]
         return {"valid": True, "error": None, "models": models}
@@ -51,7 +49,7 @@ def _validate_openai(api_key: str) -> dict[str, Any]:
 
 def _validate_anthropic(api_key: str) -> dict[str, Any]:
     try:
-        client = Anthropic(api_key=api_key)
+        client = make_client("anthropic", api_key)
         client.messages.create(
             model="claude-haiku-4-5-20251001",
             max_tokens=1,
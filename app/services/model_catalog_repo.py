@@ -6,14 +6,18 @@ Milestone 3: Load model catalog entries from the database.
 
 from __future__ import annotations
 
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.db.model_catalog_models import ModelCatalog
+from app.utils.timing import timed
 
 
-def load_catalog(db: Session) -> list[ModelCatalog]:
+@timed("catalog")
+async def load_catalog(db: AsyncSession) -> list[ModelCatalog]:
     """
     Load enabled catalog models from DB.
     Returns ORM rows (ModelCatalog).
     """
-    return db.query(ModelCatalog).order_by(ModelCatalog.id.asc()).all()
+    result = await db.execute(select(ModelCatalog).order_by(ModelCatalog.id.asc()))
+    return list(result.scalars().all())
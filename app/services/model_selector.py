@@ -17,6 +17,7 @@ from app.schemas.routing import (
     TaskType
 )
 from app.db.model_catalog_models import ModelCatalog
+from app.utils.timing import timed
 
 _COST_ORDER = {"low": 0, "medium": 1, "high": 2}
 _LATENCY_ORDER = {"fast": 0, "normal": 1}
@@ -64,6 +65,7 @@ class ModelSelector:
         self.catalog = catalog
         self.config = config if config is not None else SelectionConfig()
 
+    @timed("select")
     def select(self, constraints: RouteConstraints) -> List[ModelCandidate]:
         candidates: List[ModelCandidate] = []
 
@@ -0,0 +1,101 @@
+"""
+app/services/password_hasher.py
+-------------------------------
+Bounded bcrypt pool for auth_service.
+
+bcrypt releases the GIL while hashing, so a dedicated thread pool gives real
+parallelism without process start-up or pickling cost. What matters is the
+bound: at most `max_workers` hashes run at once and at most `max_queue`
+wait, so a login storm gets fast HasherBusy errors instead of eating the
+threadpool that completion requests also need.
+
+Env:
+- BCRYPT_ROUNDS     work factor for new hashes (default 12)
+- BCRYPT_WORKERS    concurrent hashes (default 2)
+- BCRYPT_MAX_QUEUE  hashes allowed to wait (default 64)
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import bcrypt
+
+
+class HasherBusy(RuntimeError):
+    """Too many password operations already queued — caller should back off."""
+
+
+def hash_rounds(hashed: str) -> int | None:
+    """Cost parameter of a bcrypt hash ("$2b$12$..." -> 12), None if unparseable."""
+    parts = hashed.split("$")
+    if len(parts) < 4:
+        return None
+    try:
+        return int(parts[2])
+    except ValueError:
+        return None
+
+
+class PasswordHasher:
+    def __init__(self, rounds: int = 12, max_workers: int = 2, max_queue: int = 64):
+        self.rounds = rounds
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="bcrypt")
+        # Running + waiting operations share one budget
+        self._slots = threading.BoundedSemaphore(max_workers + max_queue)
+
+    @classmethod
+    def from_env(cls) -> "PasswordHasher":
+        return cls(
+            rounds=int(os.getenv("BCRYPT_ROUNDS", 12)),
+            max_workers=int(os.getenv("BCRYPT_WORKERS", 2)),
+            max_queue=int(os.getenv("BCRYPT_MAX_QUEUE", 64)),
+        )
+
+    async def hash(self, password: str) -> str:
+        rounds = self.rounds
+        return await asyncio.wrap_future(self.submit(
+            lambda: bcrypt.hashpw(password.encode(), bcrypt.gensalt(rounds)).decode()
+        ))
+
+    async def verify(self, password: str, hashed: str) -> bool:
+        return await asyncio.wrap_future(
+            self.submit(lambda: bcrypt.checkpw(password.encode(), hashed.encode()))
+        )
+
+    def needs_rehash(self, hashed: str) -> bool:
+        return hash_rounds(hashed) != self.rounds
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=True)
+
+    def submit(self, fn) -> Future:
+        """Run fn in the pool (non-blocking); raises HasherBusy if the queue is full."""
+        if not self._slots.acquire(blocking=False):
+            raise HasherBusy("Too many concurrent login/registration requests, retry shortly")
+        try:
+            future = self._executor.submit(fn)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+
+_hasher: PasswordHasher | None = None
+
+
+def get_password_hasher() -> PasswordHasher:
+    global _hasher
+    if _hasher is None:
+        _hasher = PasswordHasher.from_env()
+    return _hasher
+
+
+def set_password_hasher(hasher: PasswordHasher | None) -> None:
+    """Swap the pool (tests); None re-reads the env on next use."""
+    global _hasher
+    _hasher = hasher
@@ -0,0 +1,235 @@
+"""
+app/services/prompt_bodies.py
+-----------------------------
+Content-addressed, compressed storage for prompt text.
+
+The chat UI sends the whole conversation as the prompt on every turn, so
+storing each body in full grows quadratically with conversation length.
+Instead a body is split into chunks at line boundaries once roughly
+PROMPT_CHUNK_BYTES have accumulated. Boundaries depend only on the text
+before them, so a transcript that grew by one turn re-uses every complete
+chunk of the previous one. Each chunk is zlib-compressed and stored once in
+prompt_blobs under its sha256; Prompt rows keep the ordered list of hashes.
+
+Writes: attach_body() on the Prompt before submitting it to the write-behind
+queue; store_prompt_blobs (a batch hook on Prompt) inserts the new chunks
+in the same transaction as the prompts; chunks already stored only get
+their touched_at refreshed (so retention never collects a chunk in use).
+
+Reads: prompt_text / prompt_texts (async) and prompt_texts_sync resolve
+either form of row (chunked, or legacy raw_prompt). Chunks are immutable,
+so decompressed text is kept in a process-wide LRU (PROMPT_CHUNK_CACHE_MB).
+
+Env:
+- PROMPT_CHUNK_BYTES    (default 4096)
+- PROMPT_CHUNK_CACHE_MB (default 32)
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import threading
+import zlib
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Iterable
+
+from sqlalchemy import select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.db.prompt_models import Prompt, PromptBlob
+
+CHUNK_BYTES = int(os.getenv("PROMPT_CHUNK_BYTES", 4096))
+
+# A single line longer than this is cut mid-line
+_MAX_CHUNK_CHARS = CHUNK_BYTES * 4
+
+
+class MissingPromptBlob(LookupError):
+    """A prompt references a chunk that is not in prompt_blobs."""
+
+
+class ChunkCache:
+    """Thread-safe LRU of decompressed chunk text, bounded by total characters."""
+
+    def __init__(self, max_chars: int):
+        self.max_chars = max_chars
+        self._lock = threading.Lock()
+        self._items: OrderedDict[str, str] = OrderedDict()
+        self._chars = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> str | None:
+        with self._lock:
+            text = self._items.get(key)
+            if text is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return text
+
+    def put(self, key: str, text: str) -> None:
+        with self._lock:
+            if key in self._items:
+                self._items.move_to_end(key)
+                return
+            self._items[key] = text
+            self._chars += len(text)
+            while self._chars > self.max_chars and self._items:
+                _, evicted = self._items.popitem(last=False)
+                self._chars -= len(evicted)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+            self._chars = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._items), "chars": self._chars, "hits": self.hits, "misses": self.misses}
+
+
+chunk_cache = ChunkCache(int(float(os.getenv("PROMPT_CHUNK_CACHE_MB", 32)) * 1024 * 1024))
+
+
+def split_chunks(text: str, target: int = CHUNK_BYTES) -> list[str]:
+    """Cut `text` after the first line break once a chunk reaches `target` chars."""
+    chunks: list[str] = []
+    current: list[str] = []
+    size = 0
+    for line in text.splitlines(keepends=True):
+        while len(line) > _MAX_CHUNK_CHARS:
+            if current:
+                chunks.append("".join(current))
+                current, size = [], 0
+            chunks.append(line[:_MAX_CHUNK_CHARS])
+            line = line[_MAX_CHUNK_CHARS:]
+        current.append(line)
+        size += len(line)
+        if size >= target:
+            chunks.append("".join(current))
+            current, size = [], 0
+    if current or not chunks:
+        chunks.append("".join(current))
+    return chunks
+
+
+def _hash(text: str) -> str:
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+def _encode(chunk: str) -> dict:
+    raw = chunk.encode()
+    packed = zlib.compress(raw, 6)
+    codec, data = ("zlib", packed) if len(packed) < len(raw) else ("raw", raw)
+    return {"hash": _hash(chunk), "codec": codec, "size": len(raw), "data": data}
+
+
+def _decode(codec: str, data: bytes) -> str:
+    return (zlib.decompress(data) if codec == "zlib" else data).decode()
+
+
+def attach_body(row: Prompt, text: str) -> Prompt:
+    """Store `text` on `row` as chunk references; the chunks ride along until the row is written."""
+    chunks = split_chunks(text)
+    blobs = {}
+    for chunk in chunks:
+        blob = _encode(chunk)
+        blobs[blob["hash"]] = blob
+        chunk_cache.put(blob["hash"], chunk)  # usually read back moments later by the completion
+    row.raw_prompt = ""
+    row.body_hash = _hash(text)
+    row.body_chunks = [_hash(chunk) for chunk in chunks]
+    # Plain instance attributes (not columns): picked up by store_prompt_blobs
+    row._body_text = text
+    row._new_blobs = blobs
+    return row
+
+
+def store_prompt_blobs(db: Session, rows: list[Prompt]) -> None:
+    """Write-behind batch hook for Prompt: insert new chunks, touch the ones already stored."""
+    blobs: dict[str, dict] = {}
+    for row in rows:
+        blobs.update(getattr(row, "_new_blobs", None) or {})
+    if not blobs:
+        return
+    now = datetime.utcnow()
+    values = [{**b, "touched_at": now} for b in blobs.values()]
+    dialect = db.get_bind().dialect.name
+    if dialect in ("sqlite", "postgresql"):
+        insert = sqlite.insert if dialect == "sqlite" else postgresql.insert
+        stmt = insert(PromptBlob)
+        stmt = stmt.on_conflict_do_update(index_elements=["hash"], set_={"touched_at": stmt.excluded.touched_at})
+        db.execute(stmt, values)
+    else:
+        existing = set(db.scalars(select(PromptBlob.hash).where(PromptBlob.hash.in_(list(blobs)))))
+        if existing:
+            db.execute(update(PromptBlob).where(PromptBlob.hash.in_(existing)).values(touched_at=now))
+        db.add_all([PromptBlob(**v) for v in values if v["hash"] not in existing])
+        db.flush()
+
+
+def _lookup(rows: Iterable[Any]) -> tuple[dict[str, str], set[str]]:
+    """Chunks the rows need: those already in the LRU, and the hashes still to fetch."""
+    found: dict[str, str] = {}
+    missing: set[str] = set()
+    for row in rows:
+        if getattr(row, "_body_text", None) is not None or not row.body_chunks:
+            continue
+        for h in row.body_chunks:
+            if h in found or h in missing:
+                continue
+            text = chunk_cache.get(h)
+            if text is None:
+                missing.add(h)
+            else:
+                found[h] = text
+    return found, missing
+
+
+def _assemble(row: Any, chunks: dict[str, str]) -> str:
+    text = getattr(row, "_body_text", None)
+    if text is not None:
+        return text  # still pending in the write-behind queue
+    if not row.body_chunks:
+        return row.raw_prompt  # stored before chunking existed
+    try:
+        return "".join(chunks[h] for h in row.body_chunks)
+    except KeyError as e:
+        raise MissingPromptBlob(f"Prompt {row.id}: chunk {e.args[0][:12]} not found") from None
+
+
+def _decode_rows(result, into: dict[str, str]) -> dict[str, str]:
+    for h, codec, data in result:
+        text = _decode(codec, data)
+        chunk_cache.put(h, text)
+        into[h] = text
+    return into
+
+
+def _blob_query(hashes: set[str]):
+    return select(PromptBlob.hash, PromptBlob.codec, PromptBlob.data).where(PromptBlob.hash.in_(hashes))
+
+
+async def prompt_texts(db: AsyncSession, rows: list[Any]) -> list[str]:
+    """Full text for each row (ORM objects or Row tuples with raw_prompt/body_chunks), one query for all misses."""
+    chunks, missing = _lookup(rows)
+    if missing:
+        _decode_rows(await db.execute(_blob_query(missing)), chunks)
+    return [_assemble(row, chunks) for row in rows]
+
+
+async def prompt_text(db: AsyncSession, row: Any) -> str:
+    return (await prompt_texts(db, [row]))[0]
+
+
+def prompt_texts_sync(db: Session, rows: list[Any]) -> list[str]:
+    chunks, missing = _lookup(rows)
+    if missing:
+        _decode_rows(db.execute(_blob_query(missing)), chunks)
+    return [_assemble(row, chunks) for row in rows]
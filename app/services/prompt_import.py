@@ -0,0 +1,401 @@
+"""
+app/services/prompt_import.py
+-----------------------------
+Bulk prompt import (NDJSON upload) + background profiling.
+
+Upload: the request body is read chunk by chunk and split into lines as it
+arrives; each valid line becomes a Prompt (no profile yet) handed to the
+write-behind queue, which batches the INSERTs. When the queue is full the
+upload simply waits, so memory stays bounded by the queue, not the file.
+
+Profiling: ImportProfilerPool works through a job's prompts in id order,
+`batch` rows at a time, across a fixed number of worker threads. Every
+profiler call goes through the provider scheduler at "batch" priority, so
+imports only use Gemini capacity that live traffic leaves free, and
+overload errors (429 / quota / timeouts) are retried with exponential
+backoff. Profiles and the job's checkpoint are committed together, so a
+restarted process resumes right after the last finished batch.
+
+Env:
+- IMPORT_PROFILE_WORKERS     (default 4)
+- IMPORT_PROFILE_BATCH       (default 32)
+- IMPORT_PROFILE_MAX_RETRIES (default 5)
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import AsyncIterator, Callable
+
+from pydantic import ValidationError
+from sqlalchemy import bindparam, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.db.models import ImportJob
+from app.db.prompt_models import PROFILE_COLUMNS, Prompt, profile_columns
+from app.schemas.prompts import PromptImportLine, PromptProfile
+from app.services.prompt_bodies import attach_body, prompt_texts_sync
+from app.services.scheduler import ProviderScheduler, is_overload_error
+from app.services.session_store import UserSnapshot
+from app.services.write_behind import WriteQueueFull, get_write_queue
+from app.utils.blocking import run_blocking
+
+logger = logging.getLogger(__name__)
+
+MAX_LINE_BYTES = 1024 * 1024
+MAX_REPORTED_ERRORS = 20
+
+
+class ImportTooLarge(ValueError):
+    """A single NDJSON line exceeds MAX_LINE_BYTES."""
+
+
+@dataclass
+class ImportResult:
+    job: ImportJob
+    errors: list[dict] = field(default_factory=list)
+
+
+async def iter_lines(chunks: AsyncIterator[bytes], max_line_bytes: int = MAX_LINE_BYTES) -> AsyncIterator[bytes]:
+    """Split a byte stream into lines without buffering more than one line."""
+    buffer = b""
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            yield line
+        if len(buffer) > max_line_bytes:
+            raise ImportTooLarge(f"line longer than {max_line_bytes} bytes")
+    if buffer:
+        yield buffer
+
+
+async def import_prompts(db: AsyncSession, user: UserSnapshot, chunks: AsyncIterator[bytes]) -> ImportResult:
+    """
+    Store every valid NDJSON line of `chunks` as an unprofiled Prompt, then
+    hand the job to the profiling pool.
+
+    Line format: {"prompt": "...", "created_at": "<ISO, optional>"}.
+    Invalid lines are counted as rejected (the first few are reported).
+    """
+    job = ImportJob(user_id=user.id, status="importing")
+    db.add(job)
+    await db.commit()
+
+    write_queue = get_write_queue()
+    result = ImportResult(job=job)
+    imported = rejected = 0
+    try:
+        line_no = 0
+        async for line in iter_lines(chunks):
+            line_no += 1
+            if not line.strip():
+                continue
+            try:
+                item = PromptImportLine.model_validate_json(line)
+            except ValidationError as e:
+                rejected += 1
+                if len(result.errors) < MAX_REPORTED_ERRORS:
+                    result.errors.append({"line": line_no, "error": e.errors(include_url=False)[0]["msg"]})
+                continue
+
+            row = Prompt(
+                created_at=item.created_at or datetime.utcnow(),
+                username=user.username,
+                user_id=user.id,
+                import_job_id=job.id,
+            )
+            attach_body(row, item.prompt.strip())
+            # Backpressure: wait for the writer rather than buffering the upload.
+            # bulk=True stops at half the queue, keeping headroom for live requests
+            while True:
+                try:
+                    await write_queue.asubmit(row, bulk=True)
+                    break
+                except WriteQueueFull:
+                    await asyncio.sleep(0.05)
+            imported += 1
+    except Exception as e:
+        await run_blocking(write_queue.flush)
+        job.status, job.last_error = "failed", f"upload aborted: {e}"
+        job.imported, job.rejected = imported, rejected
+        await db.commit()
+        raise
+
+    # Profiling reads the rows back from the database
+    await run_blocking(write_queue.flush)
+    job.imported, job.rejected = imported, rejected
+    job.status = "profiling" if imported else "done"
+    job.profiling_started_at = datetime.utcnow()
+    await db.commit()
+
+    if imported:
+        get_import_pool().submit(job.id)
+    return result
+
+
+def job_progress(job: ImportJob) -> dict:
+    """Counts, throughput and ETA for GET /v1/prompts/imports/{job_id}."""
+    handled = job.profiled + job.failed
+    remaining = max(job.imported - handled, 0)
+    rate = eta_s = None
+    if job.profiling_started_at and handled:
+        elapsed = ((job.updated_at or datetime.utcnow()) - job.profiling_started_at).total_seconds()
+        if elapsed > 0:
+            rate = round(handled / elapsed, 3)
+            eta_s = round(remaining / rate, 1) if job.status == "profiling" else 0.0
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "imported": job.imported,
+        "rejected": job.rejected,
+        "profiled": job.profiled,
+        "failed": job.failed,
+        "remaining": remaining,
+        "rows_per_s": rate,
+        "eta_s": eta_s,
+        "last_error": job.last_error,
+        "created_at": job.created_at,
+        "updated_at": job.updated_at,
+    }
+
+
+class ImportProfilerPool:
+    """
+    Profiles imported prompts in the background, one job at a time (FIFO).
+
+    `profile_fn(raw_prompt) -> PromptProfile` is the blocking profiler call;
+    `scheduler` (optional) gates each call as low-priority Gemini traffic.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session],
+        profile_fn: Callable[[str], PromptProfile],
+        workers: int = 4,
+        batch: int = 32,
+        scheduler: ProviderScheduler | None = None,
+        key_id: str = "import",
+        max_retries: int = 5,
+        backoff_s: float = 1.0,
+    ):
+        self._session_factory = session_factory
+        self._profile_fn = profile_fn
+        self.workers = workers
+        self.batch = batch
+        self._scheduler = scheduler
+        self._key_id = key_id
+        self.max_retries = max_retries
+        self.backoff_s = backoff_s
+
+        self._jobs: queue.Queue[int | None] = queue.Queue()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="import-profiler")
+        self._stopping = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+        self._active_job: int | None = None
+        self._retries = 0
+
+    def submit(self, job_id: int) -> None:
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="import-profiler-feed", daemon=True)
+                self._thread.start()
+        self._jobs.put(job_id)
+
+    def process(self, job_id: int) -> None:
+        """Profile every remaining prompt of `job_id` (blocking; resumes from the checkpoint)."""
+        while not self._stopping.is_set():
+            with self._session_factory() as db:
+                job = db.get(ImportJob, job_id)
+                if job is None or job.status != "profiling":
+                    return
+                rows = db.execute(
+                    select(Prompt.id, Prompt.raw_prompt, Prompt.body_chunks)
+                    .where(Prompt.import_job_id == job_id, Prompt.id > job.checkpoint_id)
+                    .order_by(Prompt.id)
+                    .limit(self.batch)
+                ).all()
+                texts = prompt_texts_sync(db, rows)
+            if not rows:
+                self._finish(job_id)
+                return
+
+            results = list(self._executor.map(self._profile_one, texts))
+            if self._stopping.is_set():
+                return  # uncommitted batch is redone on resume
+            self._commit_batch(job_id, rows, results)
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "active_job": self._active_job,
+            "queued_jobs": self._jobs.qsize(),
+            "retries": self._retries,
+        }
+
+    def close(self, timeout: float | None = 10.0) -> None:
+        self._stopping.set()
+        self._jobs.put(None)
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    # ---------- internals ----------
+
+    def _run(self) -> None:
+        while True:
+            job_id = self._jobs.get()
+            if job_id is None or self._stopping.is_set():
+                return
+            self._active_job = job_id
+            try:
+                self.process(job_id)
+            except Exception:
+                logger.exception("import job %s: profiling stopped", job_id)
+                self._mark_failed(job_id)
+            finally:
+                self._active_job = None
+
+    def _profile_one(self, raw_prompt: str) -> tuple[dict | None, str | None]:
+        for attempt in range(self.max_retries + 1):
+            try:
+                if self._scheduler is None:
+                    profile = self._profile_fn(raw_prompt)
+                else:
+                    with self._scheduler.slot("gemini", self._key_id, user_id="import", urgency="batch"):
+                        profile = self._profile_fn(raw_prompt)
+                return profile.model_dump(), None
+            except Exception as e:
+                if is_overload_error(e) and attempt < self.max_retries and not self._stopping.is_set():
+                    self._retries += 1
+                    self._stopping.wait(self.backoff_s * 2 ** attempt)
+                    continue
+                return None, str(e)
+        return None, "retries exhausted"
+
+    def _commit_batch(self, job_id: int, rows, results) -> None:
+        table = Prompt.__table__
+        profiled = [
+            {"row_id": row.id, "prompt_profile_json": profile, **profile_columns(profile)}
+            for row, (profile, _) in zip(rows, results)
+            if profile is not None
+        ]
+        errors = [error for _, error in results if error is not None]
+        with self._session_factory() as db:
+            if profiled:
+                db.execute(
+                    update(table)
+                    .where(table.c.id == bindparam("row_id"))
+                    .values({c: bindparam(c) for c in ("prompt_profile_json", *PROFILE_COLUMNS)}),
+                    profiled,
+                )
+            values = {
+                "checkpoint_id": rows[-1].id,
+                "profiled": ImportJob.profiled + len(profiled),
+                "failed": ImportJob.failed + len(errors),
+                "updated_at": datetime.utcnow(),
+            }
+            if errors:
+                values["last_error"] = errors[-1][:500]
+            db.execute(update(ImportJob).where(ImportJob.id == job_id).values(values))
+            db.commit()
+
+    def _finish(self, job_id: int) -> None:
+        with self._session_factory() as db:
+            db.execute(
+                update(ImportJob)
+                .where(ImportJob.id == job_id, ImportJob.status == "profiling")
+                .values(status="done", updated_at=datetime.utcnow())
+            )
+            db.commit()
+
+    def _mark_failed(self, job_id: int) -> None:
+        with self._session_factory() as db:
+            db.execute(
+                update(ImportJob)
+                .where(ImportJob.id == job_id)
+                .values(status="failed", updated_at=datetime.utcnow())
+            )
+            db.commit()
+
+
+def resume_import_jobs(session_factory: Callable[[], Session]) -> list[int]:
+    """
+    Re-queue jobs left unfinished by a previous process (app startup).
+
+    Jobs cut off mid-upload keep the rows that made it to the database:
+    their counts are recomputed and they move on to profiling.
+    """
+    with session_factory() as db:
+        jobs = db.scalars(select(ImportJob).where(ImportJob.status.in_(("importing", "profiling")))).all()
+        for job in jobs:
+            if job.status == "importing":
+                job.imported = db.scalar(select(func.count()).where(Prompt.import_job_id == job.id))
+                job.status = "profiling"
+                job.last_error = "upload interrupted; profiling the rows received"
+                job.profiling_started_at = datetime.utcnow()
+        db.commit()
+        job_ids = [job.id for job in jobs]
+    if job_ids:
+        pool = get_import_pool()
+        for job_id in job_ids:
+            pool.submit(job_id)
+    return job_ids
+
+
+# ---------- process-wide pool ----------
+
+_pool: ImportProfilerPool | None = None
+_pool_lock = threading.Lock()
+
+
+def get_import_pool() -> ImportProfilerPool:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            from sqlalchemy.orm import sessionmaker
+            from app.db.session import engine
+            from app.services.scheduler import get_scheduler
+
+            profiler = None
+
+            def profile(raw_prompt: str) -> PromptProfile:
+                # Created on first use, so a missing GEMINI_API_KEY fails the rows, not startup
+                nonlocal profiler
+                if profiler is None:
+                    from app.services.gemini_profiler import GeminiPromptProfiler
+                    profiler = GeminiPromptProfiler()
+                return profiler.profile(raw_prompt)
+
+            _pool = ImportProfilerPool(
+                sessionmaker(bind=engine, expire_on_commit=False),
+                profile,
+                workers=int(os.getenv("IMPORT_PROFILE_WORKERS", 4)),
+                batch=int(os.getenv("IMPORT_PROFILE_BATCH", 32)),
+                scheduler=get_scheduler(),
+                max_retries=int(os.getenv("IMPORT_PROFILE_MAX_RETRIES", 5)),
+            )
+        return _pool
+
+
+def set_import_pool(pool: ImportProfilerPool | None) -> None:
+    """Swap the pool (tests). Closes the previous one."""
+    global _pool
+    with _pool_lock:
+        previous, _pool = _pool, pool
+    if previous is not None and previous is not pool:
+        previous.close()
+
+
+def shutdown_import_pool() -> None:
+    """Stop profiling (app shutdown); unfinished jobs resume on the next start."""
+    set_import_pool(None)
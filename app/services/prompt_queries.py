@@ -0,0 +1,126 @@
+"""
+app/services/prompt_queries.py
+------------------------------
+Filtered listing and GROUP BY analytics over stored prompts.
+
+Listing uses keyset (cursor) pagination on (created_at, id) descending:
+each page is one index range scan on ix_prompts_user_created (or
+ix_prompts_task_created), however deep the client pages. OFFSET would
+re-read and discard every earlier row.
+
+Filters on profile fields hit the denormalized task_type / needs_web /
+output_format / urgency columns, not prompt_profile_json; each has a
+(column, created_at) index.
+"""
+
+from __future__ import annotations
+
+import base64
+from dataclasses import dataclass, fields
+from datetime import datetime
+from typing import Literal
+
+from sqlalchemy import and_, func, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.prompt_models import Prompt
+
+AnalyticsGroupBy = Literal["task_type", "needs_web", "output_format", "urgency", "day"]
+
+
+class InvalidCursor(ValueError):
+    """Raised when a pagination cursor cannot be decoded."""
+
+
+@dataclass(frozen=True)
+class PromptFilters:
+    user_id: int | None = None
+    username: str | None = None
+    start: datetime | None = None  # inclusive
+    end: datetime | None = None    # exclusive
+    task_type: str | None = None
+    needs_web: bool | None = None
+    output_format: str | None = None
+    urgency: str | None = None
+
+    def clauses(self) -> list:
+        clauses = []
+        for f in fields(self):
+            value = getattr(self, f.name)
+            if value is None or f.name in ("start", "end"):
+                continue
+            clauses.append(getattr(Prompt, f.name) == value)
+        if self.start is not None:
+            clauses.append(Prompt.created_at >= self.start)
+        if self.end is not None:
+            clauses.append(Prompt.created_at < self.end)
+        return clauses
+
+
+def encode_cursor(created_at: datetime, prompt_id: int) -> str:
+    raw = f"{created_at.isoformat()}|{prompt_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, prompt_id = raw.split("|")
+        return datetime.fromisoformat(created_at), int(prompt_id)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise InvalidCursor("invalid cursor") from e
+
+
+async def list_prompts(
+    db: AsyncSession,
+    filters: PromptFilters,
+    limit: int = 20,
+    cursor: str | None = None,
+) -> tuple[list[Prompt], str | None]:
+    """One page of prompts, newest first, plus the cursor for the next page (None on the last)."""
+    stmt = select(Prompt).where(*filters.clauses())
+    if cursor is not None:
+        created_at, prompt_id = decode_cursor(cursor)
+        stmt = stmt.where(or_(
+            Prompt.created_at < created_at,
+            and_(Prompt.created_at == created_at, Prompt.id < prompt_id),
+        ))
+    # One extra row tells us whether another page exists without a COUNT
+    stmt = stmt.order_by(Prompt.created_at.desc(), Prompt.id.desc()).limit(limit + 1)
+
+    rows = list((await db.execute(stmt)).scalars())
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].created_at, rows[-1].id)
+    return rows, next_cursor
+
+
+async def prompt_analytics(db: AsyncSession, filters: PromptFilters, group_by: AnalyticsGroupBy) -> list[dict]:
+    """Prompt counts per `group_by` value (per UTC day for "day"), ordered by key."""
+    if group_by == "day":
+        key = func.date(Prompt.created_at).label("day")
+    else:
+        key = getattr(Prompt, group_by).label(group_by)
+
+    stmt = (
+        select(
+            key,
+            func.count().label("prompts"),
+            func.min(Prompt.created_at).label("first_at"),
+            func.max(Prompt.created_at).label("last_at"),
+        )
+        .where(*filters.clauses())
+        .group_by(key)
+        .order_by(key)
+    )
+    groups = []
+    for row in await db.execute(stmt):
+        group = row._asdict()
+        if group_by == "day" and not isinstance(group["day"], str):
+            group["day"] = group["day"].isoformat()
+        for ts in ("first_at", "last_at"):
+            if isinstance(group[ts], datetime):
+                group[ts] = group[ts].isoformat()
+        groups.append(group)
+    return groups
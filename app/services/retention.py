@@ -0,0 +1,313 @@
+"""
+app/services/retention.py
+-------------------------
+Age-based retention: move old completion_attempts / prompts / request_logs
+rows out of the database into gzip NDJSON archive files on local disk.
+
+For each table, rows older than its cutoff are processed in id order,
+`chunk` rows at a time:
+  1. write the chunk to <archive_dir>/<table>/<table>-<first id>-<last id>.ndjson.gz
+  2. append an entry (file, id range, time range, rows, sha256) to
+     <archive_dir>/manifest.jsonl
+  3. DELETE those ids in one short transaction, then pause briefly so
+     request writers get the lock between chunks
+A crash between steps leaves rows that are both archived and still live;
+the next run rewrites the same file name and readers de-duplicate the
+manifest by file, so nothing is lost or doubled.
+
+Prompts are archived with their full text in raw_prompt (chunked bodies
+reassembled), and prompt_blobs no longer referenced afterwards are
+removed. A row that a remaining row still points at (a prompt from a
+request_log or attempt, a request_log from an attempt) is kept until the
+referencing row is archived too; tables are archived in that order.
+
+/v1/usage is unaffected: totals come from usage_rollups, not request_logs.
+
+Archived rows can be read back with iter_archive() or put back into the
+database with restore() (ids are preserved; rows already present are
+skipped).
+
+Env (CLI defaults, see scripts/archive_old_rows.py):
+- ARCHIVE_DIR                (default ./archive)
+- RETAIN_PROMPTS_DAYS        (default 180)
+- RETAIN_REQUEST_LOGS_DAYS   (default 90)
+- RETAIN_COMPLETION_ATTEMPTS_DAYS (default 30)
+"""
+
+from __future__ import annotations
+
+import gzip
+import hashlib
+import json
+import os
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Callable, Iterator
+
+from sqlalchemy import DateTime, Table, delete, exists, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from app.db.models import CompletionAttempt, RequestLog
+from app.db.prompt_models import Prompt, PromptBlob
+from app.services.exporter import json_default
+from app.services.prompt_bodies import prompt_texts_sync
+
+ARCHIVE_DIR = os.getenv("ARCHIVE_DIR", "./archive")
+
+# Archive order matters: referencing tables first, so their targets become unreferenced
+TABLES: dict[str, Table] = {
+    "completion_attempts": CompletionAttempt.__table__,
+    "request_logs": RequestLog.__table__,
+    "prompts": Prompt.__table__,
+}
+
+DEFAULT_RETENTION_DAYS = {
+    "completion_attempts": int(os.getenv("RETAIN_COMPLETION_ATTEMPTS_DAYS", 30)),
+    "request_logs": int(os.getenv("RETAIN_REQUEST_LOGS_DAYS", 90)),
+    "prompts": int(os.getenv("RETAIN_PROMPTS_DAYS", 180)),
+}
+
+# table -> foreign key columns elsewhere that point at its ids
+_REFERENCED_BY = {
+    "request_logs": [CompletionAttempt.__table__.c.request_log_id],
+    "prompts": [RequestLog.__table__.c.prompt_id, CompletionAttempt.__table__.c.prompt_id],
+}
+
+MANIFEST = "manifest.jsonl"
+
+
+@dataclass
+class ArchiveResult:
+    table: str
+    cutoff: datetime
+    rows: int = 0
+    files: int = 0
+    blobs_removed: int = 0
+
+
+def _manifest_path(archive_dir: Path) -> Path:
+    return archive_dir / MANIFEST
+
+
+def read_manifest(archive_dir: str | Path = ARCHIVE_DIR) -> list[dict]:
+    """Manifest entries, last write wins per file."""
+    path = _manifest_path(Path(archive_dir))
+    if not path.exists():
+        return []
+    entries: dict[str, dict] = {}
+    with path.open() as f:
+        for line in f:
+            if line.strip():
+                entry = json.loads(line)
+                entries[entry["file"]] = entry
+    return sorted(entries.values(), key=lambda e: (e["table"], e["first_id"]))
+
+
+def _select_chunk(table: Table, cutoff: datetime, after_id: int, chunk: int):
+    stmt = select(table).where(table.c.created_at < cutoff, table.c.id > after_id)
+    for ref in _REFERENCED_BY.get(table.name, ()):
+        stmt = stmt.where(~exists().where(ref == table.c.id))
+    return stmt.order_by(table.c.id).limit(chunk)
+
+
+def _write_chunk(archive_dir: Path, name: str, records: list[dict]) -> dict:
+    first_id, last_id = records[0]["id"], records[-1]["id"]
+    rel = Path(name) / f"{name}-{first_id:012d}-{last_id:012d}.ndjson.gz"
+    path = archive_dir / rel
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    tmp = path.with_suffix(".tmp")
+    digest = hashlib.sha256()
+    # mtime=0: the same rows always produce the same bytes
+    with open(tmp, "wb") as raw, gzip.GzipFile(fileobj=raw, mode="wb", mtime=0) as gz:
+        for record in records:
+            line = (json.dumps(record, default=json_default, separators=(",", ":")) + "\n").encode()
+            gz.write(line)
+            digest.update(line)
+    with open(tmp, "rb") as f:
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+    created = [r["created_at"] for r in records if r.get("created_at") is not None]
+    entry = {
+        "table": name,
+        "file": rel.as_posix(),
+        "first_id": first_id,
+        "last_id": last_id,
+        "rows": len(records),
+        "min_created_at": min(created).isoformat() if created else None,
+        "max_created_at": max(created).isoformat() if created else None,
+        "sha256": digest.hexdigest(),  # of the uncompressed NDJSON
+        "archived_at": datetime.utcnow().isoformat(),
+    }
+    with _manifest_path(archive_dir).open("a") as f:
+        f.write(json.dumps(entry) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+    return entry
+
+
+def archive_table(
+    session_factory: Callable[[], Session],
+    name: str,
+    older_than_days: int,
+    archive_dir: str | Path = ARCHIVE_DIR,
+    chunk: int = 5000,
+    pause_s: float = 0.05,
+    dry_run: bool = False,
+    now: datetime | None = None,
+) -> ArchiveResult:
+    """Archive and delete `name` rows created more than `older_than_days` ago."""
+    table = TABLES[name]
+    archive_dir = Path(archive_dir)
+    archive_dir.mkdir(parents=True, exist_ok=True)
+    result = ArchiveResult(table=name, cutoff=(now or datetime.utcnow()) - timedelta(days=older_than_days))
+
+    after_id = 0
+    while True:
+        with session_factory() as db:
+            rows = db.execute(_select_chunk(table, result.cutoff, after_id, chunk)).all()
+            if not rows:
+                break
+            records = [dict(row._mapping) for row in rows]
+            if table is Prompt.__table__:
+                for record, text in zip(records, prompt_texts_sync(db, rows)):
+                    record["raw_prompt"] = text
+                    record["body_hash"] = record["body_chunks"] = None
+        after_id = records[-1]["id"]
+        result.rows += len(records)
+        if dry_run:
+            continue
+
+        _write_chunk(archive_dir, name, records)
+        result.files += 1
+        with session_factory() as db:
+            db.execute(delete(table).where(table.c.id.in_([r["id"] for r in records])))
+            db.commit()
+        if pause_s:
+            time.sleep(pause_s)
+
+    if name == "prompts" and result.rows and not dry_run:
+        result.blobs_removed = collect_unreferenced_blobs(session_factory, result.cutoff)
+    return result
+
+
+def collect_unreferenced_blobs(session_factory: Callable[[], Session], touched_before: datetime, chunk: int = 5000) -> int:
+    """
+    Delete prompt_blobs no remaining prompt refers to.
+
+    Only blobs not touched since `touched_before` are candidates, and the
+    DELETE re-checks that, so a chunk re-used by a prompt committed during
+    the scan survives. (Prompts still in the write-behind queue carry their
+    chunk bytes and re-insert them.)
+    """
+    referenced: set[str] = set()
+    after_id = 0
+    with session_factory() as db:
+        while True:
+            rows = db.execute(
+                select(Prompt.id, Prompt.body_chunks)
+                .where(Prompt.id > after_id, Prompt.body_chunks.is_not(None))
+                .order_by(Prompt.id)
+                .limit(chunk)
+            ).all()
+            if not rows:
+                break
+            for row in rows:
+                referenced.update(row.body_chunks or ())
+            after_id = rows[-1].id
+
+        candidates = [
+            h for h in db.scalars(select(PromptBlob.hash).where(PromptBlob.touched_at < touched_before))
+            if h not in referenced
+        ]
+    removed = 0
+    for i in range(0, len(candidates), chunk):
+        with session_factory() as db:
+            removed += db.execute(
+                delete(PromptBlob).where(
+                    PromptBlob.hash.in_(candidates[i:i + chunk]),
+                    PromptBlob.touched_at < touched_before,
+                )
+            ).rowcount
+            db.commit()
+    return removed
+
+
+def iter_archive(
+    name: str,
+    archive_dir: str | Path = ARCHIVE_DIR,
+    start: datetime | None = None,
+    end: datetime | None = None,
+) -> Iterator[dict]:
+    """Archived `name` rows with start <= created_at < end; only files whose range overlaps are opened."""
+    archive_dir = Path(archive_dir)
+    for entry in read_manifest(archive_dir):
+        if entry["table"] != name:
+            continue
+        if start and entry["max_created_at"] and datetime.fromisoformat(entry["max_created_at"]) < start:
+            continue
+        if end and entry["min_created_at"] and datetime.fromisoformat(entry["min_created_at"]) >= end:
+            continue
+        with gzip.open(archive_dir / entry["file"], "rt") as f:
+            for line in f:
+                record = json.loads(line)
+                created = datetime.fromisoformat(record["created_at"]) if record.get("created_at") else None
+                if created is not None and ((start and created < start) or (end and created >= end)):
+                    continue
+                yield record
+
+
+def _coerce(table: Table, record: dict) -> dict:
+    """JSON values back to column types (ISO strings -> datetime)."""
+    row = {}
+    for column in table.columns:
+        value = record.get(column.key)
+        if value is not None and isinstance(column.type, DateTime):
+            value = datetime.fromisoformat(value)
+        row[column.key] = value
+    return row
+
+
+def restore(
+    session_factory: Callable[[], Session],
+    name: str,
+    archive_dir: str | Path = ARCHIVE_DIR,
+    start: datetime | None = None,
+    end: datetime | None = None,
+    chunk: int = 1000,
+) -> int:
+    """
+    Re-insert archived rows (e.g. to replay them); ids already in the table
+    are skipped. Usage rollups are not touched: they never dropped these rows.
+    Returns the number of archived rows read.
+    """
+    table = TABLES[name]
+    restored = 0
+    batch: list[dict] = []
+
+    def flush() -> int:
+        with session_factory() as db:
+            dialect = db.get_bind().dialect.name
+            if dialect in ("sqlite", "postgresql"):
+                insert = sqlite.insert if dialect == "sqlite" else postgresql.insert
+                db.execute(insert(table).on_conflict_do_nothing(index_elements=["id"]), batch)
+            else:
+                present = set(db.scalars(select(table.c.id).where(table.c.id.in_([r["id"] for r in batch]))))
+                fresh = [r for r in batch if r["id"] not in present]
+                if fresh:
+                    db.execute(table.insert(), fresh)
+            db.commit()
+        return len(batch)
+
+    for record in iter_archive(name, archive_dir, start=start, end=end):
+        batch.append(_coerce(table, record))
+        if len(batch) >= chunk:
+            restored += flush()
+            batch = []
+    if batch:
+        restored += flush()
+    return restored
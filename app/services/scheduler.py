@@ -0,0 +1,342 @@
+"""
+app/services/scheduler.py
+-------------------------
+Provider-level admission control in front of LLMCompletionClient.generate.
+
+- Adaptive (AIMD) concurrency limits per provider and per API key,
+  driven by observed latency and overload errors
+- Priority classes: urgency == "fast" is dispatched before normal work
+- Weighted fair queuing across users (start-time fair queuing), so a
+  single tenant flooding one provider cannot starve everyone else.
+  Per-user finish tags of idle users are swept every `_PRUNE_EVERY`
+  acquires, so the table does not grow with every user ever seen
+
+Blocking by design: completion routes run in worker threads, so a waiter
+simply parks on a threading.Event until a slot is granted.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import itertools
+import os
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Iterator
+
+_PRUNE_EVERY = 1024
+
+# Lower number = dispatched first
+_PRIORITY = {"fast": 0, "normal": 1, "batch": 2}
+
+# Substrings that mark an error as "provider is overloaded" (vs. a bad request)
+_OVERLOAD_MARKERS = ("429", "rate", "quota", "overloaded", "timeout", "timed out", "503", "unavailable")
+
+
+class SchedulerBusy(RuntimeError):
+    """No slot could be granted locally — the provider was never called."""
+
+
+class SchedulerOverloaded(SchedulerBusy):
+    """Queue for a provider is full — request rejected without waiting."""
+
+
+class SchedulerTimeout(SchedulerBusy):
+    """Request waited longer than the queue timeout without getting a slot."""
+
+
+@dataclass(frozen=True)
+class SchedulerConfig:
+    """
+    Limits are the AIMD bounds; the live limit moves between min and max.
+
+    - latency_tolerance: a call slower than baseline * tolerance counts as congestion
+    - backoff: multiplicative decrease factor on congestion / overload
+    """
+    provider_initial: float = 8.0
+    provider_min: float = 1.0
+    provider_max: float = 64.0
+    key_initial: float = 4.0
+    key_min: float = 1.0
+    key_max: float = 16.0
+    latency_tolerance: float = 2.0
+    backoff: float = 0.7
+    max_queue: int = 256
+    queue_timeout_s: float = 30.0
+
+    @classmethod
+    def from_env(cls) -> "SchedulerConfig":
+        return cls(
+            provider_initial=float(os.getenv("SCHED_PROVIDER_INITIAL", cls.provider_initial)),
+            provider_max=float(os.getenv("SCHED_PROVIDER_MAX", cls.provider_max)),
+            key_initial=float(os.getenv("SCHED_KEY_INITIAL", cls.key_initial)),
+            key_max=float(os.getenv("SCHED_KEY_MAX", cls.key_max)),
+            max_queue=int(os.getenv("SCHED_MAX_QUEUE", cls.max_queue)),
+            queue_timeout_s=float(os.getenv("SCHED_QUEUE_TIMEOUT_S", cls.queue_timeout_s)),
+        )
+
+
+class AIMDLimit:
+    """
+    Additive-increase / multiplicative-decrease concurrency limit.
+
+    Baseline latency is a slow-moving minimum estimate; a call that is much
+    slower than the baseline (or fails with an overload error) shrinks the
+    limit, otherwise the limit grows by ~1 per window of `limit` calls.
+    """
+
+    def __init__(self, initial: float, minimum: float, maximum: float, tolerance: float, backoff: float):
+        self.limit = initial
+        self.minimum = minimum
+        self.maximum = maximum
+        self.tolerance = tolerance
+        self.backoff = backoff
+        self.inflight = 0
+        self.baseline_s: float | None = None
+
+    def has_capacity(self) -> bool:
+        return self.inflight < int(self.limit)
+
+    def on_sample(self, latency_s: float, overloaded: bool) -> None:
+        if self.baseline_s is None:
+            self.baseline_s = latency_s
+        else:
+            # Track the floor quickly, drift up slowly (provider got slower for good)
+            self.baseline_s = min(latency_s, self.baseline_s * 0.99 + latency_s * 0.01)
+
+        congested = overloaded or latency_s > self.baseline_s * self.tolerance
+        if congested:
+            self.limit = max(self.minimum, self.limit * self.backoff)
+        else:
+            self.limit = min(self.maximum, self.limit + 1.0 / max(self.limit, 1.0))
+
+
+@dataclass
+class _Waiter:
+    priority: int
+    start_tag: float
+    finish_tag: float
+    seq: int
+    provider: str
+    key_id: str
+    enqueued_at: float
+    event: threading.Event = field(default_factory=threading.Event)
+    granted: bool = False
+
+    def sort_key(self) -> tuple:
+        return (self.priority, self.finish_tag, self.seq)
+
+
+@dataclass
+class _WaitStats:
+    count: int = 0
+    total_s: float = 0.0
+    max_s: float = 0.0
+    rejected: int = 0
+    timed_out: int = 0
+
+    def record(self, wait_s: float) -> None:
+        self.count += 1
+        self.total_s += wait_s
+        self.max_s = max(self.max_s, wait_s)
+
+
+def key_fingerprint(api_key: str) -> str:
+    """Stable, non-reversible id for a provider key (used for per-key limits)."""
+    return hashlib.sha256(api_key.encode()).hexdigest()[:12]
+
+
+def is_overload_error(exc: BaseException) -> bool:
+    """Heuristic: rate limits, timeouts and 5xx-unavailable mean back off."""
+    text = f"{type(exc).__name__} {exc}".lower()
+    return any(marker in text for marker in _OVERLOAD_MARKERS)
+
+
+class ProviderScheduler:
+    """
+    Grants execution slots for (provider, key) pairs.
+
+    Usage:
+        with scheduler.slot("openai", key_id, user_id=7, urgency="fast"):
+            ... provider call ...
+    """
+
+    def __init__(self, config: SchedulerConfig | None = None):
+        self.config = config if config is not None else SchedulerConfig()
+        self._lock = threading.Lock()
+        self._seq = itertools.count()
+        self._provider_limits: dict[str, AIMDLimit] = {}
+        self._key_limits: dict[tuple[str, str], AIMDLimit] = {}
+        self._queues: dict[str, list[_Waiter]] = {}
+        self._user_finish: dict[object, float] = {}
+        self._acquires = 0
+        self._vtime = 0.0
+        self._wait_stats: dict[str, _WaitStats] = {}
+
+    # ---------- public API ----------
+
+    @contextmanager
+    def slot(
+        self,
+        provider: str,
+        key_id: str,
+        user_id: object = None,
+        urgency: str = "normal",
+        weight: float = 1.0,
+    ) -> Iterator[None]:
+        self.acquire(provider, key_id, user_id=user_id, urgency=urgency, weight=weight)
+        start = time.monotonic()
+        overloaded = False
+        try:
+            yield
+        except Exception as e:
+            overloaded = is_overload_error(e)
+            raise
+        finally:
+            self.release(provider, key_id, time.monotonic() - start, overloaded)
+
+    def acquire(
+        self,
+        provider: str,
+        key_id: str,
+        user_id: object = None,
+        urgency: str = "normal",
+        weight: float = 1.0,
+    ) -> None:
+        with self._lock:
+            queue = self._queues.setdefault(provider, [])
+            stats = self._wait_stats.setdefault(provider, _WaitStats())
+
+            # Start-time fair queuing: each user's requests are spaced 1/weight apart
+            # in virtual time, so heavy users queue behind light users' first requests.
+            start_tag = max(self._vtime, self._user_finish.get(user_id, 0.0))
+            finish_tag = start_tag + 1.0 / max(weight, 1e-6)
+            self._user_finish[user_id] = finish_tag
+            self._acquires += 1
+            if self._acquires % _PRUNE_EVERY == 0:
+                self._prune_idle_users()
+
+            waiter = _Waiter(
+                priority=_PRIORITY.get(urgency, _PRIORITY["normal"]),
+                start_tag=start_tag,
+                finish_tag=finish_tag,
+                seq=next(self._seq),
+                provider=provider,
+                key_id=key_id,
+                enqueued_at=time.monotonic(),
+            )
+            queue.append(waiter)
+            queue.sort(key=_Waiter.sort_key)
+            self._dispatch(provider)
+            if not waiter.granted and len(queue) > self.config.max_queue:
+                queue.remove(waiter)
+                stats.rejected += 1
+                raise SchedulerOverloaded(f"{provider} queue is full ({len(queue)} waiting)")
+
+        if not waiter.event.wait(self.config.queue_timeout_s):
+            with self._lock:
+                if not waiter.granted:
+                    self._queues[provider].remove(waiter)
+                    stats.timed_out += 1
+                    raise SchedulerTimeout(
+                        f"Waited {self.config.queue_timeout_s:.0f}s for a {provider} slot"
+                    )
+
+    def release(self, provider: str, key_id: str, latency_s: float, overloaded: bool = False) -> None:
+        with self._lock:
+            plimit = self._provider_limit(provider)
+            klimit = self._key_limit(provider, key_id)
+            plimit.inflight -= 1
+            klimit.inflight -= 1
+            plimit.on_sample(latency_s, overloaded)
+            klimit.on_sample(latency_s, overloaded)
+            self._dispatch(provider)
+
+    def stats(self) -> dict:
+        """Snapshot of limits, in-flight counts, queue depth and wait times."""
+        with self._lock:
+            providers = {}
+            for name, limit in self._provider_limits.items():
+                ws = self._wait_stats.get(name, _WaitStats())
+                providers[name] = {
+                    "limit": round(limit.limit, 2),
+                    "inflight": limit.inflight,
+                    "queue_depth": len(self._queues.get(name, [])),
+                    "wait_count": ws.count,
+                    "wait_avg_ms": round(ws.total_s / ws.count * 1000, 2) if ws.count else 0.0,
+                    "wait_max_ms": round(ws.max_s * 1000, 2),
+                    "rejected": ws.rejected,
+                    "timed_out": ws.timed_out,
+                }
+            keys = {
+                f"{p}:{k}": {"limit": round(lim.limit, 2), "inflight": lim.inflight}
+                for (p, k), lim in self._key_limits.items()
+            }
+            return {"providers": providers, "keys": keys}
+
+    # ---------- internals (call with self._lock held) ----------
+
+    def _provider_limit(self, provider: str) -> AIMDLimit:
+        if provider not in self._provider_limits:
+            c = self.config
+            self._provider_limits[provider] = AIMDLimit(
+                c.provider_initial, c.provider_min, c.provider_max, c.latency_tolerance, c.backoff
+            )
+        return self._provider_limits[provider]
+
+    def _key_limit(self, provider: str, key_id: str) -> AIMDLimit:
+        if (provider, key_id) not in self._key_limits:
+            c = self.config
+            self._key_limits[(provider, key_id)] = AIMDLimit(
+                c.key_initial, c.key_min, c.key_max, c.latency_tolerance, c.backoff
+            )
+        return self._key_limits[(provider, key_id)]
+
+    def _prune_idle_users(self) -> None:
+        """
+        Forget users that no longer affect ordering. With nobody queued the
+        scheduler is idle and, as in SFQ, virtual time may jump to the largest
+        finish tag, which makes every entry redundant; otherwise drop the
+        ones already behind virtual time (max(vtime, tag) == vtime anyway).
+        """
+        if not any(self._queues.values()):
+            if self._user_finish:
+                self._vtime = max(self._vtime, max(self._user_finish.values()))
+            self._user_finish.clear()
+            return
+        idle = [user for user, finish in self._user_finish.items() if finish <= self._vtime]
+        for user in idle:
+            del self._user_finish[user]
+
+    def _dispatch(self, provider: str) -> None:
+        """Grant slots to queued waiters in priority/fairness order while capacity lasts."""
+        queue = self._queues.get(provider, [])
+        plimit = self._provider_limit(provider)
+        i = 0
+        while i < len(queue) and plimit.has_capacity():
+            waiter = queue[i]
+            klimit = self._key_limit(provider, waiter.key_id)
+            if not klimit.has_capacity():
+                # This key is saturated; a different key further back may still run
+                i += 1
+                continue
+            queue.pop(i)
+            plimit.inflight += 1
+            klimit.inflight += 1
+            self._vtime = max(self._vtime, waiter.start_tag)
+            waiter.granted = True
+            self._wait_stats[provider].record(time.monotonic() - waiter.enqueued_at)
+            waiter.event.set()
+
+
+# Lazy process-wide singleton (same pattern as routes_prompts._get_profiler)
+_scheduler: ProviderScheduler | None = None
+
+
+def get_scheduler() -> ProviderScheduler:
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = ProviderScheduler(SchedulerConfig.from_env())
+    return _scheduler
@@ -0,0 +1,240 @@
+"""
+app/services/session_store.py
+-----------------------------
+Pluggable session backends for auth_service.
+
+- MemorySessionStore: process-local dict (tests, single-worker dev)
+- DBSessionStore: `sessions` table, shared by every worker and survives restarts
+
+Both support expiry and sliding renewal: a session read in the second half
+of its TTL is pushed out to a full TTL again (so active users stay logged in
+while reads stay write-free most of the time).
+
+TokenCache is a small in-process LRU (token -> UserSnapshot) that sits in
+front of whichever store is configured.
+
+Store methods are async so the DB backend never blocks the event loop.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import dataclass, replace
+from datetime import datetime, timedelta
+from typing import Callable
+
+from sqlalchemy import delete
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.models import AuthSession
+
+DEFAULT_TTL_S = 7 * 24 * 3600
+
+
+@dataclass(frozen=True)
+class UserSnapshot:
+    """The slice of User that authenticated routes need (no ORM, no DB)."""
+    id: int
+    username: str
+
+
+@dataclass
+class SessionRecord:
+    user_id: int
+    username: str
+    expires_at: float  # unix timestamp
+
+
+def _hash_token(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+class SessionStore(ABC):
+    """Backend contract. `get` returns None for unknown or expired tokens."""
+
+    # Drop expired entries on one in N creates, not on every login
+    SWEEP_EVERY = 100
+
+    def __init__(self, ttl_s: float = DEFAULT_TTL_S):
+        self.ttl_s = ttl_s
+
+    @abstractmethod
+    async def create(self, token: str, user_id: int, username: str) -> SessionRecord:
+        ...
+
+    @abstractmethod
+    async def get(self, token: str) -> SessionRecord | None:
+        ...
+
+    @abstractmethod
+    async def delete(self, token: str) -> None:
+        ...
+
+    def _needs_renewal(self, record: SessionRecord, now: float) -> bool:
+        return record.expires_at - now < self.ttl_s / 2
+
+
+class MemorySessionStore(SessionStore):
+    """Process-local store. Expired entries are swept lazily."""
+
+    def __init__(self, ttl_s: float = DEFAULT_TTL_S):
+        super().__init__(ttl_s)
+        self._lock = threading.Lock()
+        self._records: dict[str, SessionRecord] = {}
+        self._creates = 0
+
+    async def create(self, token: str, user_id: int, username: str) -> SessionRecord:
+        record = SessionRecord(user_id=user_id, username=username, expires_at=time.time() + self.ttl_s)
+        with self._lock:
+            self._creates += 1
+            if self._creates % self.SWEEP_EVERY == 0:
+                self._sweep(time.time())
+            self._records[token] = record
+        return replace(record)
+
+    async def get(self, token: str) -> SessionRecord | None:
+        now = time.time()
+        with self._lock:
+            record = self._records.get(token)
+            if record is None:
+                return None
+            if record.expires_at <= now:
+                del self._records[token]
+                return None
+            if self._needs_renewal(record, now):
+                record.expires_at = now + self.ttl_s
+            return replace(record)
+
+    async def delete(self, token: str) -> None:
+        with self._lock:
+            self._records.pop(token, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._records.clear()
+
+    def _sweep(self, now: float) -> None:
+        expired = [t for t, r in self._records.items() if r.expires_at <= now]
+        for t in expired:
+            del self._records[t]
+
+
+class DBSessionStore(SessionStore):
+    """
+    Sessions in the `sessions` table (keyed by sha256 of the token).
+    Uses its own short-lived DB sessions, independent of the request's.
+    """
+
+    def __init__(self, session_factory: Callable[[], AsyncSession], ttl_s: float = DEFAULT_TTL_S):
+        super().__init__(ttl_s)
+        self._session_factory = session_factory
+        self._creates = 0
+
+    async def create(self, token: str, user_id: int, username: str) -> SessionRecord:
+        now = datetime.utcnow()
+        expires = now + timedelta(seconds=self.ttl_s)
+        async with self._session_factory() as db:
+            db.add(AuthSession(
+                token_hash=_hash_token(token),
+                user_id=user_id,
+                username=username,
+                created_at=now,
+                expires_at=expires,
+            ))
+            self._creates += 1
+            if self._creates % self.SWEEP_EVERY == 0:
+                await db.execute(delete(AuthSession).where(AuthSession.expires_at <= now))
+            await db.commit()
+        return SessionRecord(user_id=user_id, username=username, expires_at=_to_ts(expires))
+
+    async def get(self, token: str) -> SessionRecord | None:
+        async with self._session_factory() as db:
+            row = await db.get(AuthSession, _hash_token(token))
+            if row is None:
+                return None
+            now = datetime.utcnow()
+            if row.expires_at <= now:
+                await db.delete(row)
+                await db.commit()
+                return None
+            record = SessionRecord(user_id=row.user_id, username=row.username, expires_at=_to_ts(row.expires_at))
+            if self._needs_renewal(record, _to_ts(now)):
+                row.expires_at = now + timedelta(seconds=self.ttl_s)
+                record.expires_at = _to_ts(row.expires_at)
+                await db.commit()
+            return record
+
+    async def delete(self, token: str) -> None:
+        async with self._session_factory() as db:
+            await db.execute(delete(AuthSession).where(AuthSession.token_hash == _hash_token(token)))
+            await db.commit()
+
+
+def _to_ts(dt: datetime) -> float:
+    """Naive-UTC datetime (as stored by SQLite) -> unix timestamp."""
+    return (dt - datetime(1970, 1, 1)).total_seconds()
+
+
+class TokenCache:
+    """
+    Bounded LRU of token -> (UserSnapshot, cached_until).
+
+    Entries live at most `ttl_s` so a logout on another worker is picked up
+    within that window; a local logout evicts immediately.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl_s: float = 30.0):
+        self.maxsize = maxsize
+        self.ttl_s = ttl_s
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[str, tuple[UserSnapshot, float]] = OrderedDict()
+
+    def get(self, token: str) -> UserSnapshot | None:
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None:
+                return None
+            snapshot, cached_until = entry
+            if cached_until <= time.monotonic():
+                del self._entries[token]
+                return None
+            self._entries.move_to_end(token)
+            return snapshot
+
+    def put(self, token: str, snapshot: UserSnapshot, session_expires_at: float) -> None:
+        # Never cache beyond the session's own expiry
+        remaining = max(0.0, session_expires_at - time.time())
+        cached_until = time.monotonic() + min(self.ttl_s, remaining)
+        with self._lock:
+            self._entries[token] = (snapshot, cached_until)
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def evict(self, token: str) -> None:
+        with self._lock:
+            self._entries.pop(token, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+def store_from_env() -> SessionStore:
+    """
+    SESSION_BACKEND=memory (default) | db
+    SESSION_TTL_S=<seconds>
+    """
+    ttl_s = float(os.getenv("SESSION_TTL_S", DEFAULT_TTL_S))
+    backend = os.getenv("SESSION_BACKEND", "memory").lower()
+    if backend == "db":
+        from app.db.session import AsyncSessionLocal
+        return DBSessionStore(AsyncSessionLocal, ttl_s=ttl_s)
+    if backend == "memory":
+        return MemorySessionStore(ttl_s=ttl_s)
+    raise RuntimeError(f"Unknown SESSION_BACKEND: {backend}")
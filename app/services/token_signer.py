@@ -0,0 +1,186 @@
+"""
+app/services/token_signer.py
+----------------------------
+Stateless, HMAC-signed session tokens (AUTH_MODE=signed).
+
+Token layout:  v1.<kid>.<payload>.<signature>
+- payload: base64url(compact JSON {"uid", "usr", "exp", "jti"})
+- signature: base64url(HMAC-SHA256(secret[kid], "v1.<kid>.<payload>"))
+
+Verification is pure CPU: no session store, no users table.
+
+Key rotation: SESSION_SIGNING_KEYS="new:secretB,old:secretA" — the first
+key signs new tokens, every listed key is accepted for verification. Drop
+the old entry once its tokens have expired.
+
+Logout adds the token's jti to a RevocationList until the token's own
+expiry, so the list stays small (only live, revoked tokens). Lookups are
+in-memory; the optional DB copy is re-read on an interval, never per request.
+"""
+
+from __future__ import annotations
+
+import base64
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable
+
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.models import RevokedToken
+
+TOKEN_PREFIX = "v1."
+
+
+@dataclass(frozen=True)
+class TokenClaims:
+    user_id: int
+    username: str
+    expires_at: float
+    jti: str
+
+
+def _b64encode(raw: bytes) -> str:
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def _b64decode(text: str) -> bytes:
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+
+def is_signed_token(token: str) -> bool:
+    return token.startswith(TOKEN_PREFIX)
+
+
+class TokenSigner:
+    """Signs with the first key in the keyring, verifies against all of them."""
+
+    def __init__(self, keys: list[tuple[str, str]], ttl_s: float):
+        if not keys:
+            raise ValueError("TokenSigner needs at least one signing key")
+        self._active_kid = keys[0][0]
+        self._keys = {kid: secret.encode() for kid, secret in keys}
+        self.ttl_s = ttl_s
+
+    @classmethod
+    def from_env(cls, ttl_s: float) -> "TokenSigner":
+        raw = os.getenv("SESSION_SIGNING_KEYS", "")
+        keys = []
+        for entry in raw.split(","):
+            kid, sep, secret = entry.strip().partition(":")
+            if sep and kid and secret:
+                keys.append((kid, secret))
+        if not keys:
+            raise RuntimeError(
+                "AUTH_MODE=signed requires SESSION_SIGNING_KEYS, e.g. "
+                "SESSION_SIGNING_KEYS=\"k1:$(python -c 'import secrets; print(secrets.token_urlsafe(32))')\""
+            )
+        return cls(keys, ttl_s=ttl_s)
+
+    def sign(self, user_id: int, username: str) -> str:
+        claims = {
+            "uid": user_id,
+            "usr": username,
+            "exp": int(time.time() + self.ttl_s),
+            "jti": secrets.token_urlsafe(9),
+        }
+        payload = _b64encode(json.dumps(claims, separators=(",", ":")).encode())
+        signing_input = f"{TOKEN_PREFIX}{self._active_kid}.{payload}"
+        return f"{signing_input}.{self._signature(self._active_kid, signing_input)}"
+
+    def verify(self, token: str) -> TokenClaims:
+        """Return claims for a valid, unexpired token; raise LookupError otherwise."""
+        try:
+            version, kid, payload, signature = token.split(".")
+        except ValueError:
+            raise LookupError("Invalid or expired session")
+        if f"{version}." != TOKEN_PREFIX or kid not in self._keys:
+            raise LookupError("Invalid or expired session")
+
+        expected = self._signature(kid, f"{TOKEN_PREFIX}{kid}.{payload}")
+        if not hmac.compare_digest(expected, signature):
+            raise LookupError("Invalid or expired session")
+
+        try:
+            claims = json.loads(_b64decode(payload))
+            parsed = TokenClaims(
+                user_id=int(claims["uid"]),
+                username=str(claims["usr"]),
+                expires_at=float(claims["exp"]),
+                jti=str(claims["jti"]),
+            )
+        except (ValueError, KeyError, TypeError):
+            raise LookupError("Invalid or expired session")
+        if parsed.expires_at <= time.time():
+            raise LookupError("Invalid or expired session")
+        return parsed
+
+    def _signature(self, kid: str, signing_input: str) -> str:
+        digest = hmac.new(self._keys[kid], signing_input.encode(), hashlib.sha256).digest()
+        return _b64encode(digest)
+
+
+class RevocationList:
+    """
+    jti -> expiry of revoked-but-not-yet-expired tokens.
+
+    With a session_factory, revocations are also written to `revoked_tokens`
+    and re-read at most every `sync_interval_s` (see sync_if_stale), so a
+    logout on one worker reaches the others without a per-request lookup.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], AsyncSession] | None = None,
+        sync_interval_s: float = 5.0,
+    ):
+        self._session_factory = session_factory
+        self._sync_interval_s = sync_interval_s
+        self._lock = threading.Lock()
+        self._revoked: dict[str, float] = {}
+        self._last_sync = 0.0
+
+    async def revoke(self, jti: str, expires_at: float) -> None:
+        with self._lock:
+            self._revoked[jti] = expires_at
+            self._prune(time.time())
+        if self._session_factory is not None:
+            async with self._session_factory() as db:
+                await db.merge(RevokedToken(jti=jti, expires_at=datetime.utcfromtimestamp(expires_at)))
+                await db.commit()
+
+    def is_revoked(self, jti: str) -> bool:
+        with self._lock:
+            return jti in self._revoked
+
+    async def sync_if_stale(self) -> None:
+        """Pull revocations made by other workers (no-op between intervals)."""
+        now = time.time()
+        if self._session_factory is None or now - self._last_sync <= self._sync_interval_s:
+            return
+        self._last_sync = now
+        async with self._session_factory() as db:
+            cutoff = datetime.utcfromtimestamp(now)
+            await db.execute(delete(RevokedToken).where(RevokedToken.expires_at <= cutoff))
+            rows = (await db.execute(select(RevokedToken.jti, RevokedToken.expires_at))).all()
+            await db.commit()
+        with self._lock:
+            for jti, expires_at in rows:
+                self._revoked[jti] = (expires_at - datetime(1970, 1, 1)).total_seconds()
+            self._prune(now)
+
+    def __len__(self) -> int:
+        return len(self._revoked)
+
+    def _prune(self, now: float) -> None:
+        expired = [j for j, exp in self._revoked.items() if exp <= now]
+        for j in expired:
+            del self._revoked[j]
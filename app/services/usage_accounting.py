@@ -0,0 +1,154 @@
+"""
+app/services/usage_accounting.py
+--------------------------------
+Token usage and cost accounting for /v1/completions.
+
+execute_completion collects one AttemptUsage per provider call (including
+failed ones), prices it from the catalog row's in_per_1m / out_per_1m, and
+hands a single RequestLog row per completion to the write-behind queue —
+recording never waits on the database and never fails the request.
+
+Cost of attempts whose output was discarded (errors after billing, empty
+responses, then a fallback) is kept separately as wasted_cost_usd.
+
+Each attempt is also queued as its own CompletionAttempt row (timing, error
+class, retryable or not, tokens) for fallback analysis; see
+attempt_analytics.py. Attempts of anonymous calls are kept too, without a
+RequestLog to point at.
+"""
+
+from __future__ import annotations
+
+import logging
+import uuid
+from dataclasses import dataclass
+from datetime import datetime
+
+from app.db.model_catalog_models import ModelCatalog
+from app.db.models import CompletionAttempt, RequestLog
+from app.services.scheduler import is_overload_error
+from app.services.write_behind import WriteQueueFull, get_write_queue
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class AttemptUsage:
+    provider: str
+    model: str
+    input_tokens: int = 0
+    output_tokens: int = 0
+    cost_usd: float = 0.0
+    ok: bool = False
+    error: str | None = None
+    candidate_key: str | None = None
+    started_at: datetime | None = None
+    ended_at: datetime | None = None
+    latency_ms: float | None = None
+    outcome: str = "ok"  # ok | error | unusable
+    error_class: str | None = None
+    retryable: bool | None = None
+
+    def failed(self, exc: BaseException, outcome: str = "error") -> None:
+        self.error = str(exc)
+        self.outcome = outcome
+        self.error_class, self.retryable = classify_error(exc)
+
+
+def classify_error(exc: BaseException) -> tuple[str, bool]:
+    """(exception class name, whether trying again later could succeed)."""
+    retryable = isinstance(exc, (TimeoutError, ConnectionError)) or is_overload_error(exc)
+    return type(exc).__name__, retryable
+
+
+def price_tokens(entry: ModelCatalog | None, input_tokens: int, output_tokens: int) -> float:
+    """USD cost of a call at the catalog's per-1M rates (0.0 when the model is unpriced)."""
+    if entry is None or entry.in_per_1m is None or entry.out_per_1m is None:
+        return 0.0
+    return (input_tokens / 1_000_000) * entry.in_per_1m + (output_tokens / 1_000_000) * entry.out_per_1m
+
+
+def build_request_log(user_id: int, prompt_id: int, attempts: list[AttemptUsage]) -> RequestLog:
+    final = attempts[-1]
+    wasted = sum(a.cost_usd for a in attempts if not a.ok)
+    total = sum(a.cost_usd for a in attempts)
+    input_tokens = sum(a.input_tokens for a in attempts)
+    output_tokens = sum(a.output_tokens for a in attempts)
+    return RequestLog(
+        user_id=user_id,
+        prompt_id=prompt_id,
+        # Set here rather than by the column default, which would apply at flush time
+        created_at=datetime.utcnow(),
+        prompt="",  # the text lives once, as the prompt's chunked body
+        require_json=False,
+        chosen_provider=final.provider,
+        chosen_model=final.model,
+        # Legacy columns, kept filled so older readers see real numbers
+        input_tokens_est=input_tokens,
+        output_tokens_est=output_tokens,
+        estimated_cost_usd=total,
+        attempts=len(attempts),
+        input_tokens=input_tokens,
+        output_tokens=output_tokens,
+        cost_usd=total,
+        wasted_cost_usd=wasted,
+        status="ok" if final.ok else "failed",
+    )
+
+
+def build_attempt_rows(
+    user_id: int | None,
+    prompt_id: int,
+    attempts: list[AttemptUsage],
+    request_log_id: int | None = None,
+    task_type: str | None = None,
+) -> list[CompletionAttempt]:
+    completion_id = uuid.uuid4().hex
+    return [
+        CompletionAttempt(
+            request_log_id=request_log_id,
+            completion_id=completion_id,
+            prompt_id=prompt_id,
+            user_id=user_id,
+            attempt_no=n,
+            candidate_key=a.candidate_key,
+            provider=a.provider,
+            model=a.model,
+            task_type=task_type,
+            created_at=a.started_at or datetime.utcnow(),
+            ended_at=a.ended_at,
+            latency_ms=a.latency_ms,
+            outcome=a.outcome,
+            error_class=a.error_class,
+            retryable=a.retryable,
+            input_tokens=a.input_tokens,
+            output_tokens=a.output_tokens,
+            cost_usd=a.cost_usd,
+        )
+        for n, a in enumerate(attempts, start=1)
+    ]
+
+
+async def record_completion(
+    user_id: int | None,
+    prompt_id: int,
+    attempts: list[AttemptUsage],
+    task_type: str | None = None,
+) -> RequestLog | None:
+    """
+    Queue the usage row and the per-attempt rows for a finished completion.
+    Anonymous requests get attempt rows only.
+    """
+    if not attempts:
+        return None
+    queue = get_write_queue()
+    log = None
+    try:
+        if user_id is not None:
+            log = await queue.asubmit(build_request_log(user_id, prompt_id, attempts))
+        for row in build_attempt_rows(user_id, prompt_id, attempts, log.id if log else None, task_type):
+            await queue.asubmit(row)
+    except WriteQueueFull:
+        # Accounting must not fail a request that already succeeded (and was billed)
+        logger.warning("Usage rows for prompt %s dropped: write queue full", prompt_id)
+    return log
@@ -0,0 +1,124 @@
+"""
+app/services/usage_rollups.py
+-----------------------------
+Per-user / per-day / per-model usage totals for /v1/usage.
+
+SUM/COUNT over request_logs grows with a user's whole history; usage_rollups
+grows with days x models instead. Rollups are updated incrementally in the
+same transaction that inserts each write-behind batch of RequestLog rows
+(see WriteBehindQueue.add_batch_hook), so they never drift from the logs.
+
+Logs written before rollups existed are folded in once with:
+    python -m scripts.backfill_usage_rollups
+"""
+
+from __future__ import annotations
+
+from datetime import date, datetime
+from typing import Any, Iterable, Literal
+
+from sqlalchemy import func, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.db.models import RequestLog, UsageRollup
+
+GroupBy = Literal["day", "model", "provider"]
+
+_COUNTERS = ("requests", "failed", "attempts", "input_tokens", "output_tokens", "cost_usd", "wasted_cost_usd")
+
+RollupKey = tuple[int, date, str, str]
+
+
+def accumulate(totals: dict[RollupKey, dict[str, float]], logs: Iterable[Any]) -> dict[RollupKey, dict[str, float]]:
+    """Add RequestLog rows (ORM objects or Row tuples with the same attributes) into `totals`."""
+    for log in logs:
+        created = log.created_at or datetime.utcnow()
+        key = (log.user_id, created.date(), log.chosen_provider, log.chosen_model)
+        t = totals.setdefault(key, dict.fromkeys(_COUNTERS, 0))
+        t["requests"] += 1
+        t["failed"] += 1 if log.status == "failed" else 0
+        t["attempts"] += log.attempts or 0
+        # Legacy rows only have the *_est / estimated_cost_usd columns
+        t["input_tokens"] += log.input_tokens if log.input_tokens is not None else (log.input_tokens_est or 0)
+        t["output_tokens"] += log.output_tokens if log.output_tokens is not None else (log.output_tokens_est or 0)
+        t["cost_usd"] += log.cost_usd if log.cost_usd is not None else (log.estimated_cost_usd or 0.0)
+        t["wasted_cost_usd"] += log.wasted_cost_usd or 0.0
+    return totals
+
+
+def upsert_rollups(db: Session, totals: dict[RollupKey, dict[str, float]]) -> None:
+    """Add `totals` onto usage_rollups (INSERT ... ON CONFLICT DO UPDATE where supported)."""
+    if not totals:
+        return
+    rows = [
+        {"user_id": k[0], "day": k[1], "provider": k[2], "model": k[3], **v}
+        for k, v in totals.items()
+    ]
+    dialect = db.get_bind().dialect.name
+    if dialect in ("sqlite", "postgresql"):
+        insert = sqlite.insert if dialect == "sqlite" else postgresql.insert
+        stmt = insert(UsageRollup)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["user_id", "day", "provider", "model"],
+            set_={c: getattr(UsageRollup, c) + getattr(stmt.excluded, c) for c in _COUNTERS},
+        )
+        db.execute(stmt, rows)
+        return
+
+    # Portable fallback: update, insert when nothing matched
+    for row in rows:
+        result = db.execute(
+            update(UsageRollup)
+            .where(
+                UsageRollup.user_id == row["user_id"],
+                UsageRollup.day == row["day"],
+                UsageRollup.provider == row["provider"],
+                UsageRollup.model == row["model"],
+            )
+            .values({c: getattr(UsageRollup, c) + row[c] for c in _COUNTERS})
+        )
+        if result.rowcount == 0:
+            db.add(UsageRollup(**row))
+    db.flush()
+
+
+def apply_request_logs(db: Session, logs: list[RequestLog]) -> None:
+    """Write-behind batch hook for RequestLog."""
+    upsert_rollups(db, accumulate({}, logs))
+
+
+async def query_usage(
+    db: AsyncSession,
+    user_id: int,
+    start: date | None = None,
+    end: date | None = None,
+    group_by: GroupBy | None = None,
+) -> dict:
+    """Totals over [start, end] (inclusive, UTC days), optionally broken down by group_by."""
+    sums = [func.coalesce(func.sum(getattr(UsageRollup, c)), 0).label(c) for c in _COUNTERS]
+    filters = [UsageRollup.user_id == user_id]
+    if start is not None:
+        filters.append(UsageRollup.day >= start)
+    if end is not None:
+        filters.append(UsageRollup.day <= end)
+
+    totals = (await db.execute(select(*sums).where(*filters))).one()._asdict()
+
+    groups = None
+    if group_by is not None:
+        keys = {
+            "day": [UsageRollup.day],
+            "model": [UsageRollup.provider, UsageRollup.model],
+            "provider": [UsageRollup.provider],
+        }[group_by]
+        result = await db.execute(select(*keys, *sums).where(*filters).group_by(*keys).order_by(*keys))
+        groups = []
+        for row in result:
+            group = row._asdict()
+            if "day" in group:
+                group["day"] = group["day"].isoformat()
+            groups.append(group)
+
+    return {"totals": totals, "groups": groups}
@@ -0,0 +1,458 @@
+"""
+app/services/write_behind.py
+----------------------------
+Write-behind persistence for append-only rows (Prompt, RequestLog).
+
+Committing one row per request makes every handler wait for the SQLite write
+lock. Instead, handlers hand rows to a WriteBehindQueue and return at once;
+a background thread inserts them in grouped transactions, flushing every
+`flush_interval_ms` or as soon as `max_batch` rows are waiting.
+
+IDs are assigned at submit time from blocks reserved in the `id_sequences`
+table (IdAllocator), so a response can still carry `prompt_id`. Ids are
+unique but, with several workers each drawing from its own block, do not
+follow insert order; readers that need an order use (created_at, id). The writer
+thread reserves the next block before the current one runs out; async code
+submits with `asubmit`, which runs a reservation that still has to happen
+inline (first row of a table, or a burst that outran the prefetch) in an
+executor instead of on the event loop. Rows that
+are queued but not yet committed can be read back with `pending()`, which
+lets a completion that follows its create_prompt straight away still find
+the prompt. `get_row()` adds the multi-worker case: an id that was handed
+out (below the id_sequences high-water mark) but is neither committed nor
+queued here was most likely queued by another worker, so it polls the
+database for up to WRITE_BEHIND_READ_WAIT_MS before reporting it missing.
+
+A batch that fails is retried row by row. A row that still fails goes back
+on the queue (it stays readable through `pending()`) up to `max_retries`
+times, then is dead-lettered: appended with its error to the JSONL file at
+`dead_letter_path` and kept in `dead_letters()`, and counted in stats() as
+`dead_lettered`. Its id was already handed to a client, so the file is the
+place to recover it from.
+
+Rows written through the queue must not also be inserted with autoincrement
+ids elsewhere in the app, or the two id sources could collide.
+
+Batch hooks (add_batch_hook) run inside the same transaction as the insert
+of their model's rows — used to keep derived tables (usage rollups) exactly
+in step with the rows they summarise, and to store prompt body chunks.
+
+Env:
+- WRITE_BEHIND_FLUSH_MS   (default 5)
+- WRITE_BEHIND_MAX_BATCH  (default 500)
+- WRITE_BEHIND_MAX_PENDING (default 10000) — submit raises WriteQueueFull past this
+- WRITE_BEHIND_BULK_MAX_PENDING (default half of the above) — the same for
+  bulk=True submits (NDJSON imports), leaving the rest for live traffic
+- WRITE_BEHIND_MAX_RETRIES (default 3) — requeues of a failing row before it is dead-lettered
+- WRITE_BEHIND_DEAD_LETTER (default write_behind_dead_letter.jsonl; empty = memory only)
+- ID_BLOCK_SIZE           (default 1000)
+- WRITE_BEHIND_READ_WAIT_MS (default 500) — get_row's wait for another worker's flush
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Any, Callable
+
+from sqlalchemy import func, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.db.models import IdSequence
+from app.utils.blocking import run_blocking
+from app.utils.timing import record
+
+logger = logging.getLogger(__name__)
+
+
+class WriteQueueFull(RuntimeError):
+    """Too many rows are waiting to be written; the caller should back off."""
+
+
+class IdAllocator:
+    """
+    Hands out primary keys from blocks reserved in `id_sequences`.
+
+    Reserving a block is a single-row UPDATE, so several processes can share a
+    database without handing out the same id. When a block runs low, the next
+    one is reserved from the writer thread (see `prefetch`), so submit
+    normally never touches the database.
+    """
+
+    def __init__(self, session_factory: Callable[[], Session], block_size: int = 1000):
+        self._session_factory = session_factory
+        self.block_size = block_size
+        self._lock = threading.Lock()
+        self._blocks: dict[str, deque[range]] = {}
+
+    def take(self, model: type) -> int | None:
+        """The next id from an already reserved block, or None; never touches the database."""
+        with self._lock:
+            blocks = self._blocks.get(model.__tablename__)
+            while blocks and len(blocks[0]) == 0:
+                blocks.popleft()
+            if not blocks:
+                return None
+            current = blocks[0]
+            blocks[0] = current[1:]
+            return current[0]
+
+    def next_id(self, model: type) -> int:
+        """The next id, reserving a block first if none is left (blocking)."""
+        while (row_id := self.take(model)) is None:
+            # Reserved outside the lock so take() never waits on the database;
+            # two threads racing here just leave a spare block for later
+            block = self._reserve(model)
+            with self._lock:
+                self._blocks.setdefault(model.__tablename__, deque()).append(block)
+        return row_id
+
+    def prefetch(self, model: type) -> None:
+        """Reserve the next block ahead of time if fewer than half a block is left."""
+        table = model.__tablename__
+        with self._lock:
+            blocks = self._blocks.setdefault(table, deque())
+            if sum(len(b) for b in blocks) >= self.block_size // 2:
+                return
+        block = self._reserve(model)
+        with self._lock:
+            self._blocks[table].append(block)
+
+    def remaining(self, model: type) -> int:
+        with self._lock:
+            return sum(len(b) for b in self._blocks.get(model.__tablename__, ()))
+
+    def _reserve(self, model: type) -> range:
+        table = model.__tablename__
+        with self._session_factory() as db:
+            if db.get(IdSequence, table) is None:
+                # First use: start after any rows inserted before the queue existed
+                start = (db.scalar(select(func.max(model.id))) or 0) + 1
+                db.add(IdSequence(name=table, next_id=start))
+                try:
+                    db.commit()
+                except IntegrityError:
+                    db.rollback()  # another process initialised it first
+            # The UPDATE takes the row (or SQLite write) lock, so read-after-update is atomic
+            db.execute(
+                update(IdSequence)
+                .where(IdSequence.name == table)
+                .values(next_id=IdSequence.next_id + self.block_size)
+            )
+            end = db.scalar(select(IdSequence.next_id).where(IdSequence.name == table))
+            db.commit()
+        return range(end - self.block_size, end)
+
+
+class WriteBehindQueue:
+    def __init__(
+        self,
+        session_factory: Callable[[], Session],
+        flush_interval_ms: float = 5.0,
+        max_batch: int = 500,
+        max_pending: int = 10_000,
+        bulk_max_pending: int | None = None,
+        id_block_size: int = 1000,
+        max_retries: int = 3,
+        dead_letter_path: str | None = None,
+    ):
+        self._session_factory = session_factory
+        self.flush_interval_s = flush_interval_ms / 1000
+        self.max_batch = max_batch
+        self.max_pending = max_pending
+        self.bulk_max_pending = max_pending // 2 if bulk_max_pending is None else bulk_max_pending
+        self.max_retries = max_retries
+        self.dead_letter_path = dead_letter_path
+        self.ids = IdAllocator(session_factory, block_size=id_block_size)
+
+        self._cond = threading.Condition()
+        self._queue: deque[Any] = deque()
+        self._pending: dict[tuple[str, int], Any] = {}
+        self._models: dict[str, type] = {}
+        self._hooks: dict[str, list[Callable[[Session, list[Any]], None]]] = {}
+        self._retries: dict[tuple[str, int], int] = {}
+        self._dead_letters: deque[dict] = deque(maxlen=1000)
+        self._in_flight = 0
+        self._closed = False
+
+        self._flushed = 0
+        self._batches = 0
+        self._requeued = 0
+        self._dead_lettered = 0
+        self._last_batch = 0
+
+        self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+        self._thread.start()
+
+    def add_batch_hook(self, model: type, hook: Callable[[Session, list[Any]], None]) -> None:
+        """Call hook(db, rows) in the transaction that inserts each batch of `model` rows."""
+        self._hooks.setdefault(model.__tablename__, []).append(hook)
+
+    async def asubmit(self, row: Any, bulk: bool = False) -> Any:
+        """submit() for async code: a block reservation, if one is needed, runs off the event loop."""
+        if row.id is None:
+            row.id = self.ids.take(type(row))
+            if row.id is None:
+                row.id = await run_blocking(self.ids.next_id, type(row))
+        return self.submit(row, bulk=bulk)
+
+    def submit(self, row: Any, bulk: bool = False) -> Any:
+        """
+        Queue `row` for insert, assigning its id now. Returns the row.
+        May reserve an id block inline; async callers use asubmit.
+        bulk=True rows are refused at bulk_max_pending, so a large import
+        cannot fill the queue that live requests need.
+        """
+        model = type(row)
+        if row.id is None:
+            row.id = self.ids.next_id(model)
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("Write-behind queue is closed")
+            if len(self._pending) >= (self.bulk_max_pending if bulk else self.max_pending):
+                raise WriteQueueFull("Too many pending writes, retry shortly")
+            self._models[model.__tablename__] = model
+            self._pending[(model.__tablename__, row.id)] = row
+            self._queue.append(row)
+            if len(self._queue) >= self.max_batch:
+                self._cond.notify()
+        return row
+
+    def pending(self, model: type, row_id: int) -> Any | None:
+        """A queued row that has not been committed yet, if any."""
+        with self._cond:
+            return self._pending.get((model.__tablename__, row_id))
+
+    def dead_letters(self) -> list[dict]:
+        """The most recent rows that could not be written, newest last."""
+        with self._cond:
+            return list(self._dead_letters)
+
+    def flush(self, timeout: float | None = None) -> bool:
+        """Block until everything submitted so far is committed (or dead-lettered)."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            self._cond.notify_all()
+            while self._queue or self._in_flight:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def close(self, timeout: float | None = 10.0) -> None:
+        """Stop accepting rows, write what is queued, stop the thread."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join(timeout)
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "queued": len(self._queue),
+                "pending": len(self._pending),
+                "flushed": self._flushed,
+                "batches": self._batches,
+                "requeued": self._requeued,
+                "dead_lettered": self._dead_lettered,
+                "last_batch": self._last_batch,
+            }
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                if not self._queue and not self._closed:
+                    self._cond.wait(self.flush_interval_s)
+                elif len(self._queue) < self.max_batch and not self._closed:
+                    # Let a batch build up for one interval after the first row arrives
+                    self._cond.wait(self.flush_interval_s)
+                batch = [self._queue.popleft() for _ in range(min(self.max_batch, len(self._queue)))]
+                self._in_flight = len(batch)
+                done = self._closed and not self._queue and not batch
+                models = list(self._models.values())
+            if done:
+                return
+            if batch:
+                self._write(batch)
+            for model in models:
+                if self.ids.remaining(model) < self.ids.block_size // 2:
+                    try:
+                        self.ids.prefetch(model)
+                    except Exception:
+                        logger.exception("Id block prefetch for %s failed", model.__tablename__)
+
+    def _write(self, batch: list[Any]) -> None:
+        failed: list[tuple[Any, Exception]] = []
+        by_table: dict[str, list[Any]] = {}
+        for row in batch:
+            by_table.setdefault(type(row).__tablename__, []).append(row)
+        started = time.perf_counter()
+        try:
+            with self._session_factory() as db:
+                # Core executemany: far cheaper than ORM unit-of-work for plain inserts
+                for table, rows in by_table.items():
+                    db.execute(insert(type(rows[0])), [_row_values(r) for r in rows])
+                    for hook in self._hooks.get(table, ()):
+                        hook(db, rows)
+                db.commit()
+            record("db_commit", time.perf_counter() - started)
+        except Exception:
+            logger.exception("Write-behind batch of %d rows failed; retrying row by row", len(batch))
+            failed = self._write_one_by_one(batch)
+            record("db_commit", time.perf_counter() - started, outcome="retried")
+        # _retries is only touched by the writer thread
+        retry, dead = [], []
+        for row, error in failed:
+            key = (type(row).__tablename__, row.id)
+            self._retries[key] = self._retries.get(key, 0) + 1
+            if self._retries[key] <= self.max_retries and not self._closed:
+                retry.append(row)
+            else:
+                del self._retries[key]
+                dead.append(_dead_letter(row, error))
+        if dead:
+            self._store_dead_letters(dead)
+        with self._cond:
+            kept = {(type(row).__tablename__, row.id) for row in retry}
+            for row in batch:
+                key = (type(row).__tablename__, row.id)
+                if key not in kept:
+                    self._pending.pop(key, None)
+                    self._retries.pop(key, None)
+            self._queue.extend(retry)  # still readable through pending() until written
+            self._requeued += len(retry)
+            self._dead_letters.extend(dead)
+            self._flushed += len(batch) - len(failed)
+            self._dead_lettered += len(dead)
+            self._batches += 1
+            self._last_batch = len(batch)
+            self._in_flight = 0
+            self._cond.notify_all()
+
+    def _write_one_by_one(self, batch: list[Any]) -> list[tuple[Any, Exception]]:
+        """Isolate the bad rows so one of them cannot sink the whole batch."""
+        failed = []
+        for row in batch:
+            try:
+                with self._session_factory() as db:
+                    db.merge(row)
+                    for hook in self._hooks.get(type(row).__tablename__, ()):
+                        hook(db, [row])
+                    db.commit()
+            except Exception as e:
+                failed.append((row, e))
+                logger.warning("Write of %s id=%s failed: %s", type(row).__tablename__, row.id, e)
+        return failed
+
+    def _store_dead_letters(self, dead: list[dict]) -> None:
+        for entry in dead:
+            logger.error("Dead-lettered %s id=%s: %s", entry["table"], entry["id"], entry["error"])
+        if not self.dead_letter_path:
+            return
+        try:
+            with open(self.dead_letter_path, "a", encoding="utf-8") as f:
+                for entry in dead:
+                    f.write(json.dumps(entry, default=str) + "\n")
+        except OSError:
+            logger.exception("Could not write %d dead letters to %s", len(dead), self.dead_letter_path)
+
+
+def _dead_letter(row: Any, error: Exception) -> dict:
+    entry = {
+        "table": type(row).__tablename__,
+        "id": row.id,
+        "failed_at": datetime.utcnow().isoformat(),
+        "error": f"{type(error).__name__}: {error}",
+        "values": {column.key: getattr(row, column.key) for column in row.__table__.columns},
+    }
+    if getattr(row, "_body_text", None) is not None:
+        entry["body"] = row._body_text  # chunked prompt bodies are not in the columns
+    return entry
+
+
+def _row_values(row: Any) -> dict:
+    """Column values of an ORM object, with Python-side column defaults applied."""
+    values = {}
+    for column in row.__table__.columns:
+        value = getattr(row, column.key)
+        if value is None and column.default is not None:
+            default = column.default
+            value = default.arg(None) if default.is_callable else default.arg
+            setattr(row, column.key, value)  # keep pending() reads consistent with the stored row
+        values[column.key] = value
+    return values
+
+
+async def get_row(db: AsyncSession, model: type, row_id: int) -> Any | None:
+    """
+    db.get() for tables written through the queue: also finds rows queued in
+    this process, and waits briefly for rows another worker has queued.
+    """
+    row = await db.get(model, row_id) or get_write_queue().pending(model, row_id)
+    if row is not None:
+        return row
+    allocated = await db.scalar(select(IdSequence.next_id).where(IdSequence.name == model.__tablename__))
+    if allocated is None or row_id >= allocated:
+        return None  # never handed out
+    deadline = time.monotonic() + float(os.getenv("WRITE_BEHIND_READ_WAIT_MS", 500)) / 1000
+    poll_s = float(os.getenv("WRITE_BEHIND_FLUSH_MS", 5)) / 1000 * 2
+    while time.monotonic() < deadline:
+        await asyncio.sleep(poll_s)
+        row = await db.get(model, row_id)
+        if row is not None:
+            return row
+    return None
+
+
+_queue: WriteBehindQueue | None = None
+_queue_lock = threading.Lock()
+
+
+def get_write_queue() -> WriteBehindQueue:
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            from sqlalchemy.orm import sessionmaker
+            from app.db.models import RequestLog
+            from app.db.prompt_models import Prompt
+            from app.db.session import engine
+            from app.services.prompt_bodies import store_prompt_blobs
+            from app.services.usage_rollups import apply_request_logs
+            _queue = WriteBehindQueue(
+                # expire_on_commit=False: queued rows stay readable after their batch commits
+                sessionmaker(bind=engine, autoflush=False, expire_on_commit=False),
+                flush_interval_ms=float(os.getenv("WRITE_BEHIND_FLUSH_MS", 5)),
+                max_batch=int(os.getenv("WRITE_BEHIND_MAX_BATCH", 500)),
+                max_pending=int(os.getenv("WRITE_BEHIND_MAX_PENDING", 10_000)),
+                bulk_max_pending=int(os.environ["WRITE_BEHIND_BULK_MAX_PENDING"])
+                if os.getenv("WRITE_BEHIND_BULK_MAX_PENDING") else None,
+                id_block_size=int(os.getenv("ID_BLOCK_SIZE", 1000)),
+                max_retries=int(os.getenv("WRITE_BEHIND_MAX_RETRIES", 3)),
+                dead_letter_path=os.getenv("WRITE_BEHIND_DEAD_LETTER", "write_behind_dead_letter.jsonl") or None,
+            )
+            _queue.add_batch_hook(RequestLog, apply_request_logs)
+            _queue.add_batch_hook(Prompt, store_prompt_blobs)
+        return _queue
+
+
+def set_write_queue(queue: WriteBehindQueue | None) -> None:
+    """Swap the queue (tests). Closes the previous one."""
+    global _queue
+    with _queue_lock:
+        previous, _queue = _queue, queue
+    if previous is not None and previous is not queue:
+        previous.close()
+
+
+def shutdown_write_queue() -> None:
+    """Flush and stop the queue (app shutdown). No-op if it was never started."""
+    set_write_queue(None)
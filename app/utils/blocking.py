@@ -0,0 +1,35 @@
+"""
+app/utils/blocking.py
+---------------------
+Run blocking calls (provider SDK requests, key validation) from async code.
+
+The executor is picked up from context: a route running inside a bulkhead
+(app/api/bulkhead.py) sends its blocking calls to that bulkhead's own
+pool; anywhere else they go to the loop's default executor.
+"""
+
+import asyncio
+import functools
+from contextlib import contextmanager
+from contextvars import ContextVar
+from concurrent.futures import Executor
+from typing import Any, Callable, Iterator, TypeVar
+
+T = TypeVar("T")
+
+_current_executor: ContextVar[Executor | None] = ContextVar("blocking_executor", default=None)
+
+
+@contextmanager
+def use_executor(executor: Executor) -> Iterator[None]:
+    """Route run_blocking calls made in this context to `executor`."""
+    token = _current_executor.set(executor)
+    try:
+        yield
+    finally:
+        _current_executor.reset(token)
+
+
+async def run_blocking(fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_current_executor.get(), functools.partial(fn, *args, **kwargs))
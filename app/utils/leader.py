@@ -0,0 +1,66 @@
+"""
+app/utils/leader.py
+-------------------
+Elect one worker process per host for once-only background duties.
+
+With several server workers every process runs the app lifespan. Work
+that must happen exactly once per deployment (resuming interrupted
+import jobs) runs only in the worker holding an exclusive, non-blocking
+flock on LEADER_LOCK_PATH. The kernel drops the lock when that process
+exits, so the worker started in its place picks it up.
+
+On platforms without fcntl every process is the leader (single-worker
+development is the only supported setup there).
+
+Env:
+- LEADER_LOCK_PATH (default <tmpdir>/byok-<hash of DATABASE_URL>.lock,
+  so two deployments on one host do not share a leader)
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import tempfile
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+_lock = threading.Lock()
+_handle = None  # open lock file, held for the life of the process
+
+
+def default_lock_path() -> str:
+    from app.db.session import DATABASE_URL
+
+    digest = hashlib.sha256(DATABASE_URL.encode()).hexdigest()[:12]
+    return os.path.join(tempfile.gettempdir(), f"byok-{digest}.lock")
+
+
+def acquire_leadership(path: str | None = None) -> bool:
+    """True if this process is (or just became) the leader; never blocks."""
+    global _handle
+    with _lock:
+        if _handle is not None:
+            return True
+        if fcntl is None:
+            return True
+        handle = open(path or os.getenv("LEADER_LOCK_PATH") or default_lock_path(), "a+")
+        try:
+            fcntl.flock(handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            handle.close()
+            return False
+        _handle = handle
+        return True
+
+
+def release_leadership() -> None:
+    global _handle
+    with _lock:
+        if _handle is not None:
+            _handle.close()  # closing the descriptor releases the flock
+            _handle = None
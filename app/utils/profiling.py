@@ -0,0 +1,156 @@
+"""
+app/utils/profiling.py
+----------------------
+On-demand profiling of a single request (see app/api/profiling.py).
+
+Two captures, both from the standard library so nothing extra has to be
+installed on a production box:
+
+- CPU: StackSampler, a daemon thread that reads sys._current_frames() every
+  PROFILE_SAMPLE_INTERVAL_MS and counts whole stacks. Output is the
+  "folded" format (one `thread;outer;...;inner count` line per stack) that
+  speedscope, flamegraph.pl and inferno read directly. Sampling costs
+  nothing in the profiled code itself, unlike cProfile's per-call hook.
+- Memory: tracemalloc for the duration of the request. The raw snapshot is
+  dumped (load with tracemalloc.Snapshot.load) next to a plain-text top-N by
+  line with the peak traced size.
+
+Every thread is sampled (the event loop and the blocking-call pools
+included), and those are shared with whatever else the worker is doing.
+Under load a profile includes other requests' work; take profiles on a
+quiet worker or read them as "what this process did while the request ran".
+
+Only one capture runs per process at a time: tracemalloc is process-wide,
+and two overlapping captures would each see the other's allocations.
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from pathlib import Path
+
+_capture_lock = threading.Lock()
+
+
+def sample_interval() -> float:
+    return float(os.getenv("PROFILE_SAMPLE_INTERVAL_MS", "5")) / 1000
+
+
+def profile_dir() -> Path:
+    return Path(os.getenv("PROFILE_DIR", "profiles"))
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({Path(code.co_filename).name}:{frame.f_lineno})"
+
+
+class StackSampler:
+    """Counts the stacks of the given threads (default: all but itself) until stopped."""
+
+    def __init__(self, interval: float | None = None, thread_ids: set[int] | None = None):
+        self.interval = sample_interval() if interval is None else interval
+        self.thread_ids = thread_ids
+        self.stacks: Counter[str] = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="byok-stack-sampler", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own or (self.thread_ids is not None and ident not in self.thread_ids):
+                    continue
+                labels = []
+                while frame is not None:
+                    labels.append(_frame_label(frame))
+                    frame = frame.f_back
+                labels.append(names.get(ident, str(ident)))
+                self.stacks[";".join(reversed(labels))] += 1
+            self.samples += 1
+
+    def folded(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+class RequestProfile:
+    """
+    CPU samples + allocation snapshot for one request.
+
+        profile = RequestProfile.begin("3f2a9c")
+        if profile is None: ...          # another capture is running
+        ...
+        profile.finish()
+        paths = profile.write()          # blocking file I/O; call off the loop
+    """
+
+    def __init__(self, request_id: str, top: int = 50):
+        self.request_id = request_id
+        self.top = top
+        self.sampler = StackSampler()
+        self.started = time.perf_counter()
+        self.duration = 0.0
+        self.snapshot: tracemalloc.Snapshot | None = None
+        self.peak_bytes = 0
+        self._owns_tracemalloc = False
+
+    @classmethod
+    def begin(cls, request_id: str) -> RequestProfile | None:
+        if not _capture_lock.acquire(blocking=False):
+            return None
+        profile = cls(request_id)
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(int(os.getenv("PROFILE_TRACEMALLOC_FRAMES", "10")))
+            profile._owns_tracemalloc = True
+        tracemalloc.reset_peak()
+        profile.sampler.start()
+        return profile
+
+    def finish(self) -> None:
+        try:
+            self.sampler.stop()
+            self.duration = time.perf_counter() - self.started
+            self.snapshot = tracemalloc.take_snapshot().filter_traces((
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            ))
+            self.peak_bytes = tracemalloc.get_traced_memory()[1]
+            if self._owns_tracemalloc:
+                tracemalloc.stop()
+        finally:
+            _capture_lock.release()
+
+    def memory_report(self) -> str:
+        stats = self.snapshot.statistics("lineno")
+        lines = [
+            f"request {self.request_id}: {self.duration * 1000:.1f} ms, "
+            f"peak traced {self.peak_bytes / 1024:.1f} KiB, {self.sampler.samples} CPU samples",
+            f"top {self.top} allocation sites still live at the end of the request:",
+        ]
+        lines += [str(stat) for stat in stats[: self.top]]
+        return "\n".join(lines) + "\n"
+
+    def write(self, directory: Path | None = None) -> list[Path]:
+        directory = directory or profile_dir()
+        directory.mkdir(parents=True, exist_ok=True)
+        cpu = directory / f"{self.request_id}.cpu.folded"
+        cpu.write_text(self.sampler.folded())
+        report = directory / f"{self.request_id}.mem.txt"
+        report.write_text(self.memory_report())
+        raw = directory / f"{self.request_id}.tracemalloc"
+        self.snapshot.dump(str(raw))
+        return [cpu, report, raw]
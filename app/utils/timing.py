@@ -0,0 +1,216 @@
+"""
+app/utils/timing.py
+-------------------
+Low-overhead stage timers feeding two sinks:
+
+- the current request's Server-Timing header (app/api/server_timing.py
+  opens a RequestTimings per request in a ContextVar)
+- process-wide Prometheus histograms, rendered by GET /metrics
+
+Usage:
+    with stage("catalog"):
+        catalog = await load_catalog(db)
+
+    with stage("attempt", provider="openai", model="gpt-4o-mini") as s:
+        result = await call()
+        s.set(outcome="fallback")       # default: "ok", or "error" on exception
+
+    @timed("keys")
+    async def build_user_keys(...): ...
+
+Every stage lands in byok_stage_duration_seconds with the labels stage,
+provider, model, task_type and outcome (empty when not given). A timer is a
+perf_counter pair, one dict lookup and a bisect under a lock; no I/O.
+
+Histograms are per process: with several workers each one serves its own
+/metrics (see docs/DEPLOYMENT.md).
+"""
+
+from __future__ import annotations
+
+import functools
+import inspect
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Iterator
+
+# Seconds; covers cache hits through long provider calls
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+STAGE_LABELS = ("stage", "provider", "model", "task_type", "outcome")
+
+
+class Histogram:
+    """Cumulative-bucket histogram keyed by a fixed tuple of label values."""
+
+    def __init__(self, name: str, help_text: str, label_names: tuple[str, ...], buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        # label values -> [per-bucket counts (+Inf last), count, sum]
+        self._series: dict[tuple[str, ...], list] = {}
+
+    def observe(self, seconds: float, labels: tuple[str, ...]) -> None:
+        index = bisect_left(self.buckets, seconds)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0, 0.0]
+            series[0][index] += 1
+            series[1] += 1
+            series[2] += seconds
+
+    def snapshot(self) -> dict[tuple[str, ...], tuple[list[int], int, float]]:
+        with self._lock:
+            return {k: (list(v[0]), v[1], v[2]) for k, v in self._series.items()}
+
+    def clear(self) -> None:
+        with self._lock:
+            self._series.clear()
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for labels, (counts, count, total) in sorted(self.snapshot().items()):
+            base = ",".join(f'{n}="{_escape(v)}"' for n, v in zip(self.label_names, labels))
+            sep = "," if base else ""
+            cumulative = 0
+            for bound, n in zip(self.buckets, counts):
+                cumulative += n
+                lines.append(f'{self.name}_bucket{{{base}{sep}le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_bucket{{{base}{sep}le="+Inf"}} {count}')
+            lines.append(f"{self.name}_sum{{{base}}} {total}")
+            lines.append(f"{self.name}_count{{{base}}} {count}")
+        return lines
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+STAGE_SECONDS = Histogram(
+    "byok_stage_duration_seconds",
+    "Time spent per request stage (profiling, routing, provider attempts, DB writes).",
+    STAGE_LABELS,
+)
+REQUEST_SECONDS = Histogram(
+    "byok_http_request_duration_seconds",
+    "End-to-end HTTP request time by route template and status.",
+    ("method", "route", "status"),
+)
+
+HISTOGRAMS = [REQUEST_SECONDS, STAGE_SECONDS]
+
+
+def render_prometheus() -> str:
+    """Prometheus text exposition (format 0.0.4) of every histogram."""
+    lines: list[str] = []
+    for histogram in HISTOGRAMS:
+        lines += histogram.render()
+    return "\n".join(lines) + "\n"
+
+
+# ---------- per-request timings ----------
+
+class RequestTimings:
+    """Stages recorded while serving one request, in completion order."""
+
+    __slots__ = ("started", "entries")
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.entries: list[tuple[str, str, float]] = []  # (name, description, seconds)
+
+    def add(self, name: str, seconds: float, description: str = "") -> None:
+        self.entries.append((name, description, seconds))
+
+    def header(self) -> str:
+        """Server-Timing value; repeated stages (fallback attempts) become attempt-2, attempt-3."""
+        seen: dict[str, int] = {}
+        parts = []
+        for name, description, seconds in self.entries:
+            seen[name] = seen.get(name, 0) + 1
+            token = name if seen[name] == 1 else f"{name}-{seen[name]}"
+            desc = f';desc="{description}"' if description else ""
+            parts.append(f"{token};dur={seconds * 1000:.1f}{desc}")
+        parts.append(f"total;dur={(time.perf_counter() - self.started) * 1000:.1f}")
+        return ", ".join(parts)
+
+
+_current: ContextVar[RequestTimings | None] = ContextVar("request_timings", default=None)
+
+
+def begin_request() -> tuple[RequestTimings, Any]:
+    """Start collecting for the current request; returns (timings, reset token)."""
+    timings = RequestTimings()
+    return timings, _current.set(timings)
+
+
+def end_request(token: Any) -> None:
+    _current.reset(token)
+
+
+def current_timings() -> RequestTimings | None:
+    return _current.get()
+
+
+# ---------- timers ----------
+
+class Stage:
+    __slots__ = ("name", "labels")
+
+    def __init__(self, name: str, labels: dict[str, str]):
+        self.name = name
+        self.labels = labels
+
+    def set(self, **labels: Any) -> None:
+        self.labels.update({k: "" if v is None else str(v) for k, v in labels.items()})
+
+
+def record(name: str, seconds: float, **labels: Any) -> None:
+    """Record an already-measured stage."""
+    values = {k: "" if v is None else str(v) for k, v in labels.items()}
+    values.setdefault("outcome", "ok")
+    STAGE_SECONDS.observe(seconds, (name, *(values.get(n, "") for n in STAGE_LABELS[1:])))
+    timings = _current.get()
+    if timings is not None:
+        desc = "/".join(values[n] for n in ("provider", "model") if values.get(n))
+        if values["outcome"] != "ok":
+            desc = f"{desc} {values['outcome']}".strip()
+        timings.add(name, seconds, desc)
+
+
+@contextmanager
+def stage(name: str, **labels: Any) -> Iterator[Stage]:
+    """Time the block; outcome is "error" if it raises, unless set explicitly."""
+    handle = Stage(name, {k: "" if v is None else str(v) for k, v in labels.items()})
+    start = time.perf_counter()
+    try:
+        yield handle
+    except BaseException:
+        handle.labels.setdefault("outcome", "error")
+        raise
+    finally:
+        record(name, time.perf_counter() - start, **handle.labels)
+
+
+def timed(name: str) -> Callable[[Callable], Callable]:
+    """Decorator form of stage() for sync and async functions."""
+    def decorator(fn: Callable) -> Callable:
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with stage(name):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with stage(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,107 @@
+"""
+scripts/archive_old_rows.py
+---------------------------
+Retention for completion_attempts, request_logs and prompts (see app/services/retention.py).
+
+  archive   move rows older than the cutoff into gzip NDJSON files + manifest,
+            then delete them from the database in small batches
+  list      show the manifest
+  query     print archived rows (NDJSON) for a table and time range
+  restore   re-insert archived rows, e.g. to replay them
+
+Safe to run while the API is up: each chunk is deleted in its own short
+transaction, with a pause in between.
+
+Run:
+python -m scripts.archive_old_rows archive --dry-run
+python -m scripts.archive_old_rows archive --table request_logs --days 30
+python -m scripts.archive_old_rows query --table prompts --start 2025-01-01 --end 2025-02-01
+python -m scripts.archive_old_rows restore --table prompts --start 2025-01-01 --end 2025-02-01
+"""
+
+import argparse
+import json
+import sys
+from datetime import datetime
+
+from sqlalchemy.orm import sessionmaker
+
+from app.db.migrations import ensure_schema
+from app.db.session import engine
+from app.services.exporter import json_default
+from app.services.retention import (
+    ARCHIVE_DIR,
+    DEFAULT_RETENTION_DAYS,
+    TABLES,
+    archive_table,
+    iter_archive,
+    read_manifest,
+    restore,
+)
+
+
+def _archive(args, session_factory) -> None:
+    for name in ([args.table] if args.table else TABLES):
+        days = args.days if args.days is not None else DEFAULT_RETENTION_DAYS[name]
+        result = archive_table(
+            session_factory, name, days,
+            archive_dir=args.dir, chunk=args.chunk, pause_s=args.pause, dry_run=args.dry_run,
+        )
+        verb = "would archive" if args.dry_run else "archived"
+        print(
+            f"{name}: {verb} {result.rows} rows older than {result.cutoff:%Y-%m-%d %H:%M} "
+            f"({result.files} files, {result.blobs_removed} prompt blobs freed)"
+        )
+
+
+def _list(args, _session_factory) -> None:
+    for entry in read_manifest(args.dir):
+        if args.table and entry["table"] != args.table:
+            continue
+        print(
+            f"{entry['file']:<60} {entry['rows']:>7} rows  ids {entry['first_id']}-{entry['last_id']}  "
+            f"{entry['min_created_at']} .. {entry['max_created_at']}"
+        )
+
+
+def _query(args, _session_factory) -> None:
+    for record in iter_archive(args.table, args.dir, start=args.start, end=args.end):
+        sys.stdout.write(json.dumps(record, default=json_default) + "\n")
+
+
+def _restore(args, session_factory) -> None:
+    count = restore(session_factory, args.table, args.dir, start=args.start, end=args.end)
+    print(f"{args.table}: {count} archived rows read (ids already present were skipped)")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dir", default=ARCHIVE_DIR, help="archive directory (default $ARCHIVE_DIR or ./archive)")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("archive")
+    p.add_argument("--table", choices=list(TABLES))
+    p.add_argument("--days", type=int, help="override the table's retention (RETAIN_*_DAYS)")
+    p.add_argument("--chunk", type=int, default=5000, help="rows per archive file / delete transaction")
+    p.add_argument("--pause", type=float, default=0.05, help="seconds to sleep between chunks")
+    p.add_argument("--dry-run", action="store_true", help="count only; write and delete nothing")
+    p.set_defaults(run=_archive)
+
+    p = sub.add_parser("list")
+    p.add_argument("--table", choices=list(TABLES))
+    p.set_defaults(run=_list)
+
+    for name, run in (("query", _query), ("restore", _restore)):
+        p = sub.add_parser(name)
+        p.add_argument("--table", choices=list(TABLES), required=True)
+        p.add_argument("--start", type=datetime.fromisoformat, help="created_at >= (ISO date/time)")
+        p.add_argument("--end", type=datetime.fromisoformat, help="created_at < (ISO date/time)")
+        p.set_defaults(run=run)
+
+    args = parser.parse_args()
+    ensure_schema(engine)
+    args.run(args, sessionmaker(bind=engine, expire_on_commit=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+scripts/backfill_usage_rollups.py
+---------------------------------
+Build usage_rollups from existing request_logs.
+
+Reads request_logs in id order, `--chunk` rows at a time (keyset pagination,
+so memory stays flat on millions of rows), and upserts each chunk's totals
+in its own transaction.
+
+Rollups are otherwise maintained incrementally by the write-behind queue, so
+running this against live rollups would count those logs twice. By default
+it refuses when usage_rollups is non-empty; --rebuild clears the table first.
+Run it with the API stopped (e.g. right after upgrading).
+
+Run:
+python -m scripts.backfill_usage_rollups
+python -m scripts.backfill_usage_rollups --rebuild --chunk 20000
+"""
+
+import argparse
+import sys
+import time
+
+from sqlalchemy import delete, func, select
+
+from app.db.migrations import ensure_schema
+from app.db.models import RequestLog, UsageRollup
+from app.db.session import SessionLocal, engine
+from app.services.usage_rollups import accumulate, upsert_rollups
+
+_COLUMNS = (
+    RequestLog.id,
+    RequestLog.user_id,
+    RequestLog.created_at,
+    RequestLog.chosen_provider,
+    RequestLog.chosen_model,
+    RequestLog.status,
+    RequestLog.attempts,
+    RequestLog.input_tokens,
+    RequestLog.output_tokens,
+    RequestLog.input_tokens_est,
+    RequestLog.output_tokens_est,
+    RequestLog.cost_usd,
+    RequestLog.estimated_cost_usd,
+    RequestLog.wasted_cost_usd,
+)
+
+
+def backfill(chunk: int, rebuild: bool) -> int:
+    ensure_schema(engine)
+
+    with SessionLocal() as db:
+        if db.scalar(select(func.count()).select_from(UsageRollup)):
+            if not rebuild:
+                sys.exit("usage_rollups is not empty; pass --rebuild to recompute from scratch")
+            db.execute(delete(UsageRollup))
+            db.commit()
+
+    processed = 0
+    after_id = 0
+    started = time.monotonic()
+    while True:
+        with SessionLocal() as db:
+            rows = db.execute(
+                select(*_COLUMNS).where(RequestLog.id > after_id).order_by(RequestLog.id).limit(chunk)
+            ).all()
+            if not rows:
+                break
+            upsert_rollups(db, accumulate({}, rows))
+            db.commit()
+        after_id = rows[-1].id
+        processed += len(rows)
+        print(f"  {processed:>10} logs  (up to id {after_id}, {processed / (time.monotonic() - started):.0f}/s)")
+    return processed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunk", type=int, default=5000, help="request_logs rows per transaction")
+    parser.add_argument("--rebuild", action="store_true", help="delete existing rollups first")
+    args = parser.parse_args()
+
+    total = backfill(args.chunk, args.rebuild)
+    print(f"Done: {total} request logs rolled up")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,288 @@
+"""
+scripts/bench_hot_paths.py
+--------------------------
+Microbenchmarks for the in-process hot paths, with JSON baselines.
+
+Cases:
+- select[catalog=N] / route[catalog=N]: ModelSelector.select and
+  DeterministicRouter.route over synthetic catalogs of 3, 30 and 300 models
+- prompt_profile.*: PromptProfile validation and JSON serialization
+- route_decision.*: RouteDecision validation and JSON serialization (the
+  /v1/route and completion responses carry one)
+- profiler.parse[plain|fenced]: GeminiPromptProfiler's response cleanup
+  (gemini_profiler.parse_profile), with and without markdown fences
+- estimate_tokens[4KB]
+- encrypt_key / decrypt_key: Fernet round trip used for stored BYOK keys
+
+Each case is timed with timeit: autorange to at least --min-time seconds
+per run, then --repeat runs. "best" is the fastest run's time per call
+(least disturbed by the rest of the machine) and is what --compare uses;
+"median" is reported alongside.
+
+Baselines are only comparable on the same machine and Python; the file
+records both and --compare warns when they differ.
+
+Run:
+python -m scripts.bench_hot_paths                                  # print results
+python -m scripts.bench_hot_paths --save benchmarks/hot_paths.json # new baseline
+python -m scripts.bench_hot_paths --compare benchmarks/hot_paths.json --threshold 0.20
+python -m scripts.bench_hot_paths --compare old.json --against new.json
+--compare exits 1 when any case is slower than the baseline by more than
+--threshold.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import timeit
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable
+
+from app.db.model_catalog_models import ModelCatalog
+from app.schemas.prompts import PromptProfile
+from app.schemas.routing import RouteDecision
+from app.services.deterministic_router import DeterministicRouter
+from app.services.gemini_profiler import parse_profile
+from app.services.model_selector import ModelSelector
+from app.utils.encryption import decrypt_key, encrypt_key
+from app.utils.token_estimator import estimate_tokens
+
+CATALOG_SIZES = (3, 30, 300)
+DEFAULT_THRESHOLD = 0.20
+
+PROFILE = {
+    "task_type": "coding", "needs_web": False, "needs_code": True,
+    "output_format": "json", "urgency": "normal", "confidence": 0.92,
+}
+PROFILE_REPLY = json.dumps(PROFILE, indent=2)
+FENCED_REPLY = "```json\n" + PROFILE_REPLY.replace("false", "False") + "\n```"
+
+# name -> setup(); setup builds the inputs and returns the callable to time
+CASES: dict[str, Callable[[], Callable[[], object]]] = {}
+
+
+def case(name: str):
+    def decorator(setup: Callable[[], Callable[[], object]]):
+        CASES[name] = setup
+        return setup
+    return decorator
+
+
+def synthetic_catalog(size: int) -> list[ModelCatalog]:
+    """Catalog rows spread over every provider, cost tier and capability."""
+    providers = ("gemini", "openai", "anthropic")
+    tiers = ("low", "medium", "high")
+    return [
+        ModelCatalog(
+            key=f"model_{i}",
+            provider=providers[i % 3],
+            model=f"{providers[i % 3]}-model-{i}",
+            cost_tier=tiers[(i // 3) % 3],
+            latency_hint="fast" if i % 2 == 0 else "normal",
+            supports_web=i % 4 == 0,
+            supports_json=i % 5 != 0,
+            good_for_code=i % 4 != 3,
+            in_per_1m=0.1 * (i + 1),
+            out_per_1m=0.4 * (i + 1),
+        )
+        for i in range(size)
+    ]
+
+
+def _router(size: int) -> DeterministicRouter:
+    return DeterministicRouter(selector=ModelSelector(catalog=synthetic_catalog(size)))
+
+
+def _catalog_cases(size: int) -> None:
+    @case(f"select[catalog={size}]")
+    def _select():
+        router = _router(size)
+        constraints = router.route(PromptProfile(**PROFILE)).constraints
+        return lambda: router.selector.select(constraints)
+
+    @case(f"route[catalog={size}]")
+    def _route():
+        router = _router(size)
+        profile = PromptProfile(**PROFILE)
+        return lambda: router.route(profile)
+
+
+for _size in CATALOG_SIZES:
+    _catalog_cases(_size)
+
+
+@case("prompt_profile.validate")
+def _profile_validate():
+    return lambda: PromptProfile(**PROFILE)
+
+
+@case("prompt_profile.dump_json")
+def _profile_dump():
+    profile = PromptProfile(**PROFILE)
+    return profile.model_dump_json
+
+
+@case("route_decision.validate[catalog=30]")
+def _decision_validate():
+    data = _router(30).route(PromptProfile(**PROFILE)).model_dump()
+    return lambda: RouteDecision.model_validate(data)
+
+
+@case("route_decision.dump_json[catalog=30]")
+def _decision_dump():
+    decision = _router(30).route(PromptProfile(**PROFILE))
+    return decision.model_dump_json
+
+
+@case("profiler.parse[plain]")
+def _parse_plain():
+    return lambda: parse_profile(PROFILE_REPLY)
+
+
+@case("profiler.parse[fenced]")
+def _parse_fenced():
+    return lambda: parse_profile(FENCED_REPLY)
+
+
+@case("estimate_tokens[4KB]")
+def _estimate():
+    text = "x" * 4096
+    return lambda: estimate_tokens(text)
+
+
+def _ensure_encryption_key() -> None:
+    if not os.getenv("ENCRYPTION_KEY"):
+        from cryptography.fernet import Fernet
+
+        os.environ["ENCRYPTION_KEY"] = Fernet.generate_key().decode()
+
+
+@case("encrypt_key")
+def _encrypt():
+    _ensure_encryption_key()
+    return lambda: encrypt_key("sk-proj-" + "a" * 48)
+
+
+@case("decrypt_key")
+def _decrypt():
+    _ensure_encryption_key()
+    token = encrypt_key("sk-proj-" + "a" * 48)
+    return lambda: decrypt_key(token)
+
+
+def measure(fn: Callable[[], object], repeat: int, min_time: float) -> dict:
+    timer = timeit.Timer(fn)
+    number, _ = timer.autorange()
+    number = max(number, int(number * min_time / 0.2))  # autorange targets 0.2s
+    runs = [t / number for t in timer.repeat(repeat=repeat, number=number)]
+    return {
+        "best_us": round(min(runs) * 1e6, 3),
+        "median_us": round(statistics.median(runs) * 1e6, 3),
+        "loops": number,
+    }
+
+
+def run_cases(selected: str | None = None, repeat: int = 5, min_time: float = 0.2) -> dict[str, dict]:
+    results = {}
+    for name, setup in CASES.items():
+        if selected and selected not in name:
+            continue
+        results[name] = measure(setup(), repeat, min_time)
+    return results
+
+
+def environment() -> dict:
+    return {
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "machine": platform.machine(),
+        "processor": platform.processor() or platform.machine(),
+        "system": platform.system(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def compare(baseline: dict[str, dict], current: dict[str, dict], threshold: float) -> list[dict]:
+    """One row per case; status is regression / improved / ok / new / missing."""
+    rows = []
+    for name in sorted(set(baseline) | set(current)):
+        before, after = baseline.get(name), current.get(name)
+        if before is None or after is None:
+            rows.append({"case": name, "status": "new" if before is None else "missing"})
+            continue
+        ratio = after["best_us"] / before["best_us"]
+        status = "regression" if ratio > 1 + threshold else "improved" if ratio < 1 - threshold else "ok"
+        rows.append({
+            "case": name, "before_us": before["best_us"], "after_us": after["best_us"],
+            "ratio": ratio, "status": status,
+        })
+    return rows
+
+
+def _load(path: str) -> dict:
+    return json.loads(Path(path).read_text())
+
+
+def print_results(results: dict[str, dict]) -> None:
+    print(f"{'case':<40}{'best us':>12}{'median us':>12}{'loops':>10}")
+    for name, r in results.items():
+        print(f"{name:<40}{r['best_us']:>12.2f}{r['median_us']:>12.2f}{r['loops']:>10}")
+
+
+def print_comparison(rows: list[dict], threshold: float) -> None:
+    print(f"{'case':<40}{'before us':>12}{'after us':>12}{'change':>9}  status (threshold ±{threshold:.0%})")
+    for row in rows:
+        if "ratio" not in row:
+            print(f"{row['case']:<40}{'':>12}{'':>12}{'':>9}  {row['status']}")
+            continue
+        print(f"{row['case']:<40}{row['before_us']:>12.2f}{row['after_us']:>12.2f}"
+              f"{row['ratio'] - 1:>+9.1%}  {row['status']}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--filter", help="only cases whose name contains this")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--min-time", type=float, default=0.2, help="seconds per timing run")
+    parser.add_argument("--save", help="write the results as a baseline JSON file")
+    parser.add_argument("--compare", metavar="BASELINE", help="compare against this baseline")
+    parser.add_argument("--against", metavar="RESULTS", help="with --compare: a saved file instead of a fresh run")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="allowed slowdown, e.g. 0.15")
+    args = parser.parse_args()
+
+    if args.against:
+        current = _load(args.against)
+    else:
+        current = {"environment": environment(), "results": run_cases(args.filter, args.repeat, args.min_time)}
+        current["created_at"] = datetime.now(timezone.utc).isoformat(timespec="seconds")
+        print_results(current["results"])
+
+    if args.save:
+        Path(args.save).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.save).write_text(json.dumps(current, indent=2) + "\n")
+        print(f"\nbaseline written to {args.save}")
+
+    if args.compare:
+        baseline = _load(args.compare)
+        if baseline.get("environment") != current.get("environment"):
+            print("\nwarning: baseline was recorded on a different machine or Python; compare with care")
+        results = current["results"]
+        base_results = baseline["results"]
+        if args.filter:
+            base_results = {k: v for k, v in base_results.items() if args.filter in k}
+        rows = compare(base_results, results, args.threshold)
+        print()
+        print_comparison(rows, args.threshold)
+        regressions = [r["case"] for r in rows if r["status"] == "regression"]
+        if regressions:
+            sys.exit(f"\n{len(regressions)} regression(s): {', '.join(regressions)}")
+
+
+if __name__ == "__main__":
+    main()
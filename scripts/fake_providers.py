@@ -0,0 +1,350 @@
+"""
+scripts/fake_providers.py
+-------------------------
+Local stand-ins for the OpenAI, Anthropic and Gemini HTTP APIs, for load
+tests (scripts/load_test.py) that must not spend money at real providers.
+
+Each provider gets its own server speaking just enough of its wire format
+for the official SDKs used by LLMCompletionClient and GeminiPromptProfiler:
+
+    openai     POST /v1/chat/completions                  OPENAI_BASE_URL=<url>/v1
+    anthropic  POST /v1/messages                          ANTHROPIC_BASE_URL=<url>
+    gemini     POST /{version}/models/{model}:generateContent   GEMINI_BASE_URL=<url>
+
+Behaviour per provider (FakeProviderConfig):
+- time to first token: lognormal around latency_ms (shape latency_sigma)
+- generation: output_tokens (±50%) at tokens_per_s, added to the response
+  time; the router makes non-streaming calls, so streaming speed shows up
+  as total response time
+- error_rate: share of requests answered 500 after the first-token delay
+- rate_limit_rate: share answered 429 immediately
+- 429 bursts: every burst_every_s seconds, burst_for_s seconds during which
+  every request gets 429 (with Retry-After)
+
+Gemini requests that carry the profiler's classifier instruction get a
+PromptProfile JSON whose task_type is guessed from keywords, so /v1/prompts
+works end to end.
+
+Waiting is asyncio.sleep, so one server holds thousands of concurrent calls.
+
+Run (standalone, e.g. against a router started by hand):
+python -m scripts.fake_providers --port 9100 --latency-ms 600 --error-rate 0.02
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import random
+import socket
+import threading
+import time
+import uuid
+from collections import Counter
+from dataclasses import asdict, dataclass, fields
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+PROVIDERS = ("openai", "anthropic", "gemini")
+CLASSIFIER_MARKER = "You are a prompt classifier"
+WORDS = ("route", "token", "model", "budget", "latency", "fallback", "provider", "cache", "request", "answer")
+
+
+@dataclass
+class FakeProviderConfig:
+    latency_ms: float = 400.0       # median time to first token
+    latency_sigma: float = 0.5      # lognormal shape; 0 = constant
+    tokens_per_s: float = 80.0      # generation speed
+    output_tokens: int = 200        # mean completion length
+    error_rate: float = 0.0         # 500 after the first-token delay
+    rate_limit_rate: float = 0.0    # 429 straight away
+    burst_every_s: float = 0.0      # 0 = no 429 bursts
+    burst_for_s: float = 2.0
+    retry_after_s: float = 1.0
+    seed: int | None = None
+
+
+class FakeProvider:
+    """Response timing, failure injection and counters for one provider."""
+
+    def __init__(self, name: str, config: FakeProviderConfig):
+        if name not in PROVIDERS:
+            raise ValueError(f"Unsupported provider: {name}")
+        self.name = name
+        self.config = config
+        self.rng = random.Random(config.seed)
+        self.started = time.monotonic()
+        self.counts: Counter[str] = Counter()
+
+    def in_burst(self) -> bool:
+        c = self.config
+        return c.burst_every_s > 0 and (time.monotonic() - self.started) % c.burst_every_s < c.burst_for_s
+
+    def first_token_s(self) -> float:
+        c = self.config
+        return c.latency_ms / 1000 * (self.rng.lognormvariate(0, c.latency_sigma) if c.latency_sigma else 1)
+
+    def output_length(self) -> int:
+        return max(1, int(self.config.output_tokens * self.rng.uniform(0.5, 1.5)))
+
+    async def handle(self, prompt: str, model: str, web: bool = False) -> JSONResponse:
+        c = self.config
+        self.counts["requests"] += 1
+        if self.in_burst() or self.rng.random() < c.rate_limit_rate:
+            self.counts["429"] += 1
+            return _error(self.name, 429, "Rate limit exceeded (fake)", {"retry-after": f"{c.retry_after_s:g}"})
+        delay = self.first_token_s()
+        if self.rng.random() < c.error_rate:
+            await asyncio.sleep(delay)
+            self.counts["500"] += 1
+            return _error(self.name, 500, "Internal server error (fake)")
+
+        input_tokens = max(1, len(prompt) // 4)
+        if CLASSIFIER_MARKER in prompt:
+            text = json.dumps(classify(prompt))
+            output_tokens = len(text) // 4
+        else:
+            output_tokens = self.output_length()
+            text = " ".join(self.rng.choice(WORDS) for _ in range(output_tokens))
+        await asyncio.sleep(delay + output_tokens / c.tokens_per_s)
+        self.counts["ok"] += 1
+        return JSONResponse(_body(self.name, model, text, input_tokens, output_tokens, web))
+
+
+def classify(prompt: str) -> dict:
+    """A plausible PromptProfile for the profiler's classifier call."""
+    quoted = prompt.split("Classify this prompt:", 1)[-1].lower()
+    needs_web = any(w in quoted for w in ("latest", "today", "current", "news"))
+    if needs_web:
+        task = "web_search"
+    elif any(w in quoted for w in ("code", "function", "bug", "sql", "python")):
+        task = "coding"
+    elif "summar" in quoted:
+        task = "summarization"
+    elif "extract" in quoted:
+        task = "extraction"
+    else:
+        task = "text_generation"
+    return {
+        "task_type": task,
+        "needs_web": needs_web,
+        "needs_code": task == "coding",
+        "output_format": "json" if "json" in quoted else "text",
+        "urgency": "fast" if any(w in quoted for w in ("quick", "asap", "urgent")) else "normal",
+        "confidence": 0.9,
+    }
+
+
+def _error(provider: str, status: int, message: str, headers: dict | None = None) -> JSONResponse:
+    if provider == "anthropic":
+        kind = "rate_limit_error" if status == 429 else "api_error"
+        body = {"type": "error", "error": {"type": kind, "message": message}}
+    elif provider == "gemini":
+        kind = "RESOURCE_EXHAUSTED" if status == 429 else "INTERNAL"
+        body = {"error": {"code": status, "message": message, "status": kind}}
+    else:
+        kind = "rate_limit_exceeded" if status == 429 else "server_error"
+        body = {"error": {"message": message, "type": kind, "code": kind}}
+    return JSONResponse(body, status_code=status, headers=headers)
+
+
+def _body(provider: str, model: str, text: str, input_tokens: int, output_tokens: int, web: bool) -> dict:
+    if provider == "openai":
+        return {
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+            "usage": {
+                "prompt_tokens": input_tokens,
+                "completion_tokens": output_tokens,
+                "total_tokens": input_tokens + output_tokens,
+            },
+        }
+    if provider == "anthropic":
+        return {
+            "id": f"msg_{uuid.uuid4().hex}",
+            "type": "message",
+            "role": "assistant",
+            "model": model,
+            "content": [{"type": "text", "text": text}],
+            "stop_reason": "end_turn",
+            "stop_sequence": None,
+            "usage": {"input_tokens": input_tokens, "output_tokens": output_tokens},
+        }
+    candidate = {"content": {"role": "model", "parts": [{"text": text}]}, "finishReason": "STOP", "index": 0}
+    if web:
+        candidate["groundingMetadata"] = {
+            "groundingChunks": [{"web": {"uri": "https://example.com/fake", "title": "Fake source"}}],
+        }
+    return {
+        "candidates": [candidate],
+        "usageMetadata": {
+            "promptTokenCount": input_tokens,
+            "candidatesTokenCount": output_tokens,
+            "totalTokenCount": input_tokens + output_tokens,
+        },
+        "modelVersion": model,
+    }
+
+
+def _text(content) -> str:
+    """Message content as a string: plain, or a list of text blocks/parts."""
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        return "\n".join(_text(part) for part in content)
+    if isinstance(content, dict):
+        return content.get("text") or _text(content.get("parts") or content.get("content") or "")
+    return ""
+
+
+def make_app(provider: FakeProvider) -> FastAPI:
+    app = FastAPI(title=f"fake {provider.name}")
+    app.state.provider = provider
+
+    if provider.name == "openai":
+        @app.post("/v1/chat/completions")
+        async def chat_completions(request: Request):
+            body = await request.json()
+            return await provider.handle(_text(body.get("messages", [])), body.get("model", ""))
+
+    elif provider.name == "anthropic":
+        @app.post("/v1/messages")
+        async def messages(request: Request):
+            body = await request.json()
+            return await provider.handle(_text(body.get("messages", [])), body.get("model", ""))
+
+    else:
+        @app.post("/{version}/models/{target:path}")
+        async def generate_content(version: str, target: str, request: Request):
+            model, _, method = target.partition(":")
+            if method != "generateContent":
+                return _error("gemini", 404, f"Unsupported method: {method}")
+            body = await request.json()
+            web = any("googleSearch" in tool or "google_search" in tool for tool in body.get("tools", []))
+            return await provider.handle(_text(body.get("contents", [])), model, web=web)
+
+    @app.get("/_stats")
+    async def stats():
+        return dict(provider.counts)
+
+    return app
+
+
+class FakeProviderServer:
+    """A fake provider on its own uvicorn server, in a background thread."""
+
+    def __init__(self, name: str, config: FakeProviderConfig | None = None, host: str = "127.0.0.1", port: int = 0):
+        self.provider = FakeProvider(name, config or FakeProviderConfig())
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._socket.bind((host, port))
+        self.host, self.port = self._socket.getsockname()
+        self._server = uvicorn.Server(uvicorn.Config(
+            make_app(self.provider), log_level="warning", access_log=False, backlog=4096,
+        ))
+        self._thread = threading.Thread(
+            target=self._server.run, kwargs={"sockets": [self._socket]}, name=f"fake-{name}", daemon=True,
+        )
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    @property
+    def base_url(self) -> str:
+        """What the SDK's base URL has to be set to."""
+        return f"{self.url}/v1" if self.provider.name == "openai" else self.url
+
+    def start(self, timeout: float = 10.0) -> FakeProviderServer:
+        self._thread.start()
+        deadline = time.monotonic() + timeout
+        while not self._server.started:
+            if time.monotonic() > deadline or not self._thread.is_alive():
+                raise RuntimeError(f"fake {self.provider.name} server did not start")
+            time.sleep(0.01)
+        return self
+
+    def stop(self) -> None:
+        self._server.should_exit = True
+        self._thread.join(timeout=10)
+        self._socket.close()
+
+
+BASE_URL_ENV = {"openai": "OPENAI_BASE_URL", "anthropic": "ANTHROPIC_BASE_URL", "gemini": "GEMINI_BASE_URL"}
+API_KEY_ENV = {"openai": "OPENAI_API_KEY", "anthropic": "ANTHROPIC_API_KEY", "gemini": "GEMINI_API_KEY"}
+
+
+def start_fake_providers(
+    configs: dict[str, FakeProviderConfig], host: str = "127.0.0.1", port: int = 0,
+) -> dict[str, FakeProviderServer]:
+    """One server per provider; with a fixed port, providers take port, port+1, port+2."""
+    servers = {}
+    for i, name in enumerate(PROVIDERS):
+        servers[name] = FakeProviderServer(name, configs.get(name), host, port + i if port else 0).start()
+    return servers
+
+
+def router_env(servers: dict[str, FakeProviderServer]) -> dict[str, str]:
+    """Environment that points the router's SDK clients at the fakes."""
+    env = {}
+    for name, server in servers.items():
+        env[BASE_URL_ENV[name]] = server.base_url
+        env[API_KEY_ENV[name]] = f"fake-{name}-key"
+    return env
+
+
+def add_config_arguments(parser: argparse.ArgumentParser) -> None:
+    """--latency-ms, --error-rate, ... for every provider, plus per-provider JSON overrides."""
+    defaults = FakeProviderConfig()
+    for f in fields(FakeProviderConfig):
+        if f.name == "seed":
+            continue
+        parser.add_argument(f"--{f.name.replace('_', '-')}", type=float, default=getattr(defaults, f.name))
+    parser.add_argument(
+        "--provider-config", action="append", default=[], metavar="NAME=JSON",
+        help='per-provider override, e.g. openai=\'{"rate_limit_rate": 0.2}\' (repeatable)',
+    )
+    parser.add_argument("--seed", type=int, default=None)
+
+
+def configs_from_args(args: argparse.Namespace) -> dict[str, FakeProviderConfig]:
+    base = {f.name: getattr(args, f.name) for f in fields(FakeProviderConfig)}
+    base["output_tokens"] = int(base["output_tokens"])
+    overrides: dict[str, dict] = {}
+    for item in args.provider_config:
+        name, _, raw = item.partition("=")
+        if name not in PROVIDERS:
+            raise SystemExit(f"--provider-config: unknown provider {name!r}")
+        overrides[name] = json.loads(raw)
+    return {name: FakeProviderConfig(**{**base, **overrides.get(name, {})}) for name in PROVIDERS}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100, help="openai on PORT, anthropic PORT+1, gemini PORT+2")
+    add_config_arguments(parser)
+    args = parser.parse_args()
+
+    configs = configs_from_args(args)
+    servers = start_fake_providers(configs, args.host, args.port)
+    for name, server in servers.items():
+        print(f"fake {name:<10} {server.url}  {json.dumps(asdict(configs[name]))}")
+    print("\nPoint the router at them with:")
+    for key, value in router_env(servers).items():
+        print(f"export {key}={value}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        for server in servers.values():
+            server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,314 @@
+"""
+scripts/load_test.py
+--------------------
+End-to-end load test of the router against local fake providers.
+
+Measures the router's own capacity (routing, profiling round trip, DB
+writes, scheduler, fallback) without paying for real provider calls:
+
+1. starts fake OpenAI / Anthropic / Gemini servers (scripts/fake_providers.py)
+   with the latency, error-rate and 429-burst settings given here
+2. seeds a temporary SQLite database with a catalog spanning all three
+3. starts the router (scripts/serve.py, --workers N) with OPENAI_BASE_URL,
+   ANTHROPIC_BASE_URL and GEMINI_BASE_URL pointing at the fakes
+4. drives POST /v1/prompts then POST /v1/completions for each simulated
+   request, as an open-loop Poisson arrival process at --rps. Prompt sizes
+   are lognormal (median --prompt-chars, long tail, capped at 32k chars),
+   across coding / writing / summarization / extraction / web prompts
+5. reports throughput, p50/p95/p99 per endpoint and end to end, status
+   codes, fallback counts (CompletionResponse.attempts > 1), which provider
+   answered, and what each fake provider saw
+
+Open loop: arrivals do not wait for earlier requests, so a saturated router
+shows up as growing latency and errors rather than a lower offered rate.
+--max-in-flight bounds client memory; arrivals beyond it are counted as
+"shed" and never sent.
+
+With --router-url the router is not started (nor is a database seeded);
+start it yourself with the env printed by `python -m scripts.fake_providers`.
+
+Run:
+python -m scripts.load_test --rps 50 --duration 30
+python -m scripts.load_test --rps 200 --workers 4 --latency-ms 800 \\
+    --provider-config openai='{"burst_every_s": 20, "burst_for_s": 5}' --json load.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import httpx
+from sqlalchemy.orm import sessionmaker
+
+from app.db.migrations import upgrade
+from app.db.model_catalog_models import ModelCatalog
+from app.db.session import make_engine
+from app.services.attempt_analytics import percentiles
+from scripts.fake_providers import add_config_arguments, configs_from_args, router_env, start_fake_providers
+
+REPORT_PERCENTILES = (50, 95, 99)
+MAX_PROMPT_CHARS = 32_000
+
+# Same shape as scripts/seed_model_catalog.py, plus Anthropic so every fake sees traffic
+LOADTEST_CATALOG = [
+    dict(key="gemini_flash", provider="gemini", model="models/gemini-2.5-flash", cost_tier="low",
+         latency_hint="fast", supports_web=True, good_for_code=True, in_per_1m=0.30, out_per_1m=2.50),
+    dict(key="gemini_pro", provider="gemini", model="models/gemini-1.5-pro", cost_tier="medium",
+         latency_hint="normal", good_for_code=True, in_per_1m=1.25, out_per_1m=5.00),
+    dict(key="openai_mini", provider="openai", model="gpt-4o-mini", cost_tier="low",
+         latency_hint="fast", good_for_code=True, in_per_1m=0.15, out_per_1m=0.60),
+    dict(key="anthropic_haiku", provider="anthropic", model="claude-haiku-4-5", cost_tier="low",
+         latency_hint="fast", good_for_code=True, in_per_1m=0.80, out_per_1m=4.00),
+]
+
+# (weight, opening line); the classifier fake keys on these words
+PROMPT_KINDS = [
+    (0.35, "Write a Python function that {topic}. Explain the code."),
+    (0.25, "Write a short blog post about {topic}."),
+    (0.20, "Summarize the following notes about {topic}:"),
+    (0.15, "Extract every date and company name mentioned below about {topic}:"),
+    (0.05, "What is the latest news today about {topic}?"),
+]
+TOPICS = ("rate limiting", "database indexes", "LLM routing", "budget alerts", "cache eviction", "retry storms")
+FILLER = (
+    "The service receives a burst of requests every few minutes and the queue depth grows until the "
+    "workers catch up. Each request carries a user id, a prompt and a routing profile. "
+)
+
+
+class PromptFactory:
+    def __init__(self, rng: random.Random, median_chars: int):
+        self.rng = rng
+        self.median_chars = median_chars
+        self.weights = [w for w, _ in PROMPT_KINDS]
+
+    def make(self) -> str:
+        _, template = self.rng.choices(PROMPT_KINDS, weights=self.weights)[0]
+        head = template.format(topic=self.rng.choice(TOPICS))
+        size = min(MAX_PROMPT_CHARS, int(self.median_chars * self.rng.lognormvariate(0, 1.0)))
+        body = (FILLER * (size // len(FILLER) + 1))[: max(0, size - len(head))]
+        return f"{head}\n\n{body}".strip()
+
+
+@dataclass
+class EndpointStats:
+    latencies_ms: list[float] = field(default_factory=list)
+    statuses: Counter = field(default_factory=Counter)
+
+    def add(self, status: int | str, ms: float) -> None:
+        self.statuses[str(status)] += 1
+        if status == 200:
+            self.latencies_ms.append(ms)
+
+    def summary(self, elapsed: float) -> dict:
+        ok = self.statuses["200"]
+        return {
+            "requests": sum(self.statuses.values()),
+            "ok": ok,
+            "ok_per_s": round(ok / elapsed, 2) if elapsed else None,
+            "statuses": dict(self.statuses),
+            "latency_ms": percentiles(self.latencies_ms, REPORT_PERCENTILES),
+        }
+
+
+@dataclass
+class LoadResults:
+    prompts: EndpointStats = field(default_factory=EndpointStats)
+    completions: EndpointStats = field(default_factory=EndpointStats)
+    end_to_end: EndpointStats = field(default_factory=EndpointStats)
+    attempts: Counter = field(default_factory=Counter)
+    answered_by: Counter = field(default_factory=Counter)
+    offered: int = 0
+    shed: int = 0
+    duration: float = 0.0   # arrival window
+    elapsed: float = 0.0    # until the last response
+
+    def report(self) -> dict:
+        completed = self.completions.statuses["200"]
+        return {
+            "elapsed_s": round(self.elapsed, 2),
+            "offered": self.offered,
+            "offered_rps": round(self.offered / self.duration, 2) if self.duration else None,
+            "shed": self.shed,
+            "prompts": self.prompts.summary(self.elapsed),
+            "completions": self.completions.summary(self.elapsed),
+            "end_to_end": self.end_to_end.summary(self.elapsed),
+            "needed_fallback": sum(n for a, n in self.attempts.items() if a > 1),
+            "needed_fallback_share": round(
+                sum(n for a, n in self.attempts.items() if a > 1) / completed, 4) if completed else None,
+            "attempts": {str(k): v for k, v in sorted(self.attempts.items())},
+            "answered_by": dict(self.answered_by),
+        }
+
+
+async def one_request(client: httpx.AsyncClient, prompt: str, results: LoadResults) -> None:
+    start = time.perf_counter()
+    try:
+        resp = await client.post("/v1/prompts", json={"prompt": prompt, "username": "loadtest"})
+        status = resp.status_code
+    except httpx.HTTPError as e:
+        resp, status = None, type(e).__name__
+    after_prompt = time.perf_counter()
+    results.prompts.add(status, (after_prompt - start) * 1000)
+    if status != 200:
+        results.end_to_end.add(status, 0)
+        return
+
+    try:
+        resp = await client.post("/v1/completions", json={"prompt_id": resp.json()["prompt_id"]})
+        status = resp.status_code
+    except httpx.HTTPError as e:
+        resp, status = None, type(e).__name__
+    end = time.perf_counter()
+    results.completions.add(status, (end - after_prompt) * 1000)
+    results.end_to_end.add(status, (end - start) * 1000)
+    if status == 200:
+        body = resp.json()
+        results.attempts[body["attempts"]] += 1
+        results.answered_by[f"{body['provider']}/{body['model']}"] += 1
+
+
+async def drive(base_url: str, rps: float, duration: float, max_in_flight: int, prompts: PromptFactory,
+                rng: random.Random) -> LoadResults:
+    """Poisson arrivals at `rps` for `duration` seconds; waits for stragglers."""
+    results = LoadResults(duration=duration)
+    in_flight: set[asyncio.Task] = set()
+    limits = httpx.Limits(max_connections=max_in_flight, max_keepalive_connections=max_in_flight)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=300) as client:
+        start = time.perf_counter()
+        next_at = start
+        while True:
+            next_at += rng.expovariate(rps)
+            if next_at - start >= duration:
+                break
+            await asyncio.sleep(max(0.0, next_at - time.perf_counter()))
+            results.offered += 1
+            if len(in_flight) >= max_in_flight:
+                results.shed += 1
+                continue
+            task = asyncio.create_task(one_request(client, prompts.make(), results))
+            in_flight.add(task)
+            task.add_done_callback(in_flight.discard)
+        if in_flight:
+            await asyncio.gather(*in_flight)
+        results.elapsed = time.perf_counter() - start
+    return results
+
+
+def seed_database(url: str) -> None:
+    engine = make_engine(url)
+    upgrade(engine)
+    with sessionmaker(bind=engine)() as db:
+        db.add_all(ModelCatalog(**row) for row in LOADTEST_CATALOG)
+        db.commit()
+    engine.dispose()
+
+
+def start_router(port: int, workers: int, env: dict[str, str], log_path: Path) -> subprocess.Popen:
+    cmd = [sys.executable, "-m", "scripts.serve", "--host", "127.0.0.1", "--port", str(port),
+           "--workers", str(workers), "--no-access-log"]
+    log = open(log_path, "w")
+    return subprocess.Popen(cmd, env={**os.environ, **env}, stdout=log, stderr=subprocess.STDOUT)
+
+
+def wait_ready(base_url: str, router: subprocess.Popen | None, timeout: float = 60.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if router is not None and router.poll() is not None:
+            raise RuntimeError(f"router exited with code {router.returncode}")
+        try:
+            if httpx.get(f"{base_url}/metrics", timeout=1).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"router at {base_url} not ready after {timeout:.0f}s")
+
+
+def print_report(report: dict, fakes: dict[str, dict]) -> None:
+    print(f"\n{report['offered']} requests offered ({report['offered_rps']}/s), {report['shed']} shed by the "
+          f"client, last response after {report['elapsed_s']}s\n")
+    print(f"{'endpoint':<14}{'requests':>10}{'ok':>8}{'ok/s':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}  statuses")
+    for name in ("prompts", "completions", "end_to_end"):
+        s = report[name]
+        p = s["latency_ms"]
+        cells = "".join(f"{(v if v is not None else '-'):>10}" for v in (p["p50"], p["p95"], p["p99"]))
+        print(f"{name:<14}{s['requests']:>10}{s['ok']:>8}{s['ok_per_s'] or 0:>9}{cells}  {s['statuses']}")
+    print(f"\nneeded fallback: {report['needed_fallback']} ({report['needed_fallback_share']}), "
+          f"attempts per completion: {report['attempts']}")
+    print(f"answered by: {report['answered_by']}")
+    print("\nfake providers:")
+    for name, counts in fakes.items():
+        print(f"  {name:<10} {counts}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rps", type=float, default=20.0, help="offered requests per second (prompt + completion)")
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds of arrivals")
+    parser.add_argument("--max-in-flight", type=int, default=1000)
+    parser.add_argument("--prompt-chars", type=int, default=600, help="median prompt size")
+    parser.add_argument("--workers", type=int, default=1, help="router worker processes")
+    parser.add_argument("--router-port", type=int, default=8765)
+    parser.add_argument("--router-url", help="use an already running router instead of starting one")
+    parser.add_argument("--json", help="also write the report to this file")
+    add_config_arguments(parser)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    fakes = start_fake_providers(configs_from_args(args))
+    router = None
+    tmp = Path(tempfile.mkdtemp(prefix="byok-load-"))
+    base_url = args.router_url
+    try:
+        if base_url is None:
+            db_url = f"sqlite:///{tmp / 'load.db'}"
+            seed_database(db_url)
+            env = {
+                **router_env(fakes),
+                "DATABASE_URL": db_url,
+                "LEADER_LOCK_PATH": str(tmp / "leader.lock"),
+                "SESSION_BACKEND": "db",
+            }
+            router = start_router(args.router_port, args.workers, env, tmp / "router.log")
+            base_url = f"http://127.0.0.1:{args.router_port}"
+        else:
+            print("Using the running router; its provider base URLs must point at:")
+            for key, value in router_env(fakes).items():
+                print(f"  {key}={value}")
+        wait_ready(base_url, router)
+
+        print(f"Driving {base_url} at {args.rps:g} rps for {args.duration:g}s ...")
+        results = asyncio.run(drive(
+            base_url, args.rps, args.duration, args.max_in_flight, PromptFactory(rng, args.prompt_chars), rng,
+        ))
+        report = results.report()
+        report["fake_providers"] = {name: dict(server.provider.counts) for name, server in fakes.items()}
+        print_report(report, report["fake_providers"])
+        if args.json:
+            Path(args.json).write_text(json.dumps(report, indent=2))
+    finally:
+        if router is not None:
+            router.terminate()
+            try:
+                router.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                router.kill()
+            print(f"\nrouter log: {tmp / 'router.log'}")
+        for server in fakes.values():
+            server.stop()
+
+
+if __name__ == "__main__":
+    main()
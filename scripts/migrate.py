@@ -0,0 +1,47 @@
+"""
+scripts/migrate.py
+------------------
+Bring the database schema up to date (see app/db/migrations.py).
+
+Run it once per deploy, before starting the API workers; the workers only
+check the recorded version and refuse to start on an out-of-date schema.
+
+Run:
+python -m scripts.migrate
+python -m scripts.migrate --status
+python -m scripts.migrate --target 3
+"""
+
+import argparse
+import logging
+
+from app.db.migrations import HEAD, MIGRATIONS, current_version, upgrade
+from app.db.session import engine
+
+
+def _status() -> None:
+    version = current_version(engine)
+    print(f"database: {'unversioned' if version is None else version}   code (HEAD): {HEAD}")
+    for migration in MIGRATIONS:
+        mark = "applied" if version is not None and migration.version <= version else "pending"
+        print(f"  {migration.version:>4}  {mark:<8} {migration.description}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--status", action="store_true", help="show the recorded version and pending migrations")
+    parser.add_argument("--target", type=int, help=f"migrate up to this version (default HEAD = {HEAD})")
+    args = parser.parse_args()
+
+    if args.status:
+        _status()
+        return
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    applied = upgrade(engine, args.target)
+    print(f"Applied: {', '.join(map(str, applied))}" if applied else "Nothing to apply")
+    print(f"Schema version: {current_version(engine)}")
+
+
+if __name__ == "__main__":
+    main()
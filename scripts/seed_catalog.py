@@ -1,12 +1,12 @@
 from sqlalchemy.orm import Session
 from app.db.session import SessionLocal, engine
-from app.db.base import Base
+from app.db.migrations import upgrade
 from app.db import models  # noqa: F401  ensures models are registered
 from app.db.models import User, Budget, ModelCatalog
 
 def seed():
     # ✅ Ensure tables exist even when FastAPI server is not running
-    Base.metadata.create_all(bind=engine)
+    upgrade(engine)
 
     db: Session = SessionLocal()
 
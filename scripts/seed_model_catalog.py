@@ -1,7 +1,7 @@
 """
 scripts/seed_model_catalog.py
 -----------------------------
-Populate models_catalog with default entries.
+Populate models_catalog with default entries (USD per 1M tokens, list prices).
 
 Run:
 python scripts/seed_model_catalog.py
@@ -21,6 +21,8 @@ DEFAULT_MODELS = [
         supports_web=False,
         supports_json=True,
         good_for_code=True,
+        in_per_1m=0.30,
+        out_per_1m=2.50,
     ),
     ModelCatalog(
         key="gemini_pro",
@@ -31,6 +33,8 @@ DEFAULT_MODELS = [
         supports_web=False,
         supports_json=True,
         good_for_code=True,
+        in_per_1m=1.25,
+        out_per_1m=5.00,
     ),
     ModelCatalog(
         key="openai_mini",
@@ -41,6 +45,8 @@ DEFAULT_MODELS = [
         supports_web=False,
         supports_json=True,
         good_for_code=True,
+        in_per_1m=0.15,
+        out_per_1m=0.60,
     ),
 ]
 
@@ -52,6 +58,9 @@ def main() -> None:
             exists = db.query(ModelCatalog).filter(ModelCatalog.key == m.key).first()
             if not exists:
                 db.add(m)
+            elif exists.in_per_1m is None:
+                # Rows seeded before pricing existed
+                exists.in_per_1m, exists.out_per_1m = m.in_per_1m, m.out_per_1m
         db.commit()
         print("✅ Seeded models_catalog")
     finally:
@@ -0,0 +1,102 @@
+"""
+scripts/serve.py
+----------------
+Production entrypoint: several uvicorn worker processes behind one socket.
+
+`make run` (uvicorn --reload, one process) is for development. This runs
+WEB_CONCURRENCY workers with uvloop + httptools, a keep-alive longer than
+a typical load balancer idle timeout, and a graceful shutdown that lets
+in-flight LLM calls finish before each worker exits.
+
+Before any worker starts, the supervisor process:
+  - refuses settings that only work in one process (see check_shared_state
+    and docs/DEPLOYMENT.md)
+  - imports app.main once, so a broken deploy fails here rather than in
+    every worker, and the bytecode cache is warm for the workers
+  - runs the schema check once, so workers never race to create tables
+uvicorn spawns (not forks) its workers, so each one still imports the app
+itself; nothing but the listening socket is shared.
+
+SIGTERM / SIGINT: workers stop accepting, wait up to --graceful-timeout for
+running requests, then run the lifespan shutdown (flush write-behind queue
+and budget ledger).
+
+Run:
+python -m scripts.serve
+WEB_CONCURRENCY=8 python -m scripts.serve --port 8080
+"""
+
+import argparse
+import importlib.util
+import os
+import sys
+
+import uvicorn
+
+
+def check_shared_state(workers: int, env=os.environ) -> list[str]:
+    """Settings that break once requests are spread over several processes."""
+    if workers <= 1:
+        return []
+    problems = []
+    if env.get("SESSION_BACKEND", "memory").lower() != "db":
+        # session mode: a login on one worker is unknown to the others;
+        # signed mode: a logout (revocation) is only seen by one worker
+        problems.append("SESSION_BACKEND=db is required with more than one worker")
+    return problems
+
+
+def preload() -> None:
+    """Import the app and bring the schema up once, in the supervisor."""
+    import app.main  # noqa: F401  fail fast on import errors
+    from app.db.migrations import ensure_schema
+    from app.db.session import engine
+
+    ensure_schema(engine)
+    engine.dispose()  # workers open their own connections
+
+
+def _installed(module: str, name: str) -> str:
+    return name if importlib.util.find_spec(module) else "auto"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", 8000)))
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WEB_CONCURRENCY", os.cpu_count() or 1)))
+    parser.add_argument("--keep-alive", type=int, default=int(os.getenv("KEEPALIVE_S", 75)),
+                        help="idle keep-alive seconds; keep above the load balancer's idle timeout")
+    parser.add_argument("--backlog", type=int, default=int(os.getenv("BACKLOG", 2048)),
+                        help="listen() backlog (also capped by net.core.somaxconn)")
+    parser.add_argument("--graceful-timeout", type=int, default=int(os.getenv("GRACEFUL_TIMEOUT_S", 90)),
+                        help="seconds a stopping worker waits for in-flight requests")
+    parser.add_argument("--max-requests", type=int, default=int(os.getenv("MAX_REQUESTS", 0)),
+                        help="recycle a worker after this many requests (0 = never)")
+    parser.add_argument("--no-access-log", action="store_true", help="skip per-request access logging")
+    args = parser.parse_args()
+
+    problems = check_shared_state(args.workers)
+    if problems:
+        sys.exit("Refusing to start:\n  " + "\n  ".join(problems))
+
+    preload()
+    uvicorn.run(
+        "app.main:app",
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        loop=_installed("uvloop", "uvloop"),
+        http=_installed("httptools", "httptools"),
+        backlog=args.backlog,
+        timeout_keep_alive=args.keep_alive,
+        timeout_graceful_shutdown=args.graceful_timeout,
+        limit_max_requests=args.max_requests or None,
+        limit_max_requests_jitter=args.max_requests // 10,  # uvicorn >= 0.41
+        access_log=not args.no_access_log,
+        proxy_headers=True,
+    )
+
+
+if __name__ == "__main__":
+    main()
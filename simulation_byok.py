@@ -1,221 +1,584 @@
+"""
+simulation_byok.py
+------------------
+Discrete-event capacity simulator for the BYOK router.
+
+Simulated days of traffic run through the real routing code
+(DeterministicRouter + ModelSelector over a catalog), the budget tiering
+of app/services/budget_ledger.py, and the fallback loop of
+completion_service.py. It predicts throughput, tail latency, spend and
+budget exhaustion, so capacity can be planned before scaling.
+
+Model of one request:
+  arrival (Poisson, daily sine-wave rate, users Zipf-distributed)
+  -> router worker slot (bulkhead: router_workers in flight, router_queue
+     waiting, 503 beyond that)
+  -> profiling call to the profiler provider (like POST /v1/prompts)
+  -> route(profile, budget cap) -> candidates that fit the remaining budget
+     (402 when none do)
+  -> up to max_attempts provider calls, in router order. Each call:
+       RPM token bucket (429 straight away) -> provider concurrency slot
+       -> lognormal time to first token + output tokens / tokens_per_s
+       -> error with probability error_rate
+     Each attempt reserves the estimated cost and settles to the actual
+     cost, failed attempts included.
+
+Routing is deterministic in (task_type, flags, urgency, cost cap), so each
+decision is computed once by the real router and then reused. The event
+loop is a heap of plain generators; nothing sleeps for real. It runs tens
+of thousands of simulated requests per wall-clock second.
+
+Inputs come from SimConfig; a JSON file passed with --config overrides
+any part of it (see SimConfig.from_dict). The catalog defaults to
+DEFAULT_CATALOG; --catalog-from-db reads models_catalog from DATABASE_URL.
+
+Run:
+python simulation_byok.py --days 7
+python simulation_byok.py --days 30 --config capacity.json --json report.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import heapq
+import itertools
 import json
 import math
-from dataclasses import dataclass
-from typing import List, Optional, Dict, Any
+import random
+import time
+from bisect import bisect_right
+from collections import Counter, defaultdict, deque
+from dataclasses import asdict, dataclass, field, fields, is_dataclass
+from typing import Any, Generator
+
+from app.db.model_catalog_models import ModelCatalog
+from app.schemas.prompts import PromptProfile
+from app.services.attempt_analytics import percentiles
+from app.services.budget_ledger import cost_tier_cap
+from app.services.completion_service import MAX_FALLBACK_ATTEMPTS
+from app.services.deterministic_router import DeterministicRouter
+from app.services.model_selector import ModelSelector
+from app.services.usage_accounting import price_tokens
+
+DAY_S = 86_400.0
+MONTH_S = 30 * DAY_S
+REPORT_PERCENTILES = (50, 95, 99)
 
 
 # -----------------------------
-# 1) Data models
+# 1) Inputs
 # -----------------------------
-@dataclass(frozen=True)
-class Constraints:
-    require_json: bool = False
-    max_cost_usd: Optional[float] = None
-    latency: str = "standard"  # "fast" | "standard"
+@dataclass
+class TaskMix:
+    """Traffic share and request shape of one task_type."""
+    weight: float
+    prompt_tokens: float            # median; lognormal
+    output_tokens: float            # median; lognormal
+    needs_web: float = 0.0          # share of prompts that need web search
+    json_share: float = 0.0         # share asking for JSON output
+    fast_share: float = 0.2         # share with urgency "fast"
 
 
-@dataclass(frozen=True)
-class ModelSpec:
-    provider: str
-    model: str
-    supports_json: bool
-    latency: str
-    context_tokens: int
-    in_per_1m: float
-    out_per_1m: float
-    reliability_score: float  # used for fallback preference
+@dataclass
+class ProviderSpec:
+    ttft_ms: float = 500.0          # median time to first token
+    ttft_sigma: float = 0.5         # lognormal shape
+    tokens_per_s: float = 80.0
+    error_rate: float = 0.01        # failed call, after the first-token delay
+    rpm: float = 0.0                # requests per minute before 429 (0 = unlimited)
+    max_concurrency: int = 0        # calls in flight, e.g. SCHED_PROVIDER_MAX x workers (0 = unlimited)
 
 
-@dataclass
-class BudgetWallet:
-    monthly_budget_usd: float
-    spent_usd: float = 0.0
+def _default_mix() -> dict[str, TaskMix]:
+    return {
+        "coding": TaskMix(0.35, prompt_tokens=600, output_tokens=500),
+        "text_generation": TaskMix(0.25, prompt_tokens=200, output_tokens=600),
+        "summarization": TaskMix(0.20, prompt_tokens=2500, output_tokens=250),
+        "extraction": TaskMix(0.15, prompt_tokens=1500, output_tokens=200, json_share=0.6),
+        "web_search": TaskMix(0.05, prompt_tokens=100, output_tokens=400, needs_web=1.0),
+    }
 
-    def remaining(self) -> float:
-        return max(0.0, self.monthly_budget_usd - self.spent_usd)
 
-    def can_afford(self, est_cost: float) -> bool:
-        return est_cost <= self.remaining()
+def _default_providers() -> dict[str, ProviderSpec]:
+    return {
+        "gemini": ProviderSpec(ttft_ms=400, tokens_per_s=120, rpm=2000),
+        "openai": ProviderSpec(ttft_ms=500, tokens_per_s=80, rpm=5000),
+        "anthropic": ProviderSpec(ttft_ms=700, tokens_per_s=60, error_rate=0.015, rpm=1000),
+    }
 
-    def spend(self, amount: float) -> None:
-        self.spent_usd += amount
+
+@dataclass
+class SimConfig:
+    days: float = 1.0
+    base_rps: float = 2.0               # mean arrival rate
+    diurnal_amplitude: float = 0.5      # peak = base_rps * (1 + amplitude), at midday
+    mix: dict[str, TaskMix] = field(default_factory=_default_mix)
+    providers: dict[str, ProviderSpec] = field(default_factory=_default_providers)
+    router_workers: int = 32            # BULKHEAD_LLM_WORKERS x worker processes
+    router_queue: int = 64              # BULKHEAD_LLM_QUEUE x worker processes
+    profile_calls: bool = True          # each request is profiled first (POST /v1/prompts)
+    profiler_provider: str = "gemini"
+    profiler_model: str = "models/gemini-2.5-flash"
+    max_attempts: int = MAX_FALLBACK_ATTEMPTS
+    users: int = 200
+    user_skew: float = 1.1              # Zipf exponent of traffic per user
+    monthly_budget_usd: float | None = 20.0   # per user; None = unlimited
+    est_output_tokens: int = 1024       # BUDGET_EST_OUTPUT_TOKENS
+    seed: int | None = 1
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> SimConfig:
+        """Defaults overridden by `data`; mix/providers entries merge per key."""
+        config = cls()
+        for key, value in data.items():
+            if key == "mix":
+                config.mix.update({k: _merge(config.mix.get(k), TaskMix, v) for k, v in value.items()})
+            elif key == "providers":
+                config.providers.update({k: _merge(config.providers.get(k), ProviderSpec, v) for k, v in value.items()})
+            elif key in {f.name for f in fields(cls)}:
+                setattr(config, key, value)
+            else:
+                raise ValueError(f"Unknown simulation setting: {key}")
+        return config
+
+
+def _merge(current, kind, overrides: dict):
+    base = asdict(current) if current is not None else {}
+    return kind(**{**base, **overrides})
+
+
+# Same rows as scripts/seed_model_catalog.py, plus Anthropic and a web-capable Gemini entry
+DEFAULT_CATALOG = [
+    dict(key="gemini_flash", provider="gemini", model="models/gemini-2.5-flash", cost_tier="low",
+         latency_hint="fast", supports_web=True, good_for_code=True, in_per_1m=0.30, out_per_1m=2.50),
+    dict(key="gemini_pro", provider="gemini", model="models/gemini-1.5-pro", cost_tier="medium",
+         latency_hint="normal", good_for_code=True, in_per_1m=1.25, out_per_1m=5.00),
+    dict(key="openai_mini", provider="openai", model="gpt-4o-mini", cost_tier="low",
+         latency_hint="fast", good_for_code=True, in_per_1m=0.15, out_per_1m=0.60),
+    dict(key="openai_4o", provider="openai", model="gpt-4o", cost_tier="high",
+         latency_hint="normal", good_for_code=True, in_per_1m=2.50, out_per_1m=10.00),
+    dict(key="anthropic_sonnet", provider="anthropic", model="claude-sonnet-4-5", cost_tier="high",
+         latency_hint="normal", good_for_code=True, in_per_1m=3.00, out_per_1m=15.00),
+    dict(key="anthropic_haiku", provider="anthropic", model="claude-haiku-4-5", cost_tier="medium",
+         latency_hint="fast", good_for_code=True, in_per_1m=1.00, out_per_1m=5.00),
+]
+
+
+def default_catalog() -> list[ModelCatalog]:
+    return [ModelCatalog(supports_json=True, **row) for row in DEFAULT_CATALOG]
+
+
+def catalog_from_db() -> list[ModelCatalog]:
+    from sqlalchemy import select
+
+    from app.db.session import SessionLocal
+
+    with SessionLocal() as db:
+        rows = list(db.scalars(select(ModelCatalog).order_by(ModelCatalog.id)))
+        db.expunge_all()
+    return rows
 
 
 # -----------------------------
-# 2) Helpers: token + cost
+# 2) Event loop
 # -----------------------------
-def estimate_tokens(text: str) -> int:
-    # Simple heuristic for the simulation
-    return max(1, math.ceil(len(text) / 4))
+Process = Generator[Any, Any, Any]
 
 
-def estimate_cost_usd(spec: ModelSpec, in_tokens: int, out_tokens: int) -> float:
-    return (in_tokens / 1_000_000) * spec.in_per_1m + (out_tokens / 1_000_000) * spec.out_per_1m
+class Kernel:
+    """
+    Minimal discrete-event loop over generators. A process yields either a
+    float (sleep that many simulated seconds) or a command callable(kernel,
+    process) that decides when to resume it.
+    """
 
+    def __init__(self):
+        self.now = 0.0
+        self._heap: list = []
+        self._seq = itertools.count()
 
-def validate_json(text: str) -> None:
-    json.loads(text)
+    def at(self, delay: float, proc: Process, value: Any = None) -> None:
+        heapq.heappush(self._heap, (self.now + delay, next(self._seq), proc, value))
+
+    def spawn(self, proc: Process) -> None:
+        self.at(0.0, proc)
+
+    def step(self, proc: Process, value: Any = None) -> None:
+        try:
+            command = proc.send(value)
+        except StopIteration:
+            return
+        if command.__class__ is float:
+            self.at(command, proc)
+        else:
+            command(self, proc)
+
+    def run(self, until: float) -> None:
+        heap = self._heap
+        while heap and heap[0][0] <= until:
+            self.now, _, proc, value = heapq.heappop(heap)
+            self.step(proc, value)
+
+
+class Slots:
+    """Counting semaphore with a FIFO queue; capacity 0 = unlimited."""
+
+    def __init__(self, capacity: int, max_queue: int | None = None):
+        self.capacity = capacity
+        self.free = capacity
+        self.max_queue = max_queue
+        self.waiters: deque = deque()
+
+    def acquire(self):
+        """Command: resumes with True once a slot is held, False if the queue is full."""
+        def command(kernel: Kernel, proc: Process) -> None:
+            if self.capacity == 0:
+                kernel.step(proc, True)
+            elif self.free > 0:
+                self.free -= 1
+                kernel.step(proc, True)
+            elif self.max_queue is not None and len(self.waiters) >= self.max_queue:
+                kernel.step(proc, False)
+            else:
+                self.waiters.append(proc)
+        return command
+
+    def release(self, kernel: Kernel) -> None:
+        if self.capacity == 0:
+            return
+        if self.waiters:
+            kernel.at(0.0, self.waiters.popleft(), True)  # hand the slot over
+        else:
+            self.free += 1
+
+
+class TokenBucket:
+    """Requests-per-minute limit with a 10-second burst allowance."""
+
+    def __init__(self, rpm: float):
+        self.rate = rpm / 60
+        self.capacity = max(1.0, self.rate * 10)
+        self.tokens = self.capacity
+        self.updated = 0.0
+
+    def take(self, now: float) -> bool:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
 
 
 # -----------------------------
-# 3) Fake provider calls (simulate behavior)
+# 3) Statistics
 # -----------------------------
-class FakeProvider:
-    """
-    Simulates LLM calls.
-    Cheap model sometimes returns invalid JSON to trigger fallback.
-    """
-
-    async def generate(self, spec: ModelSpec, prompt: str, max_output_tokens: int, require_json: bool) -> str:
-        # "Cheap" model intentionally returns invalid JSON when require_json=True
-        if spec.model == "cheap-fast" and require_json:
-            return '{"ok": true, "note": "oops missing quote}'  # invalid JSON
+@dataclass
+class DayStats:
+    offered: int = 0
+    completed: int = 0
+    failed: int = 0                 # every attempt failed (502)
+    profile_failed: int = 0         # profiling call failed (no completion attempted)
+    rejected: int = 0               # router queue full (503)
+    budget_exceeded: int = 0        # nothing fits the budget (402)
+    cost_usd: float = 0.0
+    latencies_s: list[float] = field(default_factory=list)
 
-        # More reliable model returns valid JSON
-        if require_json:
-            return json.dumps({"ok": True, "provider": spec.provider, "model": spec.model})
 
-        return f"Hello from {spec.provider}/{spec.model}"
+@dataclass
+class ProviderStats:
+    calls: int = 0
+    ok: int = 0
+    errors: int = 0
+    rate_limited: int = 0
+    cost_usd: float = 0.0
 
 
 # -----------------------------
-# 4) Router: filter → score → choose → fallback
+# 4) Simulator
 # -----------------------------
-async def byok_generate(
-    prompt: str,
-    constraints: Constraints,
-    wallet: BudgetWallet,
-    catalog: List[ModelSpec],
-    provider: FakeProvider,
-    max_output_tokens: int = 200,
-) -> Dict[str, Any]:
-    in_tokens = estimate_tokens(prompt)
-    out_tokens = max_output_tokens
-
-    # Apply policy: clamp max output tokens for safety
-    max_output_tokens = min(max_output_tokens, 500)
-    out_tokens = max_output_tokens
-
-    # Step A: filter by capabilities/constraints
-    candidates = []
-    for m in catalog:
-        if constraints.require_json and not m.supports_json:
-            continue
-        if constraints.latency == "fast" and m.latency != "fast":
-            continue
-        if in_tokens + out_tokens > m.context_tokens:
-            continue
-        candidates.append(m)
-
-    if not candidates:
-        return {"status": "error", "reason": "No models satisfy constraints."}
-
-    # Step B: compute estimated cost, filter by max_cost and wallet budget
-    scored = []
-    for m in candidates:
-        est = estimate_cost_usd(m, in_tokens, out_tokens)
-        if constraints.max_cost_usd is not None and est > constraints.max_cost_usd:
-            continue
-        if not wallet.can_afford(est):
-            continue
-        # Score: prefer cheaper, then more reliable
-        score = (est, -m.reliability_score)
-        scored.append((score, est, m))
-
-    if not scored:
+class Simulator:
+    def __init__(self, config: SimConfig, catalog: list[ModelCatalog]):
+        self.config = config
+        self.rng = random.Random(config.seed)
+        self.kernel = Kernel()
+        self.entries = {m.key: m for m in catalog}
+        self.profiler_entry = next((m for m in catalog if m.model == config.profiler_model), None)
+        self.router = DeterministicRouter(selector=ModelSelector(catalog=catalog))
+        self.routes: dict[tuple, list] = {}
+        self.workers = Slots(config.router_workers, config.router_queue)
+        self.provider_slots = {n: Slots(p.max_concurrency) for n, p in config.providers.items()}
+        self.buckets = {n: TokenBucket(p.rpm) for n, p in config.providers.items() if p.rpm > 0}
+
+        self.tasks = list(config.mix)
+        self.task_cum = list(itertools.accumulate(config.mix[t].weight for t in self.tasks))
+        self.user_cum = list(itertools.accumulate(1 / (rank ** config.user_skew) for rank in range(1, config.users + 1)))
+        self.spent = [0.0] * config.users
+        self.reserved = [0.0] * config.users
+        self.month = 0
+        self.exhausted_at: dict[int, float] = {}  # user -> first 402 (simulated seconds)
+
+        self.days: list[DayStats] = [DayStats() for _ in range(max(1, math.ceil(config.days)))]
+        self.providers: dict[str, ProviderStats] = defaultdict(ProviderStats)
+        self.models: Counter[str] = Counter()
+        self.attempts: Counter[int] = Counter()
+        self.queue_wait_s: list[float] = []
+
+    # -- inputs -----------------------------------------------------------
+
+    def rate(self, t: float) -> float:
+        c = self.config
+        return c.base_rps * (1 + c.diurnal_amplitude * math.sin(2 * math.pi * t / DAY_S - math.pi / 2))
+
+    def arrivals(self, horizon: float) -> Process:
+        """Non-homogeneous Poisson arrivals (thinning against the peak rate)."""
+        peak = self.config.base_rps * (1 + abs(self.config.diurnal_amplitude))
+        rng = self.rng
+        t = 0.0
+        while True:
+            gap = rng.expovariate(peak)
+            t += gap
+            if t >= horizon:
+                return
+            yield gap
+            if rng.random() * peak <= self.rate(t):
+                self.kernel.spawn(self.request())
+
+    def draw_request(self) -> tuple[int, PromptProfile, int, int]:
+        rng = self.rng
+        user = bisect_right(self.user_cum, rng.random() * self.user_cum[-1])
+        task = self.tasks[bisect_right(self.task_cum, rng.random() * self.task_cum[-1])]
+        mix = self.config.mix[task]
+        profile = PromptProfile(
+            task_type=task,
+            needs_web=rng.random() < mix.needs_web,
+            needs_code=task == "coding",
+            output_format="json" if rng.random() < mix.json_share else "text",
+            urgency="fast" if rng.random() < mix.fast_share else "normal",
+            confidence=1.0,
+        )
+        prompt_tokens = max(1, int(mix.prompt_tokens * rng.lognormvariate(0, 0.8)))
+        output_tokens = max(1, int(mix.output_tokens * rng.lognormvariate(0, 0.6)))
+        return user, profile, prompt_tokens, output_tokens
+
+    def candidates(self, profile: PromptProfile, cap: str) -> list:
+        key = (profile.task_type, profile.needs_web, profile.needs_code, profile.output_format, profile.urgency, cap)
+        found = self.routes.get(key)
+        if found is None:
+            decision = self.router.route(profile, max_cost_tier=cap)
+            found = self.routes[key] = decision.candidates
+        return found
+
+    # -- budget -----------------------------------------------------------
+
+    def remaining(self, user: int) -> float | None:
+        limit = self.config.monthly_budget_usd
+        if limit is None:
+            return None
+        month = int(self.kernel.now // MONTH_S)
+        if month != self.month:  # monthly reset
+            self.month = month
+            self.spent = [0.0] * self.config.users
+        return limit - self.spent[user] - self.reserved[user]
+
+    # -- processes --------------------------------------------------------
+
+    def call(self, provider: str, entry: ModelCatalog | None, input_tokens: int, output_tokens: int) -> Process:
+        """One provider call; returns (ok, cost_usd)."""
+        spec = self.config.providers[provider]
+        stats = self.providers[provider]
+        stats.calls += 1
+        bucket = self.buckets.get(provider)
+        if bucket is not None and not bucket.take(self.kernel.now):
+            stats.rate_limited += 1
+            yield 0.02  # the 429 round trip
+            return False, 0.0
+
+        slots = self.provider_slots[provider]
+        yield slots.acquire()
+        try:
+            ttft = spec.ttft_ms / 1000 * self.rng.lognormvariate(0, spec.ttft_sigma)
+            if self.rng.random() < spec.error_rate:
+                yield ttft
+                stats.errors += 1
+                return False, 0.0
+            yield ttft + output_tokens / spec.tokens_per_s
+        finally:
+            slots.release(self.kernel)
+        cost = price_tokens(entry, input_tokens, output_tokens)
+        stats.ok += 1
+        stats.cost_usd += cost
+        return True, cost
+
+    def request(self) -> Process:
+        kernel, config = self.kernel, self.config
+        start = kernel.now
+        day = self.days[min(int(start // DAY_S), len(self.days) - 1)]
+        day.offered += 1
+        user, profile, prompt_tokens, output_tokens = self.draw_request()
+
+        if not (yield self.workers.acquire()):
+            day.rejected += 1
+            return
+        self.queue_wait_s.append(kernel.now - start)
+        try:
+            if config.profile_calls:
+                ok, cost = yield from self.call(
+                    config.profiler_provider, self.profiler_entry, prompt_tokens + 600, 60,
+                )
+                day.cost_usd += cost
+                if not ok:
+                    day.profile_failed += 1
+                    return
+
+            remaining = self.remaining(user)
+            limit = config.monthly_budget_usd
+            cap = cost_tier_cap(remaining, limit) if remaining is not None else "high"
+            chain = self.candidates(profile, cap) or self.candidates(profile, "high")
+            if not chain:
+                day.failed += 1
+                return
+
+            attempts = 0
+            for candidate in chain:
+                if attempts == config.max_attempts:
+                    break
+                entry = self.entries.get(candidate.key)
+                estimate = price_tokens(entry, prompt_tokens + 1, config.est_output_tokens)
+                if remaining is not None:
+                    remaining = self.remaining(user)
+                    if estimate > remaining:
+                        continue
+                    self.reserved[user] += estimate
+                attempts += 1
+                ok, cost = yield from self.call(candidate.provider, entry, prompt_tokens, output_tokens)
+                if remaining is not None:
+                    self.reserved[user] -= estimate
+                    self.spent[user] += cost
+                day.cost_usd += cost
+                if ok:
+                    self.models[candidate.key] += 1
+                    self.attempts[attempts] += 1
+                    day.completed += 1
+                    day.latencies_s.append(kernel.now - start)
+                    return
+
+            if attempts == 0:
+                day.budget_exceeded += 1
+                self.exhausted_at.setdefault(user, kernel.now)
+            else:
+                day.failed += 1
+        finally:
+            self.workers.release(kernel)
+
+    # -- run --------------------------------------------------------------
+
+    def run(self) -> dict:
+        horizon = self.config.days * DAY_S
+        started = time.perf_counter()
+        self.kernel.spawn(self.arrivals(horizon))
+        self.kernel.run(until=horizon + 3600)  # let in-flight requests drain
+        wall = time.perf_counter() - started
+        return self.report(horizon, wall)
+
+    def report(self, horizon: float, wall: float) -> dict:
+        offered = sum(d.offered for d in self.days)
+        completed = sum(d.completed for d in self.days)
+        latencies = [x for d in self.days for x in d.latencies_s]
+        fallback = sum(n for a, n in self.attempts.items() if a > 1)
+        exhausted_days = sorted(t / DAY_S for t in self.exhausted_at.values())
         return {
-            "status": "error",
-            "reason": f"No affordable models. Remaining budget: ${wallet.remaining():.4f}",
+            "simulated_days": self.config.days,
+            "wall_s": round(wall, 2),
+            "simulated_requests_per_wall_s": round(offered / wall) if wall else None,
+            "offered": offered,
+            "completed": completed,
+            "throughput_rps": round(completed / horizon, 3),
+            "peak_offered_rps": round(self.config.base_rps * (1 + abs(self.config.diurnal_amplitude)), 3),
+            "latency_s": _percentiles(latencies),
+            "router_queue_wait_s": _percentiles(self.queue_wait_s),
+            "cost_usd": round(sum(d.cost_usd for d in self.days), 4),
+            "needed_fallback": fallback,
+            "needed_fallback_share": round(fallback / completed, 4) if completed else None,
+            "attempts": {str(k): v for k, v in sorted(self.attempts.items())},
+            "answered_by": dict(self.models.most_common()),
+            "providers": {n: asdict(s) for n, s in sorted(self.providers.items())},
+            "budget": {
+                "monthly_budget_usd": self.config.monthly_budget_usd,
+                "users": self.config.users,
+                "users_exhausted": len(self.exhausted_at),
+                "first_exhausted_day": round(exhausted_days[0], 2) if exhausted_days else None,
+                "median_exhausted_day": round(exhausted_days[len(exhausted_days) // 2], 2) if exhausted_days else None,
+            },
+            "days": [
+                {
+                    "day": i + 1,
+                    **{k: v for k, v in asdict(d).items() if k != "latencies_s"},
+                    "cost_usd": round(d.cost_usd, 4),
+                    "latency_s": _percentiles(d.latencies_s),
+                    "users_exhausted": sum(1 for t in self.exhausted_at.values() if t < (i + 1) * DAY_S),
+                }
+                for i, d in enumerate(self.days)
+            ],
         }
 
-    scored.sort(key=lambda x: x[0])
-
-    # Primary + fallback chain (top 3)
-    chain = [m for _, _, m in scored[:3]]
 
-    # Step C: attempt with fallback
-    attempts = []
-    last_error = None
-    for m in chain:
-        est_cost = estimate_cost_usd(m, in_tokens, out_tokens)
-
-        try:
-            text = await provider.generate(m, prompt, max_output_tokens, constraints.require_json)
-
-            if constraints.require_json:
-                validate_json(text)
-
-            # "Spend" money only if we succeed (simplification)
-            wallet.spend(est_cost)
-
-            return {
-                "status": "ok",
-                "text": text,
-                "provider": m.provider,
-                "model": m.model,
-                "input_tokens_est": in_tokens,
-                "output_tokens_est": out_tokens,
-                "estimated_cost_usd": round(est_cost, 8),
-                "wallet_remaining_usd": round(wallet.remaining(), 6),
-                "attempts": attempts + [{"provider": m.provider, "model": m.model, "result": "success"}],
-            }
-
-        except Exception as e:
-            last_error = e
-            attempts.append(
-                {"provider": m.provider, "model": m.model, "result": f"failed: {type(e).__name__}"}
-            )
-
-    return {
-        "status": "error",
-        "reason": f"All attempts failed. Last error: {last_error}",
-        "attempts": attempts,
-    }
+def _percentiles(values: list[float]) -> dict:
+    return percentiles(values, REPORT_PERCENTILES)
 
 
 # -----------------------------
-# 5) Run demo
+# 5) CLI
 # -----------------------------
+def print_report(report: dict) -> None:
+    print(f"{report['offered']} requests over {report['simulated_days']} simulated days in {report['wall_s']}s "
+          f"({report['simulated_requests_per_wall_s']} simulated requests/s)\n")
+    print(f"throughput {report['throughput_rps']} completions/s (peak offered {report['peak_offered_rps']}/s), "
+          f"latency {report['latency_s']}, router queue wait {report['router_queue_wait_s']}")
+    print(f"cost ${report['cost_usd']}, fallback {report['needed_fallback']} ({report['needed_fallback_share']}), "
+          f"attempts {report['attempts']}")
+    print(f"budget {report['budget']}\n")
+    print(f"{'day':>4}{'offered':>10}{'done':>10}{'502':>7}{'503':>7}{'402':>7}{'cost $':>11}{'p95 s':>8}"
+          f"{'p99 s':>8}{'exhausted':>11}")
+    for d in report["days"]:
+        lat = d["latency_s"]
+        print(f"{d['day']:>4}{d['offered']:>10}{d['completed']:>10}{d['failed'] + d['profile_failed']:>7}"
+              f"{d['rejected']:>7}{d['budget_exceeded']:>7}{d['cost_usd']:>11.2f}"
+              f"{lat['p95'] if lat['p95'] is not None else '-':>8}{lat['p99'] if lat['p99'] is not None else '-':>8}"
+              f"{d['users_exhausted']:>11}")
+    print("\nproviders:")
+    for name, s in report["providers"].items():
+        print(f"  {name:<10} {s}")
+
+
+def _jsonable(value):
+    return asdict(value) if is_dataclass(value) else value
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--config", help="JSON file overriding SimConfig fields")
+    parser.add_argument("--days", type=float)
+    parser.add_argument("--rps", type=float, help="mean arrival rate (base_rps)")
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--catalog-from-db", action="store_true", help="route over models_catalog from DATABASE_URL")
+    parser.add_argument("--json", help="also write the report to this file")
+    args = parser.parse_args()
+
+    data = json.loads(open(args.config).read()) if args.config else {}
+    for key, value in (("days", args.days), ("base_rps", args.rps), ("seed", args.seed)):
+        if value is not None:
+            data[key] = value
+    config = SimConfig.from_dict(data)
+    catalog = catalog_from_db() if args.catalog_from_db else default_catalog()
+
+    report = Simulator(config, catalog).run()
+    report["config"] = json.loads(json.dumps(asdict(config), default=_jsonable))
+    print_report(report)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
 if __name__ == "__main__":
-    import asyncio
-
-    catalog = [
-        ModelSpec(
-            provider="openai",
-            model="cheap-fast",
-            supports_json=True,
-            latency="fast",
-            context_tokens=32_000,
-            in_per_1m=0.10,
-            out_per_1m=0.30,
-            reliability_score=0.70,
-        ),
-        ModelSpec(
-            provider="openai",
-            model="reliable-standard",
-            supports_json=True,
-            latency="standard",
-            context_tokens=128_000,
-            in_per_1m=0.20,
-            out_per_1m=0.80,
-            reliability_score=0.95,
-        ),
-        ModelSpec(
-            provider="google",
-            model="mid-fast",
-            supports_json=True,
-            latency="fast",
-            context_tokens=128_000,
-            in_per_1m=0.12,
-            out_per_1m=0.40,
-            reliability_score=0.85,
-        ),
-    ]
-
-    wallet = BudgetWallet(monthly_budget_usd=0.01)  # tiny budget to show policy works
-    constraints = Constraints(require_json=True, max_cost_usd=0.005, latency="fast")
-    prompt = "Return JSON with keys ok, provider, model."
-
-    result = asyncio.run(byok_generate(prompt, constraints, wallet, catalog, FakeProvider()))
-    print("\n=== BYOK Simulation Result ===")
-    print(json.dumps(result, indent=2))
+    main()
@@ -0,0 +1,129 @@
+"""
+tests/unit/test_attempt_analytics.py
+------------------------------------
+Unit tests for per-attempt error classification and the fallback summary.
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.db.base import Base
+from app.db.models import CompletionAttempt
+import app.db.prompt_models  # noqa: F401  (request_logs references prompts)
+from app.db.session import make_engine
+from app.services.attempt_analytics import AttemptFilters, attempt_summary, percentiles
+from app.services.LLM_completion import ProviderResponseError
+from app.services.usage_accounting import classify_error
+
+NOW = datetime(2026, 6, 1, 12)
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = tmp_path / "attempts.db"
+    engine = make_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind=engine)
+
+    def attempt(chain, no, provider, model, outcome, latency, error=None, retryable=None, age_h=1):
+        return CompletionAttempt(
+            completion_id=chain, prompt_id=1, attempt_no=no, provider=provider, model=model, task_type="coding",
+            created_at=NOW - timedelta(hours=age_h), latency_ms=latency, outcome=outcome,
+            error_class=error, retryable=retryable, input_tokens=100, output_tokens=10, cost_usd=0.001,
+        )
+
+    with sessionmaker(bind=engine)() as db:
+        db.add_all([
+            # Concurrent completions of one prompt, rows interleaved
+            # 1st choice works (twice)
+            attempt("a", 1, "anthropic", "sonnet", "ok", 800),
+            attempt("b", 1, "anthropic", "sonnet", "ok", 1200),
+            # rate limited, fallback works
+            attempt("c", 1, "anthropic", "sonnet", "error", 300, "RateLimitError", True),
+            # empty answer, then every fallback fails
+            attempt("d", 1, "anthropic", "sonnet", "unusable", 900, "ProviderResponseError", False),
+            attempt("c", 2, "gemini", "flash", "ok", 500),
+            attempt("d", 2, "gemini", "flash", "error", 100, "APITimeoutError", True),
+            attempt("d", 3, "openai", "mini", "error", 50, "AuthenticationError", False),
+            # outside the window
+            attempt("e", 1, "anthropic", "sonnet", "ok", 99_999, age_h=24 * 30),
+        ])
+        db.commit()
+    engine.dispose()
+    return path
+
+
+async def test_summary_breaks_down_fallbacks(db_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{db_path}")
+    async with async_sessionmaker(engine)() as db:
+        summary = await attempt_summary(db, AttemptFilters(end=NOW))
+    await engine.dispose()
+
+    assert (summary["completions"], summary["succeeded"], summary["failed"]) == (4, 3, 1)
+    assert summary["needed_fallback"] == 2
+    assert summary["resolved_at_attempt"] == {"1": 2, "2": 1}
+    assert summary["failed_attempt_latency_ms"]["p50"] == 100
+
+    sonnet = next(g for g in summary["by_model"] if g["model"] == "sonnet")
+    assert (sonnet["attempts"], sonnet["ok"], sonnet["error"], sonnet["unusable"]) == (4, 2, 1, 1)
+    assert sonnet["retryable_share"] == 0.5
+    assert sonnet["latency_ms"] == {"p50": 800, "p90": 1200, "p99": 1200}
+    assert sonnet["top_errors"] == {"RateLimitError": 1, "ProviderResponseError": 1}
+
+    third = summary["by_attempt_no"][2]
+    assert (third["attempt_no"], third["success_rate"]) == (3, 0.0)
+
+
+async def test_summary_filters_by_provider(db_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{db_path}")
+    async with async_sessionmaker(engine)() as db:
+        summary = await attempt_summary(db, AttemptFilters(end=NOW, provider="gemini"))
+    await engine.dispose()
+    assert [g["model"] for g in summary["by_model"]] == ["flash"]
+    assert [g["attempt_no"] for g in summary["by_attempt_no"]] == [2]
+    # totals cover the two chains gemini took part in, judged on every attempt
+    assert (summary["completions"], summary["succeeded"], summary["failed"]) == (2, 1, 1)
+    assert summary["needed_fallback"] == 2
+    assert summary["resolved_at_attempt"] == {"2": 1}
+
+
+async def test_chain_is_judged_whole_and_counted_in_its_start_window(db_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{db_path}")
+    async with async_sessionmaker(engine)() as db:
+        # Chain "f" fails at 2h ago; its fallback, 1h ago, works
+        db.add_all([
+            CompletionAttempt(completion_id="f", attempt_no=1, provider="anthropic", model="sonnet",
+                              created_at=NOW - timedelta(hours=2), outcome="error", latency_ms=10),
+            CompletionAttempt(completion_id="f", attempt_no=2, provider="gemini", model="flash",
+                              created_at=NOW - timedelta(hours=1), outcome="ok", latency_ms=10),
+        ])
+        await db.commit()
+        earlier = await attempt_summary(db, AttemptFilters(start=NOW - timedelta(hours=3), end=NOW - timedelta(minutes=90)))
+        later = await attempt_summary(db, AttemptFilters(start=NOW - timedelta(minutes=90), end=NOW))
+    await engine.dispose()
+    assert (earlier["completions"], earlier["succeeded"], earlier["resolved_at_attempt"]) == (1, 1, {"2": 1})
+    assert later["completions"] == 4  # "f" is not counted again
+    assert later["by_attempt_no"][1]["attempts"] == 3  # but its fallback attempt is
+
+
+async def test_summary_totals_never_go_negative_under_a_filter(db_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{db_path}")
+    async with async_sessionmaker(engine)() as db:
+        summary = await attempt_summary(db, AttemptFilters(end=NOW, provider="openai"))
+        empty = await attempt_summary(db, AttemptFilters(end=NOW, provider="mistral"))
+    await engine.dispose()
+    assert (summary["completions"], summary["succeeded"], summary["failed"], summary["needed_fallback"]) == (1, 0, 1, 1)
+    assert (empty["completions"], empty["succeeded"], empty["failed"], empty["needed_fallback"]) == (0, 0, 0, 0)
+
+
+def test_percentiles_nearest_rank():
+    assert percentiles(list(range(1, 101))) == {"p50": 50, "p90": 90, "p99": 99}
+    assert percentiles([]) == {"p50": None, "p90": None, "p99": None}
+
+
+def test_classify_error():
+    assert classify_error(RuntimeError("Error code: 429 - rate limit exceeded")) == ("RuntimeError", True)
+    assert classify_error(TimeoutError()) == ("TimeoutError", True)
+    assert classify_error(ProviderResponseError("openai returned an empty response")) == ("ProviderResponseError", False)
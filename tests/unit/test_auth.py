@@ -5,8 +5,7 @@ Unit tests for the auth service (Milestone 4).
 """
 
 import pytest
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 
 from app.db.base import Base
 from app.services.auth_service import (
@@ -14,69 +13,71 @@ from app.services.auth_service import (
     login_user,
     get_user_from_token,
     logout,
-    _sessions,
+    set_session_store,
 )
+from app.services.session_store import MemorySessionStore
 
 
 @pytest.fixture
-def db():
-    """In-memory SQLite DB with user table."""
-    engine = create_engine("sqlite:///:memory:")
-    Base.metadata.create_all(bind=engine)
-    Session = sessionmaker(bind=engine)
-    session = Session()
-    yield session
-    session.close()
-    _sessions.clear()
-
-
-def test_register_creates_user(db):
-    user = register_user("alice", "secret123", db)
+async def db():
+    """In-memory SQLite DB with user table, fresh in-memory session store."""
+    set_session_store(MemorySessionStore())
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    Session = async_sessionmaker(engine, expire_on_commit=False)
+    async with Session() as session:
+        yield session
+    await engine.dispose()
+
+
+async def test_register_creates_user(db):
+    user = await register_user("alice", "secret123", db)
     assert user.id is not None
     assert user.username == "alice"
     assert user.password_hash is not None
     assert user.password_hash != "secret123"  # must be hashed
 
 
-def test_register_duplicate_raises(db):
-    register_user("alice", "secret123", db)
+async def test_register_duplicate_raises(db):
+    await register_user("alice", "secret123", db)
     with pytest.raises(ValueError, match="already exists"):
-        register_user("alice", "other456", db)
+        await register_user("alice", "other456", db)
 
 
-def test_login_valid_credentials(db):
-    register_user("alice", "secret123", db)
-    user, token = login_user("alice", "secret123", db)
+async def test_login_valid_credentials(db):
+    await register_user("alice", "secret123", db)
+    user, token = await login_user("alice", "secret123", db)
     assert user.username == "alice"
     assert len(token) > 0
 
 
-def test_login_wrong_password(db):
-    register_user("alice", "secret123", db)
+async def test_login_wrong_password(db):
+    await register_user("alice", "secret123", db)
     with pytest.raises(ValueError, match="Invalid password"):
-        login_user("alice", "wrongpass", db)
+        await login_user("alice", "wrongpass", db)
 
 
-def test_login_nonexistent_user(db):
+async def test_login_nonexistent_user(db):
     with pytest.raises(LookupError, match="User not found"):
-        login_user("ghost", "secret123", db)
+        await login_user("ghost", "secret123", db)
 
 
-def test_get_user_from_valid_token(db):
-    register_user("alice", "secret123", db)
-    _, token = login_user("alice", "secret123", db)
-    user = get_user_from_token(token, db)
+async def test_get_user_from_valid_token(db):
+    await register_user("alice", "secret123", db)
+    _, token = await login_user("alice", "secret123", db)
+    user = await get_user_from_token(token)
     assert user.username == "alice"
 
 
-def test_get_user_from_invalid_token(db):
+async def test_get_user_from_invalid_token(db):
     with pytest.raises(LookupError, match="Invalid or expired"):
-        get_user_from_token("fake-token", db)
+        await get_user_from_token("fake-token")
 
 
-def test_logout_invalidates_token(db):
-    register_user("alice", "secret123", db)
-    _, token = login_user("alice", "secret123", db)
-    logout(token)
+async def test_logout_invalidates_token(db):
+    await register_user("alice", "secret123", db)
+    _, token = await login_user("alice", "secret123", db)
+    await logout(token)
     with pytest.raises(LookupError, match="Invalid or expired"):
-        get_user_from_token(token, db)
\ No newline at end of file
+        await get_user_from_token(token)
\ No newline at end of file
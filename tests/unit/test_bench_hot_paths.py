@@ -0,0 +1,37 @@
+"""
+tests/unit/test_bench_hot_paths.py
+----------------------------------
+Keeps the microbenchmark cases runnable and the regression check honest.
+"""
+
+import pytest
+
+from scripts.bench_hot_paths import CASES, compare, measure, synthetic_catalog
+
+
+@pytest.mark.parametrize("name", list(CASES))
+def test_every_case_runs(name, monkeypatch):
+    monkeypatch.delenv("ENCRYPTION_KEY", raising=False)
+    CASES[name]()()
+
+
+def test_synthetic_catalog_routes_to_several_providers():
+    from scripts.bench_hot_paths import PROFILE, _router
+    from app.schemas.prompts import PromptProfile
+
+    assert len(synthetic_catalog(300)) == 300
+    decision = _router(30).route(PromptProfile(**PROFILE))
+    assert len({c.provider for c in decision.candidates}) == 3
+
+
+def test_measure_reports_per_call_time():
+    result = measure(lambda: None, repeat=2, min_time=0.01)
+    assert 0 < result["best_us"] <= result["median_us"]
+    assert result["loops"] >= 1
+
+
+def test_compare_flags_regressions_beyond_threshold():
+    baseline = {"a": {"best_us": 10.0}, "b": {"best_us": 10.0}, "c": {"best_us": 10.0}, "gone": {"best_us": 1.0}}
+    current = {"a": {"best_us": 11.0}, "b": {"best_us": 12.0}, "c": {"best_us": 5.0}, "added": {"best_us": 1.0}}
+    status = {row["case"]: row["status"] for row in compare(baseline, current, threshold=0.15)}
+    assert status == {"a": "ok", "b": "regression", "c": "improved", "gone": "missing", "added": "new"}
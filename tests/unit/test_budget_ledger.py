@@ -0,0 +1,256 @@
+"""
+tests/unit/test_budget_ledger.py
+--------------------------------
+Unit tests for the in-memory budget ledger (reserve/settle, idempotent
+flushes) and budget-aware routing in the completion pipeline.
+"""
+
+from datetime import datetime, timedelta
+from unittest.mock import MagicMock
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.db.base import Base
+from app.db.model_catalog_models import ModelCatalog
+from app.db.models import Budget, BudgetFlush, User
+from app.db.prompt_models import Prompt
+from app.db.session import make_engine
+from app.services.budget_ledger import (
+    BudgetExceeded,
+    BudgetLedger,
+    cost_tier_cap,
+    set_budget_ledger,
+)
+from app.services.completion_service import execute_completion
+from app.services.LLM_completion import LLMCompletionClient, LLMResult
+from app.services.write_behind import set_write_queue
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    engine = make_engine(f"sqlite:///{tmp_path / 'budget.db'}")
+    Base.metadata.create_all(bind=engine)
+    factory = sessionmaker(bind=engine, expire_on_commit=False)
+    with factory() as db:
+        db.add(User(id=7, username="alice"))
+        db.add(Budget(user_id=7, monthly_budget_usd=1.0, spent_usd=0.25))
+        db.commit()
+    yield factory
+    engine.dispose()
+
+
+@pytest.fixture
+def ledger(session_factory):
+    ledger = BudgetLedger(session_factory, flush_interval_s=0)  # flush manually
+    ledger.load(7)
+    return ledger
+
+
+def _spent(session_factory, user_id=7):
+    with session_factory() as db:
+        return db.scalar(select(Budget.spent_usd).where(Budget.user_id == user_id))
+
+
+def test_reserve_and_settle(ledger):
+    assert ledger.remaining(7) == pytest.approx(0.75)
+    r = ledger.reserve(7, 0.5)
+    assert ledger.remaining(7) == pytest.approx(0.25)
+    with pytest.raises(BudgetExceeded):
+        ledger.reserve(7, 0.3)
+    ledger.settle(r, 0.1)  # actual was cheaper than the estimate
+    assert ledger.remaining(7) == pytest.approx(0.65)
+
+
+def test_user_without_budget_is_unlimited(ledger):
+    ledger.load(99)
+    assert ledger.remaining(99) is None
+    ledger.settle(ledger.reserve(99, 1e6), 1e6)
+
+
+def test_flush_writes_deltas_once(ledger, session_factory):
+    ledger.settle(ledger.reserve(7, 0.2), 0.2)
+    assert ledger.flush() == 1
+    assert _spent(session_factory) == pytest.approx(0.45)
+    assert ledger.flush() == 0  # nothing new
+    assert _spent(session_factory) == pytest.approx(0.45)
+    assert ledger.remaining(7) == pytest.approx(0.55)
+
+
+def test_replayed_flush_is_not_applied_twice(ledger, session_factory):
+    ledger.settle(ledger.reserve(7, 0.2), 0.2)
+    ledger._apply("flush-1", {7: 0.2})
+    # Outcome unknown to the ledger (e.g. error after commit): same id retried
+    ledger._apply("flush-1", {7: 0.2})
+    assert _spent(session_factory) == pytest.approx(0.45)
+    with session_factory() as db:
+        assert len(db.scalars(select(BudgetFlush)).all()) == 1
+
+
+def test_flush_picks_up_other_workers_spend(ledger, session_factory):
+    other = BudgetLedger(session_factory, flush_interval_s=0)
+    other.load(7)
+    other.settle(other.reserve(7, 0.5), 0.5)
+    other.flush()
+    ledger.flush()
+    assert ledger.remaining(7) == pytest.approx(0.25)
+
+
+def test_budget_created_later_applies_after_refresh(ledger, session_factory):
+    ledger.load(8)
+    assert ledger.remaining(8) is None
+    with session_factory() as db:
+        db.add(User(id=8, username="bob"))
+        db.add(Budget(user_id=8, monthly_budget_usd=2.0, spent_usd=0.5))
+        db.commit()
+    ledger.flush()
+    assert ledger.remaining(8) == pytest.approx(1.5)
+
+
+def test_old_flush_rows_are_pruned(session_factory):
+    ledger = BudgetLedger(session_factory, flush_interval_s=0, flush_retention_s=3600, prune_interval_s=0)
+    ledger.load(7)
+    with session_factory() as db:
+        db.add(BudgetFlush(flush_id="old", user_id=7, delta_usd=0.1, created_at=datetime.utcnow() - timedelta(days=2)))
+        db.commit()
+    ledger.settle(ledger.reserve(7, 0.2), 0.2)
+    ledger.flush()
+    with session_factory() as db:
+        assert db.scalar(select(BudgetFlush).where(BudgetFlush.flush_id == "old")) is None
+        assert len(db.scalars(select(BudgetFlush)).all()) == 1  # this flush's row is kept
+
+
+def test_refresh_reads_only_active_accounts(ledger, session_factory):
+    ledger.flush()  # load() counted as use; now nothing is pending
+    queries = []
+    original = ledger._session_factory
+
+    def counting_factory():
+        queries.append(1)
+        return original()
+
+    ledger._session_factory = counting_factory
+    ledger.flush()
+    assert queries == []  # idle account: no refresh query
+    ledger.remaining(7)
+    ledger.flush()
+    assert len(queries) == 1
+
+
+def test_idle_settled_accounts_are_evicted(session_factory):
+    ledger = BudgetLedger(session_factory, flush_interval_s=0, idle_evict_s=0)
+    ledger.load(7)
+    reservation = ledger.reserve(7, 0.1)
+    ledger.flush()
+    assert ledger.is_loaded(7)  # a reservation is still open
+    ledger.settle(reservation, 0.1)
+    ledger.flush()  # writes the spend; the account is touched by settle
+    ledger.flush()
+    assert not ledger.is_loaded(7)
+    assert _spent(session_factory) == pytest.approx(0.35)
+    ledger.load(7)
+    assert ledger.remaining(7) == pytest.approx(0.65)
+
+
+def test_cost_tier_cap():
+    assert cost_tier_cap(0.8, 1.0) == "high"
+    assert cost_tier_cap(0.2, 1.0) == "medium"
+    assert cost_tier_cap(0.05, 1.0) == "low"
+
+
+# --- Budget-aware routing in the completion pipeline ---
+
+@pytest.fixture
+async def db():
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    async with async_sessionmaker(engine, expire_on_commit=False)() as session:
+        session.add_all([
+            ModelCatalog(
+                key="claude_sonnet", provider="anthropic", model="claude-sonnet-4-5-20250929",
+                cost_tier="medium", latency_hint="fast", good_for_code=True,
+                in_per_1m=3.0, out_per_1m=15.0,
+            ),
+            ModelCatalog(
+                key="gemini_flash", provider="gemini", model="models/gemini-2.5-flash",
+                cost_tier="low", latency_hint="fast", good_for_code=True,
+                in_per_1m=0.30, out_per_1m=2.50,
+            ),
+        ])
+        session.add(Prompt(
+            username="alice", user_id=7, raw_prompt="Write a sort function",
+            prompt_profile_json={
+                "task_type": "coding", "needs_web": False, "needs_code": True,
+                "output_format": "text", "urgency": "normal", "confidence": 0.9,
+            },
+        ))
+        await session.commit()
+        yield session
+    await engine.dispose()
+
+
+class _DiscardQueue:
+    def submit(self, row):
+        return row
+
+    async def asubmit(self, row):
+        return row
+
+    def pending(self, model, row_id):
+        return None
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def installed(ledger):
+    set_budget_ledger(ledger)
+    set_write_queue(_DiscardQueue())
+    yield ledger
+    set_budget_ledger(None)
+    set_write_queue(None)
+
+
+def _client():
+    client = MagicMock(spec=LLMCompletionClient)
+    client.generate.return_value = LLMResult(text="ok", input_tokens=10, output_tokens=10)
+    return client
+
+
+async def test_healthy_budget_keeps_preferred_model(db, installed):
+    response = await execute_completion(prompt_id=1, db=db, client=_client())
+    assert response.provider == "anthropic"
+    assert installed.remaining(7) < 0.75  # settled actual cost
+
+
+async def test_low_budget_downgrades_to_cheaper_tier(db, installed):
+    installed.settle(installed.reserve(7, 0.7), 0.7)  # 0.05 of 1.0 left -> low tier only
+    response = await execute_completion(prompt_id=1, db=db, client=_client())
+    assert response.provider == "gemini"
+    assert "budget low" in response.route_decision.reason
+
+
+async def test_rejects_when_nothing_affordable(db, installed):
+    installed.settle(installed.reserve(7, 0.749), 0.749)
+    client = _client()
+    with pytest.raises(BudgetExceeded):
+        await execute_completion(prompt_id=1, db=db, client=client)
+    client.generate.assert_not_called()
+
+
+async def test_cancelled_attempt_settles_its_reservation(db, installed, monkeypatch):
+    import asyncio
+
+    async def cancelled(*args, **kwargs):
+        raise asyncio.CancelledError()  # client went away mid-call
+
+    monkeypatch.setattr("app.services.completion_service.run_blocking", cancelled)
+    with pytest.raises(asyncio.CancelledError):
+        await execute_completion(prompt_id=1, db=db, client=_client())
+    account = installed._accounts[7]
+    assert account.reserved == 0
+    assert account.unflushed > 0  # charged the estimate: the call may still be billed
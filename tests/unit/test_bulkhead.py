@@ -0,0 +1,96 @@
+"""
+tests/unit/test_bulkhead.py
+---------------------------
+Unit tests for bulkhead isolation (bounded pools, fast 503 rejection).
+"""
+
+import asyncio
+import threading
+
+import pytest
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+
+from app.api.bulkhead import Bulkhead, BulkheadFull, bulkhead
+from app.utils.blocking import run_blocking
+
+
+async def test_run_executes_in_bulkhead_threads():
+    bh = Bulkhead("test", max_concurrent=2, max_queue=0)
+    name = await bh.run(lambda: threading.current_thread().name)
+    assert name.startswith("bulkhead-test")
+    assert bh.stats()["completed"] == 1
+
+
+async def test_rejects_when_pool_and_queue_full():
+    bh = Bulkhead("test", max_concurrent=1, max_queue=1)
+    release = threading.Event()
+    running = asyncio.ensure_future(bh.run(release.wait))
+    queued = asyncio.ensure_future(bh.run(release.wait))
+    await asyncio.sleep(0.05)
+
+    with pytest.raises(BulkheadFull):
+        await bh.run(lambda: None)
+    stats = bh.stats()
+    assert stats["running"] == 1
+    assert stats["queued"] == 1
+    assert stats["rejected"] == 1
+    assert stats["saturation"] == 1.0
+
+    release.set()
+    await asyncio.gather(running, queued)
+    assert bh.stats()["queued"] == 0
+
+
+async def test_admit_routes_blocking_calls_to_bulkhead_executor():
+    bh = Bulkhead("async", max_concurrent=1, max_queue=0)
+    async with bh.admit():
+        name = await run_blocking(lambda: threading.current_thread().name)
+        with pytest.raises(BulkheadFull):
+            async with bh.admit():
+                pass
+    assert name.startswith("bulkhead-async")
+    assert bh.stats()["completed"] == 1
+    # Outside the bulkhead, blocking calls fall back to the default executor
+    assert not (await run_blocking(lambda: threading.current_thread().name)).startswith("bulkhead-")
+
+
+async def test_saturated_bulkhead_does_not_block_another():
+    slow = Bulkhead("slow", max_concurrent=1, max_queue=0)
+    fast = Bulkhead("fast", max_concurrent=1, max_queue=0)
+    release = threading.Event()
+    blocked = asyncio.ensure_future(slow.run(release.wait))
+    await asyncio.sleep(0.05)
+
+    assert await asyncio.wait_for(fast.run(lambda: "ok"), timeout=1) == "ok"
+    release.set()
+    await blocked
+
+
+def test_decorator_preserves_fastapi_signature():
+    app = FastAPI()
+
+    def get_suffix() -> str:
+        return "!"
+
+    @app.get("/echo/{word}")
+    @bulkhead("test-decorator")
+    def echo(word: str, times: int = 1, suffix: str = Depends(get_suffix)):
+        return {"result": word * times + suffix}
+
+    resp = TestClient(app).get("/echo/ab", params={"times": 2})
+    assert resp.status_code == 200
+    assert resp.json() == {"result": "abab!"}
+
+
+def test_decorator_supports_async_handlers():
+    app = FastAPI()
+
+    @app.get("/double/{n}")
+    @bulkhead("test-async-decorator")
+    async def double(n: int):
+        return {"result": await run_blocking(lambda: n * 2)}
+
+    resp = TestClient(app).get("/double/21")
+    assert resp.status_code == 200
+    assert resp.json() == {"result": 42}
@@ -8,22 +8,47 @@ Uses mock LLMCompletionClient and in-memory DB to avoid real API calls.
 
 import pytest
 from unittest.mock import MagicMock, patch
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 
 from app.db.base import Base
 from app.db.prompt_models import Prompt
 from app.db.model_catalog_models import ModelCatalog
 from app.services.completion_service import execute_completion
 from app.services.LLM_completion import LLMCompletionClient, LLMResult
+from app.services.scheduler import SchedulerBusy, SchedulerOverloaded
+from app.services.write_behind import set_write_queue
+
+
+class _DiscardQueue:
+    """Attempt rows of these anonymous prompts are not under test here."""
+
+    def submit(self, row):
+        return row
+
+    async def asubmit(self, row):
+        return row
+
+    def pending(self, model, row_id):
+        return None
+
+    def close(self):
+        pass
+
+
+@pytest.fixture(autouse=True)
+def write_queue():
+    set_write_queue(_DiscardQueue())
+    yield
+    set_write_queue(None)
 
 
 @pytest.fixture
-def db():
+async def db():
     """In-memory SQLite DB with prompt and catalog tables."""
-    engine = create_engine("sqlite:///:memory:")
-    Base.metadata.create_all(bind=engine)
-    Session = sessionmaker(bind=engine)
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    Session = async_sessionmaker(engine, expire_on_commit=False)
     session = Session()
 
     # Seed catalog: 3 MVP models
@@ -66,17 +91,18 @@ def db():
         prompt_profile_json=None,
     ))
 
-    session.commit()
+    await session.commit()
     yield session
-    session.close()
+    await session.close()
+    await engine.dispose()
 
 
-def test_completion_happy_path(db):
+async def test_completion_happy_path(db):
     """First candidate succeeds — should return on first attempt."""
     client = MagicMock(spec=LLMCompletionClient)
     client.generate.return_value = LLMResult(text="def sort_list(lst): return sorted(lst)")
 
-    result = execute_completion(prompt_id=1, db=db, client=client)
+    result = await execute_completion(prompt_id=1, db=db, client=client)
 
     assert result.prompt_id == 1
     assert result.attempts == 1
@@ -87,7 +113,7 @@ def test_completion_happy_path(db):
     client.generate.assert_called_once()
 
 
-def test_completion_fallback(db):
+async def test_completion_fallback(db):
     """First candidate fails, second succeeds."""
     client = MagicMock(spec=LLMCompletionClient)
     client.generate.side_effect = [
@@ -95,33 +121,64 @@ def test_completion_fallback(db):
         LLMResult(text="def sort_list(lst): return sorted(lst)"),
     ]
 
-    result = execute_completion(prompt_id=1, db=db, client=client)
+    result = await execute_completion(prompt_id=1, db=db, client=client)
 
     assert result.attempts == 2
     assert len(result.text) > 0
     assert client.generate.call_count == 2
 
 
-def test_completion_all_fail(db):
+async def test_completion_all_fail(db):
     """All candidates fail — should raise RuntimeError."""
     client = MagicMock(spec=LLMCompletionClient)
     client.generate.side_effect = RuntimeError("Provider down")
 
     with pytest.raises(RuntimeError, match="All .* attempts failed"):
-        execute_completion(prompt_id=1, db=db, client=client)
+        await execute_completion(prompt_id=1, db=db, client=client)
 
 
-def test_completion_prompt_not_found(db):
+async def test_completion_scheduler_busy_does_not_fall_back(db):
+    """A saturated local queue is not a provider failure — no next candidate."""
+    client = MagicMock(spec=LLMCompletionClient)
+    client.generate.side_effect = SchedulerOverloaded("anthropic queue is full (64 waiting)")
+
+    with pytest.raises(SchedulerBusy, match="queue is full"):
+        await execute_completion(prompt_id=1, db=db, client=client)
+    client.generate.assert_called_once()
+
+
+async def test_completion_prompt_not_found(db):
     """Non-existent prompt_id — should raise LookupError."""
     client = MagicMock(spec=LLMCompletionClient)
 
     with pytest.raises(LookupError, match="not found"):
-        execute_completion(prompt_id=999, db=db, client=client)
+        await execute_completion(prompt_id=999, db=db, client=client)
 
 
-def test_completion_no_profile(db):
+async def test_completion_no_profile(db):
     """Prompt exists but has no profile — should raise ValueError."""
     client = MagicMock(spec=LLMCompletionClient)
 
     with pytest.raises(ValueError, match="no profile"):
-        execute_completion(prompt_id=2, db=db, client=client)
\ No newline at end of file
+        await execute_completion(prompt_id=2, db=db, client=client)
+
+
+async def test_completion_times_each_attempt(db):
+    """Every attempt shows up in the request's Server-Timing, labelled by outcome."""
+    from app.utils.timing import begin_request, end_request
+
+    client = MagicMock(spec=LLMCompletionClient)
+    client.generate.side_effect = [RuntimeError("Provider down"), LLMResult(text="ok")]
+
+    timings, token = begin_request()
+    try:
+        await execute_completion(prompt_id=1, db=db, client=client)
+    finally:
+        end_request(token)
+
+    names = [name for name, _, _ in timings.entries]
+    assert names[:2] == ["load_prompt", "catalog"]
+    attempts = [desc for name, desc, _ in timings.entries if name == "attempt"]
+    assert attempts[0] == "anthropic/claude-sonnet-4-5-20250929 error"
+    assert not attempts[1].endswith("error")
+    assert "attempt-2;dur=" in timings.header()
@@ -0,0 +1,36 @@
+"""
+tests/unit/test_db_session.py
+-----------------------------
+Unit tests for engine tuning.
+"""
+
+from sqlalchemy import text
+
+from app.db.session import make_async_engine, make_engine, to_async_url
+
+
+def test_sqlite_file_engine_uses_wal(tmp_path):
+    engine = make_engine(f"sqlite:///{tmp_path / 'wal.db'}")
+    with engine.connect() as conn:
+        assert conn.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+        assert conn.execute(text("PRAGMA synchronous")).scalar() == 1  # NORMAL
+        assert conn.execute(text("PRAGMA busy_timeout")).scalar() == 5000
+
+
+def test_to_async_url():
+    assert to_async_url("sqlite:///./byok.db") == "sqlite+aiosqlite:///./byok.db"
+    assert to_async_url("postgresql+psycopg://u:p@h/db") == "postgresql+asyncpg://u:p@h/db"
+
+
+async def test_async_sqlite_engine_uses_wal(tmp_path):
+    engine = make_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'async.db'}")
+    async with engine.connect() as conn:
+        assert (await conn.execute(text("PRAGMA journal_mode"))).scalar() == "wal"
+    await engine.dispose()
+
+
+def test_untuned_engine_keeps_defaults(tmp_path):
+    engine = make_engine(f"sqlite:///{tmp_path / 'plain.db'}", tuned=False)
+    with engine.connect() as conn:
+        assert conn.execute(text("PRAGMA journal_mode")).scalar() == "delete"
+
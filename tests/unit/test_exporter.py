@@ -0,0 +1,90 @@
+"""
+tests/unit/test_exporter.py
+---------------------------
+Unit tests for streaming NDJSON export and the admin gate in front of it.
+"""
+
+import gzip
+import json
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.api.dependencies import require_admin
+from app.db.base import Base
+from app.db.prompt_models import Prompt
+from app.services.exporter import EXPORTABLE, export_ndjson, gzip_stream
+from app.services.session_store import UserSnapshot
+
+
+@pytest.fixture
+async def session_factory(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'export.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    factory = async_sessionmaker(engine, expire_on_commit=False)
+    async with factory() as db:
+        db.add_all([
+            Prompt(username="alice", user_id=1 + i % 2, raw_prompt=f"p{i}", prompt_profile_json={"task_type": "coding"})
+            for i in range(25)
+        ])
+        await db.commit()
+    yield factory
+    await engine.dispose()
+
+
+async def _collect(chunks):
+    return b"".join([c async for c in chunks])
+
+
+def _lines(body: bytes) -> list[dict]:
+    return [json.loads(line) for line in body.decode().splitlines()]
+
+
+async def test_streams_every_row_in_created_order_one_chunk_per_batch(session_factory):
+    chunks = [c async for c in export_ndjson(session_factory, EXPORTABLE["prompts"], batch=10)]
+    assert len(chunks) == 3
+    rows = _lines(b"".join(chunks))
+    assert [r["id"] for r in rows] == list(range(1, 26))
+    assert rows[0]["prompt_profile_json"] == {"task_type": "coding"}
+    assert "T" in rows[0]["created_at"]  # ISO timestamp
+
+
+async def test_resume_after_id_and_user_filter(session_factory):
+    rows = _lines(await _collect(export_ndjson(session_factory, EXPORTABLE["prompts"], after_id=20)))
+    assert [r["id"] for r in rows] == [21, 22, 23, 24, 25]
+    with pytest.raises(LookupError):
+        await _collect(export_ndjson(session_factory, EXPORTABLE["prompts"], after_id=999))
+
+    rows = _lines(await _collect(export_ndjson(session_factory, EXPORTABLE["prompts"], user_id=2)))
+    assert {r["user_id"] for r in rows} == {2}
+    assert len(rows) == 12
+
+
+async def test_resume_follows_created_at_not_id(session_factory):
+    from datetime import datetime
+
+    async with session_factory() as db:
+        # A low id committed late by another worker, with an earlier timestamp than id 100
+        db.add(Prompt(id=100, username="w1", raw_prompt="a", created_at=datetime(2030, 1, 1, 0, 0, 1)))
+        db.add(Prompt(id=50, username="w2", raw_prompt="b", created_at=datetime(2030, 1, 1, 0, 0, 2)))
+        await db.commit()
+    rows = _lines(await _collect(export_ndjson(session_factory, EXPORTABLE["prompts"], after_id=25)))
+    assert [r["id"] for r in rows] == [100, 50]
+    rows = _lines(await _collect(export_ndjson(session_factory, EXPORTABLE["prompts"], after_id=100)))
+    assert [r["id"] for r in rows] == [50]
+
+
+async def test_gzip_stream_is_a_valid_gzip_file(session_factory):
+    plain = await _collect(export_ndjson(session_factory, EXPORTABLE["prompts"], batch=7))
+    packed = await _collect(gzip_stream(export_ndjson(session_factory, EXPORTABLE["prompts"], batch=7)))
+    assert gzip.decompress(packed) == plain
+
+
+async def test_require_admin(monkeypatch):
+    monkeypatch.setenv("ADMIN_USERNAMES", "root, ops")
+    assert (await require_admin(UserSnapshot(id=1, username="ops"))).username == "ops"
+    with pytest.raises(HTTPException) as exc:
+        await require_admin(UserSnapshot(id=2, username="alice"))
+    assert exc.value.status_code == 403
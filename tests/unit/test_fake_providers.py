@@ -0,0 +1,86 @@
+"""
+tests/unit/test_fake_providers.py
+---------------------------------
+The load-test stand-in providers, driven through the real SDK clients via
+the base-URL overrides in app/providers/sdk_clients.py.
+"""
+
+import random
+
+import pytest
+
+from app.services.LLM_completion import LLMCompletionClient
+from app.services.gemini_profiler import GeminiPromptProfiler
+from app.services.usage_accounting import classify_error
+from scripts.fake_providers import FakeProvider, FakeProviderConfig, router_env, start_fake_providers
+from scripts.load_test import LoadResults, PromptFactory
+
+FAST = dict(latency_ms=5, latency_sigma=0, tokens_per_s=100_000, output_tokens=20, retry_after_s=0.01, seed=7)
+
+
+@pytest.fixture(scope="module")
+def fakes():
+    servers = start_fake_providers({
+        "openai": FakeProviderConfig(**FAST),
+        "anthropic": FakeProviderConfig(**{**FAST, "rate_limit_rate": 1.0}),
+        "gemini": FakeProviderConfig(**FAST),
+    })
+    yield servers
+    for server in servers.values():
+        server.stop()
+
+
+@pytest.fixture
+def client(fakes, monkeypatch):
+    for key, value in router_env(fakes).items():
+        monkeypatch.setenv(key, value)
+    return LLMCompletionClient()
+
+
+@pytest.mark.parametrize("provider,model", [("openai", "gpt-4o-mini"), ("gemini", "models/gemini-2.5-flash")])
+def test_sdk_round_trip(client, fakes, provider, model):
+    result = client.generate("Write a haiku about routers", provider, model, needs_web=provider == "gemini")
+    assert result.text and 10 <= result.output_tokens <= 30
+    assert result.input_tokens == len("Write a haiku about routers") // 4
+    if provider == "gemini":
+        assert result.sources == [{"title": "Fake source", "url": "https://example.com/fake"}]
+    assert fakes[provider].provider.counts["ok"] >= 1
+
+
+def test_rate_limited_provider_raises_a_retryable_error(client, fakes):
+    with pytest.raises(Exception) as exc:
+        client.generate("hello", "anthropic", "claude-haiku-4-5")
+    assert classify_error(exc.value) == ("RateLimitError", True)
+    assert fakes["anthropic"].provider.counts["429"] >= 1
+
+
+def test_profiler_gets_a_valid_profile(fakes, monkeypatch):
+    for key, value in router_env(fakes).items():
+        monkeypatch.setenv(key, value)
+    profile = GeminiPromptProfiler().profile("Fix this SQL query, quick")
+    assert (profile.task_type, profile.needs_code, profile.urgency) == ("coding", True, "fast")
+
+
+def test_bursts_are_periodic():
+    fake = FakeProvider("openai", FakeProviderConfig(burst_every_s=10, burst_for_s=2))
+    fake.started -= 1
+    assert fake.in_burst()
+    fake.started -= 5
+    assert not fake.in_burst()
+
+
+def test_prompt_sizes_and_report():
+    factory = PromptFactory(random.Random(1), median_chars=600)
+    sizes = sorted(len(factory.make()) for _ in range(500))
+    assert 300 < sizes[250] < 1200 and sizes[-1] <= 32_000 + 200
+
+    results = LoadResults(duration=10, elapsed=12)
+    results.offered = 4
+    for status, ms in [(200, 100), (200, 300), (502, 50)]:
+        results.completions.add(status, ms)
+    results.attempts.update({1: 1, 2: 1})
+    report = results.report()
+    assert report["offered_rps"] == 0.4
+    assert report["completions"]["statuses"] == {"200": 2, "502": 1}
+    assert report["completions"]["latency_ms"]["p50"] == 100
+    assert (report["needed_fallback"], report["needed_fallback_share"]) == (1, 0.5)
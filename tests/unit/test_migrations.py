@@ -0,0 +1,107 @@
+"""
+tests/unit/test_migrations.py
+-----------------------------
+Unit tests for the versioned schema migrations and the startup check.
+"""
+
+import pytest
+from sqlalchemy import inspect, text
+
+from app.db import migrations
+from app.db.migrations import HEAD, SchemaOutOfDate, _stamp, current_version, ensure_schema, upgrade
+from app.db.session import make_engine
+
+
+@pytest.fixture
+def legacy_engine(tmp_path):
+    """A database created before versioning: tables without the later columns."""
+    engine = make_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE users (id INTEGER PRIMARY KEY, username TEXT)"))
+        conn.execute(text("CREATE TABLE provider_keys (id INTEGER PRIMARY KEY, provider TEXT)"))
+        conn.execute(text(
+            "CREATE TABLE prompts (id INTEGER PRIMARY KEY, created_at DATETIME, username TEXT, "
+            "user_id INTEGER, raw_prompt TEXT, prompt_profile_json JSON)"
+        ))
+        conn.execute(text(
+            "INSERT INTO prompts (username, raw_prompt, prompt_profile_json) VALUES "
+            "('a', 'x', '{\"task_type\": \"coding\", \"needs_web\": true, \"output_format\": \"json\", \"urgency\": \"fast\"}'), "
+            "('a', 'y', NULL)"
+        ))
+    yield engine
+    engine.dispose()
+
+
+def test_fresh_database_is_created_at_head(tmp_path):
+    engine = make_engine(f"sqlite:///{tmp_path / 'new.db'}")
+    assert current_version(engine) is None
+    assert upgrade(engine) == []
+    assert current_version(engine) == HEAD
+    assert "prompt_blobs" in inspect(engine).get_table_names()
+    engine.dispose()
+
+
+def test_upgrade_adds_columns_and_backfills(legacy_engine):
+    assert upgrade(legacy_engine) == list(range(1, HEAD + 1))
+    assert upgrade(legacy_engine) == []  # already at HEAD
+    assert current_version(legacy_engine) == HEAD
+
+    inspector = inspect(legacy_engine)
+    user_cols = {c["name"] for c in inspector.get_columns("users")}
+    key_cols = {c["name"]: c for c in inspector.get_columns("provider_keys")}
+    assert {"password_hash", "created_at"} <= user_cols
+    assert "discovered_models" in key_cols
+    assert "pending" in str(key_cols["status"]["default"])
+
+    with legacy_engine.connect() as conn:
+        rows = conn.execute(text(
+            "SELECT task_type, needs_web, output_format, urgency FROM prompts ORDER BY id"
+        )).all()
+    assert rows == [("coding", 1, "json", "fast"), (None, None, None, None)]
+    indexes = {ix["name"] for ix in inspector.get_indexes("prompts")}
+    assert {
+        "ix_prompts_user_created", "ix_prompts_task_created", "ix_prompts_web_created",
+        "ix_prompts_format_created", "ix_prompts_urgency_created", "ix_prompts_created",
+    } <= indexes
+    attempt_indexes = {ix["name"] for ix in inspector.get_indexes("completion_attempts")}
+    assert {"ix_completion_attempts_prompt_id", "ix_completion_attempts_completion_id"} <= attempt_indexes
+
+
+def test_baseline_ddl_is_idempotent(legacy_engine):
+    # A rerun after a failed backfill must not trip over columns it already added
+    for _ in range(2):
+        with legacy_engine.begin() as conn:
+            migrations.MIGRATIONS[0].upgrade(conn)
+
+
+def test_startup_refuses_an_out_of_date_schema(legacy_engine, monkeypatch):
+    monkeypatch.delenv("DB_AUTO_MIGRATE", raising=False)
+    with pytest.raises(SchemaOutOfDate):
+        ensure_schema(legacy_engine)
+    assert "task_type" not in {c["name"] for c in inspect(legacy_engine).get_columns("prompts")}
+
+    monkeypatch.setenv("DB_AUTO_MIGRATE", "1")
+    assert ensure_schema(legacy_engine) == HEAD
+
+
+def test_startup_on_current_schema_only_reads_the_version(tmp_path, monkeypatch):
+    engine = make_engine(f"sqlite:///{tmp_path / 'cur.db'}")
+    assert ensure_schema(engine) == HEAD  # empty database is initialised
+
+    monkeypatch.setattr(migrations, "upgrade", lambda *a, **k: pytest.fail("upgrade ran on a current schema"))
+    assert ensure_schema(engine) == HEAD
+    engine.dispose()
+
+
+def test_upgrade_from_an_earlier_version_creates_new_tables(tmp_path):
+    engine = make_engine(f"sqlite:///{tmp_path / 'v1.db'}")
+    upgrade(engine)
+    with engine.begin() as conn:
+        conn.execute(text("DROP TABLE completion_attempts"))
+        _stamp(conn, 1)  # as deployed before migration 2 existed
+
+    with pytest.raises(SchemaOutOfDate):
+        ensure_schema(engine)
+    assert upgrade(engine, target=2) == [2]
+    assert "completion_attempts" in inspect(engine).get_table_names()
+    engine.dispose()
@@ -0,0 +1,66 @@
+"""
+tests/unit/test_password_hasher.py
+----------------------------------
+Unit tests for the bounded bcrypt pool and transparent rehash on login.
+"""
+
+import threading
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.db.base import Base
+from app.db.models import User
+from app.services.auth_service import login_user, register_user, set_session_store
+from app.services.password_hasher import (
+    HasherBusy,
+    PasswordHasher,
+    hash_rounds,
+    set_password_hasher,
+)
+from app.services.session_store import MemorySessionStore
+
+
+@pytest.fixture
+async def db():
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    set_session_store(MemorySessionStore())
+    async with async_sessionmaker(engine, expire_on_commit=False)() as session:
+        yield session
+    await engine.dispose()
+    set_password_hasher(None)
+
+
+async def test_hash_and_verify():
+    hasher = PasswordHasher(rounds=4)
+    hashed = await hasher.hash("secret123")
+    assert hash_rounds(hashed) == 4
+    assert await hasher.verify("secret123", hashed)
+    assert not await hasher.verify("wrong", hashed)
+
+
+async def test_full_queue_rejects_fast():
+    hasher = PasswordHasher(rounds=4, max_workers=1, max_queue=0)
+    release = threading.Event()
+    blocker = hasher.submit(release.wait)  # occupies the only slot
+    with pytest.raises(HasherBusy):
+        await hasher.hash("secret123")
+    release.set()
+    blocker.result()
+    assert await hasher.verify("secret123", await hasher.hash("secret123"))
+
+
+async def test_login_rehashes_when_work_factor_changes(db):
+    set_password_hasher(PasswordHasher(rounds=4))
+    await register_user("alice", "secret123", db)
+
+    set_password_hasher(PasswordHasher(rounds=5))
+    await login_user("alice", "secret123", db)
+
+    user = (await db.execute(select(User).where(User.username == "alice"))).scalars().first()
+    assert hash_rounds(user.password_hash) == 5
+    # Still the same password after the upgrade
+    await login_user("alice", "secret123", db)
@@ -0,0 +1,110 @@
+"""
+tests/unit/test_profiling.py
+----------------------------
+Unit tests for the stack sampler and the header-gated profiling middleware.
+"""
+
+import threading
+import time
+import tracemalloc
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import app.api.profiling as profiling_mw
+from app.api.profiling import ProfilingMiddleware
+from app.services.session_store import UserSnapshot
+from app.utils.profiling import RequestProfile, StackSampler
+
+
+def _spin(seconds: float) -> int:
+    total, deadline = 0, time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        total += 1
+    return total
+
+
+def test_sampler_records_the_busy_function():
+    sampler = StackSampler(interval=0.001, thread_ids={threading.get_ident()})
+    sampler.start()
+    _spin(0.1)
+    sampler.stop()
+    assert sampler.samples > 10
+    top_stack, _ = sampler.stacks.most_common(1)[0]
+    assert top_stack.startswith("MainThread;")
+    assert "_spin (test_profiling.py:" in top_stack
+    assert sampler.folded().splitlines()[0].rsplit(" ", 1)[1].isdigit()
+
+
+def test_only_one_capture_at_a_time(tmp_path):
+    first = RequestProfile.begin("first")
+    assert RequestProfile.begin("second") is None
+    payload = [bytearray(1024) for _ in range(100)]
+    first.finish()
+    assert not tracemalloc.is_tracing()
+    assert first.peak_bytes >= 100 * 1024
+    assert payload
+
+    second = RequestProfile.begin("second")
+    assert second is not None
+    second.finish()
+
+
+@pytest.fixture
+def client(monkeypatch, tmp_path):
+    monkeypatch.setenv("PROFILE_DIR", str(tmp_path))
+    monkeypatch.setenv("ADMIN_USERNAMES", "ops")
+
+    async def fake_user(token):
+        if token == "nope":
+            raise LookupError("Invalid or expired token")
+        return UserSnapshot(id=1, username=token)
+
+    monkeypatch.setattr(profiling_mw, "get_user_from_token", fake_user)
+
+    app = FastAPI()
+    app.add_middleware(ProfilingMiddleware)
+
+    @app.get("/work")
+    def work():
+        return {"n": _spin(0.05)}
+
+    return TestClient(app)
+
+
+def test_admin_request_with_header_is_profiled(client, tmp_path):
+    resp = client.get("/work", headers={
+        "Authorization": "Bearer ops", "X-BYOK-Profile": "1", "X-Request-ID": "req-123",
+    })
+    assert resp.status_code == 200
+    assert resp.headers["x-profile-id"] == "req-123"
+
+    assert sorted(p.name for p in tmp_path.iterdir()) == [
+        "req-123.cpu.folded", "req-123.mem.txt", "req-123.tracemalloc",
+    ]
+    assert "_spin (test_profiling.py:" in (tmp_path / "req-123.cpu.folded").read_text()
+    assert (tmp_path / "req-123.mem.txt").read_text().startswith("request req-123:")
+    tracemalloc.Snapshot.load(str(tmp_path / "req-123.tracemalloc"))
+
+
+@pytest.mark.parametrize("headers", [
+    {"Authorization": "Bearer ops"},                              # no profile header
+    {"Authorization": "Bearer alice", "X-BYOK-Profile": "1"},      # not an admin
+    {"Authorization": "Bearer nope", "X-BYOK-Profile": "1"},       # bad token
+    {"X-BYOK-Profile": "1"},                                      # anonymous
+])
+def test_everyone_else_passes_through(client, tmp_path, headers):
+    resp = client.get("/work", headers=headers)
+    assert resp.status_code == 200
+    assert "x-profile-id" not in resp.headers
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_unsafe_request_id_is_replaced(client, tmp_path):
+    resp = client.get("/work", headers={
+        "Authorization": "Bearer ops", "X-BYOK-Profile": "1", "X-Request-ID": "../../etc/passwd",
+    })
+    profile_id = resp.headers["x-profile-id"]
+    assert profile_id != "../../etc/passwd" and len(profile_id) == 16
+    assert (tmp_path / f"{profile_id}.cpu.folded").exists()
@@ -0,0 +1,128 @@
+"""
+tests/unit/test_prompt_bodies.py
+--------------------------------
+Unit tests for content-addressed, compressed prompt body storage.
+"""
+
+import pytest
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.db.base import Base
+from app.db.prompt_models import Prompt, PromptBlob
+from app.db.session import make_engine
+from app.services.exporter import EXPORTABLE, export_ndjson
+from app.services.prompt_bodies import (
+    ChunkCache,
+    MissingPromptBlob,
+    attach_body,
+    chunk_cache,
+    prompt_text,
+    prompt_texts_sync,
+    split_chunks,
+    store_prompt_blobs,
+)
+from app.services.write_behind import WriteBehindQueue
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = tmp_path / "bodies.db"
+    engine = make_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind=engine)
+    engine.dispose()
+    return path
+
+
+@pytest.fixture
+def session_factory(db_path):
+    engine = make_engine(f"sqlite:///{db_path}")
+    yield sessionmaker(bind=engine, expire_on_commit=False)
+    engine.dispose()
+
+
+@pytest.fixture(autouse=True)
+def cold_cache():
+    chunk_cache.clear()
+    yield
+    chunk_cache.clear()
+
+
+def _transcript(turns: int) -> str:
+    """Same shape as ui/chat.py build_contextual_prompt."""
+    parts = ["Previous conversation:"]
+    for i in range(turns):
+        parts.append(f"User: question {i} " + "about sorting algorithms " * 20)
+        parts.append(f"Assistant: answer {i} " + "with a long explanation " * 40)
+    parts += ["", f"User: question {turns}", "", "Respond to the latest user message, using the conversation above as context."]
+    return "\n".join(parts)
+
+
+def _store(session_factory, texts):
+    queue = WriteBehindQueue(session_factory, flush_interval_ms=1)
+    queue.add_batch_hook(Prompt, store_prompt_blobs)
+    rows = [queue.submit(attach_body(Prompt(username="alice", user_id=1), text)) for text in texts]
+    queue.close()
+    return [r.id for r in rows]
+
+
+def test_split_is_lossless_and_prefix_stable():
+    short, longer = _transcript(10), _transcript(11)
+    a, b = split_chunks(short, target=1024), split_chunks(longer, target=1024)
+    assert "".join(a) == short and "".join(b) == longer
+    # Every complete chunk of the shorter transcript is reused by the longer one
+    assert a[:-1] == b[:len(a) - 1]
+    assert split_chunks("") == [""]
+    assert "".join(split_chunks("x" * 50_000)) == "x" * 50_000
+
+
+def test_growing_transcript_is_stored_once(session_factory):
+    texts = [_transcript(n) for n in range(1, 30)]
+    ids = _store(session_factory, texts)
+
+    with session_factory() as db:
+        stored = db.scalar(select(func.sum(func.length(PromptBlob.data))))
+        rows = [db.get(Prompt, i) for i in ids]
+        assert prompt_texts_sync(db, rows) == texts
+    assert stored < sum(len(t) for t in texts) / 20  # far below storing every transcript in full
+    assert all(r.raw_prompt == "" and r.body_hash for r in rows)
+
+
+async def test_async_read_uses_lru_and_handles_legacy_rows(session_factory, db_path):
+    [chunked_id] = _store(session_factory, [_transcript(5)])
+    with session_factory() as db:
+        db.add(Prompt(id=10_000, username="old", raw_prompt="stored before chunking"))
+        db.commit()
+
+    engine = create_async_engine(f"sqlite+aiosqlite:///{db_path}")
+    async with async_sessionmaker(engine)() as db:
+        row = await db.get(Prompt, chunked_id)
+        assert await prompt_text(db, row) == _transcript(5)
+        misses = chunk_cache.stats()["misses"]
+        assert await prompt_text(db, row) == _transcript(5)
+        assert chunk_cache.stats()["misses"] == misses  # second read is all cache hits
+        assert await prompt_text(db, await db.get(Prompt, 10_000)) == "stored before chunking"
+
+        # Export reassembles bodies so the dump is self-contained
+        body = b"".join([c async for c in export_ndjson(async_sessionmaker(engine), EXPORTABLE["prompts"])])
+        assert _transcript(5).encode().replace(b"\n", b"\\n") in body
+    await engine.dispose()
+
+
+def test_missing_chunk_is_reported(session_factory):
+    with session_factory() as db:
+        db.add(Prompt(id=1, username="a", raw_prompt="", body_chunks=["0" * 64]))
+        db.commit()
+        with pytest.raises(MissingPromptBlob):
+            prompt_texts_sync(db, [db.get(Prompt, 1)])
+
+
+def test_chunk_cache_evicts_least_recently_used():
+    cache = ChunkCache(max_chars=10)
+    cache.put("a", "aaaa")
+    cache.put("b", "bbbb")
+    cache.get("a")
+    cache.put("c", "cccc")  # over budget: "b" is the LRU entry
+    assert cache.get("b") is None
+    assert cache.get("a") == "aaaa" and cache.get("c") == "cccc"
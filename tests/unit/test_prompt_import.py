@@ -0,0 +1,208 @@
+"""
+tests/unit/test_prompt_import.py
+--------------------------------
+Unit tests for NDJSON bulk import and the background profiling pool.
+"""
+
+import json
+from datetime import datetime
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.db.base import Base
+from app.db.models import ImportJob, User
+from app.db.prompt_models import Prompt
+from app.db.session import make_engine
+from app.schemas.prompts import PromptProfile
+from app.services.prompt_bodies import chunk_cache, prompt_texts_sync, store_prompt_blobs
+from app.services.prompt_import import (
+    ImportProfilerPool,
+    ImportTooLarge,
+    import_prompts,
+    iter_lines,
+    job_progress,
+    resume_import_jobs,
+    set_import_pool,
+)
+from app.services.session_store import UserSnapshot
+from app.services.write_behind import WriteBehindQueue, set_write_queue
+
+ALICE = UserSnapshot(id=1, username="alice")
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = tmp_path / "import.db"
+    engine = make_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind=engine)
+    with sessionmaker(bind=engine)() as db:
+        db.add(User(id=1, username="alice"))
+        db.commit()
+    engine.dispose()
+    return path
+
+
+@pytest.fixture
+def session_factory(db_path):
+    engine = make_engine(f"sqlite:///{db_path}")
+    yield sessionmaker(bind=engine, expire_on_commit=False)
+    engine.dispose()
+
+
+@pytest.fixture
+async def adb(db_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{db_path}")
+    async with async_sessionmaker(engine, expire_on_commit=False)() as session:
+        yield session
+    await engine.dispose()
+
+
+class RecordingPool:
+    def __init__(self):
+        self.jobs = []
+
+    def submit(self, job_id):
+        self.jobs.append(job_id)
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def installed(session_factory):
+    pool = RecordingPool()
+    queue = WriteBehindQueue(session_factory, flush_interval_ms=1)
+    queue.add_batch_hook(Prompt, store_prompt_blobs)
+    set_write_queue(queue)
+    set_import_pool(pool)
+    yield pool
+    set_import_pool(None)
+    set_write_queue(None)
+
+
+async def _chunks(data: bytes, size: int = 7):
+    for i in range(0, len(data), size):
+        yield data[i:i + size]
+
+
+def _profile(raw_prompt: str) -> PromptProfile:
+    return PromptProfile(
+        task_type="coding" if "code" in raw_prompt else "text_generation",
+        needs_web=False, needs_code="code" in raw_prompt,
+        output_format="text", urgency="normal", confidence=0.8,
+    )
+
+
+async def test_iter_lines_reassembles_lines_across_chunks():
+    lines = [line async for line in iter_lines(_chunks(b'{"a":1}\n{"b":22}\n{"c":3}'))]
+    assert lines == [b'{"a":1}', b'{"b":22}', b'{"c":3}']
+
+    with pytest.raises(ImportTooLarge):
+        [line async for line in iter_lines(_chunks(b"x" * 100), max_line_bytes=10)]
+
+
+async def test_import_stores_unprofiled_rows_and_queues_job(adb, session_factory, installed):
+    body = "\n".join([
+        json.dumps({"prompt": "write code to sort"}),
+        "not json",
+        json.dumps({"prompt": "a poem", "created_at": "2025-01-02T03:04:05"}),
+        "",
+        json.dumps({"prompt": ""}),
+    ]).encode()
+
+    result = await import_prompts(adb, ALICE, _chunks(body))
+
+    assert (result.job.imported, result.job.rejected) == (2, 2)
+    assert [e["line"] for e in result.errors] == [2, 5]
+    assert result.job.status == "profiling"
+    assert installed.jobs == [result.job.id]
+    chunk_cache.clear()  # read back from prompt_blobs
+    with session_factory() as db:
+        rows = db.scalars(select(Prompt).order_by(Prompt.id)).all()
+        assert prompt_texts_sync(db, rows) == ["write code to sort", "a poem"]
+    assert all(r.prompt_profile_json is None and r.import_job_id == result.job.id for r in rows)
+    assert rows[1].created_at == datetime(2025, 1, 2, 3, 4, 5)
+
+
+def _seed_job(session_factory, n=10):
+    with session_factory() as db:
+        job = ImportJob(user_id=1, status="profiling", imported=n, profiling_started_at=datetime.utcnow())
+        db.add(job)
+        db.flush()
+        db.add_all([Prompt(username="alice", user_id=1, raw_prompt=f"code {i}", import_job_id=job.id) for i in range(n)])
+        db.commit()
+        return job.id
+
+
+def _job(session_factory, job_id):
+    with session_factory() as db:
+        return db.get(ImportJob, job_id)
+
+
+def test_pool_profiles_in_batches_and_checkpoints(session_factory):
+    job_id = _seed_job(session_factory)
+    pool = ImportProfilerPool(session_factory, _profile, workers=3, batch=4)
+    pool.process(job_id)
+    pool.close()
+
+    job = _job(session_factory, job_id)
+    assert (job.status, job.profiled, job.failed) == ("done", 10, 0)
+    with session_factory() as db:
+        rows = db.scalars(select(Prompt)).all()
+    assert {r.task_type for r in rows} == {"coding"}
+    assert job.checkpoint_id == max(r.id for r in rows)
+    progress = job_progress(job)
+    assert progress["remaining"] == 0 and progress["eta_s"] == 0.0
+
+
+def test_pool_retries_overload_and_counts_hard_failures(session_factory):
+    job_id = _seed_job(session_factory, n=3)
+    calls = {}
+
+    def flaky(raw_prompt):
+        calls[raw_prompt] = calls.get(raw_prompt, 0) + 1
+        if raw_prompt == "code 0" and calls[raw_prompt] == 1:
+            raise RuntimeError("429 rate limit")
+        if raw_prompt == "code 2":
+            raise RuntimeError("Gemini did not return valid JSON")
+        return _profile(raw_prompt)
+
+    pool = ImportProfilerPool(session_factory, flaky, workers=2, batch=10, backoff_s=0)
+    pool.process(job_id)
+    pool.close()
+
+    job = _job(session_factory, job_id)
+    assert (job.profiled, job.failed) == (2, 1)
+    assert "valid JSON" in job.last_error
+    assert calls["code 0"] == 2 and calls["code 2"] == 1
+
+
+def test_resume_continues_from_checkpoint(session_factory):
+    job_id = _seed_job(session_factory, n=6)
+    with session_factory() as db:
+        first_ids = db.scalars(select(Prompt.id).order_by(Prompt.id).limit(3)).all()
+    with session_factory() as db:
+        db.get(ImportJob, job_id).checkpoint_id = first_ids[-1]
+        db.commit()
+
+    profiled = []
+
+    def record(raw_prompt):
+        profiled.append(raw_prompt)
+        return _profile(raw_prompt)
+
+    pool = RecordingPool()
+    set_import_pool(pool)
+    try:
+        assert resume_import_jobs(session_factory) == [job_id]
+    finally:
+        set_import_pool(None)
+    assert pool.jobs == [job_id]
+
+    worker = ImportProfilerPool(session_factory, record, workers=1, batch=2)
+    worker.process(job_id)
+    worker.close()
+    assert sorted(profiled) == ["code 3", "code 4", "code 5"]
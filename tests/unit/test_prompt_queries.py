@@ -0,0 +1,99 @@
+"""
+tests/unit/test_prompt_queries.py
+---------------------------------
+Unit tests for keyset-paginated prompt listing and prompt analytics.
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.db.base import Base
+from app.db.prompt_models import Prompt
+from app.services.prompt_queries import (
+    InvalidCursor,
+    PromptFilters,
+    decode_cursor,
+    encode_cursor,
+    list_prompts,
+    prompt_analytics,
+)
+
+T0 = datetime(2026, 3, 1, 12)
+
+
+def _prompt(i, user_id=1, task_type="coding", urgency="normal", created_at=None):
+    row = Prompt(
+        username=f"user{user_id}", user_id=user_id, raw_prompt=f"p{i}",
+        created_at=created_at or T0 + timedelta(hours=i),
+    )
+    row.set_profile({
+        "task_type": task_type, "needs_web": task_type == "web_search", "needs_code": False,
+        "output_format": "text", "urgency": urgency, "confidence": 0.9,
+    })
+    return row
+
+
+@pytest.fixture
+async def db():
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    async with async_sessionmaker(engine, expire_on_commit=False)() as session:
+        session.add_all([_prompt(i, task_type="web_search" if i % 3 == 0 else "coding") for i in range(10)])
+        session.add_all([_prompt(i, user_id=2, urgency="fast") for i in range(3)])
+        # Same timestamp: the id breaks the tie
+        session.add_all([_prompt(100 + i, user_id=3, created_at=T0) for i in range(3)])
+        await session.commit()
+        yield session
+    await engine.dispose()
+
+
+def test_cursor_round_trip():
+    assert decode_cursor(encode_cursor(T0, 42)) == (T0, 42)
+    with pytest.raises(InvalidCursor):
+        decode_cursor("not-a-cursor")
+
+
+async def test_pages_cover_every_row_once_newest_first(db):
+    seen, cursor = [], None
+    while True:
+        rows, cursor = await list_prompts(db, PromptFilters(user_id=1), limit=4, cursor=cursor)
+        seen.extend(rows)
+        if cursor is None:
+            break
+    assert [r.raw_prompt for r in seen] == [f"p{i}" for i in reversed(range(10))]
+
+
+async def test_pagination_is_stable_on_equal_timestamps(db):
+    first, cursor = await list_prompts(db, PromptFilters(user_id=3), limit=2)
+    rest, end = await list_prompts(db, PromptFilters(user_id=3), limit=2, cursor=cursor)
+    assert [r.id for r in first + rest] == sorted((r.id for r in first + rest), reverse=True)
+    assert len({r.id for r in first + rest}) == 3
+    assert end is None
+
+
+async def test_filters_on_profile_columns_and_time(db):
+    rows, _ = await list_prompts(db, PromptFilters(user_id=1, task_type="web_search"))
+    assert {r.raw_prompt for r in rows} == {"p0", "p3", "p6", "p9"}
+
+    rows, _ = await list_prompts(db, PromptFilters(needs_web=True))
+    assert len(rows) == 4
+
+    rows, _ = await list_prompts(
+        db, PromptFilters(user_id=1, start=T0 + timedelta(hours=2), end=T0 + timedelta(hours=5))
+    )
+    assert [r.raw_prompt for r in rows] == ["p4", "p3", "p2"]
+
+
+async def test_analytics_groups(db):
+    by_task = await prompt_analytics(db, PromptFilters(user_id=1), "task_type")
+    assert {g["task_type"]: g["prompts"] for g in by_task} == {"coding": 6, "web_search": 4}
+
+    by_urgency = await prompt_analytics(db, PromptFilters(), "urgency")
+    assert {g["urgency"]: g["prompts"] for g in by_urgency} == {"fast": 3, "normal": 13}
+
+    by_day = await prompt_analytics(db, PromptFilters(user_id=1), "day")
+    assert by_day[0]["day"] == "2026-03-01"
+    assert sum(g["prompts"] for g in by_day) == 10
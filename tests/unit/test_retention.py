@@ -0,0 +1,105 @@
+"""
+tests/unit/test_retention.py
+----------------------------
+Unit tests for archiving old prompts / request_logs and reading them back.
+"""
+
+import gzip
+import json
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import func, select, update
+from sqlalchemy.orm import sessionmaker
+
+from app.db.base import Base
+from app.db.models import RequestLog, User
+from app.db.prompt_models import Prompt, PromptBlob
+from app.db.session import make_engine
+from app.services.prompt_bodies import attach_body, chunk_cache, prompt_texts_sync, store_prompt_blobs
+from app.services.retention import archive_table, iter_archive, read_manifest, restore
+
+NOW = datetime(2026, 6, 1)
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    engine = make_engine(f"sqlite:///{tmp_path / 'retention.db'}")
+    Base.metadata.create_all(bind=engine)
+    factory = sessionmaker(bind=engine, expire_on_commit=False)
+    with factory() as db:
+        db.add(User(id=1, username="alice"))
+        for i in range(10):
+            created = NOW - timedelta(days=100 - i * 10)  # 100, 90, ..., 10 days old
+            row = attach_body(Prompt(id=i + 1, username="alice", user_id=1, created_at=created), f"prompt {i}\n" * 3)
+            db.add(row)
+            store_prompt_blobs(db, [row])
+        db.add(RequestLog(
+            id=1, user_id=1, prompt_id=1, created_at=NOW, prompt="p",
+            chosen_provider="gemini", chosen_model="flash", attempts=1,
+            input_tokens_est=1, output_tokens_est=1, estimated_cost_usd=0.0,
+        ))
+        # As if every chunk was last written long ago; referenced ones must still survive
+        db.execute(update(PromptBlob).values(touched_at=NOW - timedelta(days=200)))
+        db.commit()
+    chunk_cache.clear()
+    yield factory
+    engine.dispose()
+
+
+def _ids(session_factory):
+    with session_factory() as db:
+        return db.scalars(select(Prompt.id).order_by(Prompt.id)).all()
+
+
+def test_archives_old_rows_in_chunks_and_deletes_them(session_factory, tmp_path):
+    archive = tmp_path / "archive"
+    result = archive_table(session_factory, "prompts", 45, archive_dir=archive, chunk=2, pause_s=0, now=NOW)
+
+    # 100..50 days old are past the cutoff; prompt 1 is still referenced by a request log
+    assert result.rows == 5
+    assert result.files == 3
+    assert _ids(session_factory) == [1, 7, 8, 9, 10]
+
+    manifest = read_manifest(archive)
+    assert [(e["first_id"], e["last_id"]) for e in manifest] == [(2, 3), (4, 5), (6, 6)]
+    with gzip.open(archive / manifest[0]["file"], "rt") as f:
+        first = json.loads(f.readline())
+    assert first["raw_prompt"] == "prompt 1\n" * 3  # full text, not chunk references
+    assert first["body_chunks"] is None
+
+    # Chunks of the archived prompts are gone; the remaining prompts still read fine
+    assert result.blobs_removed == 5
+    with session_factory() as db:
+        assert db.scalar(select(func.count()).select_from(PromptBlob)) == 5
+        assert prompt_texts_sync(db, [db.get(Prompt, 7)]) == ["prompt 6\n" * 3]
+
+
+def test_dry_run_changes_nothing(session_factory, tmp_path):
+    result = archive_table(session_factory, "prompts", 45, archive_dir=tmp_path, dry_run=True, now=NOW)
+    assert result.rows == 5 and result.files == 0
+    assert len(_ids(session_factory)) == 10
+    assert read_manifest(tmp_path) == []
+
+
+def test_query_and_restore_round_trip(session_factory, tmp_path):
+    archive_table(session_factory, "prompts", 45, archive_dir=tmp_path, chunk=2, pause_s=0, now=NOW)
+
+    window = list(iter_archive("prompts", tmp_path, start=NOW - timedelta(days=85), end=NOW - timedelta(days=65)))
+    assert [r["id"] for r in window] == [3, 4]
+
+    assert restore(session_factory, "prompts", tmp_path) == 5
+    assert restore(session_factory, "prompts", tmp_path) == 5  # second run skips existing ids
+    assert _ids(session_factory) == list(range(1, 11))
+    with session_factory() as db:
+        row = db.get(Prompt, 2)
+        assert row.created_at == NOW - timedelta(days=90)
+        assert prompt_texts_sync(db, [row]) == ["prompt 1\n" * 3]
+
+
+def test_rerun_after_crash_does_not_duplicate_manifest(session_factory, tmp_path):
+    archive_table(session_factory, "prompts", 45, archive_dir=tmp_path, chunk=5, pause_s=0, now=NOW)
+    restore(session_factory, "prompts", tmp_path)  # rows back as if the delete never ran
+    archive_table(session_factory, "prompts", 45, archive_dir=tmp_path, chunk=5, pause_s=0, now=NOW)
+    assert len(read_manifest(tmp_path)) == 1
+    assert len(list(iter_archive("prompts", tmp_path))) == 5
@@ -0,0 +1,163 @@
+"""
+tests/unit/test_scheduler.py
+----------------------------
+Unit tests for the provider scheduler (AIMD limits, priority, fairness).
+"""
+
+import threading
+import time
+
+import pytest
+
+from app.services.scheduler import (
+    AIMDLimit,
+    ProviderScheduler,
+    SchedulerConfig,
+    SchedulerOverloaded,
+    SchedulerTimeout,
+    is_overload_error,
+)
+
+
+def _scheduler(**overrides) -> ProviderScheduler:
+    # Pin limits to 1 so dispatch order is fully observable
+    defaults = dict(
+        provider_initial=1.0, provider_min=1.0, provider_max=1.0,
+        key_initial=1.0, key_min=1.0, key_max=1.0, queue_timeout_s=2.0,
+    )
+    defaults.update(overrides)
+    return ProviderScheduler(SchedulerConfig(**defaults))
+
+
+def _enqueue(sched, order, label, **kwargs):
+    """Start a thread that waits for a slot, records its label, and releases."""
+    def run():
+        with sched.slot("openai", "k1", **kwargs):
+            order.append(label)
+    t = threading.Thread(target=run)
+    t.start()
+    return t
+
+
+def _wait_for_queue(sched, depth):
+    deadline = time.monotonic() + 2
+    while sched.stats()["providers"]["openai"]["queue_depth"] < depth:
+        assert time.monotonic() < deadline
+        time.sleep(0.005)
+
+
+def test_aimd_increases_on_fast_calls_and_backs_off_on_overload():
+    limit = AIMDLimit(initial=4, minimum=1, maximum=10, tolerance=2.0, backoff=0.5)
+    for _ in range(10):
+        limit.on_sample(0.1, overloaded=False)
+    assert limit.limit > 4
+
+    grown = limit.limit
+    limit.on_sample(0.1, overloaded=True)
+    assert limit.limit == pytest.approx(grown * 0.5)
+
+
+def test_aimd_backs_off_on_latency_spike():
+    limit = AIMDLimit(initial=8, minimum=1, maximum=10, tolerance=2.0, backoff=0.5)
+    limit.on_sample(0.1, overloaded=False)
+    before = limit.limit
+    limit.on_sample(1.0, overloaded=False)  # 10x baseline
+    assert limit.limit < before
+
+
+def test_fast_urgency_jumps_ahead_of_normal():
+    sched = _scheduler()
+    order: list[str] = []
+    sched.acquire("openai", "k1", user_id=1)  # occupy the only slot
+
+    threads = [_enqueue(sched, order, "normal", user_id=2, urgency="normal")]
+    _wait_for_queue(sched, 1)
+    threads.append(_enqueue(sched, order, "fast", user_id=3, urgency="fast"))
+    _wait_for_queue(sched, 2)
+
+    sched.release("openai", "k1", 0.01)
+    for t in threads:
+        t.join()
+    assert order == ["fast", "normal"]
+
+
+def test_fair_queuing_interleaves_users():
+    sched = _scheduler()
+    order: list[str] = []
+    sched.acquire("openai", "k1", user_id="hog")
+
+    threads = []
+    for i in range(3):
+        threads.append(_enqueue(sched, order, f"hog{i}", user_id="hog"))
+        _wait_for_queue(sched, i + 1)
+    threads.append(_enqueue(sched, order, "light", user_id="light"))
+    _wait_for_queue(sched, 4)
+
+    sched.release("openai", "k1", 0.01)
+    for t in threads:
+        t.join()
+    # The light user's single request must not wait behind the hog's whole backlog
+    assert order.index("light") < 2
+
+
+def test_idle_users_are_forgotten():
+    from app.services.scheduler import _PRUNE_EVERY
+
+    sched = _scheduler(provider_max=4.0, key_max=4.0)
+    for user in range(_PRUNE_EVERY):
+        with sched.slot("openai", "k1", user_id=user):
+            pass
+    assert len(sched._user_finish) == 0  # swept on the last acquire, nothing queued
+    with sched.slot("openai", "k1", user_id="next"):
+        pass
+    assert list(sched._user_finish) == ["next"]
+
+
+def test_queue_full_rejects_immediately():
+    sched = _scheduler(max_queue=0)
+    sched.acquire("openai", "k1")
+    with pytest.raises(SchedulerOverloaded):
+        sched.acquire("openai", "k1")
+    assert sched.stats()["providers"]["openai"]["rejected"] == 1
+
+
+def test_queue_timeout_raises():
+    sched = _scheduler(queue_timeout_s=0.05)
+    sched.acquire("openai", "k1")
+    with pytest.raises(SchedulerTimeout):
+        sched.acquire("openai", "k1")
+    assert sched.stats()["providers"]["openai"]["queue_depth"] == 0
+
+
+def test_saturated_key_does_not_block_other_keys():
+    sched = _scheduler(provider_initial=4.0, provider_max=4.0)
+    sched.acquire("openai", "k1")
+    # k1 is at its limit of 1, but k2 is free and the provider has room
+    sched.acquire("openai", "k2")
+    assert sched.stats()["providers"]["openai"]["inflight"] == 2
+
+
+def test_is_overload_error():
+    assert is_overload_error(RuntimeError("Error code: 429 - rate limited"))
+    assert is_overload_error(TimeoutError("read timed out"))
+    assert not is_overload_error(ValueError("invalid model name"))
+
+
+def test_scheduler_stats_endpoint_requires_admin(monkeypatch):
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+
+    from app.api.dependencies import get_current_user
+    from app.api.v1.routes_ops import router
+    from app.services.session_store import UserSnapshot
+
+    app = FastAPI()
+    app.include_router(router, prefix="/v1")
+    client = TestClient(app)
+    assert client.get("/v1/ops/scheduler").status_code == 422  # no Authorization header
+
+    monkeypatch.setenv("ADMIN_USERNAMES", "ops")
+    app.dependency_overrides[get_current_user] = lambda: UserSnapshot(id=2, username="alice")
+    assert client.get("/v1/ops/scheduler").status_code == 403
+    app.dependency_overrides[get_current_user] = lambda: UserSnapshot(id=1, username="ops")
+    assert set(client.get("/v1/ops/scheduler").json()) == {"providers", "keys"}
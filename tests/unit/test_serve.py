@@ -0,0 +1,41 @@
+"""
+tests/unit/test_serve.py
+------------------------
+Unit tests for the multi-worker entrypoint checks and worker leader election.
+"""
+
+import subprocess
+import sys
+from pathlib import Path
+
+from app.utils.leader import acquire_leadership, release_leadership
+from scripts.serve import check_shared_state
+
+ROOT = Path(__file__).resolve().parents[2]
+
+
+def test_single_worker_accepts_process_local_sessions():
+    assert check_shared_state(1, env={}) == []
+
+
+def test_multiple_workers_require_shared_sessions():
+    assert check_shared_state(4, env={"SESSION_BACKEND": "memory"})
+    assert check_shared_state(4, env={}) != []
+    assert check_shared_state(4, env={"SESSION_BACKEND": "db"}) == []
+
+
+def _other_process_acquires(path) -> bool:
+    code = f"from app.utils.leader import acquire_leadership; print(acquire_leadership({str(path)!r}))"
+    out = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+    return out.stdout.strip() == "True"
+
+
+def test_only_one_process_is_leader(tmp_path):
+    lock = tmp_path / "leader.lock"
+    assert acquire_leadership(str(lock))
+    try:
+        assert acquire_leadership(str(lock))  # idempotent within the leader
+        assert not _other_process_acquires(lock)
+    finally:
+        release_leadership()
+    assert _other_process_acquires(lock)  # released: the next worker takes over
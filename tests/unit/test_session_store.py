@@ -0,0 +1,114 @@
+"""
+tests/unit/test_session_store.py
+--------------------------------
+Unit tests for session backends (expiry, sliding renewal) and the token cache.
+"""
+
+import asyncio
+import time
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.db.base import Base
+from app.db.models import AuthSession
+from app.services.session_store import (
+    DBSessionStore,
+    MemorySessionStore,
+    TokenCache,
+    UserSnapshot,
+)
+
+
+@pytest.fixture
+async def session_factory():
+    """In-memory SQLite DB with the sessions table."""
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    yield async_sessionmaker(engine, expire_on_commit=False)
+    await engine.dispose()
+
+
+@pytest.fixture(params=["memory", "db"])
+def store_factory(request, session_factory):
+    def make(ttl_s=3600):
+        if request.param == "memory":
+            return MemorySessionStore(ttl_s=ttl_s)
+        return DBSessionStore(session_factory, ttl_s=ttl_s)
+    return make
+
+
+async def test_create_and_get(store_factory):
+    store = store_factory()
+    await store.create("tok", 1, "alice")
+    record = await store.get("tok")
+    assert record.user_id == 1
+    assert record.username == "alice"
+
+
+async def test_unknown_token_returns_none(store_factory):
+    assert await store_factory().get("nope") is None
+
+
+async def test_expired_session_returns_none(store_factory):
+    store = store_factory(ttl_s=0.05)
+    await store.create("tok", 1, "alice")
+    await asyncio.sleep(0.1)
+    assert await store.get("tok") is None
+
+
+async def test_delete(store_factory):
+    store = store_factory()
+    await store.create("tok", 1, "alice")
+    await store.delete("tok")
+    assert await store.get("tok") is None
+
+
+async def test_sliding_renewal(store_factory):
+    store = store_factory(ttl_s=1.0)
+    created = await store.create("tok", 1, "alice")
+    await asyncio.sleep(0.6)  # past half the TTL -> next read renews
+    renewed = await store.get("tok")
+    assert renewed.expires_at > created.expires_at + 0.5
+    await asyncio.sleep(0.6)  # original expiry has passed, renewed one has not
+    assert await store.get("tok") is not None
+
+
+async def test_memory_store_sweeps_every_n_creates():
+    store = MemorySessionStore(ttl_s=0.01)
+    store.SWEEP_EVERY = 3
+    await store.create("a", 1, "alice")
+    await asyncio.sleep(0.02)
+    await store.create("b", 2, "bob")
+    assert "a" in store._records  # expired, but no sweep on this create
+    await store.create("c", 3, "carol")
+    assert "a" not in store._records
+
+
+async def test_db_store_never_persists_raw_token(session_factory):
+    store = DBSessionStore(session_factory)
+    await store.create("super-secret-token", 1, "alice")
+    async with session_factory() as db:
+        hashes = list((await db.execute(select(AuthSession.token_hash))).scalars())
+    assert hashes and "super-secret-token" not in hashes
+
+
+def test_token_cache_lru_eviction():
+    cache = TokenCache(maxsize=2, ttl_s=60)
+    far = time.time() + 3600
+    cache.put("a", UserSnapshot(1, "a"), far)
+    cache.put("b", UserSnapshot(2, "b"), far)
+    cache.get("a")  # a becomes most recent
+    cache.put("c", UserSnapshot(3, "c"), far)
+    assert cache.get("b") is None
+    assert cache.get("a").username == "a"
+    assert cache.get("c").username == "c"
+
+
+def test_token_cache_respects_session_expiry():
+    cache = TokenCache(maxsize=10, ttl_s=60)
+    cache.put("a", UserSnapshot(1, "a"), time.time() + 0.05)
+    time.sleep(0.1)
+    assert cache.get("a") is None
@@ -0,0 +1,84 @@
+"""
+tests/unit/test_simulation.py
+-----------------------------
+Unit tests for the discrete-event capacity simulator (simulation_byok.py).
+"""
+
+import pytest
+
+from simulation_byok import Kernel, SimConfig, Simulator, Slots, TokenBucket, default_catalog
+
+
+def _simulate(**overrides) -> tuple[Simulator, dict]:
+    sim = Simulator(SimConfig.from_dict({"days": 0.01, "base_rps": 20, "diurnal_amplitude": 0, **overrides}),
+                    default_catalog())
+    return sim, sim.run()
+
+
+def test_slots_queue_in_fifo_order_and_reject_when_full():
+    kernel, slots, log = Kernel(), Slots(1, max_queue=1), []
+
+    def proc(name, hold):
+        ok = yield slots.acquire()
+        log.append((name, ok, kernel.now))
+        if ok:
+            yield hold
+            slots.release(kernel)
+
+    for name in ("a", "b", "c"):
+        kernel.spawn(proc(name, 1.0))
+    kernel.run(until=10)
+    assert log == [("a", True, 0.0), ("c", False, 0.0), ("b", True, 1.0)]
+
+
+def test_token_bucket_allows_a_ten_second_burst():
+    bucket = TokenBucket(rpm=60)
+    assert [bucket.take(0.0) for _ in range(11)] == [True] * 10 + [False]
+    assert bucket.take(1.0)
+
+
+def test_from_dict_merges_nested_settings():
+    config = SimConfig.from_dict({"providers": {"openai": {"error_rate": 0.5}}, "mix": {"coding": {"weight": 1}}})
+    assert config.providers["openai"].error_rate == 0.5
+    assert config.providers["openai"].tokens_per_s == 80  # untouched default
+    assert config.mix["coding"].weight == 1 and "web_search" in config.mix
+    with pytest.raises(ValueError):
+        SimConfig.from_dict({"workers": 3})
+
+
+def test_steady_traffic_is_served_through_the_real_router():
+    sim, report = _simulate(monthly_budget_usd=None, router_workers=1000)
+    expected = 20 * 0.01 * 86_400
+    assert abs(report["offered"] - expected) < 0.1 * expected
+    assert report["completed"] > 0.95 * report["offered"]
+    assert report["latency_s"]["p50"] > 0.4  # at least a first-token delay
+    assert set(report["answered_by"]) <= {m.key for m in default_catalog()}
+    # Decisions are reused: one per profile shape and cost cap, not one per request
+    assert len(sim.routes) < 50
+
+
+def test_errors_trigger_fallback_up_to_max_attempts():
+    flaky = {p: {"error_rate": 0.5} for p in ("gemini", "openai", "anthropic")}
+    _, report = _simulate(providers=flaky, profile_calls=False, monthly_budget_usd=None)
+    assert report["needed_fallback"] > 0
+    assert set(report["attempts"]) <= {"1", "2", "3"}
+
+    _, report = _simulate(providers=flaky, profile_calls=False, monthly_budget_usd=None, max_attempts=1)
+    assert report["attempts"] == {"1": report["completed"]}
+
+
+def test_small_budgets_run_out():
+    _, report = _simulate(monthly_budget_usd=0.05, users=5)
+    assert report["budget"]["users_exhausted"] > 0
+    assert report["days"][0]["budget_exceeded"] > 0
+
+
+def test_saturation_shows_as_rejections_and_queueing():
+    _, report = _simulate(router_workers=2, router_queue=4, monthly_budget_usd=None)
+    assert report["days"][0]["rejected"] > 0
+    assert report["router_queue_wait_s"]["p99"] > 0
+
+
+def test_rate_limits_count_429s():
+    _, report = _simulate(providers={"gemini": {"rpm": 60}}, monthly_budget_usd=None)
+    assert report["providers"]["gemini"]["rate_limited"] > 0
@@ -0,0 +1,47 @@
+"""
+tests/unit/test_startup.py
+--------------------------
+Import-time budget for `app.main`: worker boot must not pull in the provider
+SDKs or touch the database, and must stay under IMPORT_BUDGET_MS.
+"""
+
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[2]
+
+# Generous for a cold CI box; importing the three provider SDKs alone adds ~2s
+IMPORT_BUDGET_MS = int(os.getenv("IMPORT_BUDGET_MS", 2000))
+
+LAZY_MODULES = ("google.genai", "openai", "anthropic")
+
+
+def _import_app(tmp_path) -> dict[str, int]:
+    """Import app.main in a fresh interpreter; cumulative microseconds per module."""
+    env = {**os.environ, "DATABASE_URL": f"sqlite:///{tmp_path / 'startup.db'}"}
+    env.pop("ASYNC_DATABASE_URL", None)
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True,
+    )
+    cumulative = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, total, name = line.split("|")
+        cumulative[name.strip()] = int(total)
+    return cumulative
+
+
+def test_app_import_is_lazy_and_within_budget(tmp_path):
+    cumulative = _import_app(tmp_path)
+
+    eager = [m for m in LAZY_MODULES if m in cumulative]
+    assert not eager, f"provider SDKs imported at startup: {eager}"
+    assert not (tmp_path / "startup.db").exists(), "database touched at import time"
+
+    took_ms = cumulative["app.main"] / 1000
+    slowest = sorted(cumulative.items(), key=lambda kv: -kv[1])[:10]
+    assert took_ms < IMPORT_BUDGET_MS, f"import app.main took {took_ms:.0f}ms; slowest: {slowest}"
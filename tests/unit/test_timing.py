@@ -0,0 +1,78 @@
+"""
+tests/unit/test_timing.py
+-------------------------
+Unit tests for stage timers, the Server-Timing middleware and /metrics.
+"""
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api.server_timing import ServerTimingMiddleware
+from app.api.v1.routes_ops import metrics_router
+from app.utils.timing import Histogram, REQUEST_SECONDS, STAGE_SECONDS, stage, timed
+
+
+@pytest.fixture(autouse=True)
+def fresh_histograms():
+    STAGE_SECONDS.clear()
+    REQUEST_SECONDS.clear()
+    yield
+    STAGE_SECONDS.clear()
+    REQUEST_SECONDS.clear()
+
+
+def _app() -> FastAPI:
+    app = FastAPI()
+    app.add_middleware(ServerTimingMiddleware)
+    app.include_router(metrics_router)
+
+    @timed("lookup")
+    async def lookup(item_id: int) -> int:
+        return item_id * 2
+
+    @app.get("/items/{item_id}")
+    async def get_item(item_id: int):
+        value = await lookup(item_id)
+        with stage("attempt", provider="openai", model="gpt-4o-mini", task_type="coding") as timer:
+            timer.set(outcome="fallback")
+        return {"value": value}
+
+    return app
+
+
+def test_histogram_buckets_are_cumulative():
+    h = Histogram("t_seconds", "test", ("stage",), buckets=(0.1, 1.0))
+    for seconds in (0.05, 0.5, 0.5, 5.0):
+        h.observe(seconds, ("x",))
+    text = "\n".join(h.render())
+    assert 't_seconds_bucket{stage="x",le="0.1"} 1' in text
+    assert 't_seconds_bucket{stage="x",le="1.0"} 3' in text
+    assert 't_seconds_bucket{stage="x",le="+Inf"} 4' in text
+    assert 't_seconds_count{stage="x"} 4' in text
+
+
+def test_stage_marks_errors():
+    with pytest.raises(ValueError):
+        with stage("catalog"):
+            raise ValueError("boom")
+    assert ("catalog", "", "", "", "error") in STAGE_SECONDS.snapshot()
+
+
+def test_server_timing_header_and_metrics():
+    client = TestClient(_app())
+    resp = client.get("/items/21")
+    assert resp.json() == {"value": 42}
+
+    header = resp.headers["server-timing"]
+    assert header.startswith("lookup;dur=")
+    assert 'attempt;dur=' in header and 'desc="openai/gpt-4o-mini fallback"' in header
+    assert ", total;dur=" in header
+
+    body = client.get("/metrics").text
+    assert (
+        'byok_stage_duration_seconds_count{stage="attempt",provider="openai",model="gpt-4o-mini",'
+        'task_type="coding",outcome="fallback"} 1'
+    ) in body
+    # Route template, not the raw path, so ids do not explode cardinality
+    assert 'byok_http_request_duration_seconds_count{method="GET",route="/items/{item_id}",status="200"} 1' in body
@@ -0,0 +1,104 @@
+"""
+tests/unit/test_token_signer.py
+-------------------------------
+Unit tests for signed session tokens, key rotation and revocation.
+"""
+
+import time
+
+import pytest
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.db.base import Base
+from app.services.auth_service import (
+    configure_signed_tokens,
+    get_user_from_token,
+    login_user,
+    logout,
+    register_user,
+)
+from app.services.token_signer import RevocationList, TokenSigner, is_signed_token
+
+
+@pytest.fixture
+async def session_factory():
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    yield async_sessionmaker(engine, expire_on_commit=False)
+    await engine.dispose()
+
+
+@pytest.fixture
+def signed_mode(monkeypatch):
+    monkeypatch.setenv("AUTH_MODE", "signed")
+    configure_signed_tokens(TokenSigner([("k1", "secret-one")], ttl_s=3600), RevocationList())
+    yield
+    configure_signed_tokens(None, None)
+
+
+def test_sign_verify_roundtrip():
+    signer = TokenSigner([("k1", "secret-one")], ttl_s=60)
+    token = signer.sign(7, "alice")
+    assert is_signed_token(token)
+    claims = signer.verify(token)
+    assert claims.user_id == 7
+    assert claims.username == "alice"
+
+
+def test_tampered_payload_rejected():
+    signer = TokenSigner([("k1", "secret-one")], ttl_s=60)
+    version, kid, payload, sig = signer.sign(7, "alice").split(".")
+    other_payload = signer.sign(1, "admin").split(".")[2]
+    with pytest.raises(LookupError):
+        signer.verify(".".join([version, kid, other_payload, sig]))
+
+
+def test_expired_token_rejected():
+    signer = TokenSigner([("k1", "secret-one")], ttl_s=-1)
+    with pytest.raises(LookupError, match="expired"):
+        signer.verify(signer.sign(7, "alice"))
+
+
+def test_key_rotation_accepts_old_tokens_and_signs_with_new_key():
+    old = TokenSigner([("k1", "secret-one")], ttl_s=60)
+    token = old.sign(7, "alice")
+
+    rotated = TokenSigner([("k2", "secret-two"), ("k1", "secret-one")], ttl_s=60)
+    assert rotated.verify(token).user_id == 7
+    assert rotated.sign(7, "alice").split(".")[1] == "k2"
+
+    retired = TokenSigner([("k2", "secret-two")], ttl_s=60)
+    with pytest.raises(LookupError):
+        retired.verify(token)
+
+
+async def test_revocation_list_prunes_expired_entries():
+    revocations = RevocationList()
+    await revocations.revoke("live", time.time() + 60)
+    await revocations.revoke("dead", time.time() - 1)
+    assert revocations.is_revoked("live")
+    assert not revocations.is_revoked("dead")
+    assert len(revocations) == 1
+
+
+async def test_revocation_shared_through_db(session_factory):
+    worker_a = RevocationList(session_factory, sync_interval_s=0)
+    worker_b = RevocationList(session_factory, sync_interval_s=0)
+    await worker_a.revoke("jti-1", time.time() + 60)
+    assert not worker_b.is_revoked("jti-1")
+    await worker_b.sync_if_stale()
+    assert worker_b.is_revoked("jti-1")
+
+
+async def test_signed_login_resolves_without_store_and_logout_revokes(session_factory, signed_mode):
+    async with session_factory() as db:
+        await register_user("alice", "secret123", db)
+        _, token = await login_user("alice", "secret123", db)
+
+    assert is_signed_token(token)
+    assert (await get_user_from_token(token)).username == "alice"
+
+    await logout(token)
+    with pytest.raises(LookupError, match="Invalid or expired"):
+        await get_user_from_token(token)
@@ -0,0 +1,182 @@
+"""
+tests/unit/test_usage_accounting.py
+-----------------------------------
+Unit tests for SDK token usage capture, pricing, and RequestLog recording.
+"""
+
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+import pytest
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.db.base import Base
+from app.db.models import CompletionAttempt, RequestLog
+from app.db.model_catalog_models import ModelCatalog
+from app.db.prompt_models import Prompt
+from app.db.session import make_engine
+from app.services.completion_service import execute_completion
+from app.services.LLM_completion import LLMCompletionClient, LLMResult, ProviderResponseError
+from app.services.usage_accounting import price_tokens
+from app.services.budget_ledger import BudgetLedger, set_budget_ledger
+from app.services.write_behind import set_write_queue
+
+
+class RecordingQueue:
+    def __init__(self):
+        self.rows = []
+
+    def submit(self, row):
+        self.rows.append(row)
+        return row
+
+    async def asubmit(self, row):
+        return self.submit(row)
+
+    def pending(self, model, row_id):
+        return None
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def queue(tmp_path):
+    q = RecordingQueue()
+    set_write_queue(q)
+    # No budgets rows: accounting only, no enforcement
+    engine = make_engine(f"sqlite:///{tmp_path / 'ledger.db'}")
+    Base.metadata.create_all(bind=engine)
+    set_budget_ledger(BudgetLedger(sessionmaker(bind=engine), flush_interval_s=0))
+    yield q
+    set_write_queue(None)
+    set_budget_ledger(None)
+
+
+@pytest.fixture
+async def db():
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    async with async_sessionmaker(engine, expire_on_commit=False)() as session:
+        session.add_all([
+            ModelCatalog(
+                key="claude_sonnet", provider="anthropic", model="claude-sonnet-4-5-20250929",
+                cost_tier="medium", latency_hint="fast", supports_web=False, supports_json=True,
+                good_for_code=True, in_per_1m=3.0, out_per_1m=15.0,
+            ),
+            ModelCatalog(
+                key="gemini_flash", provider="gemini", model="models/gemini-2.5-flash",
+                cost_tier="low", latency_hint="fast", supports_web=True, supports_json=True,
+                good_for_code=True, in_per_1m=0.30, out_per_1m=2.50,
+            ),
+        ])
+        session.add(Prompt(
+            username="alice", user_id=7, raw_prompt="Write a sort function",
+            prompt_profile_json={
+                "task_type": "coding", "needs_web": False, "needs_code": True,
+                "output_format": "text", "urgency": "normal", "confidence": 0.9,
+            },
+        ))
+        await session.commit()
+        yield session
+    await engine.dispose()
+
+
+# --- SDK usage extraction ---
+
+def _client_with(provider, sdk_client):
+    client = LLMCompletionClient(keys={provider: "test-key"})
+    client._clients[provider] = sdk_client
+    return client
+
+
+def test_openai_usage_captured():
+    sdk = MagicMock()
+    sdk.chat.completions.create.return_value = SimpleNamespace(
+        choices=[SimpleNamespace(message=SimpleNamespace(content="hi"))],
+        usage=SimpleNamespace(prompt_tokens=12, completion_tokens=3),
+    )
+    result = _client_with("openai", sdk).generate("q", "openai", "gpt-4o-mini")
+    assert (result.input_tokens, result.output_tokens) == (12, 3)
+
+
+def test_anthropic_usage_captured():
+    sdk = MagicMock()
+    sdk.messages.create.return_value = SimpleNamespace(
+        content=[SimpleNamespace(text="hi")],
+        usage=SimpleNamespace(input_tokens=20, output_tokens=5),
+    )
+    result = _client_with("anthropic", sdk).generate("q", "anthropic", "claude")
+    assert (result.input_tokens, result.output_tokens) == (20, 5)
+
+
+def test_gemini_counts_thinking_tokens_as_output():
+    sdk = MagicMock()
+    sdk.models.generate_content.return_value = SimpleNamespace(
+        text="hi",
+        candidates=[],
+        usage_metadata=SimpleNamespace(prompt_token_count=8, candidates_token_count=2, thoughts_token_count=30),
+    )
+    result = _client_with("gemini", sdk).generate("q", "gemini", "models/gemini-2.5-flash")
+    assert (result.input_tokens, result.output_tokens) == (8, 32)
+
+
+def test_empty_response_raises_with_billed_usage():
+    sdk = MagicMock()
+    sdk.chat.completions.create.return_value = SimpleNamespace(
+        choices=[SimpleNamespace(message=SimpleNamespace(content=""))],
+        usage=SimpleNamespace(prompt_tokens=40, completion_tokens=0),
+    )
+    with pytest.raises(ProviderResponseError) as exc:
+        _client_with("openai", sdk).generate("q", "openai", "gpt-4o-mini")
+    assert exc.value.input_tokens == 40
+
+
+# --- Pricing + recording ---
+
+def test_price_tokens_uses_catalog_rates():
+    entry = ModelCatalog(in_per_1m=3.0, out_per_1m=15.0)
+    assert price_tokens(entry, 1_000_000, 100_000) == pytest.approx(4.5)
+    assert price_tokens(ModelCatalog(), 1000, 1000) == 0.0  # unpriced
+
+
+async def test_completion_records_usage_and_wasted_spend(db, queue):
+    client = MagicMock(spec=LLMCompletionClient)
+    client.generate.side_effect = [
+        ProviderResponseError("empty", input_tokens=1000, output_tokens=0),
+        LLMResult(text="def sort(x): ...", input_tokens=1000, output_tokens=200),
+    ]
+
+    response = await execute_completion(prompt_id=1, db=db, client=client)
+
+    assert response.attempts == 2
+    assert (response.input_tokens, response.output_tokens) == (2000, 200)
+    [log] = [r for r in queue.rows if isinstance(r, RequestLog)]
+    assert log.user_id == 7
+    assert (log.prompt_id, log.prompt) == (1, "")  # text is read through the prompt's body
+    assert log.status == "ok"
+    assert log.attempts == 2
+    assert log.wasted_cost_usd == pytest.approx(1000 * 3.0 / 1e6)  # failed claude attempt
+    assert log.cost_usd == pytest.approx(log.wasted_cost_usd + 1000 * 0.30 / 1e6 + 200 * 2.50 / 1e6)
+    assert log.estimated_cost_usd == log.cost_usd
+
+    first, second = [r for r in queue.rows if isinstance(r, CompletionAttempt)]
+    assert (first.attempt_no, first.outcome, first.error_class) == (1, "unusable", "ProviderResponseError")
+    assert first.retryable is False and first.input_tokens == 1000
+    assert (second.attempt_no, second.outcome, second.provider) == (2, "ok", "gemini")
+    assert second.task_type == "coding" and second.error_class is None
+    assert second.created_at <= second.ended_at and second.latency_ms >= 0
+
+
+async def test_failed_completion_is_still_recorded(db, queue):
+    client = MagicMock(spec=LLMCompletionClient)
+    client.generate.side_effect = RuntimeError("Provider down")
+
+    with pytest.raises(RuntimeError):
+        await execute_completion(prompt_id=1, db=db, client=client)
+
+    [log] = [r for r in queue.rows if isinstance(r, RequestLog)]
+    assert log.status == "failed"
+    assert log.cost_usd == 0.0
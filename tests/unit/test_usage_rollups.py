@@ -0,0 +1,101 @@
+"""
+tests/unit/test_usage_rollups.py
+--------------------------------
+Unit tests for incremental usage rollups and the rollup-backed usage query.
+"""
+
+from datetime import date, datetime
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.db.base import Base
+from app.db.models import RequestLog, UsageRollup
+from app.db.session import make_engine
+from app.services.usage_rollups import accumulate, apply_request_logs, query_usage, upsert_rollups
+from app.services.write_behind import WriteBehindQueue
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = tmp_path / "usage.db"
+    engine = make_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind=engine)
+    engine.dispose()
+    return path
+
+
+@pytest.fixture
+def session_factory(db_path):
+    engine = make_engine(f"sqlite:///{db_path}")
+    yield sessionmaker(bind=engine, expire_on_commit=False)
+    engine.dispose()
+
+
+def _log(day, provider="gemini", model="flash", cost=0.01, status="ok", user_id=1):
+    return RequestLog(
+        user_id=user_id, created_at=datetime(2026, 3, day, 12), prompt="p",
+        chosen_provider=provider, chosen_model=model, attempts=1,
+        input_tokens_est=10, output_tokens_est=5, estimated_cost_usd=cost,
+        input_tokens=10, output_tokens=5, cost_usd=cost, wasted_cost_usd=0.0, status=status,
+    )
+
+
+def _rollups(session_factory):
+    with session_factory() as db:
+        return {(r.day.day, r.provider): r for r in db.scalars(select(UsageRollup))}
+
+
+def test_write_behind_hook_keeps_rollups_in_step(session_factory):
+    queue = WriteBehindQueue(session_factory, flush_interval_ms=1)
+    queue.add_batch_hook(RequestLog, apply_request_logs)
+    for log in [_log(1), _log(1, status="failed"), _log(2), _log(2, provider="openai", model="mini")]:
+        queue.submit(log)
+    queue.close()
+
+    rollups = _rollups(session_factory)
+    assert rollups[(1, "gemini")].requests == 2
+    assert rollups[(1, "gemini")].failed == 1
+    assert rollups[(1, "gemini")].cost_usd == pytest.approx(0.02)
+    assert rollups[(2, "openai")].input_tokens == 10
+
+
+def test_upserts_accumulate_across_batches(session_factory):
+    for _ in range(3):
+        with session_factory() as db:
+            upsert_rollups(db, accumulate({}, [_log(5)]))
+            db.commit()
+    assert _rollups(session_factory)[(5, "gemini")].requests == 3
+
+
+def test_legacy_rows_fall_back_to_estimate_columns():
+    legacy = _log(1)
+    legacy.input_tokens = legacy.output_tokens = legacy.cost_usd = legacy.status = None
+    legacy.estimated_cost_usd = 0.5
+    [totals] = accumulate({}, [legacy]).values()
+    assert totals["cost_usd"] == 0.5
+    assert totals["input_tokens"] == 10
+    assert totals["failed"] == 0
+
+
+async def test_query_usage_range_and_group_by(session_factory, db_path):
+    with session_factory() as db:
+        apply_request_logs(db, [_log(1), _log(2), _log(2, provider="openai", model="mini", cost=0.1), _log(3, user_id=2)])
+        db.commit()
+
+    engine = create_async_engine(f"sqlite+aiosqlite:///{db_path}")
+    async with async_sessionmaker(engine)() as db:
+        everything = await query_usage(db, user_id=1)
+        assert everything["totals"]["requests"] == 3
+        assert everything["groups"] is None
+
+        day2 = await query_usage(db, user_id=1, start=date(2026, 3, 2), end=date(2026, 3, 2), group_by="provider")
+        assert day2["totals"]["requests"] == 2
+        assert day2["totals"]["cost_usd"] == pytest.approx(0.11)
+        assert [g["provider"] for g in day2["groups"]] == ["gemini", "openai"]
+
+        by_day = await query_usage(db, user_id=1, group_by="day")
+        assert [g["day"] for g in by_day["groups"]] == ["2026-03-01", "2026-03-02"]
+    await engine.dispose()
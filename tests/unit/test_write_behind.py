@@ -0,0 +1,177 @@
+"""
+tests/unit/test_write_behind.py
+-------------------------------
+Unit tests for the write-behind queue and block id allocation.
+"""
+
+import json
+import time
+
+import pytest
+from sqlalchemy import func, select
+from sqlalchemy.orm import sessionmaker
+
+from app.db.base import Base
+from app.db.prompt_models import Prompt
+from app.db.session import make_engine
+from app.services.write_behind import IdAllocator, WriteBehindQueue, WriteQueueFull
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    engine = make_engine(f"sqlite:///{tmp_path / 'wb.db'}")
+    Base.metadata.create_all(bind=engine)
+    yield sessionmaker(bind=engine, expire_on_commit=False)
+    engine.dispose()
+
+
+def _prompt(text="hello"):
+    return Prompt(username="alice", raw_prompt=text, prompt_profile_json={"task_type": "qa"})
+
+
+def _count(session_factory):
+    with session_factory() as db:
+        return db.scalar(select(func.count(Prompt.id)))
+
+
+def test_ids_assigned_at_submit_and_rows_flushed(session_factory):
+    queue = WriteBehindQueue(session_factory, flush_interval_ms=1)
+    rows = [queue.submit(_prompt(f"p{i}")) for i in range(250)]
+    assert [r.id for r in rows] == list(range(1, 251))
+
+    assert queue.flush(timeout=5)
+    assert _count(session_factory) == 250
+    assert queue.stats()["pending"] == 0
+    assert queue.stats()["batches"] < 250  # grouped, not one commit per row
+    queue.close()
+
+
+def test_pending_row_readable_before_commit(session_factory):
+    queue = WriteBehindQueue(session_factory, flush_interval_ms=10_000, max_batch=1000)
+    row = queue.submit(_prompt())
+    assert queue.pending(Prompt, row.id) is row
+    assert _count(session_factory) == 0
+
+    queue.close()  # close writes out what is still queued
+    assert _count(session_factory) == 1
+    assert queue.pending(Prompt, row.id) is None
+
+
+def test_ids_continue_after_existing_rows(session_factory):
+    with session_factory() as db:
+        db.add(Prompt(id=41, username="old", raw_prompt="before the queue"))
+        db.commit()
+    allocator = IdAllocator(session_factory, block_size=10)
+    assert allocator.next_id(Prompt) == 42
+
+
+def test_allocators_sharing_a_db_never_collide(session_factory):
+    a = IdAllocator(session_factory, block_size=5)
+    b = IdAllocator(session_factory, block_size=5)
+    ids = [a.next_id(Prompt) for _ in range(7)] + [b.next_id(Prompt) for _ in range(7)]
+    assert len(set(ids)) == len(ids)
+
+
+def test_full_queue_rejects(session_factory):
+    queue = WriteBehindQueue(session_factory, flush_interval_ms=10_000, max_batch=1000, max_pending=2)
+    queue.submit(_prompt())
+    queue.submit(_prompt())
+    with pytest.raises(WriteQueueFull):
+        queue.submit(_prompt())
+    queue.close()
+
+
+def test_bulk_submits_leave_headroom_for_live_rows(session_factory):
+    queue = WriteBehindQueue(session_factory, flush_interval_ms=10_000, max_batch=1000, max_pending=4)
+    assert queue.bulk_max_pending == 2
+    queue.submit(_prompt(), bulk=True)
+    queue.submit(_prompt(), bulk=True)
+    with pytest.raises(WriteQueueFull):
+        queue.submit(_prompt(), bulk=True)
+    queue.submit(_prompt())  # live traffic still fits
+    queue.close()
+
+
+def test_bad_row_does_not_sink_its_batch(session_factory, tmp_path):
+    dead_letter = tmp_path / "dead.jsonl"
+    queue = WriteBehindQueue(
+        session_factory, flush_interval_ms=1, max_retries=2, dead_letter_path=str(dead_letter),
+    )
+    queue.submit(_prompt("ok-1"))
+    bad = queue.submit(Prompt(username="alice", raw_prompt=None))  # NOT NULL violation
+    queue.submit(_prompt("ok-2"))
+    assert queue.flush(timeout=5)
+
+    assert _count(session_factory) == 2
+    stats = queue.stats()
+    assert (stats["requeued"], stats["dead_lettered"], stats["pending"]) == (2, 1, 0)
+    [entry] = queue.dead_letters()
+    assert (entry["table"], entry["id"]) == ("prompts", bad.id)
+    assert "IntegrityError" in entry["error"]
+    assert json.loads(dead_letter.read_text())["values"]["username"] == "alice"
+    queue.close()
+
+
+def test_failing_row_stays_readable_while_requeued(session_factory, monkeypatch):
+    queue = WriteBehindQueue(session_factory, flush_interval_ms=1, max_retries=10)
+    row = queue.submit(_prompt())
+    calls = []
+    write = queue._write_one_by_one
+
+    def flaky(batch):
+        calls.append(len(batch))
+        return [(r, RuntimeError("database is locked")) for r in batch] if len(calls) < 3 else write(batch)
+
+    def locked_insert(model):
+        raise RuntimeError("database is locked")
+
+    monkeypatch.setattr(queue, "_write_one_by_one", flaky)
+    monkeypatch.setattr("app.services.write_behind.insert", locked_insert)
+    assert queue.flush(timeout=5)
+    assert len(calls) == 3
+    assert queue.stats()["requeued"] == 2 and queue.stats()["dead_lettered"] == 0
+    assert _count(session_factory) == 1
+    assert queue.pending(Prompt, row.id) is None
+    queue.close()
+
+
+async def test_asubmit_reserves_blocks_off_the_event_loop(session_factory, monkeypatch):
+    import threading
+
+    queue = WriteBehindQueue(session_factory, flush_interval_ms=1, id_block_size=3)
+    reserve = queue.ids._reserve
+    threads = []
+
+    def tracking_reserve(model):
+        threads.append(threading.current_thread())
+        return reserve(model)
+
+    monkeypatch.setattr(queue.ids, "_reserve", tracking_reserve)
+    rows = [await queue.asubmit(_prompt(f"p{i}")) for i in range(7)]
+    assert [r.id for r in rows] == list(range(1, 8))
+    assert threads and threading.main_thread() not in threads
+    assert queue.flush(timeout=5)
+    queue.close()
+
+
+async def test_get_row_waits_for_another_workers_flush(session_factory, tmp_path, monkeypatch):
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+    from app.services.write_behind import get_row, set_write_queue
+
+    other_worker = WriteBehindQueue(session_factory, flush_interval_ms=100, max_batch=1000)
+    this_worker = WriteBehindQueue(session_factory, flush_interval_ms=1)
+    set_write_queue(this_worker)
+    row = other_worker.submit(_prompt())
+
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'wb.db'}")
+    async with async_sessionmaker(engine)() as db:
+        found = await get_row(db, Prompt, row.id)
+        assert found is not None and found.raw_prompt == "hello"
+        monkeypatch.setenv("WRITE_BEHIND_READ_WAIT_MS", "5000")
+        started = time.monotonic()
+        assert await get_row(db, Prompt, 10_000) is None
+        assert time.monotonic() - started < 1  # never handed out: no wait
+    await engine.dispose()
+    other_worker.close()
+    set_write_queue(None)